@@ -0,0 +1,255 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import boto3
+import botocore.session
+from botocore.credentials import RefreshableCredentials
+
+from coalesce import coalesced, flight
+from regions import fan_out
+
+logger = logging.getLogger()
+
+# Accounts the gateway may assume a role in: a JSON list, inline or in a file, of
+# {"id": "123456789012", "name": "prod", "role": "GatewayReadOnly", "external_id": "..."}
+AWS_ACCOUNTS = os.getenv('AWS_ACCOUNTS')
+DEFAULT_ROLE_NAME = os.getenv('AWS_ASSUME_ROLE_NAME', 'OrganizationAccountAccessRole')
+SESSION_NAME = os.getenv('AWS_ASSUME_ROLE_SESSION_NAME', 'cloud-gateway')
+SESSION_DURATION = int(os.getenv('AWS_ASSUME_ROLE_DURATION', '3600'))
+# Sessions are renewed in the background this long before they expire. botocore
+# starts refreshing on its own 15 minutes before expiry, so keep this above that
+REFRESH_AHEAD = int(os.getenv('AWS_ASSUME_ROLE_REFRESH_AHEAD', '1200'))
+REFRESH_CHECK_INTERVAL = 30
+ACCOUNT_TIMEOUT = float(os.getenv('AWS_ACCOUNT_TIMEOUT', '20'))
+# Most accounts one map() or refresh() works on at once
+ACCOUNT_WORKERS = int(os.getenv('AWS_ACCOUNT_WORKERS', '16'))
+# Held credentials closer to expiry than this are renewed on the calling thread
+# (only happens if background refreshes keep failing); matches botocore's mandatory window
+MANDATORY_REFRESH = 10 * 60
+
+
+def load_accounts(spec=AWS_ACCOUNTS):
+    """Parse AWS_ACCOUNTS (inline JSON or a path to a JSON file) into account records."""
+    if not spec:
+        return []
+    if not spec.lstrip().startswith('['):
+        with open(spec) as f:
+            spec = f.read()
+    accounts = []
+    for entry in json.loads(spec):
+        account_id = str(entry['id'])
+        role = entry.get('role') or DEFAULT_ROLE_NAME
+        accounts.append({
+            'id': account_id,
+            'name': entry.get('name') or account_id,
+            'role_arn': role if role.startswith('arn:') else f'arn:aws:iam::{account_id}:role/{role}',
+            'external_id': entry.get('external_id'),
+        })
+    return accounts
+
+
+class _RoleSession:
+    """Latest STS credentials for one role, and the boto3 session built on them."""
+
+    def __init__(self, account):
+        self.account = account
+        self.metadata = None
+        self.expires_at = 0
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.error = None
+        self.session = None
+
+
+class CredentialBroker:
+    """Assumed-role sessions per (account, role), shared by every request.
+
+    sts_factory() returns an STS client holding the gateway's own
+    credentials (a stubbed one in tests). The first use of an account calls
+    AssumeRole once, however many requests arrive together; after that its
+    clients come from the cache. They hold RefreshableCredentials, which
+    pick up renewed credentials in place, and a background thread renews
+    each session refresh_ahead seconds before it expires, so requests never
+    wait on STS.
+    """
+
+    def __init__(self, sts_factory, accounts, default_region, duration=SESSION_DURATION,
+                 refresh_ahead=REFRESH_AHEAD, session_name=SESSION_NAME, timeout=ACCOUNT_TIMEOUT,
+                 workers=ACCOUNT_WORKERS):
+        self._sts_factory = sts_factory
+        self.accounts = {account['name']: account for account in accounts}
+        self.default_region = default_region
+        self.duration = duration
+        self.refresh_ahead = refresh_ahead
+        self.session_name = session_name
+        self.timeout = timeout
+        self._sessions = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.workers = workers
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def account(self, key):
+        """Look an account up by name or id."""
+        if key in self.accounts:
+            return self.accounts[key]
+        for account in self.accounts.values():
+            if account['id'] == key:
+                return account
+        raise KeyError(f'Unknown AWS account: {key}')
+
+    def _entry(self, account):
+        with self._lock:
+            entry = self._sessions.get(account['role_arn'])
+            if entry is None:
+                entry = self._sessions[account['role_arn']] = _RoleSession(account)
+            return entry
+
+    def _assume(self, account):
+        params = {'RoleArn': account['role_arn'], 'RoleSessionName': self.session_name,
+                  'DurationSeconds': self.duration}
+        if account['external_id']:
+            params['ExternalId'] = account['external_id']
+        credentials = self._sts_factory().assume_role(**params)['Credentials']
+        expiration = credentials['Expiration']
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        return {
+            'access_key': credentials['AccessKeyId'],
+            'secret_key': credentials['SecretAccessKey'],
+            'token': credentials['SessionToken'],
+            'expiry_time': expiration.isoformat(),
+        }
+
+    def _fetch(self, account):
+        """AssumeRole now and store the result; concurrent callers share one STS call."""
+        entry = self._entry(account)
+
+        def assume():
+            try:
+                metadata = self._assume(account)
+            except Exception as e:
+                entry.error = str(e)
+                raise
+            entry.metadata = metadata
+            entry.expires_at = datetime.fromisoformat(metadata['expiry_time']).timestamp()
+            entry.refreshed_at = time.time()
+            entry.refreshes += 1
+            entry.error = None
+            return metadata
+        return flight.do(('sts.assume_role', account['role_arn']), assume, timeout=self.timeout,
+                         name='sts.assume_role')
+
+    def _current(self, account):
+        """refresh_using callback for RefreshableCredentials: the newest credentials held.
+
+        The background refresher normally has fresher ones ready by the time
+        botocore asks; only near-expired credentials cost an STS call here.
+        """
+        entry = self._entry(account)
+        if entry.metadata is None or entry.expires_at - time.time() < MANDATORY_REFRESH:
+            return self._fetch(account)
+        return entry.metadata
+
+    def session(self, key):
+        """boto3 Session for an account's role, assuming it on first use."""
+        account = self.account(key)
+        entry = self._entry(account)
+        if entry.session is None:
+            metadata = entry.metadata or self._fetch(account)
+            with self._lock:
+                if entry.session is None:
+                    credentials = RefreshableCredentials.create_from_metadata(
+                        metadata, refresh_using=lambda: self._current(account), method='sts-assume-role')
+                    botocore_session = botocore.session.get_session()
+                    # botocore has no public setter for credentials that refresh themselves
+                    botocore_session._credentials = credentials
+                    entry.session = boto3.Session(botocore_session=botocore_session)
+            self.start()
+        return entry.session
+
+    def client(self, key, service_name, region_name=None, config=None):
+        """Pooled client for a service in an account, built once and shared across requests."""
+        account = self.account(key)
+        region_name = region_name or self.default_region
+        endpoint_url = os.getenv(f'AWS_{service_name.upper()}_ENDPOINT_URL')
+        cache_key = (account['role_arn'], service_name, region_name, endpoint_url, config)
+        client = self._clients.get(cache_key)
+        if client is not None:
+            return client
+        session = self.session(key)
+        with self._lock:
+            client = self._clients.get(cache_key)
+            if client is None:
+                client = self._clients[cache_key] = coalesced(
+                    session.client(service_name, region_name=region_name, endpoint_url=endpoint_url, config=config),
+                    scope=account['id'])
+        return client
+
+    def map(self, service_name, fn, accounts=None, region_name=None, timeout=None, workers=None):
+        """Call fn(client, account) in every account; returns (results, errors, timings).
+
+        Keyed by account name. At most workers accounts (default
+        self.workers) run at once. An account whose role can't be assumed,
+        or whose call fails or misses the deadline, lands in errors.
+        """
+        names = [self.account(key)['name'] for key in accounts] if accounts else list(self.accounts)
+        calls = {name: (lambda name=name: fn(self.client(name, service_name, region_name), self.accounts[name]))
+                 for name in names}
+        return fan_out(calls, self.timeout if timeout is None else timeout, label=service_name,
+                       workers=workers or self.workers, kind='account')
+
+    def refresh(self, key=None):
+        """Renew one account's session (or every assumed one) now; returns status."""
+        names = [self.account(key)['name']] if key else \
+            [entry.account['name'] for entry in list(self._sessions.values())]
+        _, errors, _ = fan_out({name: (lambda name=name: self._fetch(self.accounts[name])) for name in names},
+                               self.timeout, label='sts.assume_role', workers=self.workers, kind='account')
+        for name, error in errors.items():
+            logger.error(f"Failed to refresh credentials for account {name}: {error}")
+        return self.status()
+
+    def _refresh_due(self):
+        while not self._stop.wait(REFRESH_CHECK_INTERVAL):
+            now = time.time()
+            for entry in list(self._sessions.values()):
+                if entry.metadata is None or entry.expires_at - now > self.refresh_ahead:
+                    continue
+                try:
+                    self._fetch(entry.account)
+                    logger.info(f"Refreshed credentials for account {entry.account['name']}")
+                except Exception as e:
+                    # Retried on the next check; the held credentials stay valid until expiry
+                    logger.error(f"Failed to refresh credentials for account {entry.account['name']}: {e}")
+
+    def start(self):
+        """Start the background refresher; safe to call repeatedly."""
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_due, name='sts-refresh', daemon=True)
+                self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        accounts = {}
+        for name, account in self.accounts.items():
+            entry = self._sessions.get(account['role_arn'])
+            accounts[name] = {
+                'id': account['id'],
+                'role_arn': account['role_arn'],
+                'assumed': bool(entry and entry.metadata),
+                'expires_at': datetime.fromtimestamp(entry.expires_at, timezone.utc).isoformat()
+                if entry and entry.expires_at else None,
+                'refreshed_at': entry.refreshed_at if entry else None,
+                'refreshes': entry.refreshes if entry else 0,
+                'error': entry.error if entry else None,
+                'clients': sum(1 for cache_key in self._clients if cache_key[0] == account['role_arn']),
+            }
+        return {'accounts': accounts, 'session_duration': self.duration, 'refresh_ahead': self.refresh_ahead}
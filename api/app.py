@@ -1,7 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, redirect
 import boto3
 import logging
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, ParamValidationError
 import os
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
@@ -12,8 +12,29 @@ import io
 import zipfile
 from pathlib import Path
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import statistics
+import itertools
+from responses import json_response, stream_json_list, compress_response
+from inventory import Delta, InventoryService, InventoryStore, PartialSnapshot, make_resource, resource_key
+from invalidations import InvalidationManager, distributions_for_bucket
+from distributions import PRESETS, DistributionCatalog, build_distribution_config, update_distribution
+from uploads import start_upload, presign_parts, complete_upload, check_upload_cors
+from coalesce import coalesced, flight
+from regions import REGIONAL_CLIENT_CONFIG, RegionDirectory, RegionFanout, merge
+from accounts import CredentialBroker, load_accounts
+from metric_catalog import RANK_FUNCTIONS, RESOURCE_METRICS, MetricCatalog, ResourceMetrics, rank_value
+from logs import CursorStore, insights_query, new_cursor, new_cursor_name, parse_limits, sse, tail
+from timeseries import (DOWNSAMPLE_METHODS, available_formats, negotiate_format, parse_max_points,
+                        series as columnar_series, series_response)
+from downloads import (get_object_args, response_headers, stream_body, stream_ranges,
+                       PARALLEL_THRESHOLD, RANGE_PART_SIZE)
+import functools
+import hashlib
+import itertools
+import sys
+import threading
+import time
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
@@ -21,27 +42,82 @@ logger = logging.getLogger()
 # Initialize Flask App
 app = Flask(__name__)
 CORS(app)
+app.after_request(compress_response)
 # AWS Credentials and Helper Function
-def get_aws_client(service_name):
+# boto3's default session is not thread-safe, but its clients are: build each
+# client once under a lock and share it across requests (and its connection pool)
+_aws_clients = {}
+_aws_client_lock = threading.Lock()
+
+def get_aws_client(service_name, region_name=None, config=None):
     try:
         aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
         aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
-        region_name = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
-        
-        if not aws_access_key or not aws_secret_key:
-            # Fall back to boto3's default credential chain
-            return boto3.client(service_name, region_name=region_name)
-            
-        return boto3.client(
-            service_name,
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key,
-            region_name=region_name
-        )
+        region_name = region_name or os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+        # Optional per-service endpoint, e.g. AWS_S3_ENDPOINT_URL for a local S3 stand-in
+        endpoint_url = os.getenv(f'AWS_{service_name.upper()}_ENDPOINT_URL')
+        key = (service_name, region_name, endpoint_url, aws_access_key, config)
+
+        with _aws_client_lock:
+            client = _aws_clients.get(key)
+            if client is None:
+                if not aws_access_key or not aws_secret_key:
+                    # Fall back to boto3's default credential chain
+                    client = boto3.client(service_name, region_name=region_name, endpoint_url=endpoint_url,
+                                          config=config)
+                else:
+                    client = boto3.client(
+                        service_name,
+                        aws_access_key_id=aws_access_key,
+                        aws_secret_access_key=aws_secret_key,
+                        region_name=region_name,
+                        endpoint_url=endpoint_url,
+                        config=config
+                    )
+                # Identical concurrent read calls (list_buckets, get_metric_data, ...) share one upstream
+                # request, scoped to the gateway's own credentials
+                client = _aws_clients[key] = coalesced(client, scope=aws_access_key or 'default-chain')
+        return client
     except ClientError as e:
         logger.error(f"Failed to create AWS client for {service_name}: {e}")
         return None
 
+def get_regional_client(service_name, region_name):
+    """Client for one leg of a multi-region fan-out, with timeouts sized to the fan-out budget."""
+    return get_aws_client(service_name, region_name, config=REGIONAL_CLIENT_CONFIG)
+
+# Enabled regions are discovered once (or read from AWS_REGIONS) and every
+# EC2/CloudWatch read fans out to all of them concurrently
+aws_regions = RegionDirectory(lambda region: get_regional_client('ec2', region),
+                              os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+region_fanout = RegionFanout(get_regional_client, aws_regions)
+
+# Other accounts (AWS_ACCOUNTS) are reached by assuming a role in each; their
+# sessions and clients are cached per (account, role) and renewed in the background
+credential_broker = CredentialBroker(lambda: get_aws_client('sts'), load_accounts(),
+                                     os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+_account_regions = {}
+
+def get_account_client(account, service_name, region_name=None):
+    """Client for a service in another account, for one leg of a fan-out."""
+    return credential_broker.client(account, service_name, region_name, config=REGIONAL_CLIENT_CONFIG)
+
+def account_regions(account):
+    """RegionDirectory for an account; opt-in regions can differ between accounts."""
+    name = credential_broker.account(account)['name']
+    with _aws_client_lock:
+        if name not in _account_regions:
+            _account_regions[name] = RegionDirectory(lambda region: get_account_client(name, 'ec2', region),
+                                                     credential_broker.default_region)
+        return _account_regions[name]
+
+def region_scope(account=None):
+    """(regions, client_factory) for a fan-out in the gateway's own account or another one."""
+    if not account:
+        return aws_regions.regions(), None
+    return account_regions(account).regions(), \
+        lambda service_name, region_name: get_account_client(account, service_name, region_name)
+
 # ---------------------------- S3 Operations ---------------------------- #
 
 # Create S3 Bucket
@@ -72,8 +148,8 @@ def list_s3_buckets():
         s3_client = get_aws_client('s3')
         response = s3_client.list_buckets()
         buckets = [{'name': bucket['Name'], 'creation_date': bucket['CreationDate']} for bucket in response['Buckets']]
-        logger.info(f"S3 Buckets: {buckets}")
-        return jsonify({'buckets': buckets}), 200
+        logger.info(f"Found {len(buckets)} S3 buckets")
+        return stream_json_list('buckets', buckets)
     except ClientError as e:
         logger.error(f"Failed to list S3 buckets: {e}")
         return jsonify({'error': str(e)}), 500
@@ -190,6 +266,157 @@ def upload_file_to_s3():
         return jsonify({'error': f"Upload failed: {str(e)}"}), 500
 
 
+# Presigned Direct-to-S3 Uploads
+@app.route('/s3/presign_upload', methods=['POST'])
+def presign_s3_upload():
+    """Hand out URLs so the client uploads straight to S3.
+
+    Body: {"bucket_name", "filename" or "key", "size", "content_type", "part_size"}.
+    Returns a single PUT URL, or a multipart upload id with one URL per part.
+    When the bucket's CORS rules do not allow the caller's origin, returns
+    {"method": "proxy", "cors": <the missing rule>} and the client uploads
+    through /s3/upload.
+    """
+    data = request.get_json(silent=True) or {}
+    bucket_name = data.get('bucket_name')
+    key = data.get('key') or secure_filename(data.get('filename', ''))
+    try:
+        size = int(data.get('size', -1))
+    except (TypeError, ValueError):
+        size = -1
+    if not bucket_name or not key or size < 0:
+        return jsonify({'error': 'bucket_name, filename/key and size are required'}), 400
+    try:
+        s3_client = get_aws_client('s3')
+        origin = request.headers.get('Origin')
+        cors_problem = origin and check_upload_cors(s3_client, bucket_name, origin)
+        if cors_problem:
+            logger.warning(f"{cors_problem}; using the proxied upload")
+            return json_response({'bucket_name': bucket_name, 'key': key, 'method': 'proxy', 'cors': cors_problem})
+        plan = start_upload(
+            s3_client, bucket_name, key, size,
+            content_type=data.get('content_type'),
+            **({'part_size': int(data['part_size'])} if data.get('part_size') else {})
+        )
+        logger.info(f"Presigned {plan['method']} upload of {key} ({size} bytes) to {bucket_name}")
+        return json_response({'bucket_name': bucket_name, 'key': key, **plan})
+    except ClientError as e:
+        logger.error(f"Failed to presign upload: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/s3/presign_parts', methods=['POST'])
+def presign_s3_parts():
+    """Fresh URLs for some parts of an in-progress multipart upload (retries, expiry)."""
+    data = request.get_json(silent=True) or {}
+    if not all(data.get(k) for k in ('bucket_name', 'key', 'upload_id', 'part_numbers')):
+        return jsonify({'error': 'bucket_name, key, upload_id and part_numbers are required'}), 400
+    try:
+        urls = presign_parts(get_aws_client('s3'), data['bucket_name'], data['key'], data['upload_id'],
+                             [int(n) for n in data['part_numbers']])
+        return json_response({'parts': [{'part_number': n, 'url': url} for n, url in urls.items()]})
+    except ClientError as e:
+        logger.error(f"Failed to presign upload parts: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/s3/complete_multipart', methods=['POST'])
+def complete_s3_multipart():
+    """Complete a multipart upload; "parts" ([{PartNumber, ETag}]) is optional."""
+    data = request.get_json(silent=True) or {}
+    if not all(data.get(k) for k in ('bucket_name', 'key', 'upload_id')):
+        return jsonify({'error': 'bucket_name, key and upload_id are required'}), 400
+    try:
+        result = complete_upload(get_aws_client('s3'), data['bucket_name'], data['key'], data['upload_id'],
+                                 data.get('parts'))
+        logger.info(f"Completed multipart upload of {data['key']} to {data['bucket_name']}")
+        return jsonify({
+            'message': 'File uploaded successfully',
+            'url': f"https://{data['bucket_name']}.s3.amazonaws.com/{data['key']}",
+            'filename': data['key'],
+            'etag': result.get('ETag', '').strip('"')
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ClientError as e:
+        logger.error(f"Failed to complete multipart upload: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/s3/abort_multipart', methods=['POST'])
+def abort_s3_multipart():
+    data = request.get_json(silent=True) or {}
+    if not all(data.get(k) for k in ('bucket_name', 'key', 'upload_id')):
+        return jsonify({'error': 'bucket_name, key and upload_id are required'}), 400
+    try:
+        get_aws_client('s3').abort_multipart_upload(Bucket=data['bucket_name'], Key=data['key'],
+                                                   UploadId=data['upload_id'])
+        return jsonify({'message': 'Multipart upload aborted'}), 200
+    except ClientError as e:
+        logger.error(f"Failed to abort multipart upload: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Download an Object from S3
+@app.route('/s3/download', methods=['GET'])
+def download_from_s3():
+    """Stream an object to the client in constant memory.
+
+    Range and conditional headers are passed through to S3. mode=redirect
+    sends the client to a presigned URL instead; large whole-object
+    downloads are fetched as parallel ranges unless parallel=0.
+    """
+    bucket_name = request.args.get('bucket_name')
+    key = request.args.get('key')
+    if not bucket_name or not key:
+        return jsonify({'error': 'bucket_name and key are required'}), 400
+    try:
+        try:
+            expires = int(request.args.get('expires', 300))
+            part_size = int(request.args.get('part_size', RANGE_PART_SIZE))
+        except ValueError:
+            raise ValueError('expires and part_size must be integers')
+        # SigV4 presigned URLs are valid for at most 7 days
+        if not 1 <= expires <= 7 * 24 * 3600:
+            raise ValueError('expires must be between 1 and 604800 seconds')
+        if part_size < 1024 * 1024:
+            raise ValueError('part_size must be at least 1048576 bytes')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    disposition = f'attachment; filename="{secure_filename(os.path.basename(key)) or "download"}"'
+
+    try:
+        s3_client = get_aws_client('s3')
+        if request.args.get('mode') == 'redirect':
+            url = s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': bucket_name, 'Key': key, 'ResponseContentDisposition': disposition},
+                ExpiresIn=expires
+            )
+            return redirect(url, code=302)
+
+        args = get_object_args(request.headers)
+        if 'Range' not in args and request.args.get('parallel') != '0':
+            head = s3_client.head_object(Bucket=bucket_name, Key=key, **args)
+            if head['ContentLength'] >= PARALLEL_THRESHOLD:
+                headers = response_headers(head)
+                headers['Content-Disposition'] = disposition
+                body = stream_ranges(s3_client, bucket_name, key, head['ContentLength'], head['ETag'],
+                                     part_size=part_size)
+                return Response(body, status=200, headers=headers, direct_passthrough=True)
+
+        s3_response = s3_client.get_object(Bucket=bucket_name, Key=key, **args)
+        headers = response_headers(s3_response)
+        headers.setdefault('Content-Disposition', disposition)
+        status = 206 if s3_response.get('ContentRange') else 200
+        return Response(stream_body(s3_response['Body']), status=status, headers=headers, direct_passthrough=True)
+
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        status = int(e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 500))
+        if status == 304 or code == '304':
+            return Response(status=304)
+        if status in (403, 404, 412, 416):
+            return jsonify({'error': code}), status
+        logger.error(f"Failed to download {key} from {bucket_name}: {e}")
+        return jsonify({'error': str(e)}), 500
+
 # Delete S3 Bucket
 @app.route('/s3/delete_bucket', methods=['POST'])
 def delete_s3_bucket():
@@ -218,27 +445,32 @@ def delete_bucket_contents(bucket_name):
     except ClientError as e:
         logger.error(f"Failed to delete contents of S3 bucket: {e}")
 
-# List Recent Objects in a Bucket
+# List the Objects in a Bucket
 @app.route('/s3/list_objects', methods=['GET'])
 def list_bucket_objects():
+    """Every object in the bucket, in key order, streamed page by page.
+
+    Only one page of 1000 keys is held at a time, so buckets of any size
+    list in constant memory.
+    """
     bucket_name = request.args.get('bucket_name')
     try:
         s3_client = get_aws_client('s3')
-        response = s3_client.list_objects_v2(Bucket=bucket_name)
-        objects = sorted(response.get('Contents', []), key=lambda x: x['LastModified'], reverse=True)
-        object_list = [{'key': obj['Key'], 'size': obj['Size'], 'last_modified': obj['LastModified']} for obj in objects]
-        return jsonify({'bucket_name': bucket_name, 'objects': object_list}), 200
+        pages = iter(s3_client.get_paginator('list_objects_v2').paginate(Bucket=bucket_name))
+        # Fetch the first page here so a missing bucket or denied access is still a proper error response
+        first_page = next(pages, {})
+
+        def object_list():
+            for page in itertools.chain([first_page], pages):
+                for obj in page.get('Contents', []):
+                    yield {'key': obj['Key'], 'size': obj['Size'], 'last_modified': obj['LastModified']}
+        return stream_json_list('objects', object_list(), extra={'bucket_name': bucket_name})
     except ClientError as e:
         logger.error(f"Failed to list objects in bucket {bucket_name}: {e}")
         return jsonify({'error': str(e)}), 500
 
-def get_ec2_client():
-    return boto3.client(
-        'ec2',
-        aws_access_key_id='AWS KEY',
-        aws_secret_access_key='AWS SECRET KEY',
-        region_name='us-east-1'
-    )
+def get_ec2_client(region_name=None):
+    return get_aws_client('ec2', region_name)
 
 # Route to create an EC2 instance
 @app.route('/create_instance', methods=['POST'])
@@ -249,7 +481,7 @@ def create_instance():
         instance_type = data.get('InstanceType', 't2.micro')      # Default instance type
         key_name = data.get('KeyName', 'Code_test')             # Provide your key pair name
         
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(data.get('Region'))
         response = ec2.run_instances(
             ImageId=image_id,
             InstanceType=instance_type,
@@ -270,7 +502,7 @@ def start_instance():
         if not instance_id:
             return jsonify({"error": "InstanceId is required"}), 400
 
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(request.json.get('Region'))
         
         # Check current instance state
         response = ec2.describe_instances(InstanceIds=[instance_id])
@@ -299,7 +531,7 @@ def stop_instance():
         if not instance_id:
             return jsonify({"error": "InstanceId is required"}), 400
 
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(request.json.get('Region'))
         
         # Check current instance state
         response = ec2.describe_instances(InstanceIds=[instance_id])
@@ -325,20 +557,18 @@ def stop_instance():
 def terminate_instance():
     try:
         instance_id = request.json.get('InstanceId')
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(request.json.get('Region'))
         ec2.terminate_instances(InstanceIds=[instance_id])
         return jsonify({"message": f"Instance {instance_id} terminated successfully"}), 200
     except ClientError as e:
         return jsonify({"error": str(e)}), 500
 
-# Route to describe all EC2 instances
-@app.route('/describe_instances', methods=['GET'])
-def describe_instances():
-    try:
-        ec2 = get_ec2_client()
-        response = ec2.describe_instances()
-        instances = []
-        
+def region_instances(ec2, region):
+    """Every instance in one region, in the /describe_instances shape."""
+    instances = []
+    kwargs = {}
+    while True:
+        response = ec2.describe_instances(**kwargs)
         for reservation in response['Reservations']:
             for instance in reservation['Instances']:
                 # Get instance tags
@@ -368,24 +598,59 @@ def describe_instances():
                     "Tags": instance.get('Tags', [])
                 }
                 instances.append(instance_details)
+        if not response.get('NextToken'):
+            return instances
+        kwargs = {'NextToken': response['NextToken']}
 
-        logger.info(f"Found {len(instances)} instances")
-        return jsonify(instances), 200
-    except ClientError as e:
-        error_message = str(e)
-        logger.error(f"Failed to describe instances: {error_message}")
-        return jsonify({"error": error_message}), 500
+# Route to describe all EC2 instances
+@app.route('/describe_instances', methods=['GET'])
+def describe_instances():
+    """Instances from every enabled region (or ?region=...), each tagged with its Region.
+
+    ?account= reads another account from AWS_ACCOUNTS through its assumed
+    role. Regions that fail or time out are skipped and named in the
+    X-Failed-Regions header; ?report=1 returns the per-region status too.
+    """
+    try:
+        account = request.args.get('account')
+        try:
+            scoped_regions, client_factory = region_scope(account)
+        except KeyError as e:
+            return jsonify({'error': str(e.args[0])}), 404
+        regions = request.args.getlist('region') or scoped_regions
+        results, errors, timings = region_fanout.map('ec2', region_instances, regions=regions,
+                                                     client_factory=client_factory)
+        instances, report = merge(results, errors, timings, regions)
+        if errors and not results:
+            logger.error(f"Failed to describe instances in every region: {errors}")
+            return json_response({'error': 'Failed to describe instances in every region', **report}, 500)
+
+        logger.info(f"Found {len(instances)} instances in {len(results)} regions")
+        if request.args.get('report'):
+            response = json_response({'instances': instances, **report})
+        else:
+            response = json_response(instances)
+        if errors:
+            response.headers['X-Failed-Regions'] = ','.join(sorted(errors))
+        return response
     except Exception as e:
         error_message = str(e)
         logger.error(f"Unexpected error while describing instances: {error_message}")
         return jsonify({"error": error_message}), 500
 
+@app.route('/aws/regions', methods=['GET'])
+def list_aws_regions():
+    """Regions the EC2 and CloudWatch fan-outs cover; ?refresh=1 rediscovers them."""
+    if request.args.get('refresh'):
+        aws_regions.refresh()
+    return json_response(aws_regions.status())
+
 # Route to reboot an EC2 instance
 @app.route('/reboot_instance', methods=['POST'])
 def reboot_instance():
     try:
         instance_id = request.json.get('InstanceId')
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(request.json.get('Region'))
         ec2.reboot_instances(InstanceIds=[instance_id])
         return jsonify({"message": f"Instance {instance_id} rebooted successfully"}), 200
     except ClientError as e:
@@ -396,7 +661,7 @@ def reboot_instance():
 def monitor_instance():
     try:
         instance_id = request.json.get('InstanceId')
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(request.json.get('Region'))
         ec2.monitor_instances(InstanceIds=[instance_id])
         return jsonify({"message": f"Monitoring enabled for instance {instance_id}"}), 200
     except ClientError as e:
@@ -407,7 +672,7 @@ def monitor_instance():
 def unmonitor_instance():
     try:
         instance_id = request.json.get('InstanceId')
-        ec2 = get_ec2_client()
+        ec2 = get_ec2_client(request.json.get('Region'))
         ec2.unmonitor_instances(InstanceIds=[instance_id])
         return jsonify({"message": f"Monitoring disabled for instance {instance_id}"}), 200
     except ClientError as e:
@@ -504,10 +769,10 @@ def analyze():
         # Analyze image
         results = analyze_image(img_bytes)
         
-        return jsonify({
+        return json_response({
             "message": "Image analyzed successfully",
             "results": results
-        }), 200
+        })
         
     except ClientError as e:
         error_message = str(e)
@@ -519,6 +784,16 @@ def analyze():
         return jsonify({"error": f"Analysis failed: {error_message}"}), 500
 #---------------------------Cloud front-------------
 
+invalidations = InvalidationManager(lambda: get_aws_client('cloudfront'))
+distribution_catalog = DistributionCatalog(lambda: get_aws_client('cloudfront'))
+
+def _distribution_options(data, default_preset=None):
+    """Pick the distribution builder options out of a request body."""
+    options = {key: data[key] for key in ('preset', 'behavior', 'behaviors', 'default_root_object',
+                                          'price_class', 'http_version') if key in data}
+    if default_preset and 'preset' not in options:
+        options['preset'] = default_preset
+    return options
 
 @app.route('/create_cloudfront_oai', methods=['POST'])
 def create_cloudfront_oai():
@@ -586,50 +861,28 @@ def create_cloudfront_distribution():
         oai_id = request.json['oai_id']
         cf_client = get_aws_client('cloudfront')
 
-        distribution_config = {
-            'CallerReference': str(os.urandom(10).hex()),
-            'Origins': {
-                'Items': [
-                    {
-                        'Id': bucket_name,
-                        'DomainName': f'{bucket_name}.s3.amazonaws.com',
-                        'S3OriginConfig': {
-                            'OriginAccessIdentity': f'origin-access-identity/cloudfront/{oai_id}'
-                        }
-                    }
-                ],
-                'Quantity': 1
-            },
-            'Enabled': True,
-            'DefaultCacheBehavior': {
-                'TargetOriginId': bucket_name,
-                'ViewerProtocolPolicy': 'redirect-to-https',
-                'AllowedMethods': {
-                    'Quantity': 2,
-                    'Items': ['GET', 'HEAD'],
-                    'CachedMethods': {
-                        'Quantity': 2,
-                        'Items': ['GET', 'HEAD']
-                    }
-                },
-                'MinTTL': 0,
-                'ForwardedValues': {
-                    'QueryString': False,
-                    'Cookies': {
-                        'Forward': 'none'
-                    }
-                }
-            },
-            'Comment': f"CloudFront Distribution for {bucket_name}"
-        }
+        distribution_config = build_distribution_config(
+            origins=[{
+                'id': bucket_name,
+                'domain': f'{bucket_name}.s3.amazonaws.com',
+                'type': 's3',
+                'oai_id': oai_id,
+                'origin_shield_region': request.json.get('origin_shield_region')
+            }],
+            comment=f"CloudFront Distribution for {bucket_name}",
+            **_distribution_options(request.json, default_preset='static_site')
+        )
 
         response = cf_client.create_distribution(DistributionConfig=distribution_config)
+        distribution_catalog.invalidate()
         distribution_domain = response['Distribution']['DomainName']
         return jsonify({
             "message": f"CloudFront distribution created for {bucket_name}",
             "DistributionDomain": distribution_domain
         }), 201
 
+    except (KeyError, ValueError, ParamValidationError) as e:
+        return jsonify({"error": f"Invalid distribution spec: {e}"}), 400
     except ClientError as e:
         logger.error(f"Failed to create CloudFront distribution for {bucket_name}: {e}")
         return jsonify({"error": str(e)}), 500
@@ -689,13 +942,19 @@ def enable_static_website():
 
 @app.route('/s3/upload_website', methods=['POST'])
 def upload_website():
-    """Upload a website folder to S3."""
+    """Upload a website folder to S3.
+
+    Unchanged files are skipped, and changed ones are queued for CloudFront
+    invalidation on the distribution_id given (or every distribution in
+    front of the bucket).
+    """
     try:
         if 'website' not in request.files:
             return jsonify({"error": "No website file provided"}), 400
             
         website_zip = request.files['website']
         bucket_name = request.form.get('bucket_name')
+        distribution_id = request.form.get('distribution_id')
         
         if not website_zip or not bucket_name:
             return jsonify({"error": "Missing file or bucket name"}), 400
@@ -712,6 +971,7 @@ def upload_website():
             # Upload all files maintaining directory structure
             s3_client = get_aws_client('s3')
             uploaded_files = []
+            unchanged_files = []
             
             for root, dirs, files in os.walk(temp_dir):
                 for file in files:
@@ -719,7 +979,23 @@ def upload_website():
                         continue
                         
                     file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, temp_dir)
+                    relative_path = os.path.relpath(file_path, temp_dir).replace(os.sep, '/')
+
+                    # Skip files whose content already matches the object. Multipart
+                    # uploads get an ETag that is not the MD5, so it is kept in metadata too
+                    local_md5 = hashlib.md5()
+                    with open(file_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                            local_md5.update(chunk)
+                    local_md5 = local_md5.hexdigest()
+                    try:
+                        existing = s3_client.head_object(Bucket=bucket_name, Key=relative_path)
+                        stored_md5 = existing.get('Metadata', {}).get('md5') or existing['ETag'].strip('"')
+                        if stored_md5 == local_md5:
+                            unchanged_files.append(relative_path)
+                            continue
+                    except ClientError:
+                        pass
                     
                     # Determine content type
                     content_type = 'application/octet-stream'
@@ -737,13 +1013,33 @@ def upload_website():
                         file_path,
                         bucket_name,
                         relative_path,
-                        ExtraArgs={'ContentType': content_type}
+                        ExtraArgs={'ContentType': content_type, 'Metadata': {'md5': local_md5}}
                     )
                     uploaded_files.append(relative_path)
             
+        # Invalidation is best-effort: the files are already in S3, so a CloudFront
+        # failure is reported alongside them rather than failing the upload
+        invalidation, invalidation_errors = {}, {}
+        if uploaded_files:
+            try:
+                distribution_ids = [distribution_id] if distribution_id else \
+                    distributions_for_bucket(get_aws_client('cloudfront'), bucket_name)
+            except Exception as e:
+                logger.error(f"Failed to find distributions for {bucket_name}: {e}")
+                distribution_ids, invalidation_errors['*'] = [], str(e)
+            for dist_id in distribution_ids:
+                try:
+                    invalidation[dist_id] = invalidations.submit(dist_id, uploaded_files)
+                except Exception as e:
+                    logger.error(f"Failed to invalidate {dist_id} after uploading to {bucket_name}: {e}")
+                    invalidation_errors[dist_id] = str(e)
+
         return jsonify({
             "message": "Website uploaded successfully",
-            "files": uploaded_files
+            "files": uploaded_files,
+            "unchanged": unchanged_files,
+            "pending_invalidations": invalidation,
+            "invalidation_errors": invalidation_errors
         }), 200
         
     except Exception as e:
@@ -763,52 +1059,19 @@ def create_distribution_for_website():
         region = location if location else 'us-east-1'
         origin_domain = f"{bucket_name}.s3-website-{region}.amazonaws.com"
         
-        distribution_config = {
-            'CallerReference': str(os.urandom(10).hex()),
-            'Origins': {
-                'Quantity': 1,
-                'Items': [
-                    {
-                        'Id': 'S3Origin',
-                        'DomainName': origin_domain,
-                        'CustomOriginConfig': {
-                            'HTTPPort': 80,
-                            'HTTPSPort': 443,
-                            'OriginProtocolPolicy': 'http-only'
-                        }
-                    }
-                ]
-            },
-            'DefaultCacheBehavior': {
-                'TargetOriginId': 'S3Origin',
-                'ViewerProtocolPolicy': 'redirect-to-https',
-                'AllowedMethods': {
-                    'Quantity': 2,
-                    'Items': ['GET', 'HEAD'],
-                    'CachedMethods': {
-                        'Quantity': 2,
-                        'Items': ['GET', 'HEAD']
-                    }
-                },
-                'ForwardedValues': {
-                    'QueryString': False,
-                    'Cookies': {'Forward': 'none'}
-                },
-                'TrustedSigners': {'Enabled': False, 'Quantity': 0},
-                'MinTTL': 86400,
-                'DefaultTTL': 86400,
-                'MaxTTL': 31536000,
-                'Compress': True
-            },
-            'Comment': f'Distribution for {bucket_name} website',
-            'Enabled': True,
-            'DefaultRootObject': 'index.html',
-            'PriceClass': 'PriceClass_All',
-            'HttpVersion': 'http2',
-            'IsIPV6Enabled': True
-        }
+        distribution_config = build_distribution_config(
+            origins=[{
+                'id': 'S3Origin',
+                'domain': origin_domain,
+                'type': 's3_website',
+                'origin_shield_region': request.json.get('origin_shield_region')
+            }],
+            comment=f'Distribution for {bucket_name} website',
+            **_distribution_options(request.json, default_preset='static_site')
+        )
         
         response = cf_client.create_distribution(DistributionConfig=distribution_config)
+        distribution_catalog.invalidate()
         distribution = response['Distribution']
         
         return jsonify({
@@ -818,68 +1081,196 @@ def create_distribution_for_website():
             "status": distribution['Status']
         }), 200
         
+    except (KeyError, ValueError, ParamValidationError) as e:
+        return jsonify({"error": f"Invalid distribution spec: {e}"}), 400
+    except ClientError as e:
+        logger.error(f"Failed to create CloudFront distribution: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cloudfront/list_distributions', methods=['GET'])
+def list_distributions():
+    """All distributions from the shared catalog; ?refresh=1 forces an upstream fetch."""
+    try:
+        distributions, etag, fetched_at = distribution_catalog.get(force=bool(request.args.get('refresh')))
+    except Exception as e:
+        logger.error(f"Failed to list CloudFront distributions: {e}")
+        return jsonify({"error": str(e)}), 503
+    response = json_response({
+        "distributions": distributions,
+        "count": len(distributions),
+        "fetched_at": datetime.utcfromtimestamp(fetched_at).isoformat() + 'Z'
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, max-age=15'
+    return response.make_conditional(request)
+
+@app.route('/cloudfront/catalog/status', methods=['GET'])
+def distribution_catalog_status():
+    return json_response(distribution_catalog.status())
+
+@app.route('/cloudfront/presets', methods=['GET'])
+def get_cloudfront_presets():
+    """Distribution presets and the managed policies they can reference."""
+    return json_response({"presets": PRESETS})
+
+@app.route('/cloudfront/distributions', methods=['POST'])
+def create_custom_distribution():
+    """Create a distribution from origins plus preset/policy/behavior options.
+
+    Body: {"origins": [{"id", "domain", "type", "origin_shield_region", ...}],
+    "preset": "static_site" | "api", "behavior": {...}, "behaviors": [...],
+    "aliases": [...], "certificate_arn": ...}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        distribution_config = build_distribution_config(
+            origins=data.get('origins') or [],
+            comment=data.get('comment', ''),
+            aliases=data.get('aliases'),
+            certificate_arn=data.get('certificate_arn'),
+            **_distribution_options(data)
+        )
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid distribution spec: {e}"}), 400
+    try:
+        response = get_aws_client('cloudfront').create_distribution(DistributionConfig=distribution_config)
+        distribution_catalog.invalidate()
+        distribution = response['Distribution']
+        return jsonify({
+            "distribution_domain": distribution['DomainName'],
+            "distribution_id": distribution['Id'],
+            "status": distribution['Status']
+        }), 201
+    except ParamValidationError as e:
+        return jsonify({"error": f"Invalid distribution spec: {e}"}), 400
     except ClientError as e:
         logger.error(f"Failed to create CloudFront distribution: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/cloudfront/distributions/<distribution_id>', methods=['PATCH'])
+def update_custom_distribution(distribution_id):
+    """Update a distribution in place: origins, preset, behaviors, comment, enabled."""
+    data = request.get_json(silent=True) or {}
+    try:
+        response = update_distribution(
+            get_aws_client('cloudfront'), distribution_id,
+            origins=data.get('origins'),
+            comment=data.get('comment'),
+            enabled=data.get('enabled'),
+            **_distribution_options(data)
+        )
+        distribution_catalog.invalidate()
+        distribution = response['Distribution']
+        return jsonify({
+            "distribution_id": distribution['Id'],
+            "status": distribution['Status'],
+            "etag": response['ETag']
+        }), 200
+    except (KeyError, ValueError, ParamValidationError) as e:
+        return jsonify({"error": f"Invalid distribution spec: {e}"}), 400
+    except ClientError as e:
+        logger.error(f"Failed to update CloudFront distribution {distribution_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cloudfront/invalidate', methods=['POST'])
+def invalidate_cloudfront_paths():
+    """Queue paths for invalidation; "immediate": true skips the coalescing delay."""
+    data = request.get_json(silent=True) or {}
+    distribution_id = data.get('distribution_id')
+    paths = data.get('paths') or []
+    if not distribution_id or not paths:
+        return jsonify({"error": "distribution_id and paths are required"}), 400
+    try:
+        invalidations.submit(distribution_id, paths, flush_delay=0 if data.get('immediate') else None)
+        return json_response(invalidations.status(distribution_id), 202)
+    except ClientError as e:
+        logger.error(f"Failed to invalidate CloudFront paths: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/cloudfront/invalidations/<distribution_id>', methods=['GET'])
+def get_cloudfront_invalidations(distribution_id):
+    """Pending, in-flight and recently completed invalidations for a distribution."""
+    return json_response(invalidations.status(distribution_id))
+
+def regional_metric_data(queries, start_time, end_time):
+    """Run get_metric_data in every region at once.
+
+    Returns (series, report): every MetricDataResult tagged with its Region,
+    and the per-region status from merge(). Raises if no region answered.
+    """
+    regions = aws_regions.regions()
+    results, errors, timings = region_fanout.map(
+        'cloudwatch',
+        lambda cloudwatch, region: cloudwatch.get_metric_data(
+            MetricDataQueries=queries, StartTime=start_time, EndTime=end_time
+        )['MetricDataResults'],
+        regions=regions
+    )
+    if errors and not results:
+        raise RuntimeError(f"get_metric_data failed in every region: {errors}")
+    # Results are shared between coalesced callers; tag copies, not the originals
+    results = {region: [dict(result) for result in region_results] for region, region_results in results.items()}
+    return merge(results, errors, timings, regions)
+
+def metric_series(series, query_id, label, max_points=None, method='lttb'):
+    return [{
+        'Label': label,
+        'Region': result['Region'],
+        **columnar_series(result['Timestamps'], result['Values'], max_points, method)
+    } for result in series if result['Id'] == query_id]
+
 @app.route('/cloudwatch/get_metrics', methods=['GET'])
 def get_cloudwatch_metrics():
+    """EC2, S3 and CloudFront series for the last 24h.
+
+    Timestamps are epoch milliseconds in ascending order. ?max_points=N
+    downsamples each series (?downsample=lttb or minmax) and ?format=
+    (or Accept) selects json, msgpack or arrow.
+    """
+    try:
+        max_points = parse_max_points(request.args.get('max_points'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    method = request.args.get('downsample', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    fmt = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+    if fmt is None:
+        return jsonify({'error': f"format must be one of {', '.join(available_formats())}"}), 406
     try:
-        cloudwatch = get_aws_client('cloudwatch')
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=24)
 
-        # EC2 Metrics
-        ec2_metrics = []
-        ec2_cpu = cloudwatch.get_metric_data(
-            MetricDataQueries=[
-                {
-                    'Id': 'cpu',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': 'AWS/EC2',
-                            'MetricName': 'CPUUtilization',
-                        },
-                        'Period': 300,
-                        'Stat': 'Average'
-                    }
+        # EC2 and S3 metrics are regional: one get_metric_data per region, all regions at once
+        series, report = regional_metric_data([
+            {
+                'Id': 'cpu',
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/EC2',
+                        'MetricName': 'CPUUtilization',
+                    },
+                    'Period': 300,
+                    'Stat': 'Average'
                 }
-            ],
-            StartTime=start_time,
-            EndTime=end_time
-        )
-        ec2_metrics.append({
-            'Label': 'CPU Utilization',
-            'Timestamps': [t.isoformat() for t in ec2_cpu['MetricDataResults'][0]['Timestamps']],
-            'Values': ec2_cpu['MetricDataResults'][0]['Values']
-        })
-
-        # S3 Metrics
-        s3_metrics = []
-        s3_size = cloudwatch.get_metric_data(
-            MetricDataQueries=[
-                {
-                    'Id': 'size',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': 'AWS/S3',
-                            'MetricName': 'BucketSizeBytes',
-                        },
-                        'Period': 86400,
-                        'Stat': 'Average'
-                    }
+            },
+            {
+                'Id': 'size',
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/S3',
+                        'MetricName': 'BucketSizeBytes',
+                    },
+                    'Period': 86400,
+                    'Stat': 'Average'
                 }
-            ],
-            StartTime=start_time,
-            EndTime=end_time
-        )
-        s3_metrics.append({
-            'Label': 'Bucket Size',
-            'Timestamps': [t.isoformat() for t in s3_size['MetricDataResults'][0]['Timestamps']],
-            'Values': s3_size['MetricDataResults'][0]['Values']
-        })
+            }
+        ], start_time, end_time)
+        ec2_metrics = metric_series(series, 'cpu', 'CPU Utilization', max_points, method)
+        s3_metrics = metric_series(series, 'size', 'Bucket Size', max_points, method)
 
-        # CloudFront Metrics
+        # CloudFront Metrics (global; CloudWatch only publishes them in us-east-1)
+        cloudwatch = get_aws_client('cloudwatch', 'us-east-1')
         cloudfront_metrics = []
         cf_requests = cloudwatch.get_metric_data(
             MetricDataQueries=[
@@ -900,26 +1291,131 @@ def get_cloudwatch_metrics():
         )
         cloudfront_metrics.append({
             'Label': 'Requests',
-            'Timestamps': [t.isoformat() for t in cf_requests['MetricDataResults'][0]['Timestamps']],
-            'Values': cf_requests['MetricDataResults'][0]['Values']
+            **columnar_series(cf_requests['MetricDataResults'][0]['Timestamps'],
+                              cf_requests['MetricDataResults'][0]['Values'], max_points, method)
         })
 
-        return jsonify({
+        return series_response({
             'ec2_metrics': ec2_metrics,
             's3_metrics': s3_metrics,
-            'cloudfront_metrics': cloudfront_metrics
-        })
+            'cloudfront_metrics': cloudfront_metrics,
+            **report
+        }, fmt, groups=('ec2_metrics', 's3_metrics', 'cloudfront_metrics'))
 
     except Exception as e:
         logger.error(f"Failed to get CloudWatch metrics: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Dimension sets come from list_metrics (cached per namespace), so every
+# instance, bucket and distribution gets its own series without hand-kept lists
+metric_catalog = MetricCatalog(lambda region: get_regional_client('cloudwatch', region))
+resource_metrics = ResourceMetrics(metric_catalog, lambda region: get_regional_client('cloudwatch', region))
+
+def instance_tag_groups(region, tag_key):
+    """Map each instance in a region to its tag value, for SUM-by-tag queries.
+
+    Tags come from the inventory's last aws_ec2 sync (at most one interval
+    old); a region is only described directly before that first sync, or
+    while the inventory cannot read it.
+    """
+    inventory.start()
+    status = inventory.status()['providers']['aws_ec2']
+    if status['last_sync'] and region not in (status['partial'] or {}):
+        tags = {resource['id']: resource['tags'] for resource in
+                inventory.store.records({'type': 'ec2_instance', 'region': region}, source='aws_ec2')}
+    else:
+        tags = {instance['InstanceId']: {tag['Key']: tag['Value'] for tag in instance['Tags']}
+                for instance in region_instances(get_regional_client('ec2', region), region)}
+    return {instance_id: instance_tags.get(tag_key, '(untagged)') for instance_id, instance_tags in tags.items()}
+
+@app.route('/cloudwatch/resource_metrics', methods=['GET'])
+def get_resource_metrics():
+    """Per-resource series for ?kind=ec2|s3|cloudfront across regions.
+
+    ?ids=a,b limits to given resources; ?top=N (with ?rank=avg|max|sum|min)
+    returns the busiest N; ?group_by=region or tag:<Key> (ec2) returns one
+    summed series per group. max_points, downsample and format work as in
+    /cloudwatch/get_metrics.
+    """
+    kind = request.args.get('kind', 'ec2')
+    if kind not in RESOURCE_METRICS:
+        return jsonify({'error': f"kind must be one of {', '.join(RESOURCE_METRICS)}"}), 400
+    spec = RESOURCE_METRICS[kind]
+    rank = request.args.get('rank', 'avg')
+    group_by = request.args.get('group_by')
+    if rank not in RANK_FUNCTIONS:
+        return jsonify({'error': f"rank must be one of {', '.join(RANK_FUNCTIONS)}"}), 400
+    if group_by and group_by != 'region' and not (group_by.startswith('tag:') and kind == 'ec2'):
+        return jsonify({'error': "group_by must be 'region', or 'tag:<Key>' for ec2"}), 400
+    try:
+        hours = int(request.args.get('hours', 24))
+        top = int(request.args.get('top', 0)) or None
+        max_points = parse_max_points(request.args.get('max_points'))
+        if not 1 <= hours <= 24 * 15:
+            raise ValueError('hours must be between 1 and 360')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    method = request.args.get('downsample', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    fmt = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+    if fmt is None:
+        return jsonify({'error': f"format must be one of {', '.join(available_formats())}"}), 406
+    ids = [i for i in request.args.get('ids', '').split(',') if i] or None
+
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(hours=hours)
+    stats = {}
+
+    def region_series(cloudwatch, region):
+        group_of = None
+        if group_by == 'region':
+            group_of = lambda resource_id: region
+        elif group_by:
+            groups = instance_tag_groups(region, group_by[len('tag:'):])
+            group_of = lambda resource_id: groups.get(resource_id, '(untagged)')
+        results, stats[region] = resource_metrics.query(kind, region, start_time, end_time, ids=ids, top=top,
+                                                         rank=rank, group_of=group_of)
+        return [{
+            'Label': result['Label'],
+            **({'Rank': rank_value(result['Values'], rank)} if top else {}),
+            **columnar_series(result['Timestamps'], result['Values'], max_points, method)
+        } for result in results]
+
+    try:
+        regions = spec.get('regions') or aws_regions.regions()
+        results, errors, timings = region_fanout.map('cloudwatch', region_series, regions=regions)
+        series, report = merge(results, errors, timings, regions)
+        if errors and not results:
+            return json_response({'error': f'Failed to query {kind} metrics in every region', **report}, 500)
+        if top:
+            series = sorted(series, key=lambda item: item['Rank'], reverse=True)[:top]
+        return series_response({
+            'kind': kind,
+            'namespace': spec['namespace'],
+            'metric': spec['metric'],
+            'stat': spec['stat'],
+            'period': spec['period'],
+            'series': series,
+            'resources': sum(s['resources'] for s in stats.values()),
+            'batches': sum(s['batches'] for s in stats.values()),
+            **report
+        }, fmt, groups=('series',))
+    except Exception as e:
+        logger.error(f"Failed to get {kind} resource metrics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cloudwatch/metric_catalog', methods=['GET'])
+def get_metric_catalog():
+    """Cached list_metrics listings behind /cloudwatch/resource_metrics."""
+    return json_response(metric_catalog.status())
+
 @app.route('/cloudwatch/get_alarms', methods=['GET'])
 def get_cloudwatch_alarms():
     try:
         cloudwatch = get_aws_client('cloudwatch')
         response = cloudwatch.describe_alarms()
-        return jsonify({'alarms': response['MetricAlarms']})
+        return json_response({'alarms': response['MetricAlarms']})
     except Exception as e:
         logger.error(f"Failed to get CloudWatch alarms: {e}")
         return jsonify({'error': str(e)}), 500
@@ -969,52 +1465,54 @@ def get_service_health():
 @app.route('/cloudwatch/get_insights', methods=['GET'])
 def get_insights():
     try:
-        cloudwatch = get_aws_client('cloudwatch')
         end_time = datetime.utcnow()
         start_time = end_time - timedelta(hours=24)
 
-        # Get EC2 instance metrics
-        ec2_metrics = cloudwatch.get_metric_data(
-            MetricDataQueries=[
-                {
-                    'Id': 'cpu',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': 'AWS/EC2',
-                            'MetricName': 'CPUUtilization',
-                        },
-                        'Period': 300,
-                        'Stat': 'Average'
-                    }
-                },
-                {
-                    'Id': 'network',
-                    'MetricStat': {
-                        'Metric': {
-                            'Namespace': 'AWS/EC2',
-                            'MetricName': 'NetworkIn',
-                        },
-                        'Period': 300,
-                        'Stat': 'Sum'
-                    }
+        # Get EC2 instance metrics from every region
+        series, report = regional_metric_data([
+            {
+                'Id': 'cpu',
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/EC2',
+                        'MetricName': 'CPUUtilization',
+                    },
+                    'Period': 300,
+                    'Stat': 'Average'
                 }
-            ],
-            StartTime=start_time,
-            EndTime=end_time
-        )
-
-        # Calculate insights
-        cpu_values = ec2_metrics['MetricDataResults'][0]['Values']
-        network_values = ec2_metrics['MetricDataResults'][1]['Values']
+            },
+            {
+                'Id': 'network',
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': 'AWS/EC2',
+                        'MetricName': 'NetworkIn',
+                    },
+                    'Period': 300,
+                    'Stat': 'Sum'
+                }
+            }
+        ], start_time, end_time)
 
-        insights = {
-            'performance_summary': {
+        # Calculate insights across the fleet, and per region
+        def summarize(results):
+            cpu_values = [v for r in results if r['Id'] == 'cpu' for v in r['Values']]
+            network_values = [v for r in results if r['Id'] == 'network' for v in r['Values']]
+            return {
                 'avg_cpu': statistics.mean(cpu_values) if cpu_values else 0,
                 'max_cpu': max(cpu_values) if cpu_values else 0,
                 'total_network': sum(network_values) if network_values else 0,
+            }
+
+        insights = {
+            'performance_summary': summarize(series),
+            'region_summary': {
+                region: summarize([r for r in series if r['Region'] == region])
+                for region, status in report['regions'].items() if status['status'] == 'ok'
             },
             'anomalies': [],
-            'recommendations': []
+            'recommendations': [],
+            **report
         }
 
         # Detect anomalies and generate recommendations
@@ -1025,11 +1523,367 @@ def get_insights():
         elif avg_cpu < 20:
             insights['recommendations'].append('Consider downsizing EC2 instances to optimize costs')
 
-        return jsonify(insights)
+        for region, summary in insights['region_summary'].items():
+            if summary['avg_cpu'] > 80:
+                insights['anomalies'].append(f'High CPU utilization detected in {region}')
+
+        return json_response(insights)
     except Exception as e:
         logger.error(f"Failed to get insights: {e}")
         return jsonify({'error': str(e)}), 500
 
+# ---------------------------- CloudWatch Logs ---------------------------- #
+
+# Tail positions survive restarts when LOGS_CURSOR_SQLITE_PATH is set
+log_cursors = CursorStore(os.getenv('LOGS_CURSOR_SQLITE_PATH'))
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+def logs_client(args):
+    """CloudWatch Logs client for the request's ?region= and ?account=."""
+    region = args.get('region') or None
+    if args.get('account'):
+        return get_account_client(args['account'], 'logs', region)
+    return get_regional_client('logs', region or os.getenv('AWS_DEFAULT_REGION', 'us-east-1'))
+
+def event_stream(events, label):
+    """SSE response that reports a failure mid-stream as an 'error' event instead of cutting off."""
+    def guarded():
+        try:
+            yield from events
+        except Exception as e:
+            logger.error(f"{label} failed: {e}")
+            yield sse('error', {'error': str(e)})
+    return Response(guarded(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/cloudwatch/logs/groups', methods=['GET'])
+def list_log_groups():
+    """One page of log groups, optionally by name prefix; pass nextToken back as ?token=."""
+    try:
+        kwargs = {'limit': 50}
+        if request.args.get('prefix'):
+            kwargs['logGroupNamePrefix'] = request.args['prefix']
+        if request.args.get('token'):
+            kwargs['nextToken'] = request.args['token']
+        response = logs_client(request.args).describe_log_groups(**kwargs)
+        return json_response({
+            'groups': [{'name': group['logGroupName'], 'storedBytes': group.get('storedBytes', 0),
+                        'retentionInDays': group.get('retentionInDays')} for group in response['logGroups']],
+            'nextToken': response.get('nextToken'),
+        })
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except Exception as e:
+        logger.error(f"Failed to list log groups: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cloudwatch/logs/tail', methods=['GET'])
+def tail_logs():
+    """Live tail of a log group as server-sent events.
+
+    ?group= starts a new tail from ?since= seconds ago (default 300);
+    ?cursor= (or the Last-Event-ID header EventSource sends on reconnect)
+    resumes a saved one. Optional ?filter= pattern, ?max_rows=, ?max_bytes=.
+    """
+    name = request.args.get('cursor') or request.headers.get('Last-Event-ID')
+    try:
+        budget = parse_limits(request.args)
+        cursor = log_cursors.get(name) if name else None
+        if cursor is None:
+            group = request.args.get('group')
+            if not group and name:
+                return jsonify({'error': f'Unknown cursor: {name}'}), 404
+            if not group:
+                return jsonify({'error': 'group is required to start a tail'}), 400
+            since = int(request.args.get('since', '300'))
+            name = name or new_cursor_name()
+            cursor = new_cursor(group, request.args.get('filter', ''), int((time.time() - since) * 1000))
+            log_cursors.put(name, cursor)
+        client = logs_client(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+
+    def events():
+        yield sse('cursor', {'cursor': name, 'group': cursor['group'], 'filter': cursor['filter']}, id=name)
+        for event in tail(client, cursor, budget, lambda position: log_cursors.put(name, position)):
+            yield event
+    return event_stream(events(), f"Log tail of {cursor['group']}")
+
+@app.route('/cloudwatch/logs/tail/<name>', methods=['DELETE'])
+def delete_log_cursor(name):
+    """Forget a saved tail position."""
+    if not log_cursors.delete(name):
+        return jsonify({'error': f'Unknown cursor: {name}'}), 404
+    return jsonify({'message': f'Cursor {name} deleted'})
+
+@app.route('/cloudwatch/logs/insights', methods=['GET', 'POST'])
+def query_logs_insights():
+    """Run a Logs Insights query and stream its rows as server-sent events.
+
+    Takes ?group= (repeatable), ?query=, ?hours= (default 1), ?limit=,
+    ?max_rows= and ?max_bytes=, or the same keys in a JSON body with
+    groups as a list.
+    """
+    args = request.args.to_dict()
+    groups = request.args.getlist('group')
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        args.update({k: v for k, v in data.items() if k != 'groups'})
+        groups = data.get('groups') or groups
+    try:
+        if not groups or not args.get('query'):
+            raise ValueError('group and query are required')
+        hours = float(args.get('hours', 1))
+        if not 0 < hours <= 24 * 30:
+            raise ValueError('hours must be between 0 and 720')
+        budget = parse_limits(args)
+        limit = int(args['limit']) if args.get('limit') else None
+        end_time = datetime.now(timezone.utc)
+        stream = insights_query(logs_client(args), groups, args['query'], end_time - timedelta(hours=hours),
+                                end_time, budget, limit=limit)
+        # Start the query here so a bad query or log group fails the request, not the stream
+        first = next(stream)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    except Exception as e:
+        logger.error(f"Failed to start Logs Insights query: {e}")
+        return jsonify({'error': str(e)}), 500
+    return event_stream(itertools.chain([first], stream), 'Logs Insights query')
+
+# ---------------------------- Inventory ---------------------------- #
+
+def _account_extra(account):
+    return {'account_id': account['id'], 'account': account['name']} if account else {}
+
+def inventory_s3_buckets(s3_client=None, account=None):
+    s3_client = s3_client or get_aws_client('s3')
+    response = s3_client.list_buckets()
+    return [
+        make_resource('aws', 's3_bucket', bucket['Name'], name=bucket['Name'], state='available',
+                      created=bucket['CreationDate'], extra=_account_extra(account))
+        for bucket in response['Buckets']
+    ]
+
+def inventory_ec2_region(ec2, region, account=None, instance_ids=None):
+    """Inventory records for every instance in a region, or only for instance_ids."""
+    resources = []
+    if instance_ids is None:
+        requests = [{}]
+    else:
+        ids = sorted(instance_ids)
+        # describe_instances takes at most 200 values per filter; a filter (unlike InstanceIds)
+        # simply leaves out instances that no longer exist
+        requests = [{'Filters': [{'Name': 'instance-id', 'Values': ids[i:i + 200]}]} for i in range(0, len(ids), 200)]
+    pages = itertools.chain.from_iterable(ec2.get_paginator('describe_instances').paginate(**params)
+                                          for params in requests)
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+                resources.append(make_resource(
+                    'aws', 'ec2_instance', instance['InstanceId'],
+                    name=tags.get('Name', ''),
+                    region=region,
+                    state=instance['State']['Name'],
+                    created=instance.get('LaunchTime'),
+                    tags=tags,
+                    extra={
+                        'instance_type': instance['InstanceType'],
+                        'public_ip': instance.get('PublicIpAddress', ''),
+                        'private_ip': instance.get('PrivateIpAddress', ''),
+                        **_account_extra(account),
+                    }
+                ))
+    return resources
+
+def inventory_ec2_instances(account=None):
+    regions, client_factory = region_scope(account and account['name'])
+    results, errors, _ = region_fanout.map('ec2', lambda ec2, region: inventory_ec2_region(ec2, region, account),
+                                           regions=regions, client_factory=client_factory)
+    resources = [resource for region in regions if region in results for resource in results[region]]
+    if errors:
+        # Keep the failed regions' instances from the last sync rather than dropping them
+        return PartialSnapshot(resources, lambda resource: resource['region'] in errors, errors)
+    return resources
+
+# CloudTrail's event history can lag by up to ~15 minutes, so change lookups reach back this far
+INVENTORY_EC2_CHANGE_LAG = int(os.getenv('INVENTORY_EC2_CHANGE_LAG', '900'))
+
+def ec2_changed_instance_ids(cloudtrail, since):
+    """Ids of instances named in CloudTrail events since the given epoch seconds."""
+    ids = set()
+    pages = cloudtrail.get_paginator('lookup_events').paginate(
+        LookupAttributes=[{'AttributeKey': 'ResourceType', 'AttributeValue': 'AWS::EC2::Instance'}],
+        StartTime=datetime.fromtimestamp(since, timezone.utc))
+    for page in pages:
+        for event in page.get('Events', []):
+            ids.update(resource['ResourceName'] for resource in event.get('Resources', [])
+                       if resource.get('ResourceType') == 'AWS::EC2::Instance')
+    return ids
+
+def inventory_ec2_changes(since):
+    """Delta of the instances CloudTrail saw change in each region since the last sync.
+
+    Only those instances are described again; ones that can no longer be
+    described are removed. Any unreadable region fails the whole delta, so
+    the inventory takes a full snapshot instead.
+    """
+    start = since - INVENTORY_EC2_CHANGE_LAG
+
+    def region_delta(cloudtrail, region):
+        changed = ec2_changed_instance_ids(cloudtrail, start)
+        if not changed:
+            return [], set()
+        resources = inventory_ec2_region(get_regional_client('ec2', region), region, instance_ids=changed)
+        found = {resource['id'] for resource in resources}
+        return resources, {resource_key('aws', 'ec2_instance', i) for i in changed - found}
+
+    results, errors, _ = region_fanout.map('cloudtrail', region_delta)
+    if errors:
+        raise RuntimeError(f"Could not read EC2 changes in {', '.join(sorted(errors))}")
+    upserts, removed = [], set()
+    for resources, gone in results.values():
+        upserts.extend(resources)
+        removed |= gone
+    return Delta(upserts, removed)
+
+# Most accounts inventoried at once; each of them still fans out across its regions
+INVENTORY_ACCOUNT_WORKERS = int(os.getenv('INVENTORY_ACCOUNT_WORKERS', '4'))
+INVENTORY_ACCOUNT_TIMEOUT = float(os.getenv('INVENTORY_ACCOUNT_TIMEOUT', '120'))
+
+def inventory_accounts(service_name, fetch):
+    """Run fetch(client, account) in every configured account, a few accounts at a time.
+
+    An account that fails keeps its records from the last sync, and so do
+    the regions a partial account snapshot couldn't read.
+    """
+    results, errors, _ = credential_broker.map(service_name, fetch, timeout=INVENTORY_ACCOUNT_TIMEOUT,
+                                               workers=INVENTORY_ACCOUNT_WORKERS)
+    resources, partial = [], {}
+    for name, snapshot in results.items():
+        resources.extend(snapshot)
+        if isinstance(snapshot, PartialSnapshot):
+            partial[name] = snapshot
+    if not errors and not partial:
+        return resources
+
+    def retain(resource):
+        account = resource['extra'].get('account')
+        return account in errors or (account in partial and partial[account].retain(resource))
+    errors = dict(errors, **{f'{name}/{region}': error for name, snapshot in partial.items()
+                             for region, error in snapshot.errors.items()})
+    return PartialSnapshot(resources, retain, errors)
+
+def inventory_azure_vms():
+    import azure_blob_vm
+    return [
+        make_resource('azure', 'virtual_machine', vm.id, name=vm.name, region=vm.location,
+                      state=vm.provisioning_state, tags=vm.tags,
+                      extra={'vm_size': vm.hardware_profile.vm_size if vm.hardware_profile else ''})
+        for vm in azure_blob_vm.compute_client.virtual_machines.list(azure_blob_vm.resource_group_name)
+    ]
+
+def inventory_azure_containers():
+    import azure_blob_vm
+    account = os.getenv('AZURE_STORAGE_ACCOUNT')
+    return [
+        make_resource('azure', 'blob_container', f'{account}/{name}', name=name, state='available',
+                      extra={'storage_account': account})
+        for name in azure_blob_vm.list_containers(account)
+    ]
+
+inventory = InventoryService(InventoryStore(os.getenv('INVENTORY_SQLITE_PATH')))
+inventory.register('aws_s3', inventory_s3_buckets, interval=int(os.getenv('INVENTORY_S3_INTERVAL', '300')))
+inventory.register('aws_ec2', inventory_ec2_instances, interval=int(os.getenv('INVENTORY_EC2_INTERVAL', '60')),
+                   changes=inventory_ec2_changes, full_every=int(os.getenv('INVENTORY_EC2_FULL_EVERY', '10')))
+if credential_broker.accounts:
+    # One provider per service covers every other account, INVENTORY_ACCOUNT_WORKERS at a time
+    inventory.register('aws_s3:accounts', functools.partial(inventory_accounts, 's3', inventory_s3_buckets),
+                       interval=int(os.getenv('INVENTORY_S3_INTERVAL', '300')))
+    inventory.register('aws_ec2:accounts',
+                       functools.partial(inventory_accounts, 'ec2',
+                                         lambda ec2, account: inventory_ec2_instances(account)),
+                       interval=int(os.getenv('INVENTORY_EC2_INTERVAL', '60')))
+if os.getenv('AZURE_SUBSCRIPTION_ID'):
+    # The Azure connectors live next to this app; only load them when configured
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'azure_api'))
+    inventory.register('azure_vms', inventory_azure_vms, interval=int(os.getenv('INVENTORY_AZURE_INTERVAL', '120')))
+    if os.getenv('AZURE_STORAGE_ACCOUNT'):
+        inventory.register('azure_containers', inventory_azure_containers,
+                           interval=int(os.getenv('INVENTORY_AZURE_INTERVAL', '120')))
+
+@app.route('/inventory', methods=['GET'])
+def query_inventory():
+    """Query the cached multi-cloud resource catalog."""
+    inventory.start()
+    try:
+        filters = {}
+        for field in ('provider', 'type', 'state', 'region'):
+            values = request.args.getlist(field)
+            if values:
+                filters[field] = values
+        tag = None
+        if request.args.get('tag'):
+            tag_key, _, tag_value = request.args['tag'].partition(':')
+            tag = (tag_key, tag_value or None)
+
+        result = inventory.store.query(
+            filters=filters,
+            search=request.args.get('q'),
+            tag=tag,
+            sort=request.args.get('sort', 'name'),
+            descending=request.args.get('order') == 'desc',
+            page=request.args.get('page', 1),
+            page_size=request.args.get('page_size', 50)
+        )
+        return json_response(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/inventory/status', methods=['GET'])
+def inventory_status():
+    """Report per-provider sync state of the inventory."""
+    inventory.start()
+    return json_response(inventory.status())
+
+@app.route('/inventory/refresh', methods=['POST'])
+def refresh_inventory():
+    """Force an immediate sync of one provider, or all of them; "full": true skips change feeds."""
+    data = request.get_json(silent=True) or {}
+    provider = data.get('provider')
+    if provider:
+        if provider not in inventory.status()['providers']:
+            return jsonify({'error': f'Unknown inventory provider: {provider}'}), 404
+        return json_response({provider: inventory.refresh(provider, full=bool(data.get('full')))})
+    return json_response(inventory.refresh_all())
+
+# ---------------------------- Accounts ---------------------------- #
+
+@app.route('/aws/accounts', methods=['GET'])
+def list_aws_accounts():
+    """Configured accounts and the state of their assumed-role sessions."""
+    return json_response(credential_broker.status())
+
+@app.route('/aws/accounts/refresh', methods=['POST'])
+def refresh_aws_accounts():
+    """Renew one account's assumed-role credentials now, or every assumed account's."""
+    account = (request.get_json(silent=True) or {}).get('account')
+    try:
+        return json_response(credential_broker.refresh(account))
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+
+# ---------------------------- Request Coalescing ---------------------------- #
+
+@app.route('/coalescing/stats', methods=['GET'])
+def coalescing_stats():
+    """Upstream calls made vs. saved by sharing identical concurrent calls."""
+    return json_response(flight.stats())
+
 # ---------------------------- Main App ---------------------------- #
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
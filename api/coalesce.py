@@ -0,0 +1,177 @@
+import logging
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger()
+
+# How long a follower waits for the shared call before giving up
+COALESCE_TIMEOUT = float(os.getenv('COALESCE_TIMEOUT', '30'))
+# Timestamps in request arguments are rounded down to this many seconds before
+# the call, so "last 24h ending now" calls made together send the same request
+COALESCE_TIME_RESOLUTION = int(os.getenv('COALESCE_TIME_RESOLUTION', '60'))
+COALESCED_OPERATIONS = {
+    'ec2': {'describe_instances': 15},
+    's3': {'list_buckets': 15},
+    'cloudwatch': {'get_metric_data': 30},
+}
+
+
+class CoalesceTimeout(TimeoutError):
+    """Raised to a caller that waited longer than the key's timeout for the shared call."""
+
+
+def align(value, resolution=COALESCE_TIME_RESOLUTION):
+    """Call arguments with every datetime rounded down to resolution seconds.
+
+    The rounded arguments are what is actually sent, so callers sharing a
+    call get exactly the response to the request their key describes.
+    """
+    if isinstance(value, dict):
+        return {k: align(v, resolution) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(align(v, resolution) for v in value)
+    if isinstance(value, datetime) and resolution:
+        timestamp = value.timestamp()
+        return datetime.fromtimestamp(timestamp - timestamp % resolution, tz=value.tzinfo)
+    return value
+
+
+def normalize(value):
+    """Hashable, order-insensitive form of call arguments (exact, nothing rounded)."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller runs the function; anyone arriving with the same key
+    before it returns waits for that result (or exception) instead of
+    making their own call. Results are shared objects - treat them as
+    read-only. Nothing is cached once the call completes.
+    """
+
+    def __init__(self, timeout=COALESCE_TIMEOUT):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, name, field, amount=1):
+        stats = self._stats.setdefault(name, {'calls': 0, 'upstream': 0, 'saved': 0, 'errors': 0, 'timeouts': 0})
+        stats[field] += amount
+
+    def do(self, key, fn, timeout=None, name=None):
+        name = name or str(key[0] if isinstance(key, tuple) else key)
+        with self._lock:
+            self._count(name, 'calls')
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._count(name, 'upstream')
+            else:
+                self._count(name, 'saved')
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self._count(name, 'errors')
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        if not call.done.wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self._count(name, 'timeouts')
+            raise CoalesceTimeout(f"Timed out waiting for shared call to {name}")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            operations = {name: dict(stats) for name, stats in self._stats.items()}
+            in_flight = len(self._calls)
+        calls = sum(s['calls'] for s in operations.values())
+        saved = sum(s['saved'] for s in operations.values())
+        return {
+            'calls': calls,
+            'upstream_calls': calls - saved,
+            'calls_saved': saved,
+            'saved_ratio': round(saved / calls, 4) if calls else 0.0,
+            'in_flight': in_flight,
+            'operations': operations,
+        }
+
+
+class CoalescingClient:
+    """boto3 client proxy that routes selected operations through a SingleFlight.
+
+    Keys combine scope (the identity whose credentials the client holds),
+    service, region, endpoint, operation and the normalized arguments;
+    everything else passes straight through to the real client. Timestamps
+    are aligned before both the key and the call (see align()).
+    """
+
+    def __init__(self, client, flight, operations, scope):
+        self._client = client
+        self._flight = flight
+        self._operations = operations
+        self._scope = scope
+
+    def __getattr__(self, attr):
+        method = getattr(self._client, attr)
+        if attr not in self._operations:
+            return method
+        meta = self._client.meta
+        prefix = (meta.service_model.service_name, meta.region_name, meta.endpoint_url, attr, self._scope)
+        timeout = self._operations[attr]
+
+        def coalesced(**kwargs):
+            kwargs = align(kwargs)
+            key = prefix + (normalize(kwargs),)
+            return self._flight.do(key, lambda: method(**kwargs), timeout=timeout,
+                                   name=f'{prefix[0]}.{attr}')
+        return coalesced
+
+
+flight = SingleFlight()
+
+
+def coalesced(client, scope, operations=None):
+    """Wrap a boto3 client so its read calls are shared across concurrent requests.
+
+    scope identifies the credentials the client holds (an access key id or
+    account id). It is part of every key, so one account's response is
+    never handed to a caller using another account's credentials.
+    """
+    if client is None:
+        return None
+    if scope is None:
+        raise ValueError('coalesced() needs a scope identifying the client credentials')
+    operations = operations if operations is not None else \
+        COALESCED_OPERATIONS.get(client.meta.service_model.service_name)
+    if not operations:
+        return client
+    return CoalescingClient(client, flight, operations, scope)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Route tests run the gateway against benchmarks/stubs.py instead of AWS
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+os.environ.setdefault('AWS_REGIONS', 'us-east-1,eu-west-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.pop('AZURE_SUBSCRIPTION_ID', None)
+
+from stubs import AwsStub, Latency  # noqa: E402
+
+
+@pytest.fixture
+def aws():
+    with AwsStub(Latency(0), scale=20) as stub:
+        yield stub
+
+
+@pytest.fixture
+def gateway(aws):
+    import app
+    return app
@@ -0,0 +1,421 @@
+import copy
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger()
+
+# AWS managed policies (same ids in every account)
+CACHE_POLICIES = {
+    'caching_optimized': '658327ea-f89d-4fab-a63d-7e88639e58f6',
+    'caching_optimized_uncompressed': 'b2884449-e4de-46a7-ac36-70bc7f1ddd6d',
+    'caching_disabled': '4135ea2d-6df8-44a3-9df3-4b5a84be39ad',
+    'elemental_media_package': '08627262-05a9-4f76-9ded-b50ca2e3a84f',
+    'amplify': '4cc15a8a-d715-48a4-82b8-cc0b614638fe',
+}
+ORIGIN_REQUEST_POLICIES = {
+    'all_viewer': '216adef6-5c7f-47e4-b989-5492eafa07d3',
+    'all_viewer_except_host_header': 'b689b0a8-53d0-40ab-baf2-68738e2966ac',
+    'cors_s3_origin': '88a5eaf4-2fd4-4709-b370-b4c650ea3fcf',
+    'cors_custom_origin': '59781a5b-3903-41f3-afcb-af62929ccde1',
+    'user_agent_referer_headers': 'acba4595-bd28-49b8-b9fe-13317c0390fa',
+}
+RESPONSE_HEADERS_POLICIES = {
+    'security_headers': '67f7725c-6f97-4210-82d7-5512b31e9d03',
+    'cors_with_preflight': '5cc3b908-e619-4b99-88e5-2cf7f45965bd',
+    'simple_cors': '60669652-455b-4ae9-85a4-c4c02393f86c',
+}
+
+METHODS = {
+    'read': ['GET', 'HEAD'],
+    'read_options': ['GET', 'HEAD', 'OPTIONS'],
+    'all': ['GET', 'HEAD', 'OPTIONS', 'PUT', 'POST', 'PATCH', 'DELETE'],
+}
+
+DEFAULT_ORIGIN_SHIELD_REGION = os.getenv('CF_ORIGIN_SHIELD_REGION')
+
+# Starting points for the two shapes of distribution we run. Anything in a
+# request overrides the preset value.
+PRESETS = {
+    'static_site': {
+        'default_root_object': 'index.html',
+        'price_class': 'PriceClass_All',
+        'http_version': 'http2and3',
+        'behavior': {
+            'cache_policy': 'caching_optimized',
+            'origin_request_policy': None,
+            'response_headers_policy': 'security_headers',
+            'compress': True,
+            'allowed_methods': 'read',
+            'viewer_protocol_policy': 'redirect-to-https',
+        },
+        # Deploys invalidate what they change, so everything can be cached long
+        'behaviors': [],
+    },
+    'api': {
+        'default_root_object': '',
+        'price_class': 'PriceClass_100',
+        'http_version': 'http2and3',
+        'behavior': {
+            'cache_policy': 'caching_disabled',
+            'origin_request_policy': 'all_viewer_except_host_header',
+            'response_headers_policy': None,
+            'compress': True,
+            'allowed_methods': 'all',
+            'viewer_protocol_policy': 'https-only',
+        },
+        'behaviors': [],
+    },
+}
+
+
+def _policy_id(value, known):
+    # Accept either one of the friendly names above or a literal policy id
+    if not value:
+        return None
+    return known.get(value, value)
+
+
+def build_origin(spec):
+    """CloudFront origin from {'id', 'domain', 'type': 's3'|'s3_website'|'custom', ...}."""
+    origin = {
+        'Id': spec['id'],
+        'DomainName': spec['domain'],
+        'OriginPath': spec.get('origin_path', ''),
+        'CustomHeaders': {'Quantity': 0},
+        'ConnectionAttempts': spec.get('connection_attempts', 3),
+        'ConnectionTimeout': spec.get('connection_timeout', 10),
+    }
+    origin_type = spec.get('type', 'custom')
+    if origin_type == 's3':
+        oai_id = spec.get('oai_id')
+        origin['S3OriginConfig'] = {
+            'OriginAccessIdentity': f'origin-access-identity/cloudfront/{oai_id}' if oai_id else ''
+        }
+    else:
+        origin['CustomOriginConfig'] = {
+            'HTTPPort': 80,
+            'HTTPSPort': 443,
+            # S3 website endpoints only speak HTTP
+            'OriginProtocolPolicy': 'http-only' if origin_type == 's3_website'
+            else spec.get('protocol_policy', 'https-only'),
+            'OriginSslProtocols': {'Quantity': 1, 'Items': ['TLSv1.2']},
+            'OriginReadTimeout': spec.get('read_timeout', 30),
+            'OriginKeepaliveTimeout': spec.get('keepalive_timeout', 5),
+        }
+    shield_region = spec.get('origin_shield_region') or DEFAULT_ORIGIN_SHIELD_REGION
+    origin['OriginShield'] = {'Enabled': True, 'OriginShieldRegion': shield_region} if shield_region \
+        else {'Enabled': False}
+    return origin
+
+
+def _methods(value):
+    """AllowedMethods items from a METHODS name or a literal list CloudFront accepts."""
+    if isinstance(value, list):
+        for methods in METHODS.values():
+            if sorted(value) == sorted(methods):
+                return list(methods)
+        raise ValueError(f"allowed_methods {value} is not one of CloudFront's method sets: "
+                         f"{list(METHODS.values())}")
+    if not isinstance(value, str) or value not in METHODS:
+        raise ValueError(f"Unknown allowed_methods '{value}'; choose from {sorted(METHODS)} or a method list")
+    return list(METHODS[value])
+
+
+def _apply_behavior(behavior, spec):
+    """Set the fields for the keys present in spec; everything else in behavior is kept."""
+    if 'origin_id' in spec:
+        behavior['TargetOriginId'] = spec['origin_id']
+    if 'viewer_protocol_policy' in spec:
+        behavior['ViewerProtocolPolicy'] = spec['viewer_protocol_policy']
+    if 'allowed_methods' in spec:
+        methods = _methods(spec['allowed_methods'])
+        cached = [m for m in ('GET', 'HEAD', 'OPTIONS') if m in methods]
+        behavior['AllowedMethods'] = {
+            'Quantity': len(methods),
+            'Items': methods,
+            'CachedMethods': {'Quantity': len(cached), 'Items': cached},
+        }
+    if 'compress' in spec:
+        behavior['Compress'] = bool(spec['compress'])
+    if 'cache_policy' in spec:
+        if not spec['cache_policy']:
+            raise ValueError('cache_policy is required')
+        behavior['CachePolicyId'] = _policy_id(spec['cache_policy'], CACHE_POLICIES)
+        # A cache policy replaces the legacy ForwardedValues/TTL settings
+        for legacy in ('ForwardedValues', 'MinTTL', 'DefaultTTL', 'MaxTTL'):
+            behavior.pop(legacy, None)
+    for key, field, known in (
+            ('origin_request_policy', 'OriginRequestPolicyId', ORIGIN_REQUEST_POLICIES),
+            ('response_headers_policy', 'ResponseHeadersPolicyId', RESPONSE_HEADERS_POLICIES)):
+        if key in spec:
+            policy_id = _policy_id(spec[key], known)
+            if policy_id:
+                behavior[field] = policy_id
+            else:
+                behavior.pop(field, None)
+    if 'path_pattern' in spec:
+        behavior['PathPattern'] = spec['path_pattern']
+    return behavior
+
+
+def build_behavior(spec, origin_id):
+    """Cache behavior using cache/origin-request policies instead of ForwardedValues."""
+    if not isinstance(spec, dict):
+        raise ValueError('behavior must be an object')
+    behavior = {'TargetOriginId': origin_id, 'SmoothStreaming': False, 'FieldLevelEncryptionId': ''}
+    return _apply_behavior(behavior, {
+        'viewer_protocol_policy': 'redirect-to-https', 'allowed_methods': 'read', 'compress': True,
+        'cache_policy': 'caching_optimized', **spec,
+    })
+
+
+def _resolve(options):
+    preset = copy.deepcopy(PRESETS.get(options.get('preset') or 'static_site'))
+    if preset is None:
+        raise ValueError(f"Unknown preset '{options.get('preset')}'; choose from {sorted(PRESETS)}")
+    if not isinstance(options.get('behavior') or {}, dict):
+        raise ValueError('behavior must be an object')
+    if not all(isinstance(spec, dict) for spec in options.get('behaviors') or []):
+        raise ValueError('behaviors must be a list of objects')
+    preset['behavior'].update(options.get('behavior') or {})
+    for key in ('default_root_object', 'price_class', 'http_version'):
+        if key in options:
+            preset[key] = options[key]
+    if 'behaviors' in options:
+        preset['behaviors'] = options['behaviors']
+    return preset
+
+
+def _behaviors(resolved, origin_id):
+    # Per-path behaviors inherit the default behavior's settings unless they override them
+    if any(not spec.get('path_pattern') for spec in resolved['behaviors']):
+        raise ValueError('Each entry in behaviors needs a path_pattern')
+    items = [build_behavior({**resolved['behavior'], **spec}, origin_id) for spec in resolved['behaviors']]
+    return {'Quantity': len(items), 'Items': items}
+
+
+def build_distribution_config(origins, comment='', caller_reference=None, aliases=None,
+                              certificate_arn=None, **options):
+    """Full DistributionConfig from origin specs and preset/behavior options.
+
+    options: preset ('static_site' or 'api'), behavior (overrides for the
+    default behavior), behaviors (per-path list, each with 'path_pattern'),
+    default_root_object, price_class, http_version. The first origin is
+    the default target.
+    """
+    if not origins:
+        raise ValueError('At least one origin is required')
+    resolved = _resolve(options)
+    default_origin = origins[0]['id']
+    config = {
+        'CallerReference': caller_reference or os.urandom(10).hex(),
+        'Comment': comment,
+        'Enabled': True,
+        'Origins': {'Quantity': len(origins), 'Items': [build_origin(o) for o in origins]},
+        'DefaultCacheBehavior': build_behavior(resolved['behavior'], default_origin),
+        'CacheBehaviors': _behaviors(resolved, default_origin),
+        'DefaultRootObject': resolved['default_root_object'],
+        'PriceClass': resolved['price_class'],
+        'HttpVersion': resolved['http_version'],
+        'IsIPV6Enabled': True,
+        'Aliases': {'Quantity': len(aliases or []), 'Items': list(aliases or [])},
+    }
+    if certificate_arn:
+        config['ViewerCertificate'] = {
+            'ACMCertificateArn': certificate_arn,
+            'SSLSupportMethod': 'sni-only',
+            'MinimumProtocolVersion': 'TLSv1.2_2021',
+        }
+    return config
+
+
+def _merge_behaviors(existing, specs, default_behavior):
+    """Merge per-path behavior specs over existing CacheBehaviors by path_pattern.
+
+    A spec for a known path changes only the keys it names; a new path
+    starts from the default behavior; {"path_pattern": ..., "remove": true}
+    drops one.
+    """
+    by_path = {behavior['PathPattern']: behavior for behavior in existing.get('Items') or []}
+    for spec in specs:
+        if not isinstance(spec, dict) or not spec.get('path_pattern'):
+            raise ValueError('Each entry in behaviors needs a path_pattern')
+        path = spec['path_pattern']
+        if spec.get('remove'):
+            by_path.pop(path, None)
+            continue
+        base = by_path.get(path) or copy.deepcopy(default_behavior)
+        by_path[path] = _apply_behavior(base, spec)
+    return {'Quantity': len(by_path), 'Items': list(by_path.values())}
+
+
+def apply_update(config, origins=None, comment=None, enabled=None, **options):
+    """Return a copy of an existing DistributionConfig with the requested changes.
+
+    Origins are merged by id (new ids are added). behavior changes only
+    the default-behavior settings it names, and behaviors are merged by
+    path_pattern, so a partial update keeps everything else. Naming a
+    preset rebuilds the default behavior from it (plus any behavior
+    overrides), which also drops legacy ForwardedValues/TTL settings;
+    per-path behaviors are kept unless behaviors changes them.
+    """
+    updated = copy.deepcopy(config)
+    if origins:
+        by_id = {origin['Id']: origin for origin in updated['Origins']['Items']}
+        for spec in origins:
+            by_id[spec['id']] = build_origin(spec)
+        updated['Origins'] = {'Quantity': len(by_id), 'Items': list(by_id.values())}
+    if comment is not None:
+        updated['Comment'] = comment
+    if enabled is not None:
+        updated['Enabled'] = bool(enabled)
+    behavior = options.get('behavior') or {}
+    if not isinstance(behavior, dict):
+        raise ValueError('behavior must be an object')
+    default_origin = behavior.get('origin_id', updated['DefaultCacheBehavior']['TargetOriginId'])
+    if options.get('preset'):
+        resolved = _resolve({'preset': options['preset'], 'behavior': behavior})
+        updated['DefaultCacheBehavior'] = build_behavior(resolved['behavior'], default_origin)
+    elif behavior:
+        _apply_behavior(updated['DefaultCacheBehavior'], behavior)
+    if 'behaviors' in options:
+        if not isinstance(options['behaviors'], list):
+            raise ValueError('behaviors must be a list')
+        updated['CacheBehaviors'] = _merge_behaviors(updated.get('CacheBehaviors') or {},
+                                                     options['behaviors'], updated['DefaultCacheBehavior'])
+    for key, field in (('default_root_object', 'DefaultRootObject'), ('price_class', 'PriceClass'),
+                       ('http_version', 'HttpVersion')):
+        if key in options:
+            updated[field] = options[key]
+    return updated
+
+
+def update_distribution(cf_client, distribution_id, **changes):
+    """Apply changes to a live distribution in place (ETag-guarded)."""
+    current = cf_client.get_distribution_config(Id=distribution_id)
+    config = apply_update(current['DistributionConfig'], **changes)
+    return cf_client.update_distribution(Id=distribution_id, IfMatch=current['ETag'], DistributionConfig=config)
+
+
+# ---------------------------- Distribution catalog ---------------------------- #
+
+# list_distributions is slow and shares a low account-wide rate limit
+CATALOG_TTL = float(os.getenv('CF_CATALOG_TTL', '300'))
+# Poll faster while a distribution is deploying so the UI sees it go live
+CATALOG_TTL_IN_PROGRESS = float(os.getenv('CF_CATALOG_TTL_IN_PROGRESS', '30'))
+
+
+def project_distribution(summary):
+    """The subset of a DistributionSummary the dashboard renders."""
+    modified = summary.get('LastModifiedTime')
+    return {
+        'Id': summary['Id'],
+        'ARN': summary.get('ARN', ''),
+        'DomainName': summary['DomainName'],
+        'Status': summary['Status'],
+        'Enabled': summary.get('Enabled', False),
+        'Comment': summary.get('Comment', ''),
+        'Aliases': summary.get('Aliases', {}).get('Items', []),
+        'Origins': [origin['DomainName'] for origin in summary.get('Origins', {}).get('Items', [])],
+        'PriceClass': summary.get('PriceClass', ''),
+        'HttpVersion': summary.get('HttpVersion', ''),
+        'LastModifiedTime': modified.isoformat() if hasattr(modified, 'isoformat') else modified,
+    }
+
+
+class DistributionCatalog:
+    """Cached, fully paginated distribution list shared by every caller.
+
+    Only one upstream fetch runs at a time; concurrent callers wait for it
+    (or, once something is cached, keep getting the previous list while a
+    background refresh runs). Each distribution's LastModifiedTime and
+    Status feed a catalog ETag, so clients get 304s until something changes
+    and unchanged summaries are not re-projected.
+    """
+
+    def __init__(self, client_factory, ttl=CATALOG_TTL, ttl_in_progress=CATALOG_TTL_IN_PROGRESS):
+        self.client_factory = client_factory
+        self.ttl = ttl
+        self.ttl_in_progress = ttl_in_progress
+        self.distributions = None
+        self.etag = None
+        self.fetched_at = 0
+        self.last_error = None
+        self.upstream_calls = 0
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._fetching = None
+
+    def _fetch(self):
+        versions, projected = {}, []
+        for page in self.client_factory().get_paginator('list_distributions').paginate():
+            self.upstream_calls += 1
+            for summary in page.get('DistributionList', {}).get('Items', []):
+                version = (str(summary.get('LastModifiedTime')), summary['Status'], summary.get('Enabled'))
+                previous = self._versions.get(summary['Id'])
+                if previous and previous[0] == version:
+                    projected.append(previous[1])
+                else:
+                    projected.append(project_distribution(summary))
+                versions[summary['Id']] = (version, projected[-1])
+        digest = hashlib.sha1(repr(sorted((i, v[0]) for i, v in versions.items())).encode('utf-8')).hexdigest()
+        return projected, versions, digest
+
+    def _refresh(self, done):
+        try:
+            distributions, versions, etag = self._fetch()
+            with self._lock:
+                if etag != self.etag:
+                    logger.info(f"CloudFront catalog changed: {len(distributions)} distributions")
+                self.distributions, self._versions, self.etag = distributions, versions, etag
+                self.fetched_at = time.time()
+                self.last_error = None
+        except Exception as e:
+            logger.error(f"Failed to list CloudFront distributions: {e}")
+            with self._lock:
+                self.last_error = str(e)
+                # Don't hammer a throttled API: back off as if the fetch had succeeded
+                self.fetched_at = time.time() - self._ttl() / 2
+        finally:
+            with self._lock:
+                self._fetching = None
+            done.set()
+
+    def _ttl(self):
+        if self.distributions and any(d['Status'] != 'Deployed' for d in self.distributions):
+            return self.ttl_in_progress
+        return self.ttl
+
+    def get(self, force=False, timeout=30):
+        """Return (distributions, etag, fetched_at); blocks only when nothing is cached yet."""
+        with self._lock:
+            stale = force or time.time() - self.fetched_at >= self._ttl()
+            done = self._fetching
+            if stale and done is None:
+                done = self._fetching = threading.Event()
+                threading.Thread(target=self._refresh, args=(done,), name='cf-catalog', daemon=True).start()
+            must_wait = done is not None and (self.distributions is None or force)
+        if must_wait:
+            done.wait(timeout)
+        with self._lock:
+            if self.distributions is None:
+                raise RuntimeError(self.last_error or 'CloudFront distribution list is not available yet')
+            return self.distributions, self.etag, self.fetched_at
+
+    def invalidate(self):
+        """Mark the list stale, e.g. after creating or updating a distribution."""
+        with self._lock:
+            self.fetched_at = 0
+
+    def status(self):
+        return {
+            'distributions': len(self.distributions or []),
+            'etag': self.etag,
+            'fetched_at': self.fetched_at or None,
+            'ttl': self._ttl(),
+            'upstream_calls': self.upstream_calls,
+            'last_error': self.last_error,
+        }
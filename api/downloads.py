@@ -0,0 +1,90 @@
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+# Bytes per chunk relayed to the client; memory per download stays near this
+CHUNK_SIZE = int(os.getenv('S3_DOWNLOAD_CHUNK', str(1024 * 1024)))
+# Whole-object downloads at least this big are fetched as parallel ranges
+PARALLEL_THRESHOLD = int(os.getenv('S3_DOWNLOAD_PARALLEL_THRESHOLD', str(64 * 1024 * 1024)))
+RANGE_PART_SIZE = int(os.getenv('S3_DOWNLOAD_PART_SIZE', str(8 * 1024 * 1024)))
+RANGE_WORKERS = int(os.getenv('S3_DOWNLOAD_WORKERS', '4'))
+
+# Request headers passed straight through to get_object
+CONDITIONAL_HEADERS = {
+    'Range': 'Range',
+    'If-None-Match': 'IfNoneMatch',
+    'If-Match': 'IfMatch',
+    'If-Modified-Since': 'IfModifiedSince',
+    'If-Unmodified-Since': 'IfUnmodifiedSince',
+}
+
+# get_object response fields copied onto the HTTP response
+RESPONSE_HEADERS = {
+    'ContentType': 'Content-Type',
+    'ContentLength': 'Content-Length',
+    'ContentRange': 'Content-Range',
+    'ETag': 'ETag',
+    'CacheControl': 'Cache-Control',
+    'ContentEncoding': 'Content-Encoding',
+    'ContentDisposition': 'Content-Disposition',
+}
+
+
+def get_object_args(headers):
+    """get_object kwargs for the pass-through request headers that are present."""
+    return {param: headers[name] for name, param in CONDITIONAL_HEADERS.items() if headers.get(name)}
+
+
+def response_headers(s3_response):
+    headers = {name: str(s3_response[field]) for field, name in RESPONSE_HEADERS.items()
+               if s3_response.get(field) is not None}
+    if s3_response.get('LastModified') is not None:
+        headers['Last-Modified'] = s3_response['LastModified'].strftime('%a, %d %b %Y %H:%M:%S GMT')
+    headers['Accept-Ranges'] = 'bytes'
+    return headers
+
+
+def stream_body(body, chunk_size=CHUNK_SIZE):
+    """Relay a botocore StreamingBody chunk by chunk, releasing the connection at the end."""
+    try:
+        for chunk in body.iter_chunks(chunk_size):
+            yield chunk
+    finally:
+        body.close()
+
+
+def plan_ranges(size, part_size=RANGE_PART_SIZE):
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def stream_ranges(s3_client, bucket, key, size, etag, part_size=RANGE_PART_SIZE, workers=RANGE_WORKERS):
+    """Fetch an object as concurrent byte ranges and yield it in order.
+
+    At most workers ranges are in flight, so memory is bounded by
+    workers * part_size however large the object is. Every range is
+    pinned to etag, so a concurrent overwrite fails the download instead
+    of splicing two versions together.
+    """
+    def fetch(first, last):
+        response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes={first}-{last}', IfMatch=etag)
+        body = response['Body']
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    ranges = deque(plan_ranges(size, part_size))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='s3-range') as pool:
+        in_flight = deque()
+        try:
+            while ranges or in_flight:
+                while ranges and len(in_flight) < workers:
+                    in_flight.append(pool.submit(fetch, *ranges.popleft()))
+                # Each part goes out as one write, without slicing it into copies
+                yield in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,274 @@
+import logging
+import os
+import posixpath
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger()
+
+# CloudFront allows 3000 file paths and 15 wildcard paths in progress per distribution
+MAX_FILE_PATHS_IN_FLIGHT = int(os.getenv('CF_INVALIDATION_MAX_FILES', '3000'))
+MAX_WILDCARDS_IN_FLIGHT = int(os.getenv('CF_INVALIDATION_MAX_WILDCARDS', '15'))
+# A directory with this many changed files is invalidated as '/dir/*'
+WILDCARD_THRESHOLD = int(os.getenv('CF_INVALIDATION_WILDCARD_THRESHOLD', '20'))
+# Wait this long after a deploy before flushing so back-to-back deploys share one invalidation
+FLUSH_DELAY = float(os.getenv('CF_INVALIDATION_FLUSH_DELAY', '5'))
+WAITER_DELAY = int(os.getenv('CF_INVALIDATION_WAITER_DELAY', '20'))
+WAITER_MAX_ATTEMPTS = int(os.getenv('CF_INVALIDATION_WAITER_ATTEMPTS', '60'))
+INDEX_DOCUMENT = 'index.html'
+
+
+def normalize_path(path):
+    """Invalidation path for an object key: rooted, normalized and percent-encoded.
+
+    CloudFront matches invalidation paths against encoded URLs, so a key with
+    spaces or non-ASCII characters must be encoded to invalidate anything.
+    """
+    path = '/' + path.strip().replace('\\', '/').lstrip('/')
+    if not path.endswith('*'):
+        normalized = posixpath.normpath(path)
+        path = normalized + '/' if path.endswith('/') and normalized != '/' else normalized
+    return quote(path, safe='/*~')
+
+
+def _with_index_aliases(paths):
+    # '/docs/index.html' is also served as '/docs/' (and '/' for the root document)
+    expanded = set(paths)
+    for path in paths:
+        if posixpath.basename(path) == INDEX_DOCUMENT:
+            directory = posixpath.dirname(path)
+            expanded.add(directory if directory == '/' else directory + '/')
+    return expanded
+
+
+def _covered(path, wildcards):
+    return any(path.startswith(w[:-1]) for w in wildcards if w != path)
+
+
+def _ancestors(path):
+    directory = posixpath.dirname(path.rstrip('/')) if path != '/' else ''
+    while directory:
+        yield directory
+        if directory == '/':
+            break
+        directory = posixpath.dirname(directory)
+
+
+def coalesce_paths(paths, wildcard_threshold=WILDCARD_THRESHOLD, max_paths=MAX_FILE_PATHS_IN_FLIGHT,
+                   max_wildcards=MAX_WILDCARDS_IN_FLIGHT):
+    """Reduce changed object paths to a small set of invalidation paths.
+
+    Directories with at least wildcard_threshold changed files become
+    '/dir/*' (deepest first, so as little as possible is over-invalidated).
+    If the result is still longer than max_paths, the directories that
+    replace the most paths are collapsed too, up to max_wildcards wildcards.
+    """
+    normalized = _with_index_aliases({normalize_path(p) for p in paths if p and p.strip()})
+    wildcards = {p for p in normalized if p.endswith('*')}
+    exact = {p for p in normalized - wildcards if not _covered(p, wildcards)}
+
+    def collapse(directory):
+        wildcard = directory.rstrip('/') + '/*'
+        wildcards.add(wildcard)
+        for path in [p for p in exact if p.startswith(wildcard[:-1])]:
+            exact.discard(path)
+        for other in [w for w in wildcards if w != wildcard and w.startswith(wildcard[:-1])]:
+            wildcards.discard(other)
+
+    def depth(directory):
+        return directory.rstrip('/').count('/')
+
+    def directory_counts():
+        counts = {}
+        for path in exact:
+            for directory in _ancestors(path):
+                counts[directory] = counts.get(directory, 0) + 1
+        return counts
+
+    while len(wildcards) < max_wildcards:
+        counts = directory_counts()
+        dense = [d for d, n in counts.items() if n >= wildcard_threshold]
+        if dense:
+            collapse(max(dense, key=lambda d: (depth(d), counts[d])))
+        elif len(exact) + len(wildcards) > max_paths and counts:
+            # '/*' covers everything, so it is only used when no subdirectory is left
+            candidates = [d for d in counts if d != '/'] or list(counts)
+            collapse(max(candidates, key=lambda d: (counts[d], depth(d))))
+        else:
+            break
+    return sorted(wildcards) + sorted(exact)
+
+
+def distributions_for_bucket(cf_client, bucket_name):
+    """Ids of distributions with an origin pointing at the bucket (REST or website endpoint)."""
+    matches = []
+    for page in cf_client.get_paginator('list_distributions').paginate():
+        for distribution in page.get('DistributionList', {}).get('Items', []):
+            for origin in distribution['Origins']['Items']:
+                if origin['DomainName'].startswith((f'{bucket_name}.s3.', f'{bucket_name}.s3-website')):
+                    matches.append(distribution['Id'])
+                    break
+    return matches
+
+
+class _Distribution:
+    def __init__(self):
+        self.pending = set()
+        self.in_flight = {}
+        self.history = []
+        self.timer = None
+        self.last_error = None
+
+    def capacity(self):
+        files = sum(1 for inv in self.in_flight.values() for p in inv['paths'] if not p.endswith('*'))
+        wildcards = sum(1 for inv in self.in_flight.values() for p in inv['paths'] if p.endswith('*'))
+        return MAX_FILE_PATHS_IN_FLIGHT - files, MAX_WILDCARDS_IN_FLIGHT - wildcards
+
+
+class InvalidationManager:
+    """Collects changed paths per distribution and invalidates them in batches.
+
+    submit() only records paths; a flush shortly afterwards coalesces
+    everything pending into as few create_invalidation calls as the
+    in-flight limits allow. Anything that does not fit stays pending and is
+    sent when a waiter reports an earlier invalidation complete.
+    """
+
+    def __init__(self, client_factory, flush_delay=FLUSH_DELAY, history=50):
+        self.client_factory = client_factory
+        self.flush_delay = flush_delay
+        self.history = history
+        self._distributions = {}
+        self._lock = threading.RLock()
+        self._waiters = ThreadPoolExecutor(max_workers=8, thread_name_prefix='cf-invalidation')
+
+    def _distribution(self, distribution_id):
+        return self._distributions.setdefault(distribution_id, _Distribution())
+
+    def submit(self, distribution_id, paths, flush_delay=None):
+        """Queue paths for invalidation; returns how many are now pending."""
+        delay = self.flush_delay if flush_delay is None else flush_delay
+        with self._lock:
+            dist = self._distribution(distribution_id)
+            dist.pending.update(normalize_path(p) for p in paths if p and p.strip())
+            if dist.timer is not None:
+                dist.timer.cancel()
+            if delay <= 0:
+                dist.timer = None
+            else:
+                dist.timer = threading.Timer(delay, self._background_flush, args=(distribution_id,))
+                dist.timer.daemon = True
+                dist.timer.start()
+            pending = len(dist.pending)
+        if delay <= 0:
+            self.flush(distribution_id)
+        return pending
+
+    def flush(self, distribution_id):
+        """Send as much of the pending set as the in-flight limits allow."""
+        with self._lock:
+            dist = self._distribution(distribution_id)
+            dist.timer = None
+            if not dist.pending:
+                return []
+            file_room, wildcard_room = dist.capacity()
+            paths = coalesce_paths(dist.pending, max_wildcards=max(wildcard_room, 0))
+            batch = []
+            for path in paths:
+                if path.endswith('*'):
+                    if wildcard_room > 0:
+                        batch.append(path)
+                        wildcard_room -= 1
+                elif file_room > 0:
+                    batch.append(path)
+                    file_room -= 1
+            if not batch:
+                logger.info(f"Invalidation for {distribution_id} deferred: in-flight limits reached")
+                return []
+            # Keep whatever did not fit, in coalesced form, for the next flush
+            dist.pending = set(paths) - set(batch)
+
+        try:
+            client = self.client_factory()
+            response = client.create_invalidation(
+                DistributionId=distribution_id,
+                InvalidationBatch={
+                    'Paths': {'Quantity': len(batch), 'Items': batch},
+                    'CallerReference': f'{int(time.time())}-{uuid.uuid4().hex[:8]}'
+                }
+            )
+        except Exception as e:
+            with self._lock:
+                dist.pending.update(batch)
+            if isinstance(e, ClientError) and e.response['Error']['Code'] == 'TooManyInvalidationsInProgress':
+                logger.warning(f"CloudFront throttled invalidations for {distribution_id}; will retry")
+                self._schedule_retry(distribution_id)
+                return []
+            # Paths stay pending (and the error shows in status()) until the next submit or flush
+            logger.error(f"Failed to create invalidation for {distribution_id}: {e}")
+            with self._lock:
+                dist.last_error = {'error': str(e), 'paths': batch, 'at': time.time()}
+            raise
+
+        invalidation = response['Invalidation']
+        record = {'id': invalidation['Id'], 'paths': batch, 'status': invalidation['Status'],
+                  'created': time.time(), 'completed': None, 'error': None}
+        with self._lock:
+            dist.in_flight[record['id']] = record
+            dist.last_error = None
+        logger.info(f"Created invalidation {record['id']} for {distribution_id} with {len(batch)} paths")
+        self._waiters.submit(self._wait, distribution_id, record)
+        return [record['id']]
+
+    def _background_flush(self, distribution_id):
+        # Timer and waiter threads have no caller to raise to; flush() has logged and recorded the error
+        try:
+            self.flush(distribution_id)
+        except Exception:
+            pass
+
+    def _schedule_retry(self, distribution_id):
+        with self._lock:
+            dist = self._distribution(distribution_id)
+            if dist.timer is None:
+                dist.timer = threading.Timer(max(self.flush_delay, WAITER_DELAY), self._background_flush,
+                                             args=(distribution_id,))
+                dist.timer.daemon = True
+                dist.timer.start()
+
+    def _wait(self, distribution_id, record):
+        try:
+            waiter = self.client_factory().get_waiter('invalidation_completed')
+            waiter.wait(DistributionId=distribution_id, Id=record['id'],
+                        WaiterConfig={'Delay': WAITER_DELAY, 'MaxAttempts': WAITER_MAX_ATTEMPTS})
+            record['status'] = 'Completed'
+        except Exception as e:
+            record['status'] = 'Unknown'
+            record['error'] = str(e)
+            logger.error(f"Waiting on invalidation {record['id']} for {distribution_id} failed: {e}")
+        record['completed'] = time.time()
+        with self._lock:
+            dist = self._distribution(distribution_id)
+            dist.in_flight.pop(record['id'], None)
+            dist.history = ([record] + dist.history)[:self.history]
+            has_pending = bool(dist.pending)
+        if has_pending:
+            self._background_flush(distribution_id)
+
+    def status(self, distribution_id):
+        with self._lock:
+            dist = self._distribution(distribution_id)
+            file_room, wildcard_room = dist.capacity()
+            return {
+                'distribution_id': distribution_id,
+                'pending': sorted(dist.pending),
+                'in_flight': list(dist.in_flight.values()),
+                'completed': list(dist.history),
+                'capacity': {'file_paths': file_room, 'wildcards': wildcard_room},
+                'last_error': dist.last_error,
+            }
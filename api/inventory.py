@@ -0,0 +1,349 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from responses import dumps
+
+logger = logging.getLogger()
+
+SORTABLE_FIELDS = ('provider', 'type', 'id', 'name', 'region', 'state', 'created')
+MAX_PAGE_SIZE = 500
+REFRESH_WORKERS = 16
+# Incremental providers still take a full snapshot every this many syncs, to catch what the change feed missed
+FULL_SYNC_EVERY = 10
+
+
+def resource_key(provider, type, id):
+    return f"{provider}:{type}:{id}"
+
+
+def make_resource(provider, type, id, name='', region='', state='', created=None, tags=None, extra=None):
+    """Build a normalized inventory record."""
+    if hasattr(created, 'isoformat'):
+        created = created.isoformat()
+    return {
+        'provider': provider,
+        'type': type,
+        'id': str(id),
+        'name': name or '',
+        'region': region or '',
+        'state': state or '',
+        'created': created or '',
+        'tags': dict(tags or {}),
+        'extra': extra or {},
+    }
+
+
+class PartialSnapshot(list):
+    """A provider's resources when some of what it covers (regions, accounts) could not be read.
+
+    Previously synced records for which retain(resource) is true are kept
+    as they were instead of being removed as stale; errors maps each
+    unreadable region or account to its error.
+    """
+
+    def __init__(self, resources, retain, errors):
+        super().__init__(resources)
+        self.retain = retain
+        self.errors = errors
+
+
+class Delta:
+    """What changed in a provider since a point in time, instead of a full snapshot.
+
+    upserts are new or changed records and removed holds resource_key()s
+    of records that no longer exist. Nothing else synced from the provider
+    is touched.
+    """
+
+    def __init__(self, upserts, removed=()):
+        self.upserts = list(upserts)
+        self.removed = set(removed)
+
+
+def _fingerprint(resource):
+    return hashlib.sha1(dumps(resource)).hexdigest()
+
+
+class InventoryStore:
+    """Indexed in-memory resource catalog, optionally mirrored to SQLite."""
+
+    def __init__(self, sqlite_path=None):
+        self._lock = threading.RLock()
+        self._resources = {}
+        self._fingerprints = {}
+        self._by_source = {}
+        self._index = {'provider': {}, 'type': {}, 'state': {}, 'region': {}}
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS resources ('
+                'key TEXT PRIMARY KEY, source TEXT, fingerprint TEXT, body TEXT)'
+            )
+            self._load()
+
+    @staticmethod
+    def key(resource):
+        return resource_key(resource['provider'], resource['type'], resource['id'])
+
+    def _load(self):
+        rows = self._db.execute('SELECT key, source, fingerprint, body FROM resources').fetchall()
+        for key, source, fingerprint, body in rows:
+            self._put(key, source, json.loads(body), fingerprint)
+        logger.info(f"Inventory loaded {len(rows)} resources from SQLite")
+
+    def _put(self, key, source, resource, fingerprint):
+        if key in self._resources:
+            self._unindex(key)
+        self._resources[key] = resource
+        self._fingerprints[key] = fingerprint
+        self._by_source.setdefault(source, set()).add(key)
+        for field, index in self._index.items():
+            index.setdefault(resource.get(field, ''), set()).add(key)
+
+    def _unindex(self, key):
+        resource = self._resources[key]
+        for field, index in self._index.items():
+            value = resource.get(field, '')
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.discard(key)
+                # Values that come and go (states, regions) would otherwise pile up as empty sets
+                if not bucket:
+                    del index[value]
+
+    def _remove(self, key, source):
+        self._unindex(key)
+        del self._resources[key]
+        del self._fingerprints[key]
+        keys = self._by_source.get(source)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_source[source]
+
+    def _upsert(self, source, resources):
+        """Store records whose fingerprint changed (lock held); returns (added, updated, seen, db rows)."""
+        added = updated = 0
+        seen = set()
+        db_upserts = []
+        for resource in resources:
+            key = self.key(resource)
+            seen.add(key)
+            fingerprint = _fingerprint(resource)
+            previous = self._fingerprints.get(key)
+            if previous == fingerprint:
+                continue
+            if previous is None:
+                added += 1
+            else:
+                updated += 1
+            self._put(key, source, resource, fingerprint)
+            db_upserts.append((key, source, fingerprint, dumps(resource).decode('utf-8')))
+        return added, updated, seen, db_upserts
+
+    def _commit(self, source, db_upserts, stale):
+        for key in stale:
+            self._remove(key, source)
+        if self._db is not None and (db_upserts or stale):
+            with self._db:
+                self._db.executemany('INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)', db_upserts)
+                self._db.executemany('DELETE FROM resources WHERE key = ?', [(k,) for k in stale])
+
+    def sync(self, source, resources, retain=None):
+        """Apply a full snapshot from one source, touching only what changed.
+
+        Records missing from the snapshot are removed unless retain(record)
+        is true. Returns (added, updated, removed) counts.
+        """
+        with self._lock:
+            added, updated, seen, db_upserts = self._upsert(source, resources)
+            stale = self._by_source.get(source, set()) - seen
+            if retain is not None:
+                stale = {key for key in stale if not retain(self._resources[key])}
+            self._commit(source, db_upserts, stale)
+        return added, updated, len(stale)
+
+    def apply(self, source, delta):
+        """Apply a Delta from one source; returns (added, updated, removed) counts."""
+        with self._lock:
+            added, updated, _, db_upserts = self._upsert(source, delta.upserts)
+            stale = delta.removed & self._by_source.get(source, set())
+            self._commit(source, db_upserts, stale)
+        return added, updated, len(stale)
+
+    def query(self, filters=None, search=None, tag=None, sort='name', descending=False, page=1, page_size=50):
+        """Filter, sort and paginate the catalog.
+
+        filters maps an indexed field (provider/type/state/region) to a value
+        or list of values; search is a case-insensitive substring of name or
+        id; tag is a (key, value) pair where value None matches any value.
+        """
+        if sort not in SORTABLE_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), MAX_PAGE_SIZE)
+
+        candidates = self.records(filters)
+        if search:
+            needle = search.lower()
+            candidates = [r for r in candidates if needle in r['name'].lower() or needle in r['id'].lower()]
+        if tag:
+            tag_key, tag_value = tag
+            candidates = [r for r in candidates
+                          if tag_key in r['tags'] and (tag_value is None or r['tags'][tag_key] == tag_value)]
+
+        candidates.sort(key=lambda r: (r.get(sort) or '', r['id']), reverse=descending)
+        start = (page - 1) * page_size
+        return {
+            'total': len(candidates),
+            'page': page,
+            'page_size': page_size,
+            'items': candidates[start:start + page_size],
+        }
+
+    def records(self, filters=None, source=None):
+        """Every record matching the indexed filters (and synced by source, if given), unsorted."""
+        with self._lock:
+            keys = set(self._by_source.get(source, ())) if source is not None else None
+            for field, wanted in (filters or {}).items():
+                if field not in self._index:
+                    raise ValueError(f"Cannot filter by '{field}'")
+                if isinstance(wanted, str):
+                    wanted = [wanted]
+                matched = set()
+                for value in wanted:
+                    matched |= self._index[field].get(value, set())
+                keys = matched if keys is None else keys & matched
+            return [self._resources[k] for k in (self._resources if keys is None else keys)]
+
+    def source_count(self, source):
+        return len(self._by_source.get(source, ()))
+
+    def __len__(self):
+        return len(self._resources)
+
+
+class InventoryService:
+    """Refreshes registered providers on their own cadence into a store.
+
+    A provider is any callable returning an iterable of make_resource()
+    records; tests can register plain functions returning canned data.
+    A provider that can also report changes(since) -> Delta is synced from
+    those between full snapshots, so a refresh only fetches what changed.
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else InventoryStore()
+        self._providers = {}
+        self._status = {}
+        self._since = {}
+        self._refreshing = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def register(self, name, fetch, interval=60, changes=None, full_every=FULL_SYNC_EVERY):
+        self._providers[name] = (fetch, interval, changes, full_every)
+        self._refreshing[name] = threading.Lock()
+        self._status[name] = {'interval': interval, 'last_sync': None, 'last_error': None,
+                              'duration_ms': None, 'count': 0, 'partial': None,
+                              'mode': None, 'last_full_sync': None, 'incremental_syncs': 0}
+
+    def refresh(self, name, full=False):
+        """Run one sync of a provider now and return its status.
+
+        Incremental providers apply changes since the start of their last
+        successful sync, falling back to a full snapshot on the first sync,
+        after a partial one, every full_every syncs, when full is true, or
+        when changes() itself fails.
+
+        One sync per provider runs at a time: a caller arriving while one is
+        in flight (the provider's thread, refresh_all, the refresh route)
+        waits for it and returns its status instead of syncing again.
+        """
+        running = self._refreshing[name]
+        if not running.acquire(blocking=False):
+            with running:
+                return self._status[name]
+        try:
+            return self._refresh(name, full)
+        finally:
+            running.release()
+
+    def _refresh(self, name, full):
+        fetch, _, changes, full_every = self._providers[name]
+        since = self._since.get(name)
+        incremental = (changes is not None and not full and since is not None
+                       and self._status[name]['incremental_syncs'] < full_every - 1)
+        sync_started = time.time()
+        started = time.perf_counter()
+        try:
+            delta = None
+            if incremental:
+                try:
+                    delta = changes(since)
+                except Exception as e:
+                    logger.warning(f"Inventory '{name}' could not read changes, taking a full snapshot: {e}")
+            if delta is not None:
+                added, updated, removed = self.store.apply(name, delta)
+                partial = False
+                status = {'mode': 'incremental', 'partial': None,
+                          'incremental_syncs': self._status[name]['incremental_syncs'] + 1}
+            else:
+                snapshot = fetch()
+                partial = isinstance(snapshot, PartialSnapshot)
+                added, updated, removed = self.store.sync(name, list(snapshot),
+                                                          retain=snapshot.retain if partial else None)
+                status = {'mode': 'full', 'last_full_sync': sync_started, 'incremental_syncs': 0,
+                          'partial': snapshot.errors if partial else None}
+            # Changes in regions or accounts a partial snapshot missed are only caught by a full one
+            self._since[name] = None if partial else sync_started
+            status.update({'last_sync': time.time(), 'last_error': None,
+                           'added': added, 'updated': updated, 'removed': removed,
+                           'count': self.store.source_count(name)})
+            if partial:
+                logger.warning(f"Inventory '{name}' kept previous records for {sorted(snapshot.errors)}")
+            if added or updated or removed:
+                logger.info(f"Inventory '{name}': +{added} ~{updated} -{removed}")
+        except Exception as e:
+            logger.error(f"Inventory refresh failed for '{name}': {e}")
+            status = {'last_error': str(e)}
+        status['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        self._status[name].update(status)
+        return self._status[name]
+
+    def refresh_all(self):
+        """Sync every provider at once (one per account and cloud), so the slowest sets the pace."""
+        names = list(self._providers)
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(len(names), REFRESH_WORKERS), thread_name_prefix='inventory') as pool:
+            return dict(zip(names, pool.map(self.refresh, names)))
+
+    def _run(self, name):
+        interval = self._providers[name][1]
+        while not self._stop.is_set():
+            self.refresh(name)
+            self._stop.wait(interval)
+
+    def start(self):
+        """Start one daemon thread per provider; safe to call repeatedly."""
+        with self._lock:
+            if self._threads:
+                return
+            for name in self._providers:
+                thread = threading.Thread(target=self._run, args=(name,), name=f'inventory-{name}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return {'resources': len(self.store), 'providers': self._status}
@@ -0,0 +1,323 @@
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+from responses import dumps
+
+logger = logging.getLogger()
+
+# Every stream stops once it has sent this many rows or bytes; clients
+# resume a tail from its cursor or narrow the Insights query
+LOGS_MAX_ROWS = int(os.getenv('LOGS_MAX_ROWS', '10000'))
+LOGS_MAX_BYTES = int(os.getenv('LOGS_MAX_BYTES', str(8 * 1024 * 1024)))
+# A tail holds a worker thread, so it is closed after this long; EventSource reconnects on its own
+LOGS_TAIL_MAX_SECONDS = int(os.getenv('LOGS_TAIL_MAX_SECONDS', '300'))
+# filter_log_events allows only a few calls per second per account and region,
+# so idle tails back off from the first interval to the second
+LOGS_TAIL_POLL = (float(os.getenv('LOGS_TAIL_POLL_MIN', '1')), float(os.getenv('LOGS_TAIL_POLL_MAX', '10')))
+# Each tail window starts this many seconds before the newest event sent, so
+# events CloudWatch ingests late are still picked up (and deduplicated by id)
+LOGS_TAIL_LOOKBACK = float(os.getenv('LOGS_TAIL_LOOKBACK', '60'))
+# Most event ids a cursor remembers from its lookback window
+LOGS_TAIL_SEEN_MAX = int(os.getenv('LOGS_TAIL_SEEN_MAX', '5000'))
+# Saved tail positions are dropped after this long unused (nextTokens expire after 24h anyway)
+LOGS_CURSOR_TTL = int(os.getenv('LOGS_CURSOR_TTL', str(24 * 3600)))
+LOGS_CURSOR_MAX = int(os.getenv('LOGS_CURSOR_MAX', '1000'))
+# The largest page filter_log_events returns
+FILTER_PAGE_LIMIT = 10000
+# get_query_results polling: first interval, growth factor, cap
+INSIGHTS_POLL = (0.5, 1.5, 5.0)
+# Insights queries still running after this long are stopped
+LOGS_QUERY_TIMEOUT = int(os.getenv('LOGS_QUERY_TIMEOUT', '900'))
+# Logs Insights returns at most this many rows per query
+INSIGHTS_MAX_LIMIT = 10000
+INSIGHTS_DONE = ('Complete', 'Failed', 'Cancelled', 'Timeout', 'Unknown')
+
+
+def sse(event, data, id=None):
+    """One server-sent event with a JSON payload."""
+    lines = f'id: {id}\n' if id is not None else ''
+    return f'{lines}event: {event}\ndata: '.encode('utf-8') + dumps(data) + b'\n\n'
+
+
+def keepalive():
+    """SSE comment line; keeps proxies from closing an idle stream."""
+    return b': keepalive\n\n'
+
+
+class Budget:
+    """Rows and bytes a single stream may still send."""
+
+    def __init__(self, max_rows=LOGS_MAX_ROWS, max_bytes=LOGS_MAX_BYTES):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+
+    def take(self, size):
+        """Account for one row of size bytes; False (and nothing taken) if it doesn't fit."""
+        if self.rows + 1 > self.max_rows or self.bytes + size > self.max_bytes:
+            return False
+        self.rows += 1
+        self.bytes += size
+        return True
+
+    @property
+    def rows_left(self):
+        return self.max_rows - self.rows
+
+    def status(self):
+        return {'rows': self.rows, 'bytes': self.bytes, 'max_rows': self.max_rows, 'max_bytes': self.max_bytes}
+
+
+def parse_limits(args):
+    """max_rows / max_bytes request arguments, capped at the server limits."""
+    max_rows = int(args.get('max_rows') or LOGS_MAX_ROWS)
+    max_bytes = int(args.get('max_bytes') or LOGS_MAX_BYTES)
+    if max_rows < 1 or max_bytes < 1:
+        raise ValueError('max_rows and max_bytes must be positive')
+    return Budget(min(max_rows, LOGS_MAX_ROWS), min(max_bytes, LOGS_MAX_BYTES))
+
+
+# ---------------------------- Tail ---------------------------- #
+
+class CursorStore:
+    """Tail positions by name, in memory and optionally mirrored to SQLite.
+
+    A cursor is where a tail stopped: the filter_log_events window it was
+    paging through (window_start and next_token), the newest timestamp it
+    sent, and the ids of the events it sent inside the lookback window, so
+    a resumed tail neither skips nor repeats events. Cursors unused for
+    ttl seconds are dropped, and past max_cursors the least recently used
+    go first.
+    """
+
+    def __init__(self, sqlite_path=None, ttl=LOGS_CURSOR_TTL, max_cursors=LOGS_CURSOR_MAX):
+        self.ttl = ttl
+        self.max_cursors = max_cursors
+        self._lock = threading.Lock()
+        self._cursors = {}
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS log_cursors (name TEXT PRIMARY KEY, body TEXT)')
+            for name, body in self._db.execute('SELECT name, body FROM log_cursors').fetchall():
+                self._cursors[name] = json.loads(body)
+            with self._lock:
+                self._evict()
+            logger.info(f"Loaded {len(self._cursors)} log tail cursors from SQLite")
+
+    def _evict(self):
+        expired = [name for name, cursor in self._cursors.items()
+                   if time.time() - cursor.get('updated_at', 0) > self.ttl]
+        overflow = len(self._cursors) - len(expired) - self.max_cursors
+        if overflow > 0:
+            live = sorted((cursor.get('updated_at', 0), name) for name, cursor in self._cursors.items()
+                          if name not in expired)
+            expired += [name for _, name in live[:overflow]]
+        for name in expired:
+            del self._cursors[name]
+        if self._db is not None and expired:
+            with self._db:
+                self._db.executemany('DELETE FROM log_cursors WHERE name = ?', [(name,) for name in expired])
+
+    def get(self, name):
+        with self._lock:
+            cursor = self._cursors.get(name)
+            if cursor and time.time() - cursor.get('updated_at', 0) > self.ttl:
+                self._evict()
+                return None
+            return copy.deepcopy(cursor) if cursor else None
+
+    def put(self, name, cursor):
+        cursor = dict(cursor, updated_at=time.time())
+        with self._lock:
+            self._cursors[name] = cursor
+            if self._db is not None:
+                with self._db:
+                    self._db.execute('INSERT OR REPLACE INTO log_cursors VALUES (?, ?)',
+                                     (name, dumps(cursor).decode('utf-8')))
+            if len(self._cursors) > self.max_cursors:
+                self._evict()
+
+    def delete(self, name):
+        with self._lock:
+            found = self._cursors.pop(name, None) is not None
+            if self._db is not None:
+                with self._db:
+                    self._db.execute('DELETE FROM log_cursors WHERE name = ?', (name,))
+        return found
+
+    def __len__(self):
+        return len(self._cursors)
+
+
+def new_cursor_name():
+    return uuid.uuid4().hex
+
+
+def new_cursor(group, filter_pattern='', start_time=None):
+    start_time = int(time.time() * 1000) if start_time is None else start_time
+    return {'group': group, 'filter': filter_pattern, 'floor': start_time, 'window_start': start_time,
+            'next_token': None, 'high_water': start_time, 'seen': {}}
+
+
+def _throttled(error):
+    return isinstance(error, ClientError) and \
+        error.response.get('Error', {}).get('Code') in ('ThrottlingException', 'LimitExceededException')
+
+
+def _advance(cursor, lookback_ms):
+    """Start the next window lookback_ms before the newest sent event and forget ids older than it."""
+    cursor['window_start'] = max(cursor['floor'], cursor['high_water'] - lookback_ms)
+    seen = {event_id: timestamp for event_id, timestamp in cursor['seen'].items()
+            if timestamp >= cursor['window_start']}
+    if len(seen) > LOGS_TAIL_SEEN_MAX:
+        # A burst bigger than the cap may repeat a few events on resume rather than grow the cursor
+        seen = dict(sorted(seen.items(), key=lambda item: item[1])[-LOGS_TAIL_SEEN_MAX:])
+    cursor['seen'] = seen
+
+
+def tail(client, cursor, budget, save, max_seconds=LOGS_TAIL_MAX_SECONDS, poll=LOGS_TAIL_POLL,
+         lookback=LOGS_TAIL_LOOKBACK, sleep=time.sleep):
+    """Follow a log group as server-sent events, one filter_log_events page at a time.
+
+    Each page is sent as soon as it arrives and the cursor is passed to
+    save(cursor) after it, so nothing is held beyond one page and a
+    reconnect picks up where the last page left off. Every window starts
+    lookback seconds before the newest event sent and skips ids already
+    sent, so events CloudWatch ingests up to that late are still
+    delivered, once. The stream ends with an 'end' event giving the
+    reason: the row or byte budget ran out, or max_seconds passed.
+    """
+    deadline = time.monotonic() + max_seconds
+    interval = poll[0]
+    lookback_ms = int(lookback * 1000)
+    while True:
+        kwargs = {'logGroupName': cursor['group'], 'startTime': cursor['window_start'],
+                  'limit': min(budget.rows_left, FILTER_PAGE_LIMIT)}
+        if cursor['filter']:
+            kwargs['filterPattern'] = cursor['filter']
+        if cursor['next_token']:
+            kwargs['nextToken'] = cursor['next_token']
+        try:
+            response = client.filter_log_events(**kwargs)
+        except Exception as e:
+            if not _throttled(e):
+                raise
+            logger.warning(f"filter_log_events throttled for {cursor['group']}, retrying in {poll[1]:g}s")
+            response, interval = None, poll[1]
+
+        events, full = [], False
+        if response is not None:
+            for event in response.get('events', []):
+                if event['eventId'] in cursor['seen']:
+                    continue
+                row = {'timestamp': event['timestamp'], 'stream': event.get('logStreamName', ''),
+                       'message': event.get('message', ''), 'id': event['eventId']}
+                if not budget.take(len(dumps(row))):
+                    full = True
+                    break
+                events.append(row)
+                cursor['seen'][event['eventId']] = event['timestamp']
+                cursor['high_water'] = max(cursor['high_water'], event['timestamp'])
+            # A page cut short can't be resumed by its token; the window is re-read and sent ids skipped
+            cursor['next_token'] = None if full else response.get('nextToken')
+            if not cursor['next_token']:
+                _advance(cursor, lookback_ms)
+            save(cursor)
+
+        if events:
+            interval = poll[0]
+            yield sse('events', {'events': events, 'sent': budget.status()})
+        if full or budget.rows_left <= 0:
+            yield sse('end', {'reason': 'limit', 'sent': budget.status()})
+            return
+        if time.monotonic() >= deadline:
+            yield sse('end', {'reason': 'max_seconds', 'sent': budget.status()})
+            return
+        if cursor['next_token']:
+            continue
+        if not events:
+            yield keepalive()
+            interval = min(interval * 2, poll[1]) if response is not None else interval
+        sleep(min(interval, max(deadline - time.monotonic(), 0)))
+
+
+# ---------------------------- Insights ---------------------------- #
+
+def _row(fields):
+    """Insights result row ([{field, value}, ...]) as (@ptr or None, dict without @ptr)."""
+    pointer = next((field.get('value') for field in fields if field['field'] == '@ptr'), None)
+    return pointer, {field['field']: field.get('value') for field in fields if field['field'] != '@ptr'}
+
+
+def insights_query(client, groups, query, start_time, end_time, budget, limit=None,
+                   timeout=LOGS_QUERY_TIMEOUT, poll=INSIGHTS_POLL, sleep=time.sleep):
+    """Run a Logs Insights query and stream its rows as server-sent events.
+
+    start_query returns at once; get_query_results is then polled with
+    growing intervals, so the first rows arrive while the query is still
+    scanning. Partial results are re-sorted between polls, so rows are
+    tracked by their @ptr and each poll sends the ones not sent before.
+    Aggregate rows (stats) have no @ptr and change until the query
+    finishes, so they are sent once, with the final results. Rows
+    already sent are not retracted. The query is stopped when the budget
+    runs out, it exceeds timeout, or the client goes away.
+    """
+    limit = min(limit or budget.max_rows, budget.max_rows, INSIGHTS_MAX_LIMIT)
+    query_id = client.start_query(logGroupNames=groups, queryString=query, startTime=int(start_time.timestamp()),
+                                  endTime=int(end_time.timestamp()), limit=limit)['queryId']
+    deadline = time.monotonic() + timeout
+    interval = poll[0]
+    sent = set()
+    finished = False
+    try:
+        yield sse('started', {'queryId': query_id, 'limit': limit})
+        while True:
+            response = client.get_query_results(queryId=query_id)
+            status = response['status']
+            done = status in INSIGHTS_DONE
+            rows, full = [], False
+            for fields in response.get('results', []):
+                pointer, row = _row(fields)
+                if pointer in sent or (pointer is None and not done):
+                    continue
+                if not budget.take(len(dumps(row))):
+                    full = True
+                    break
+                rows.append(row)
+                if pointer is not None:
+                    sent.add(pointer)
+            if rows:
+                yield sse('rows', {'rows': rows, 'status': status, 'sent': budget.status()})
+            if done and not full:
+                finished = True
+                yield sse('end', {'reason': status.lower(), 'statistics': response.get('statistics', {}),
+                                  'sent': budget.status()})
+                return
+            if full or budget.rows_left <= 0:
+                finished = done
+                yield sse('end', {'reason': 'limit', 'status': status, 'sent': budget.status()})
+                return
+            if time.monotonic() >= deadline:
+                yield sse('end', {'reason': 'timeout', 'status': status, 'sent': budget.status()})
+                return
+            yield keepalive()
+            sleep(interval)
+            interval = min(interval * poll[1], poll[2])
+    finally:
+        # Also runs when the client disconnects and the generator is closed
+        if not finished:
+            try:
+                client.stop_query(queryId=query_id)
+            except Exception as e:
+                # Already finished between the last poll and now
+                logger.info(f"stop_query {query_id}: {e}")
@@ -0,0 +1,274 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from coalesce import flight
+
+logger = logging.getLogger()
+
+# How long a namespace's list_metrics result is reused before it is listed again
+METRIC_CATALOG_TTL = int(os.getenv('METRIC_CATALOG_TTL', '900'))
+# GetMetricData accepts at most this many metrics and expressions per call
+MAX_QUERIES_PER_CALL = 500
+METRIC_BATCH_WORKERS = int(os.getenv('METRIC_BATCH_WORKERS', '8'))
+
+# One chartable metric per resource kind. dimension identifies the resource;
+# match pins the other dimensions list_metrics returns alongside it.
+RESOURCE_METRICS = {
+    'ec2': {
+        'namespace': 'AWS/EC2', 'metric': 'CPUUtilization', 'dimension': 'InstanceId', 'match': {},
+        'stat': 'Average', 'period': 300, 'recently_active': True,
+    },
+    's3': {
+        # Daily storage metric, so it never counts as recently active
+        'namespace': 'AWS/S3', 'metric': 'BucketSizeBytes', 'dimension': 'BucketName',
+        'match': {'StorageType': 'StandardStorage'}, 'stat': 'Average', 'period': 86400, 'recently_active': False,
+    },
+    'cloudfront': {
+        'namespace': 'AWS/CloudFront', 'metric': 'Requests', 'dimension': 'DistributionId',
+        'match': {'Region': 'Global'}, 'stat': 'Sum', 'period': 300, 'recently_active': True,
+        # CloudFront publishes its metrics only in us-east-1
+        'regions': ['us-east-1'],
+    },
+}
+
+# Metric math reducers used to rank series for top-N
+RANK_FUNCTIONS = {'avg': 'AVG', 'max': 'MAX', 'sum': 'SUM', 'min': 'MIN'}
+
+
+class MetricCatalog:
+    """list_metrics results per (region, namespace, metric), cached for ttl seconds.
+
+    client_factory(region) returns a CloudWatch client. Concurrent misses
+    for the same key share one listing, and a failed refresh keeps serving
+    the previous listing.
+    """
+
+    def __init__(self, client_factory, ttl=METRIC_CATALOG_TTL):
+        self._client_factory = client_factory
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _list(self, region, spec):
+        kwargs = {'Namespace': spec['namespace'], 'MetricName': spec['metric']}
+        if spec['recently_active']:
+            kwargs['RecentlyActive'] = 'PT3H'
+        dimension_sets = []
+        client = self._client_factory(region)
+        while True:
+            response = client.list_metrics(**kwargs)
+            for metric in response['Metrics']:
+                dimensions = {d['Name']: d['Value'] for d in metric.get('Dimensions', [])}
+                if set(dimensions) == {spec['dimension'], *spec['match']} and \
+                        all(dimensions[name] == value for name, value in spec['match'].items()):
+                    dimension_sets.append(metric['Dimensions'])
+            if not response.get('NextToken'):
+                return dimension_sets
+            kwargs['NextToken'] = response['NextToken']
+
+    def dimension_sets(self, region, spec):
+        key = (region, spec['namespace'], spec['metric'])
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and time.time() - entry['listed_at'] < self.ttl:
+            return entry['dimension_sets']
+        try:
+            dimension_sets = flight.do(('cloudwatch.list_metrics',) + key, lambda: self._list(region, spec),
+                                       name='cloudwatch.list_metrics')
+        except Exception as e:
+            if entry:
+                logger.warning(f"list_metrics failed for {key}, serving cached listing: {e}")
+                return entry['dimension_sets']
+            raise
+        with self._lock:
+            self._entries[key] = {'dimension_sets': dimension_sets, 'listed_at': time.time()}
+        return dimension_sets
+
+    def status(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'entries': [{'region': region, 'namespace': namespace, 'metric': metric,
+                             'resources': len(entry['dimension_sets']), 'listed_at': entry['listed_at']}
+                            for (region, namespace, metric), entry in self._entries.items()],
+            }
+
+
+def build_queries(spec, dimension_sets, ids=None, group_of=None):
+    """One MetricStat query per resource, labelled with its id.
+
+    group_of(resource_id) returns a group name (or None to skip the
+    resource); grouped queries get Ids prefixed per group so a metric math
+    METRICS('<prefix>') can aggregate them. Returns (queries, groups) where
+    groups maps each Id prefix to its group name.
+    """
+    wanted = set(ids) if ids else None
+    queries, prefixes = [], {}
+    for dimensions in dimension_sets:
+        resource_id = next(d['Value'] for d in dimensions if d['Name'] == spec['dimension'])
+        if wanted is not None and resource_id not in wanted:
+            continue
+        prefix = 'm_'
+        if group_of is not None:
+            group = group_of(resource_id)
+            if group is None:
+                continue
+            prefix = prefixes.setdefault(group, f'g{len(prefixes)}_')
+        queries.append({
+            'Id': f'{prefix}{len(queries)}',
+            'Label': resource_id,
+            'MetricStat': {
+                'Metric': {'Namespace': spec['namespace'], 'MetricName': spec['metric'], 'Dimensions': dimensions},
+                'Period': spec['period'],
+                'Stat': spec['stat'],
+            },
+            'ReturnData': group_of is None,
+        })
+    return queries, {prefix: group for group, prefix in prefixes.items()}
+
+
+def _id_prefix(query):
+    return query['Id'][:query['Id'].index('_') + 1]
+
+
+def pack_batches(queries, expressions_for=None, limit=MAX_QUERIES_PER_CALL):
+    """Split queries into GetMetricData calls of at most limit entries.
+
+    expressions_for(prefixes) returns the metric math queries a batch needs
+    for the Id prefixes it contains; room for them is reserved as the batch
+    fills, so each call carries its own aggregates. Queries sharing a prefix
+    are kept together where they fit.
+    """
+    batches = []
+    current, prefixes = [], []
+    for query in sorted(queries, key=_id_prefix):
+        prefix = _id_prefix(query)
+        new_prefixes = prefixes if prefix in prefixes else prefixes + [prefix]
+        expressions = len(expressions_for(new_prefixes)) if expressions_for else 0
+        if current and len(current) + 1 + expressions > limit:
+            batches.append(current + (expressions_for(prefixes) if expressions_for else []))
+            current, new_prefixes = [], [prefix]
+        current.append(query)
+        prefixes = new_prefixes
+    if current:
+        batches.append(current + (expressions_for(prefixes) if expressions_for else []))
+    return batches
+
+
+def top_expressions(count, rank='avg'):
+    """Per-batch top-N with metric math, so each call returns count series instead of every one."""
+    def expressions_for(prefixes):
+        return [{'Id': 'top', 'Expression': f"SORT(METRICS(), {RANK_FUNCTIONS[rank]}, DESC, {count})",
+                 'Label': 'top', 'ReturnData': True}]
+    return expressions_for
+
+
+def sum_expressions(groups):
+    """One SUM(METRICS('<prefix>')) per group present in a batch."""
+    def expressions_for(prefixes):
+        return [{'Id': f'sum_{prefix.rstrip("_")}', 'Expression': f"SUM(METRICS('{prefix}'))",
+                 'Label': groups[prefix], 'ReturnData': True} for prefix in prefixes]
+    return expressions_for
+
+
+def run_batches(client, batches, start_time, end_time, workers=METRIC_BATCH_WORKERS):
+    """Run every batch concurrently, following NextToken; returns every MetricDataResult.
+
+    Pages of one result (same batch and Id) are joined, so callers see one
+    entry per series. Each call gets its own threads (a single batch runs on
+    the caller's), so regions fanned out at once never queue behind each other.
+    """
+    def run(batch):
+        merged, order = {}, []
+        kwargs = {'MetricDataQueries': batch, 'StartTime': start_time, 'EndTime': end_time}
+        while True:
+            response = client.get_metric_data(**kwargs)
+            for result in response['MetricDataResults']:
+                key = (result['Id'], result.get('Label'))
+                if key not in merged:
+                    merged[key] = {**result, 'Timestamps': list(result['Timestamps']),
+                                   'Values': list(result['Values'])}
+                    order.append(key)
+                else:
+                    merged[key]['Timestamps'].extend(result['Timestamps'])
+                    merged[key]['Values'].extend(result['Values'])
+            if not response.get('NextToken'):
+                return [merged[key] for key in order]
+            kwargs['NextToken'] = response['NextToken']
+
+    if len(batches) <= 1:
+        return [result for batch in batches for result in run(batch)]
+    with ThreadPoolExecutor(max_workers=min(len(batches), workers), thread_name_prefix='metric-batch') as pool:
+        return [result for results in pool.map(run, batches) for result in results]
+
+
+def rank_value(values, rank='avg'):
+    if not values:
+        return float('-inf')
+    if rank == 'max':
+        return max(values)
+    if rank == 'min':
+        return min(values)
+    if rank == 'sum':
+        return sum(values)
+    return sum(values) / len(values)
+
+
+def merge_sums(results):
+    """Add up per-batch partial sums of a group by timestamp."""
+    totals = {}
+    for result in results:
+        series = totals.setdefault(result['Label'], {})
+        for timestamp, value in zip(result['Timestamps'], result['Values']):
+            series[timestamp] = series.get(timestamp, 0) + value
+    return [{'Label': label, 'Timestamps': list(series), 'Values': list(series.values())}
+            for label, series in totals.items()]
+
+
+class ResourceMetrics:
+    """Per-resource CloudWatch series for every instance, bucket or distribution.
+
+    Resources come from the catalog rather than a hand-written dimension
+    list; their queries are packed into 500-query GetMetricData calls that
+    run concurrently, and top-N and per-group sums are computed by metric
+    math in each call so thousands of resources cost a handful of requests.
+    """
+
+    def __init__(self, catalog, client_factory, workers=METRIC_BATCH_WORKERS):
+        self.catalog = catalog
+        self._client_factory = client_factory
+        self.workers = workers
+
+    def query(self, kind, region, start_time, end_time, ids=None, top=None, rank='avg', group_of=None):
+        """Series for one region; returns (results, stats).
+
+        Plain queries return one series per resource; top returns the top
+        series by rank; group_of returns one summed series per group.
+        """
+        spec = RESOURCE_METRICS[kind]
+        dimension_sets = self.catalog.dimension_sets(region, spec)
+        queries, groups = build_queries(spec, dimension_sets, ids=ids, group_of=group_of)
+        stats = {'resources': len(queries), 'batches': 0}
+        if not queries:
+            return [], stats
+        if group_of is not None:
+            expressions_for = sum_expressions(groups)
+        elif top:
+            for query in queries:
+                query['ReturnData'] = False
+            expressions_for = top_expressions(top, rank)
+        else:
+            expressions_for = None
+        batches = pack_batches(queries, expressions_for)
+        stats['batches'] = len(batches)
+        results = run_batches(self._client_factory(region), batches, start_time, end_time, self.workers)
+        if group_of is not None:
+            return merge_sums(results), stats
+        if top:
+            # Each call ranked only its own batch; pick the overall top from their winners
+            results.sort(key=lambda result: rank_value(result['Values'], rank), reverse=True)
+            return results[:top], stats
+        return results, stats
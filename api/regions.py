@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.config import Config
+
+logger = logging.getLogger()
+
+# Comma-separated regions to use instead of discovering them with DescribeRegions
+AWS_REGIONS = os.getenv('AWS_REGIONS')
+REGIONS_TTL = int(os.getenv('AWS_REGIONS_TTL', '3600'))
+# Budget for each region's call in a fan-out, counted from when the call starts;
+# slower regions are reported as failed
+REGION_TIMEOUT = float(os.getenv('AWS_REGION_TIMEOUT', '8'))
+# Threads shared by every fan-out of one kind (e.g. all EC2 region fan-outs)
+REGION_WORKERS = int(os.getenv('AWS_REGION_WORKERS', '32'))
+
+# Regional clients give up on their own shortly after the fan-out stops waiting,
+# so a hung region doesn't hold a worker for botocore's default 60s
+REGIONAL_CLIENT_CONFIG = Config(
+    connect_timeout=min(REGION_TIMEOUT, 5),
+    read_timeout=REGION_TIMEOUT,
+    retries={'max_attempts': 2, 'mode': 'standard'},
+)
+
+
+class RegionDirectory:
+    """Enabled AWS regions, discovered once with DescribeRegions and cached.
+
+    ec2_factory(region) returns an EC2 client. The default region always
+    comes first so single-series consumers keep showing it. If discovery
+    fails the last known list (or just the default region) is used.
+    """
+
+    def __init__(self, ec2_factory, default_region, ttl=REGIONS_TTL, configured=AWS_REGIONS):
+        self._ec2_factory = ec2_factory
+        self.default_region = default_region
+        self.ttl = ttl
+        self._configured = [r.strip() for r in configured.split(',') if r.strip()] if configured else None
+        self._regions = None
+        self._loaded_at = 0
+        self._error = None
+        self._lock = threading.Lock()
+
+    def _discover(self):
+        response = self._ec2_factory(self.default_region).describe_regions()
+        return [region['RegionName'] for region in response['Regions']]
+
+    def regions(self):
+        if self._configured:
+            return list(self._configured)
+        with self._lock:
+            if self._regions is None or time.time() - self._loaded_at > self.ttl:
+                try:
+                    discovered = self._discover()
+                    self._regions = sorted(discovered, key=lambda r: (r != self.default_region, r))
+                    self._error = None
+                    logger.info(f"Discovered {len(self._regions)} enabled AWS regions")
+                except Exception as e:
+                    self._error = str(e)
+                    logger.error(f"Failed to discover AWS regions, using {self._regions or [self.default_region]}: {e}")
+                    self._regions = self._regions or [self.default_region]
+                # Retry a failed discovery on the next call after a short pause, not after a full TTL
+                self._loaded_at = time.time() if self._error is None else time.time() - self.ttl + 60
+            return list(self._regions)
+
+    def refresh(self):
+        with self._lock:
+            self._regions = None
+        return self.regions()
+
+    def status(self):
+        return {
+            'regions': self.regions(),
+            'source': 'AWS_REGIONS' if self._configured else 'DescribeRegions',
+            'loaded_at': self._loaded_at or None,
+            'ttl': self.ttl,
+            'error': self._error,
+        }
+
+
+class RegionFanout:
+    """Run one call in many regions at once and collect what comes back in time.
+
+    client_factory(service, region) returns a client. Regions run in
+    parallel on the service's shared workers, so a fan-out takes about as
+    long as the slowest region, capped at timeout. A region that raises or misses the deadline is
+    reported in errors and left out of results; the others still return.
+    """
+
+    def __init__(self, client_factory, directory, timeout=REGION_TIMEOUT, workers=REGION_WORKERS):
+        self._client_factory = client_factory
+        self.directory = directory
+        self.timeout = timeout
+        self.workers = workers
+
+    def map(self, service, fn, regions=None, timeout=None, client_factory=None):
+        """Call fn(client, region) in every region; returns (results, errors, timings).
+
+        results and errors are keyed by region; timings holds each
+        finished region's elapsed milliseconds. client_factory overrides
+        where clients come from, e.g. another account's credentials.
+        """
+        regions = regions or self.directory.regions()
+        client_factory = client_factory or self._client_factory
+        calls = {region: (lambda region=region: fn(client_factory(service, region), region)) for region in regions}
+        return fan_out(calls, self.timeout if timeout is None else timeout, label=service, workers=self.workers)
+
+
+# (kind, label, workers) -> executor shared by every fan-out of that kind
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _executor(kind, label, workers):
+    with _executors_lock:
+        key = (kind, label, workers)
+        if key not in _executors:
+            _executors[key] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'fanout-{kind}-{label}')
+        return _executors[key]
+
+
+def fan_out(calls, timeout, label='', workers=REGION_WORKERS, kind='region'):
+    """Run every call in {key: fn} in parallel and give each at most timeout seconds.
+
+    Returns (results, errors, timings) keyed like calls. A call that
+    raises or runs longer than timeout lands in errors. Calls run on an
+    executor of workers threads shared by every fan-out with the same kind
+    and label, so the thread count stays bounded however many requests fan
+    out at once. A call's clock starts when it starts running; one still
+    queued timeout seconds after the fan-out began is cancelled and
+    reported instead. Fan-outs nested inside another fan-out's calls must
+    use a different kind, or they would wait on their own workers.
+    """
+    if not calls:
+        return {}, {}, {}
+    timings, started = {}, {}
+    queued_until = time.monotonic() + timeout
+
+    def timed(key, fn):
+        started[key] = time.monotonic()
+        try:
+            return fn()
+        finally:
+            timings[key] = round((time.monotonic() - started[key]) * 1000, 1)
+
+    pool = _executor(kind, label, workers)
+    futures = {pool.submit(timed, key, fn): key for key, fn in calls.items()}
+    results, errors = {}, {}
+    pending = set(futures)
+    while pending:
+        deadlines = [started[futures[f]] + timeout if futures[f] in started else queued_until for f in pending]
+        done, pending = wait(pending, timeout=max(min(deadlines) - time.monotonic(), 0),
+                             return_when=FIRST_COMPLETED)
+        for future in done:
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = str(e)
+                logger.warning(f"{label} call in {key} failed: {e}")
+        now = time.monotonic()
+        for future in [f for f in pending if futures[f] in started and now - started[futures[f]] >= timeout]:
+            key = futures[future]
+            pending.discard(future)
+            errors[key] = f'Timed out after {timeout:g}s'
+            logger.warning(f"{label} call in {key} timed out after {timeout:g}s")
+        if now >= queued_until:
+            for future in [f for f in pending if futures[f] not in started and f.cancel()]:
+                key = futures[future]
+                pending.discard(future)
+                errors[key] = f'Not started within {timeout:g}s; {label} workers are busy'
+                logger.warning(f"{label} call in {key} never started: all {workers} workers busy")
+    return results, errors, dict(timings)
+
+
+def merge(results, errors, timings, regions, tag='Region', report_key='regions'):
+    """Flatten per-region lists into one list tagged with their region.
+
+    Returns (items, report). Items keep the order of regions; report
+    gives each region's status, item count and elapsed time, and partial
+    is true when any region failed. Accounts use the same shape with
+    tag='Account' and report_key='accounts'.
+    """
+    items, per_region = [], {}
+    for region in regions:
+        if region in results:
+            region_items = results[region] or []
+            for item in region_items:
+                item[tag] = region
+            items.extend(region_items)
+            per_region[region] = {'status': 'ok', 'count': len(region_items), 'elapsed_ms': timings.get(region)}
+        else:
+            per_region[region] = {'status': 'error', 'error': errors.get(region, 'No result'),
+                                  'elapsed_ms': timings.get(region)}
+    return items, {report_key: per_region, 'partial': bool(errors)}
@@ -0,0 +1,162 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response, request
+
+# orjson is much faster than the stdlib encoder and handles datetimes natively
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional codecs - only offered to clients when the package is installed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '6'))
+
+# Codecs in server preference order
+_ENCODINGS = ['zstd', 'br', 'gzip']
+
+# ---------------------------- Serialization ---------------------------- #
+
+def _default(obj):
+    """Serialize the types boto3 hands back that JSON can't represent."""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj):
+    """Serialize obj to JSON bytes, converting datetimes to ISO-8601."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def json_response(payload, status=200):
+    """Drop-in replacement for jsonify() using the fast serializer."""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+# ---------------------------- Compression ---------------------------- #
+
+def _available(encoding):
+    if encoding == 'br':
+        return brotli is not None
+    if encoding == 'zstd':
+        return zstandard is not None
+    return True
+
+def _parse_accept_encoding(accept_encoding):
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+    return accepted
+
+def _quality(accepted, encoding):
+    return accepted.get(encoding, accepted.get('*', 0))
+
+def negotiate_encoding(accept_encoding, encodings=_ENCODINGS):
+    """Pick the best codec from an Accept-Encoding header, or None."""
+    accepted = _parse_accept_encoding(accept_encoding)
+    candidates = [
+        enc for enc in encodings
+        if _available(enc) and _quality(accepted, enc) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda enc: _quality(accepted, enc))
+
+def compress(data, encoding):
+    """Compress a complete body with the given codec."""
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(COMPRESS_LEVEL, 11))
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=COMPRESS_LEVEL).compress(data)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def compress_response(response):
+    """after_request hook: compress large JSON bodies the client can decode."""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype != 'application/json'):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# ---------------------------- Streaming ---------------------------- #
+
+def _iter_json_list(key, items, extra):
+    head = dict(extra or {})
+    if head:
+        yield dumps(head)[:-1] + b',' + dumps(key) + b':['
+    else:
+        yield b'{' + dumps(key) + b':['
+    first = True
+    for item in items:
+        yield dumps(item) if first else b',' + dumps(item)
+        first = False
+    yield b']}'
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+def stream_json_list(key, items, extra=None, status=200):
+    """Stream {**extra, key: [items...]} without materializing the document.
+
+    items may be any iterable (e.g. a generator over paginator pages). The
+    body is gzip-compressed on the fly when the client accepts it.
+    """
+    chunks = _iter_json_list(key, items, extra)
+    headers = {'Vary': 'Accept-Encoding'}
+    if negotiate_encoding(request.headers.get('Accept-Encoding'), ['gzip']):
+        chunks = _gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(chunks, status=status, mimetype='application/json', headers=headers)
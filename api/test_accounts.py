@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+from accounts import CredentialBroker, load_accounts
+
+ACCOUNTS = json.dumps([
+    {'id': '111111111111', 'name': 'prod', 'role': 'GatewayReadOnly'},
+    {'id': '222222222222', 'name': 'staging'},
+    {'id': '333333333333', 'name': 'locked', 'role': 'arn:aws:iam::333333333333:role/Denied'},
+])
+
+
+class StubSts:
+    """assume_role that counts calls, hands out numbered keys and denies the 'Denied' role."""
+
+    def __init__(self, duration=timedelta(hours=1), delay=0.0):
+        self.calls = []
+        self.duration = duration
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def assume_role(self, **params):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(params)
+            number = len(self.calls)
+        if params['RoleArn'].endswith('/Denied'):
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'not allowed'}}, 'AssumeRole')
+        return {'Credentials': {
+            'AccessKeyId': f'ASIA{number}',
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': datetime.now(timezone.utc) + self.duration,
+        }}
+
+
+@pytest.fixture
+def sts():
+    return StubSts()
+
+
+@pytest.fixture
+def broker(sts):
+    broker = CredentialBroker(lambda: sts, load_accounts(ACCOUNTS), 'us-east-1')
+    yield broker
+    broker.stop()
+
+
+def test_load_accounts_builds_role_arns():
+    accounts = {account['name']: account for account in load_accounts(ACCOUNTS)}
+    assert accounts['prod']['role_arn'] == 'arn:aws:iam::111111111111:role/GatewayReadOnly'
+    assert accounts['staging']['role_arn'].startswith('arn:aws:iam::222222222222:role/')
+    assert accounts['locked']['role_arn'] == 'arn:aws:iam::333333333333:role/Denied'
+
+
+def test_concurrent_first_use_assumes_the_role_once(sts, broker):
+    sts.delay = 0.05
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(broker.client('prod', 's3'))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(sts.calls) == 1
+    assert len({id(client) for client in clients}) == 1
+    assert broker.client('111111111111', 's3') is clients[0]
+
+
+def test_map_runs_every_account_and_reports_failures(sts, broker):
+    results, errors, timings = broker.map('s3', lambda client, account: account['id'])
+    assert results == {'prod': '111111111111', 'staging': '222222222222'}
+    assert set(errors) == {'locked'} and 'not allowed' in errors['locked']
+    assert set(timings) == {'prod', 'staging', 'locked'}
+    assert broker.status()['accounts']['locked']['error']
+
+
+def test_refresh_renews_sessions(sts, broker):
+    broker.session('prod')
+    status = broker.refresh('prod')
+    assert status['accounts']['prod']['refreshes'] == 2
+    assert len(sts.calls) == 2
+
+
+def test_credentials_near_expiry_are_renewed_on_use(sts, broker):
+    # Inside botocore's mandatory refresh window, so the next use fetches new keys
+    sts.duration = timedelta(minutes=5)
+    session = broker.session('staging')
+    sts.duration = timedelta(hours=1)
+    assert session.get_credentials().get_frozen_credentials().access_key == 'ASIA2'
+    assert len(sts.calls) == 2
@@ -0,0 +1,7 @@
+def test_list_objects_streams_every_page(aws, gateway, monkeypatch):
+    monkeypatch.setattr(aws, 'list_page_size', 7)
+    response = gateway.app.test_client().get('/s3/list_objects?bucket_name=photos')
+    body = response.get_json()
+    assert response.status_code == 200 and body['bucket_name'] == 'photos'
+    assert [obj['key'] for obj in body['objects']] == [f'obj-{i}' for i in range(20)]
+    assert aws.calls['ListObjectsV2'] == 3
@@ -0,0 +1,132 @@
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from coalesce import CoalesceTimeout, SingleFlight, CoalescingClient, coalesced
+
+
+class StubS3:
+    """list_buckets that blocks until released and answers with its own account id."""
+
+    def __init__(self, account):
+        self.account = account
+        self.calls = 0
+        self.release = threading.Event()
+        self.meta = SimpleNamespace(service_model=SimpleNamespace(service_name='s3'),
+                                    region_name='us-east-1', endpoint_url=None)
+
+    def list_buckets(self):
+        self.calls += 1
+        self.release.wait(5)
+        return {'Owner': self.account}
+
+
+def _concurrently(*calls):
+    results = [None] * len(calls)
+
+    def run(i, call):
+        results[i] = call()
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_same_scope_shares_and_other_scopes_do_not():
+    flight = SingleFlight()
+    prod, staging = StubS3('prod'), StubS3('staging')
+    operations = {'list_buckets': 5}
+    clients = [CoalescingClient(prod, flight, operations, scope='111111111111'),
+               CoalescingClient(prod, flight, operations, scope='111111111111'),
+               CoalescingClient(staging, flight, operations, scope='222222222222')]
+    threads, results = _concurrently(*(client.list_buckets for client in clients))
+    time.sleep(0.1)
+    prod.release.set()
+    staging.release.set()
+    for thread in threads:
+        thread.join()
+    assert [r['Owner'] for r in results] == ['prod', 'prod', 'staging']
+    assert prod.calls == 1 and staging.calls == 1
+
+
+def test_coalesced_requires_a_scope():
+    with pytest.raises(ValueError):
+        coalesced(StubS3('prod'), scope=None)
+    assert isinstance(coalesced(StubS3('prod'), scope='AKIAEXAMPLE'), CoalescingClient)
+
+
+class StubCloudWatch:
+    """get_metric_data that blocks until released and echoes the window it was asked for."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.meta = SimpleNamespace(service_model=SimpleNamespace(service_name='cloudwatch'),
+                                    region_name='us-east-1', endpoint_url=None)
+
+    def get_metric_data(self, StartTime, EndTime, MetricDataQueries):
+        self.calls.append((StartTime, EndTime))
+        self.release.wait(5)
+        return {'Window': (StartTime, EndTime)}
+
+
+def _at(minute, second):
+    return datetime(2024, 5, 1, 12, minute, second, tzinfo=timezone.utc)
+
+
+def test_callers_share_only_calls_with_the_same_aligned_window():
+    cloudwatch = StubCloudWatch()
+    client = CoalescingClient(cloudwatch, SingleFlight(), {'get_metric_data': 5}, scope='111111111111')
+
+    def query(end):
+        return lambda: client.get_metric_data(StartTime=_at(0, end.second), EndTime=end, MetricDataQueries=[])
+    threads, results = _concurrently(query(_at(30, 5)), query(_at(30, 50)), query(_at(31, 5)))
+    time.sleep(0.1)
+    cloudwatch.release.set()
+    for thread in threads:
+        thread.join()
+    assert len(cloudwatch.calls) == 2
+    # Every caller gets the response to exactly the request that was sent
+    assert [r['Window'] for r in results] == [(_at(0, 0), _at(30, 0))] * 2 + [(_at(0, 0), _at(31, 0))]
+
+
+def test_errors_reach_every_follower():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise RuntimeError('Throttling')
+    errors = []
+
+    def call():
+        try:
+            flight.do(('cloudwatch', 'get_metric_data'), fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+    threads, _ = _concurrently(call, call, call)
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ['Throttling'] * 3
+    stats = flight.stats()['operations']['cloudwatch']
+    assert (stats['upstream'], stats['saved'], stats['errors']) == (1, 2, 1)
+
+
+def test_followers_time_out_without_cancelling_the_leader():
+    flight = SingleFlight()
+    release = threading.Event()
+    threads, results = _concurrently(lambda: flight.do('slow', lambda: release.wait(5) and 'done'))
+    time.sleep(0.05)
+    with pytest.raises(CoalesceTimeout):
+        flight.do('slow', lambda: 'unused', timeout=0.05)
+    release.set()
+    threads[0].join()
+    assert results == ['done']
+    stats = flight.stats()
+    assert (stats['calls'], stats['upstream_calls'], stats['calls_saved'], stats['in_flight']) == (2, 1, 1, 0)
+    assert stats['operations']['slow']['timeouts'] == 1 and stats['saved_ratio'] == 0.5
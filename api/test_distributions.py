@@ -0,0 +1,61 @@
+import pytest
+
+from distributions import DistributionCatalog, apply_update, build_distribution_config
+
+ORIGIN = {'id': 'site', 'domain': 'site.s3.amazonaws.com', 'type': 's3'}
+
+
+def test_behaviors_need_a_path_pattern():
+    with pytest.raises(ValueError, match='path_pattern'):
+        build_distribution_config([ORIGIN], preset='static_site', behaviors=[{'compress': True}])
+
+
+def test_behaviors_inherit_the_default_and_keep_their_path():
+    config = build_distribution_config([ORIGIN], preset='static_site',
+                                       behaviors=[{'path_pattern': '/api/*', 'allowed_methods': 'all'}])
+    behavior = config['CacheBehaviors']['Items'][0]
+    assert behavior['PathPattern'] == '/api/*'
+    assert behavior['TargetOriginId'] == 'site'
+    assert len(behavior['AllowedMethods']['Items']) == 7
+
+
+def test_partial_update_merges_by_path_pattern():
+    config = build_distribution_config([ORIGIN], preset='static_site',
+                                       behaviors=[{'path_pattern': '/a/*'}, {'path_pattern': '/b/*'}])
+    updated = apply_update(config, behaviors=[{'path_pattern': '/a/*', 'remove': True},
+                                              {'path_pattern': '/c/*'}])
+    assert [b['PathPattern'] for b in updated['CacheBehaviors']['Items']] == ['/b/*', '/c/*']
+
+
+def test_create_route_rejects_a_behavior_without_path(gateway):
+    response = gateway.app.test_client().post('/cloudfront/distributions', json={
+        'origins': [ORIGIN], 'behaviors': [{'compress': True}]})
+    assert response.status_code == 400
+    assert 'path_pattern' in response.get_json()['error']
+
+
+def test_distribution_list_answers_304_until_a_distribution_changes(aws, gateway, monkeypatch):
+    monkeypatch.setattr(gateway, 'distribution_catalog', DistributionCatalog(lambda: gateway.get_aws_client('cloudfront')))
+    client = gateway.app.test_client()
+
+    first = client.get('/cloudfront/list_distributions')
+    assert first.status_code == 200 and first.get_json()['count'] == aws.scale
+    etag = first.headers['ETag']
+    cached = client.get('/cloudfront/list_distributions', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    assert aws.calls['ListDistributions'] == 1
+
+    # The same list fetched again keeps its ETag
+    assert client.get('/cloudfront/list_distributions?refresh=1', headers={'If-None-Match': etag}).status_code == 304
+
+    listing = aws.op_ListDistributions
+
+    def one_in_progress(params):
+        response = listing(params)
+        response['DistributionList']['Items'][3]['Status'] = 'InProgress'
+        return response
+    monkeypatch.setattr(aws, 'op_ListDistributions', one_in_progress)
+    changed = client.get('/cloudfront/list_distributions?refresh=1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert changed.get_json()['distributions'][3]['Status'] == 'InProgress'
+    assert aws.calls['ListDistributions'] == 3
@@ -0,0 +1,53 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from stubs import object_bytes
+
+MiB = 1024 * 1024
+
+
+@pytest.fixture
+def client(gateway):
+    return gateway.app.test_client()
+
+
+def test_range_requests_are_passed_through(aws, client):
+    response = client.get('/s3/download?bucket_name=media&key=video.mp4', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 100-199/{aws.object_size}'
+    assert response.data == object_bytes(100, 199)
+    assert aws.calls.get('HeadObject', 0) == 0 and aws.calls['GetObject'] == 1
+
+
+def test_large_objects_are_fetched_as_parallel_ranges_in_order(aws, client, gateway, monkeypatch):
+    monkeypatch.setattr(gateway, 'PARALLEL_THRESHOLD', 2 * MiB)
+    monkeypatch.setattr(aws, 'object_size', 3 * MiB + 5)
+    response = client.get(f'/s3/download?bucket_name=media&key=big.bin&part_size={MiB}')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename="big.bin"'
+    assert response.data == object_bytes(0, 3 * MiB + 4)
+    assert aws.calls['HeadObject'] == 1 and aws.calls['GetObject'] == 4
+
+
+def test_parallel_can_be_turned_off(aws, client, gateway, monkeypatch):
+    monkeypatch.setattr(gateway, 'PARALLEL_THRESHOLD', 1)
+    response = client.get('/s3/download?bucket_name=media&key=small.txt&parallel=0')
+    assert response.status_code == 200 and len(response.data) == aws.object_size
+    assert aws.calls.get('HeadObject', 0) == 0 and aws.calls['GetObject'] == 1
+
+
+def test_redirect_mode_hands_out_a_presigned_url(aws, client):
+    response = client.get('/s3/download?bucket_name=media&key=reports/q1.pdf&mode=redirect&expires=60')
+    assert response.status_code == 302
+    url = urlsplit(response.headers['Location'])
+    query = parse_qs(url.query)
+    assert url.path.endswith('/reports/q1.pdf')
+    assert query['response-content-disposition'] == ['attachment; filename="q1.pdf"']
+    assert aws.total_calls() == 0
+
+
+def test_missing_objects_and_bad_arguments(client):
+    assert client.get('/s3/download?bucket_name=media&key=missing.bin').status_code == 404
+    assert client.get('/s3/download?bucket_name=media&key=a&expires=0').status_code == 400
+    assert client.get('/s3/download?bucket_name=media&key=a&part_size=1024').status_code == 400
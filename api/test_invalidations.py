@@ -0,0 +1,70 @@
+import threading
+
+import invalidations
+from invalidations import InvalidationManager, coalesce_paths, normalize_path
+
+
+def test_normalize_path_roots_cleans_and_encodes():
+    assert normalize_path('docs/../img/a b.png') == '/img/a%20b.png'
+    assert normalize_path('\\reports\\ü.pdf') == '/reports/%C3%BC.pdf'
+    assert normalize_path('/assets/*') == '/assets/*'
+    assert normalize_path('blog/') == '/blog/'
+    assert normalize_path('~user/page') == '/~user/page'
+
+
+def test_dense_directories_become_wildcards():
+    paths = [f'img/{n}.png' for n in range(5)] + ['css/site.css', 'index.html']
+    assert coalesce_paths(paths, wildcard_threshold=5) == ['/img/*', '/', '/css/site.css', '/index.html']
+
+
+def test_paths_under_a_wildcard_are_dropped():
+    assert coalesce_paths(['/img/*', 'img/a.png', 'img/deep/b.png', 'about.html']) == ['/img/*', '/about.html']
+
+
+def test_over_the_path_limit_the_biggest_directory_collapses():
+    paths = [f'a/{n}' for n in range(3)] + [f'b/{n}' for n in range(2)]
+    assert coalesce_paths(paths, wildcard_threshold=100, max_paths=4) == ['/a/*', '/b/0', '/b/1']
+    assert coalesce_paths(['x', 'y', 'z'], wildcard_threshold=100, max_paths=2) == ['/*']
+
+
+def test_no_wildcards_left_means_no_collapsing():
+    paths = [f'img/{n}.png' for n in range(5)]
+    assert coalesce_paths(paths, wildcard_threshold=5, max_wildcards=0) == sorted(f'/img/{n}.png' for n in range(5))
+
+
+class StubCloudFront:
+    """create_invalidation answers InProgress; waiters block until the test releases them."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def create_invalidation(self, DistributionId, InvalidationBatch):
+        self.batches.append(InvalidationBatch['Paths']['Items'])
+        return {'Invalidation': {'Id': f'I{len(self.batches)}', 'Status': 'InProgress'}}
+
+    def get_waiter(self, name):
+        release = self.release
+
+        class Waiter:
+            def wait(self, **kwargs):
+                release.wait(5)
+        return Waiter()
+
+
+def test_paths_beyond_in_flight_capacity_wait_for_a_completion(monkeypatch):
+    monkeypatch.setattr(invalidations, 'MAX_FILE_PATHS_IN_FLIGHT', 3)
+    cloudfront = StubCloudFront()
+    manager = InvalidationManager(lambda: cloudfront, flush_delay=0)
+
+    manager.submit('E1', ['a.html', 'b.html'])
+    manager.submit('E1', ['c.html', 'd.html'])
+    status = manager.status('E1')
+    assert cloudfront.batches == [['/a.html', '/b.html'], ['/c.html']]
+    assert status['pending'] == ['/d.html'] and status['capacity']['file_paths'] == 0
+
+    # A completed invalidation frees room and the waiter flushes what was left
+    cloudfront.release.set()
+    manager._waiters.shutdown(wait=True)
+    assert cloudfront.batches[-1] == ['/d.html']
+    assert manager.status('E1')['pending'] == []
@@ -0,0 +1,118 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from inventory import Delta, InventoryService, InventoryStore, PartialSnapshot, make_resource, resource_key
+
+
+def _instance(id, region='us-east-1', state='running', **tags):
+    return make_resource('aws', 'ec2_instance', id, name=tags.get('Name', ''), region=region, state=state, tags=tags)
+
+
+class StubProvider:
+    """Full snapshots from a dict the test edits; changes(since) reports the ids marked changed."""
+
+    def __init__(self, *resources):
+        self.resources = {r['id']: r for r in resources}
+        self.changed = set()
+        self.full_calls = 0
+        self.change_calls = []
+
+    def fetch(self):
+        self.full_calls += 1
+        return list(self.resources.values())
+
+    def changes(self, since):
+        self.change_calls.append(since)
+        upserts = [self.resources[i] for i in self.changed if i in self.resources]
+        removed = {resource_key('aws', 'ec2_instance', i) for i in self.changed if i not in self.resources}
+        self.changed = set()
+        return Delta(upserts, removed)
+
+
+def test_sync_touches_only_what_changed():
+    store = InventoryStore()
+    assert store.sync('ec2', [_instance('i-1'), _instance('i-2')]) == (2, 0, 0)
+    assert store.sync('ec2', [_instance('i-1'), _instance('i-2', state='stopped')]) == (0, 1, 0)
+    assert store.sync('ec2', [_instance('i-2', state='stopped')]) == (0, 0, 1)
+    assert [r['id'] for r in store.query(filters={'state': 'stopped'})['items']] == ['i-2']
+
+
+def test_empty_index_values_are_pruned():
+    store = InventoryStore()
+    store.sync('ec2', [_instance('i-1', state='pending')])
+    store.sync('ec2', [_instance('i-1', state='running')])
+    store.sync('ec2', [])
+    assert store._index['state'] == {} and store._index['region'] == {}
+    assert 'ec2' not in store._by_source
+
+
+def test_partial_snapshot_keeps_unreadable_regions():
+    store = InventoryStore()
+    store.sync('ec2', [_instance('i-1'), _instance('i-2', region='eu-west-1')])
+    snapshot = PartialSnapshot([_instance('i-1')], lambda r: r['region'] == 'eu-west-1', {'eu-west-1': 'timed out'})
+    assert store.sync('ec2', snapshot, retain=snapshot.retain) == (0, 0, 0)
+    assert len(store) == 2
+
+
+def test_incremental_provider_applies_deltas_between_full_syncs():
+    provider = StubProvider(_instance('i-1'), _instance('i-2'))
+    service = InventoryService()
+    service.register('ec2', provider.fetch, changes=provider.changes, full_every=3)
+
+    assert service.refresh('ec2')['mode'] == 'full'
+    provider.resources['i-3'] = _instance('i-3', Name='web')
+    del provider.resources['i-1']
+    provider.changed = {'i-1', 'i-3'}
+    status = service.refresh('ec2')
+    assert (status['mode'], status['added'], status['removed']) == ('incremental', 1, 1)
+    assert sorted(r['id'] for r in service.store.records()) == ['i-2', 'i-3']
+
+    # A change the feed never reported is picked up by the periodic full sync
+    provider.resources['i-2'] = _instance('i-2', state='stopped')
+    assert service.refresh('ec2')['updated'] == 0
+    status = service.refresh('ec2')
+    assert (status['mode'], status['updated']) == ('full', 1)
+    assert provider.full_calls == 2 and len(provider.change_calls) == 2
+
+
+def test_failed_change_feed_falls_back_to_a_full_snapshot():
+    provider = StubProvider(_instance('i-1'))
+
+    def broken(since):
+        raise RuntimeError('AccessDenied')
+    service = InventoryService()
+    service.register('ec2', provider.fetch, changes=broken)
+    service.refresh('ec2')
+    status = service.refresh('ec2')
+    assert status['mode'] == 'full' and status['last_error'] is None
+    assert provider.full_calls == 2
+
+
+def test_query_filters_sorts_and_paginates():
+    store = InventoryStore()
+    store.sync('ec2', [_instance(f'i-{n}', region='us-east-1' if n % 2 else 'eu-west-1', Name=f'web-{n}')
+                       for n in range(1, 8)])
+    result = store.query(filters={'region': 'us-east-1'}, sort='name', descending=True, page=2, page_size=2)
+    assert result['total'] == 4
+    assert [r['name'] for r in result['items']] == ['web-3', 'web-1']
+    assert store.query(tag=('Name', 'web-6'))['items'][0]['id'] == 'i-6'
+
+
+def test_concurrent_refreshes_of_a_provider_share_one_sync():
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return [_instance('i-1')]
+    service = InventoryService()
+    service.register('ec2', fetch)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        pending = [pool.submit(service.refresh, 'ec2') for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        statuses = [f.result() for f in pending]
+    assert len(calls) == 1
+    assert all(status['count'] == 1 and status['last_error'] is None for status in statuses)
@@ -0,0 +1,125 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from logs import Budget, CursorStore, insights_query, new_cursor, tail
+
+
+def _events(stream):
+    """Decode an SSE byte stream into (event, data) pairs, skipping keepalives."""
+    decoded = []
+    for message in b''.join(stream).decode('utf-8').split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.split('\n') if line and not line.startswith(':'))
+        if fields:
+            decoded.append((fields['event'], json.loads(fields['data'])))
+    return decoded
+
+
+class StubInsights:
+    """get_query_results returns each canned snapshot in turn; the last one is Complete."""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.polls = 0
+        self.stopped = []
+
+    def start_query(self, **params):
+        return {'queryId': 'q-1'}
+
+    def get_query_results(self, queryId):
+        snapshot = self.snapshots[min(self.polls, len(self.snapshots) - 1)]
+        self.polls += 1
+        status = 'Complete' if self.polls >= len(self.snapshots) else 'Running'
+        return {'status': status, 'results': [[{'field': '@message', 'value': str(row)},
+                                               {'field': '@ptr', 'value': f'ptr-{row}'}] for row in snapshot]}
+
+    def stop_query(self, queryId):
+        self.stopped.append(queryId)
+
+
+def _run_insights(client, budget=None):
+    now = datetime.now(timezone.utc)
+    return _events(insights_query(client, ['/app'], 'fields @message', now - timedelta(hours=1), now,
+                                  budget or Budget(), sleep=lambda seconds: None))
+
+
+def test_insights_sends_resorted_partial_rows_once():
+    # Partial results arrive sorted by @timestamp desc, so new rows land anywhere in the list
+    events = _run_insights(StubInsights([[3, 1], [5, 3, 2, 1], [5, 4, 3, 2, 1]]))
+    sent = [row['@message'] for event, data in events if event == 'rows' for row in data['rows']]
+    assert sorted(sent) == ['1', '2', '3', '4', '5']
+    assert events[-1][0] == 'end' and events[-1][1]['reason'] == 'complete'
+
+
+def test_insights_stops_the_query_at_the_row_limit():
+    client = StubInsights([list(range(5)), list(range(20)), list(range(30))])
+    events = _run_insights(client, Budget(max_rows=8))
+    assert sum(len(data['rows']) for event, data in events if event == 'rows') == 8
+    assert events[-1][1]['reason'] == 'limit'
+    assert client.stopped == ['q-1']
+
+
+class StubLogs:
+    """filter_log_events over a list of events, filtered by startTime, one page per call."""
+
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    def filter_log_events(self, **params):
+        self.calls.append(params)
+        matching = [event for event in sorted(self.events, key=lambda e: e['timestamp'])
+                    if event['timestamp'] >= params['startTime']]
+        return {'events': matching[:params['limit']]}
+
+
+def _event(event_id, timestamp):
+    return {'eventId': event_id, 'timestamp': timestamp, 'logStreamName': 'web', 'message': f'line {event_id}'}
+
+
+def _tail(client, cursor, max_rows=100):
+    saved = []
+    events = _events(tail(client, cursor, Budget(max_rows=max_rows), saved.append, max_seconds=0,
+                          sleep=lambda seconds: None))
+    return [row['id'] for event, data in events if event == 'events' for row in data['events']], saved[-1]
+
+
+def test_tail_delivers_late_ingested_events_once():
+    start = 1_000_000
+    client = StubLogs([_event('a', start + 1000), _event('b', start + 5000)])
+    sent, cursor = _tail(client, new_cursor('/app', start_time=start))
+    assert sent == ['a', 'b']
+    # Ingested after the first poll but timestamped before the newest event sent
+    client.events.append(_event('late', start + 3000))
+    sent, cursor = _tail(client, cursor)
+    assert sent == ['late']
+    sent, cursor = _tail(client, cursor)
+    assert sent == []
+
+
+def test_tail_resumes_after_the_row_limit_without_repeats():
+    start = 1_000_000
+    client = StubLogs([_event(str(i), start + i) for i in range(10)])
+    first, cursor = _tail(client, new_cursor('/app', start_time=start), max_rows=4)
+    rest, cursor = _tail(client, cursor)
+    assert first + rest == [str(i) for i in range(10)]
+
+
+def test_cursor_store_expires_and_caps_cursors(tmp_path):
+    store = CursorStore(str(tmp_path / 'cursors.db'), ttl=60, max_cursors=3)
+    for i in range(5):
+        store.put(f'c{i}', new_cursor('/app'))
+    assert len(store) == 3 and store.get('c0') is None and store.get('c4') is not None
+    store._cursors['c4']['updated_at'] = time.time() - 120
+    assert store.get('c4') is None
+    reloaded = CursorStore(str(tmp_path / 'cursors.db'), ttl=60, max_cursors=3)
+    assert sorted(reloaded._cursors) == ['c2', 'c3']
+
+
+def test_log_groups_route_pages_by_prefix(aws, gateway):
+    client = gateway.app.test_client()
+    first = client.get('/cloudwatch/logs/groups').get_json()
+    assert len(first['groups']) == 20 and first['nextToken'] is None
+    assert first['groups'][0] == {'name': '/aws/lambda/fn-0', 'storedBytes': 0, 'retentionInDays': 30}
+    matched = client.get('/cloudwatch/logs/groups?prefix=/aws/lambda/fn-1').get_json()
+    assert [g['name'] for g in matched['groups']] == ['/aws/lambda/fn-1'] + [f'/aws/lambda/fn-1{i}' for i in range(10)]
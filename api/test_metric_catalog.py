@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from metric_catalog import (RESOURCE_METRICS, MetricCatalog, ResourceMetrics, build_queries, pack_batches,
+                            run_batches)
+
+SPEC = RESOURCE_METRICS['ec2']
+
+
+class StubCloudWatch:
+    """list_metrics over count instances; get_metric_data sleeps, then answers in two pages."""
+
+    def __init__(self, count, delay=0.0):
+        self.count = count
+        self.delay = delay
+        self.threads = set()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def list_metrics(self, **params):
+        return {'Metrics': [{'Dimensions': [{'Name': 'InstanceId', 'Value': f'i-{n}'}]} for n in range(self.count)]}
+
+    def get_metric_data(self, MetricDataQueries, StartTime, EndTime, NextToken=None):
+        with self._lock:
+            self.calls += 1
+            self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        returned = [q for q in MetricDataQueries if q.get('ReturnData', True)]
+        page = 1 if NextToken is None else 2
+        response = {'MetricDataResults': [{'Id': q['Id'], 'Label': q['Label'], 'Timestamps': [page],
+                                           'Values': [float(page)]} for q in returned]}
+        if page == 1:
+            response['NextToken'] = 'page-2'
+        return response
+
+
+def _window():
+    end = datetime.now(timezone.utc)
+    return end - timedelta(hours=1), end
+
+
+def test_pages_are_joined_per_series():
+    client = StubCloudWatch(3)
+    queries, _ = build_queries(SPEC, MetricCatalog(lambda region: client)._list('us-east-1', SPEC))
+    results = run_batches(client, pack_batches(queries), *_window())
+    assert [r['Label'] for r in results] == ['i-0', 'i-1', 'i-2']
+    assert all(r['Values'] == [1.0, 2.0] for r in results)
+
+
+def test_single_batch_runs_on_the_callers_thread():
+    client = StubCloudWatch(3)
+    queries, _ = build_queries(SPEC, MetricCatalog(lambda region: client)._list('us-east-1', SPEC))
+    run_batches(client, pack_batches(queries), *_window())
+    assert client.threads == {threading.get_ident()}
+
+
+def test_batches_are_capped_at_the_call_limit():
+    queries, _ = build_queries(SPEC, [m['Dimensions'] for m in StubCloudWatch(1200).list_metrics()['Metrics']])
+    batches = pack_batches(queries)
+    assert [len(batch) for batch in batches] == [500, 500, 200]
+
+
+def test_concurrent_regions_do_not_queue_behind_each_other():
+    # 12 regions x 3 batches x 2 pages, 0.1s per call: ~0.2s when every region has its own threads
+    clients = {f'region-{n}': StubCloudWatch(1200, delay=0.1) for n in range(12)}
+    metrics = ResourceMetrics(MetricCatalog(clients.get), clients.get, workers=8)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        outcomes = list(pool.map(lambda region: metrics.query('ec2', region, *_window()), clients))
+    assert time.monotonic() - start < 1.0
+    assert all(stats['batches'] == 3 and len(results) == 1200 for results, stats in outcomes)
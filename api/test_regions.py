@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from regions import RegionDirectory, RegionFanout, fan_out, merge
+
+
+def _sleep_then(seconds, value):
+    def call():
+        time.sleep(seconds)
+        return value
+    return call
+
+
+def _raise(message):
+    def call():
+        raise RuntimeError(message)
+    return call
+
+
+def test_failed_and_slow_regions_are_reported_and_the_rest_returned():
+    calls = {'us-east-1': lambda: [{'id': 'a'}], 'eu-west-1': _raise('AuthFailure'),
+             'ap-south-1': _sleep_then(1, [{'id': 'late'}])}
+    results, errors, timings = fan_out(calls, timeout=0.2, label='test-partial')
+    assert results == {'us-east-1': [{'id': 'a'}]}
+    assert errors == {'eu-west-1': 'AuthFailure', 'ap-south-1': 'Timed out after 0.2s'}
+    assert set(timings) == {'us-east-1', 'eu-west-1'}
+
+    items, report = merge(results, errors, timings, list(calls))
+    assert items == [{'id': 'a', 'Region': 'us-east-1'}]
+    assert report['partial'] and report['regions']['ap-south-1']['status'] == 'error'
+    assert report['regions']['us-east-1'] == {'status': 'ok', 'count': 1, 'elapsed_ms': timings['us-east-1']}
+
+
+def test_fan_outs_share_a_bounded_set_of_threads():
+    seen = set()
+    lock = threading.Lock()
+
+    def call():
+        with lock:
+            seen.add(threading.current_thread().name)
+        time.sleep(0.02)
+        return True
+    with ThreadPoolExecutor(max_workers=8) as requests:
+        outcomes = list(requests.map(
+            lambda _: fan_out({f'r{n}': call for n in range(6)}, timeout=5, label='test-shared', workers=4),
+            range(8)))
+    assert all(len(results) == 6 and not errors for results, errors, _ in outcomes)
+    assert len(seen) <= 4
+
+
+def test_calls_that_never_start_are_reported_not_awaited():
+    release = threading.Event()
+    blocker = threading.Thread(target=fan_out, args=({'hung': lambda: release.wait(5)}, 5),
+                               kwargs={'label': 'test-busy', 'workers': 1})
+    blocker.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    results, errors, _ = fan_out({'us-east-1': lambda: 'never'}, timeout=0.1, label='test-busy', workers=1)
+    assert time.monotonic() - started < 1
+    assert results == {} and 'workers are busy' in errors['us-east-1']
+    release.set()
+    blocker.join()
+
+
+def test_region_fanout_uses_configured_regions():
+    directory = RegionDirectory(lambda region: None, 'us-east-1', configured='us-east-1,eu-west-1')
+    fanout = RegionFanout(lambda service, region: f'{service}@{region}', directory, timeout=1)
+    results, errors, _ = fanout.map('ec2', lambda client, region: client)
+    assert results == {'us-east-1': 'ec2@us-east-1', 'eu-west-1': 'ec2@eu-west-1'} and errors == {}
@@ -0,0 +1,72 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import timeseries
+from timeseries import lttb_indices, minmax_indices, series
+
+
+def _walk(n, seed=7):
+    rng = random.Random(seed)
+    x = [i * 60_000 for i in range(n)]
+    y = [0.0]
+    for _ in range(n - 1):
+        y.append(y[-1] + rng.uniform(-1, 1))
+    return x, y
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(timeseries, 'np', None)
+    return request.param
+
+
+@pytest.mark.parametrize('n, n_out', [(100, 10), (2000, 300), (5000, 100)])
+def test_lttb_keeps_both_ends_and_one_point_per_bucket(backend, n, n_out):
+    x, y = _walk(n)
+    kept = lttb_indices(x, y, n_out)
+    assert len(kept) == n_out
+    assert kept[0] == 0 and kept[-1] == n - 1
+    assert kept == sorted(set(kept))
+
+
+@pytest.mark.parametrize('n, n_out', [(100, 10), (2000, 300), (5000, 100), (100_000, 1000)])
+def test_numpy_and_python_paths_pick_the_same_points(monkeypatch, n, n_out):
+    x, y = _walk(n)
+    vectorized = lttb_indices(x, y, n_out)
+    monkeypatch.setattr(timeseries, 'np', None)
+    assert lttb_indices(x, y, n_out) == vectorized
+
+
+def test_lttb_keeps_a_spike(backend):
+    x, y = _walk(10_000)
+    y[4321] = 1e6
+    assert 4321 in lttb_indices(x, y, 200)
+
+
+def test_short_series_are_returned_whole(backend):
+    x, y = _walk(10)
+    assert lttb_indices(x, y, 10) == list(range(10))
+    assert lttb_indices(x, y, 2) == list(range(10))
+
+
+def test_minmax_keeps_every_buckets_extremes(backend):
+    x, y = _walk(1000)
+    y[10], y[990] = 1e6, -1e6
+    kept = minmax_indices(y, 20)
+    assert 10 in kept and 990 in kept
+    assert len(kept) <= 20 and kept == sorted(kept)
+
+
+def test_series_orders_newest_first_data_and_downsamples():
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    timestamps = [start + timedelta(minutes=n) for n in range(500)]
+    values = [math.sin(n / 10) for n in range(500)]
+    result = series(timestamps[::-1], values[::-1], max_points=50)
+    assert result['RawPoints'] == 500 and len(result['Timestamps']) == 50
+    assert result['Timestamps'][0] == round(start.timestamp() * 1000)
+    assert result['Timestamps'] == sorted(result['Timestamps'])
+    assert result['Values'][0] == values[0] and result['Values'][-1] == values[-1]
@@ -0,0 +1,101 @@
+import pytest
+import requests
+
+import uploads
+from stubs import LocalS3
+
+BUCKET = 'uploads'
+MiB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """The gateway talking to a LocalS3 server over real HTTP."""
+    with LocalS3() as server:
+        server.buckets.add(BUCKET)
+        monkeypatch.setenv('AWS_S3_ENDPOINT_URL', server.endpoint)
+        monkeypatch.setattr(uploads, 'MULTIPART_THRESHOLD', 5 * MiB)
+        monkeypatch.setattr(uploads, '_cors_checked', {})
+        yield server
+
+
+@pytest.fixture
+def client(s3):
+    import app
+    return app.app.test_client()
+
+
+def _presign(client, key, size, **headers):
+    response = client.post('/s3/presign_upload', headers=headers,
+                           json={'bucket_name': BUCKET, 'key': key, 'size': size, 'part_size': 5 * MiB})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _put_parts(plan, data):
+    parts = []
+    for part in plan['parts']:
+        response = requests.put(part['url'], data=data[part['start']:part['end'] + 1])
+        response.raise_for_status()
+        parts.append({'PartNumber': part['part_number'], 'ETag': response.headers['ETag']})
+    return parts
+
+
+def test_presigned_multipart_upload_round_trip(s3, client):
+    data = bytes(range(256)) * (11 * MiB // 256)
+    plan = _presign(client, 'big.bin', len(data))
+    assert plan['method'] == 'multipart' and len(plan['parts']) == 3
+    parts = _put_parts(plan, data)
+
+    done = client.post('/s3/complete_multipart', json={'bucket_name': BUCKET, 'key': 'big.bin',
+                                                       'upload_id': plan['upload_id'], 'parts': parts})
+    assert done.status_code == 200, done.get_json()
+    assert s3.objects[(BUCKET, 'big.bin')] == data
+    assert s3.uploads == {}
+
+
+def test_complete_without_etags_uses_the_uploaded_parts(s3, client):
+    data = b'x' * (6 * MiB)
+    plan = _presign(client, 'no-etags.bin', len(data))
+    _put_parts(plan, data)
+    done = client.post('/s3/complete_multipart', json={'bucket_name': BUCKET, 'key': 'no-etags.bin',
+                                                       'upload_id': plan['upload_id']})
+    assert done.status_code == 200, done.get_json()
+    assert s3.objects[(BUCKET, 'no-etags.bin')] == data
+
+
+def test_abort_discards_uploaded_parts(s3, client):
+    plan = _presign(client, 'aborted.bin', 6 * MiB)
+    requests.put(plan['parts'][0]['url'], data=b'x' * (5 * MiB)).raise_for_status()
+    assert s3.uploads[plan['upload_id']]['parts']
+
+    aborted = client.post('/s3/abort_multipart', json={'bucket_name': BUCKET, 'key': 'aborted.bin',
+                                                       'upload_id': plan['upload_id']})
+    assert aborted.status_code == 200, aborted.get_json()
+    assert s3.uploads == {} and (BUCKET, 'aborted.bin') not in s3.objects
+
+
+def test_small_objects_get_a_single_put(s3, client):
+    plan = _presign(client, 'small.txt', 5)
+    assert plan['method'] == 'single'
+    requests.put(plan['url'], data=b'hello').raise_for_status()
+    assert s3.objects[(BUCKET, 'small.txt')] == b'hello'
+
+
+def test_missing_cors_rule_is_reported_not_added(s3, client):
+    plan = _presign(client, 'small.txt', 5, Origin='https://app.example.com')
+    assert plan['method'] == 'proxy'
+    assert 'https://app.example.com' in plan['cors']
+    assert BUCKET not in s3.cors
+
+
+def test_autoconfigure_only_adds_allowed_origins_to_one_rule(s3, client, monkeypatch):
+    monkeypatch.setattr(uploads, 'UPLOAD_CORS_AUTOCONFIGURE', True)
+    monkeypatch.setattr(uploads, 'UPLOAD_CORS_ORIGINS', frozenset({'https://a.example.com', 'https://b.example.com'}))
+
+    assert _presign(client, 'small.txt', 5, Origin='https://evil.example.com')['method'] == 'proxy'
+    assert BUCKET not in s3.cors
+    for origin in ('https://a.example.com', 'https://b.example.com', 'https://a.example.com'):
+        assert _presign(client, 'small.txt', 5, Origin=origin)['method'] == 'single'
+    assert s3.cors[BUCKET].count('<CORSRule>') == 1
+    assert 'https://a.example.com' in s3.cors[BUCKET] and 'https://b.example.com' in s3.cors[BUCKET]
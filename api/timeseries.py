@@ -0,0 +1,256 @@
+import json
+import math
+import os
+
+from flask import Response
+
+from responses import dumps
+
+# numpy vectorizes min/max bucketing and LTTB's triangle areas; the pure-Python
+# paths give identical picks
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Optional binary encodings - only offered when the package is installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+# Applied when a request doesn't pass max_points; 0 returns every datapoint
+DEFAULT_MAX_POINTS = int(os.getenv('METRICS_MAX_POINTS', '0'))
+MIN_POINTS = 3
+# Series longer than this many times max_points get min/max preselection before LTTB
+MINMAX_PRESELECT_RATIO = 8
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+FORMATS = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# ---------------------------- Downsampling ---------------------------- #
+
+def _bucket_edges(n, n_out):
+    """Boundaries of the n_out - 2 buckets that split the points between the first and last."""
+    step = (n - 2) / (n_out - 2)
+    return [1 + int(i * step) for i in range(n_out - 2)] + [n - 1]
+
+def _lttb(x, y, n_out):
+    edges = _bucket_edges(len(x), n_out)
+    kept = [0]
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else len(x)
+        avg_x = sum(x[end:next_end]) / (next_end - end)
+        avg_y = sum(y[end:next_end]) / (next_end - end)
+        x_a, y_a = x[a], y[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((x_a - avg_x) * (y[j] - y_a) - (x_a - x[j]) * (avg_y - y_a))
+            if area > best_area:
+                best, best_area = j, area
+        a = best
+        kept.append(a)
+    kept.append(len(x) - 1)
+    return kept
+
+def _lttb_numpy(x, y, n_out):
+    """_lttb with every triangle area computed up front.
+
+    Only the previously kept point ties one bucket to the next, and it is
+    one of the previous bucket's points, so the areas for every (previous
+    candidate, candidate) pair are scored in one pass and the walk is left
+    with a table lookup per bucket.
+    """
+    n = len(x)
+    edges = _bucket_edges(n, n_out)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    starts = np.asarray(edges[:-1])
+    sizes = np.diff(edges)
+    # Average of the bucket after each bucket; the last one is the final point
+    after = np.asarray(edges[1:])
+    counts = np.diff(np.append(after, n))
+    avg_x = (np.add.reduceat(x, after) / counts)[:, None, None]
+    avg_y = (np.add.reduceat(y, after) / counts)[:, None, None]
+
+    columns = np.arange(sizes.max())
+    valid = columns < sizes[:, None]
+    points = np.where(valid, starts[:, None] + columns, starts[:, None])
+    bx, by = x[points], y[points]
+    # Candidates for the previously kept point: the first point, then the previous bucket's
+    ax = np.vstack([np.full((1, len(columns)), x[0]), bx[:-1]])[:, :, None]
+    ay = np.vstack([np.full((1, len(columns)), y[0]), by[:-1]])[:, :, None]
+    # Same expression as _lttb, evaluated in place to keep it to two (buckets, width, width) arrays
+    area = by[:, None, :] - ay
+    area *= ax - avg_x
+    base = ax - bx[:, None, :]
+    base *= avg_y - ay
+    area -= base
+    np.abs(area, out=area)
+    area[~np.broadcast_to(valid[:, None, :], area.shape)] = -1.0
+    best = area.argmax(axis=2).tolist()
+
+    kept = [0]
+    column = 0
+    for start, row in zip(edges, best):
+        column = row[column]
+        kept.append(start + column)
+    kept.append(n - 1)
+    return kept
+
+def lttb_indices(x, y, n_out):
+    """Indices kept by Largest-Triangle-Three-Buckets, always including both ends.
+
+    Each bucket keeps the point forming the largest triangle with the
+    previously kept point and the average of the next bucket, which keeps
+    the visual shape (peaks, dips) of the series at a fraction of the size.
+    With numpy the triangle areas are scored in bulk and only the walk from
+    bucket to bucket stays in Python. Long series are first cut down to each
+    sub-bucket's min and max (MinMaxLTTB), which keeps the same extremes and
+    the buckets narrow.
+    """
+    n = len(x)
+    if n_out >= n or n_out < MIN_POINTS:
+        return list(range(n))
+    if np is None:
+        if n > n_out * MINMAX_PRESELECT_RATIO:
+            candidates = sorted({0, n - 1, *minmax_indices(y, n_out * MINMAX_PRESELECT_RATIO // 2)})
+            picked = _lttb([x[i] for i in candidates], [y[i] for i in candidates], n_out)
+            return [candidates[i] for i in picked]
+        return _lttb(x, y, n_out)
+    # Preselection keeps buckets at most a few MINMAX_PRESELECT_RATIO points wide,
+    # which bounds the (buckets, width, width) area table
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if n > n_out * MINMAX_PRESELECT_RATIO:
+        candidates = np.union1d([0, n - 1], minmax_indices(y, n_out * MINMAX_PRESELECT_RATIO // 2))
+        return candidates[_lttb_numpy(x[candidates], y[candidates], n_out)].tolist()
+    return _lttb_numpy(x, y, n_out)
+
+def minmax_indices(y, n_out):
+    """Indices of each bucket's minimum and maximum, in time order.
+
+    Cheaper than LTTB and never drops a spike, at the cost of two points
+    per bucket (so n_out // 2 buckets).
+    """
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return list(range(n))
+    size = math.ceil(n / buckets)
+    if np is not None:
+        rows = math.ceil(n / size)
+        padded = np.full(rows * size, np.nan)
+        padded[:n] = y
+        padded = padded.reshape(rows, size)
+        offsets = np.arange(rows) * size
+        picks = np.stack([offsets + np.nanargmin(padded, axis=1), offsets + np.nanargmax(padded, axis=1)], axis=1)
+        return np.unique(picks).tolist()
+    kept = []
+    for start in range(0, n, size):
+        bucket = range(start, min(start + size, n))
+        low = min(bucket, key=y.__getitem__)
+        high = max(bucket, key=y.__getitem__)
+        kept.extend(sorted({low, high}))
+    return kept
+
+def series(timestamps, values, max_points=None, method='lttb'):
+    """Columnar, time-ordered series with epoch-millisecond timestamps.
+
+    Returns {'Timestamps': [ms, ...], 'Values': [...], 'RawPoints': n},
+    downsampled to at most max_points when given.
+    """
+    epoch_ms = [round(t.timestamp() * 1000) for t in timestamps]
+    # GetMetricData returns newest first by default
+    if epoch_ms and epoch_ms[0] > epoch_ms[-1]:
+        epoch_ms.reverse()
+        values = values[::-1]
+    elif any(a > b for a, b in zip(epoch_ms, epoch_ms[1:])):
+        order = sorted(range(len(epoch_ms)), key=epoch_ms.__getitem__)
+        epoch_ms = [epoch_ms[i] for i in order]
+        values = [values[i] for i in order]
+    raw_points = len(epoch_ms)
+    if max_points and raw_points > max_points:
+        if method == 'minmax':
+            kept = minmax_indices(values, max_points)
+        else:
+            kept = lttb_indices(epoch_ms, values, max_points)
+        epoch_ms = [epoch_ms[i] for i in kept]
+        values = [values[i] for i in kept]
+    return {'Timestamps': epoch_ms, 'Values': list(values), 'RawPoints': raw_points}
+
+def parse_max_points(value):
+    """max_points query argument -> int or None; raises ValueError when out of range."""
+    if value in (None, ''):
+        return DEFAULT_MAX_POINTS or None
+    max_points = int(value)
+    if max_points == 0:
+        return None
+    if max_points < MIN_POINTS:
+        raise ValueError(f'max_points must be 0 or at least {MIN_POINTS}')
+    return max_points
+
+# ---------------------------- Encoding ---------------------------- #
+
+def available_formats():
+    return [name for name in FORMATS if name == 'json' or
+            (name == 'msgpack' and msgpack is not None) or (name == 'arrow' and pa is not None)]
+
+def negotiate_format(requested, accept):
+    """Pick an output format from ?format= or the Accept header; None if the requested one is unavailable."""
+    formats = available_formats()
+    if requested:
+        return requested if requested in formats else None
+    for name in formats:
+        if name != 'json' and FORMATS[name] in (accept or ''):
+            return name
+    return 'json'
+
+def _arrow_table(payload, groups):
+    """Long-format table (group, label, region, time, value) of every series in groups."""
+    columns = {'group': [], 'label': [], 'region': [], 'time': [], 'value': []}
+    for group in groups:
+        for item in payload.get(group, []):
+            count = len(item['Timestamps'])
+            columns['group'].extend([group] * count)
+            columns['label'].extend([item.get('Label', '')] * count)
+            columns['region'].extend([item.get('Region', '')] * count)
+            columns['time'].extend(item['Timestamps'])
+            columns['value'].extend(item['Values'])
+    metadata = {k: v for k, v in payload.items() if k not in groups}
+    return pa.table({
+        'group': pa.array(columns['group']).dictionary_encode(),
+        'label': pa.array(columns['label']).dictionary_encode(),
+        'region': pa.array(columns['region']).dictionary_encode(),
+        'time': pa.array(columns['time'], type=pa.timestamp('ms', tz='UTC')),
+        'value': pa.array(columns['value'], type=pa.float64()),
+    }, metadata={'payload': json.dumps(metadata, default=str)})
+
+def series_response(payload, fmt, groups):
+    """Encode a metrics payload as JSON, msgpack, or an Arrow IPC stream.
+
+    groups names the payload keys holding series lists; for Arrow they are
+    flattened into one table and the rest of the payload rides along as
+    JSON schema metadata.
+    """
+    if fmt == 'msgpack':
+        return Response(msgpack.packb(payload, default=str), mimetype=FORMATS['msgpack'])
+    if fmt == 'arrow':
+        table = _arrow_table(payload, groups)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(sink.getvalue().to_pybytes(), mimetype=FORMATS['arrow'])
+    return Response(dumps(payload), mimetype=FORMATS['json'])
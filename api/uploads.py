@@ -0,0 +1,155 @@
+import math
+import os
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+# Objects above this size are uploaded in parts
+MULTIPART_THRESHOLD = int(os.getenv('S3_MULTIPART_THRESHOLD', str(16 * 1024 * 1024)))
+DEFAULT_PART_SIZE = int(os.getenv('S3_PART_SIZE', str(16 * 1024 * 1024)))
+PRESIGN_EXPIRES = int(os.getenv('S3_PRESIGN_EXPIRES', '3600'))
+# Gateway-managed CORS rule letting browsers PUT to presigned URLs. Off by default: the gateway
+# then only reports a missing rule. When on, only origins in S3_UPLOAD_CORS_ORIGINS are added.
+UPLOAD_CORS_AUTOCONFIGURE = os.getenv('S3_UPLOAD_CORS_AUTOCONFIGURE', 'false').lower() == 'true'
+UPLOAD_CORS_ORIGINS = frozenset(o.strip() for o in os.getenv('S3_UPLOAD_CORS_ORIGINS', '').split(',') if o.strip())
+UPLOAD_CORS_RULE_ID = 'gateway-presigned-upload'
+# Seconds a successful CORS check is trusted before the bucket is read again
+UPLOAD_CORS_CHECK_TTL = int(os.getenv('S3_UPLOAD_CORS_CHECK_TTL', '300'))
+
+# S3 limits
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+def part_size_for(size, part_size=DEFAULT_PART_SIZE):
+    """Smallest part size >= part_size (and S3's 5 MiB minimum) that fits in 10000 parts."""
+    part_size = max(int(part_size), MIN_PART_SIZE)
+    return max(part_size, math.ceil(size / MAX_PARTS))
+
+
+def plan_parts(size, part_size):
+    """[(part_number, first_byte, last_byte)] covering size bytes."""
+    return [(i + 1, start, min(start + part_size, size) - 1)
+            for i, start in enumerate(range(0, size, part_size))]
+
+
+# (bucket, origin) -> monotonic time until which the bucket is known to allow browser PUTs
+_cors_checked = {}
+_cors_lock = threading.Lock()
+
+
+def _allows_put(rule, origin):
+    origins = rule.get('AllowedOrigins', [])
+    return 'PUT' in rule.get('AllowedMethods', []) and ('*' in origins or origin in origins)
+
+
+def _add_origin(rules, origin):
+    """rules with origin added to the gateway's own rule, created on first use."""
+    for rule in rules:
+        if rule.get('ID') == UPLOAD_CORS_RULE_ID:
+            rule['AllowedOrigins'] = sorted(set(rule.get('AllowedOrigins', [])) | {origin})
+            return rules
+    return rules + [{'ID': UPLOAD_CORS_RULE_ID, 'AllowedOrigins': [origin], 'AllowedMethods': ['PUT'],
+                     'AllowedHeaders': ['*'], 'ExposeHeaders': ['ETag'], 'MaxAgeSeconds': 3600}]
+
+
+def check_upload_cors(s3_client, bucket, origin, autoconfigure=None, allowed_origins=None):
+    """None when the bucket's CORS rules let origin PUT to presigned URLs, else why not.
+
+    Without such a rule the browser blocks the upload before it reaches S3.
+    The bucket is only changed when autoconfigure is on and origin is in
+    allowed_origins; the origin is then added to a single gateway-managed
+    rule so repeated calls never pile up rules.
+    """
+    autoconfigure = UPLOAD_CORS_AUTOCONFIGURE if autoconfigure is None else autoconfigure
+    allowed_origins = UPLOAD_CORS_ORIGINS if allowed_origins is None else allowed_origins
+    with _cors_lock:
+        if _cors_checked.get((bucket, origin), 0) > time.monotonic():
+            return None
+    try:
+        rules = s3_client.get_bucket_cors(Bucket=bucket).get('CORSRules', [])
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NoSuchCORSConfiguration':
+            return f"Could not read the CORS configuration of {bucket}: {e.response['Error']['Code']}"
+        rules = []
+    if not any(_allows_put(rule, origin) for rule in rules):
+        missing = f"Bucket {bucket} has no CORS rule allowing PUT from {origin}"
+        if not autoconfigure or origin not in allowed_origins:
+            return missing
+        try:
+            s3_client.put_bucket_cors(Bucket=bucket, CORSConfiguration={'CORSRules': _add_origin(rules, origin)})
+        except ClientError as e:
+            return f"{missing} and it could not be added: {e.response['Error']['Code']}"
+    with _cors_lock:
+        _cors_checked[(bucket, origin)] = time.monotonic() + UPLOAD_CORS_CHECK_TTL
+    return None
+
+
+def presign_put(s3_client, bucket, key, content_type=None, expires=PRESIGN_EXPIRES):
+    params = {'Bucket': bucket, 'Key': key}
+    if content_type:
+        params['ContentType'] = content_type
+    return s3_client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires, HttpMethod='PUT')
+
+
+def presign_parts(s3_client, bucket, key, upload_id, part_numbers, expires=PRESIGN_EXPIRES):
+    return {
+        number: s3_client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': number},
+            ExpiresIn=expires, HttpMethod='PUT')
+        for number in part_numbers
+    }
+
+
+def start_upload(s3_client, bucket, key, size, content_type=None, part_size=DEFAULT_PART_SIZE,
+                 expires=PRESIGN_EXPIRES):
+    """Describe how a client should upload size bytes straight to S3.
+
+    Small objects get a single presigned PUT. Larger ones get a multipart
+    upload id and one presigned URL per part, each with its byte range, so
+    the client can send parts in parallel and retry them individually.
+    """
+    if size <= MULTIPART_THRESHOLD:
+        return {
+            'method': 'single',
+            'url': presign_put(s3_client, bucket, key, content_type, expires),
+            'headers': {'Content-Type': content_type} if content_type else {},
+            'expires_in': expires,
+        }
+
+    part_size = part_size_for(size, part_size)
+    params = {'Bucket': bucket, 'Key': key}
+    if content_type:
+        params['ContentType'] = content_type
+    upload_id = s3_client.create_multipart_upload(**params)['UploadId']
+    parts = plan_parts(size, part_size)
+    urls = presign_parts(s3_client, bucket, key, upload_id, [number for number, _, _ in parts], expires)
+    return {
+        'method': 'multipart',
+        'upload_id': upload_id,
+        'part_size': part_size,
+        'parts': [{'part_number': number, 'start': start, 'end': end, 'url': urls[number]}
+                  for number, start, end in parts],
+        'expires_in': expires,
+    }
+
+
+def complete_upload(s3_client, bucket, key, upload_id, parts=None):
+    """Complete a multipart upload.
+
+    parts is [{'PartNumber', 'ETag'}] as collected by the client. Browsers
+    often cannot read the ETag response header (CORS), so when parts is
+    omitted they are taken from S3's own list of uploaded parts.
+    """
+    if not parts:
+        parts = []
+        for page in s3_client.get_paginator('list_parts').paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+            parts.extend({'PartNumber': p['PartNumber'], 'ETag': p['ETag']} for p in page.get('Parts', []))
+    if not parts:
+        raise ValueError('No uploaded parts found')
+    parts = sorted(({'PartNumber': int(p['PartNumber']), 'ETag': p['ETag']} for p in parts),
+                   key=lambda p: p['PartNumber'])
+    return s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                               MultipartUpload={'Parts': parts})
@@ -14,11 +14,14 @@ import {
   AreaChart,
   Area
 } from 'recharts'
+import { Logs } from '@/components/logs'
+import { listLogGroups } from '@/lib/api'
 
 interface MetricData {
-  Timestamps: string[]
+  Timestamps: number[] // epoch milliseconds
   Values: number[]
   Label: string
+  Region?: string
 }
 
 interface ServiceHealth {
@@ -51,13 +54,16 @@ export default function CloudWatchPage() {
   const [serviceHealth, setServiceHealth] = useState<Record<string, ServiceHealth>>({})
   const [insights, setInsights] = useState<Insight | null>(null)
   const [loading, setLoading] = useState(true)
+  const [logGroups, setLogGroups] = useState<string[]>([])
+  const [logGroup, setLogGroup] = useState('')
 
   useEffect(() => {
     const fetchData = async () => {
       try {
         // Fetch all data in parallel
         const [metricsRes, alarmsRes, healthRes, insightsRes] = await Promise.all([
-          fetch('http://localhost:5000/cloudwatch/get_metrics'),
+          // Charts are a few hundred pixels wide; let the gateway downsample
+          fetch('http://localhost:5000/cloudwatch/get_metrics?max_points=300'),
           fetch('http://localhost:5000/cloudwatch/get_alarms'),
           fetch('http://localhost:5000/cloudwatch/get_service_health'),
           fetch('http://localhost:5000/cloudwatch/get_insights')
@@ -86,6 +92,15 @@ export default function CloudWatchPage() {
     return () => clearInterval(interval)
   }, [])
 
+  useEffect(() => {
+    listLogGroups()
+      .then(({ groups }) => {
+        setLogGroups(groups.map((group) => group.name))
+        setLogGroup((current) => current || groups[0]?.name || '')
+      })
+      .catch((error) => console.error('Failed to list log groups:', error))
+  }, [])
+
   if (loading) {
     return <div className="flex items-center justify-center min-h-screen">
       <div className="animate-spin rounded-full h-32 w-32 border-b-2 border-gray-900" />
@@ -146,7 +161,7 @@ export default function CloudWatchPage() {
         <div className="bg-white rounded-lg shadow p-6">
           <h3 className="text-lg font-semibold mb-4">EC2 CPU Utilization</h3>
           <div className="h-[300px]">
-            {metrics?.ec2_metrics && (
+            {metrics?.ec2_metrics?.length ? (
               <ResponsiveContainer>
                 <LineChart data={metrics.ec2_metrics[0].Values.map((value, index) => ({
                   time: new Date(metrics.ec2_metrics[0].Timestamps[index]).toLocaleTimeString(),
@@ -159,6 +174,9 @@ export default function CloudWatchPage() {
                   <Line type="monotone" dataKey="value" stroke="#3b82f6" />
                 </LineChart>
               </ResponsiveContainer>
+            ) : (
+              // Every region can fail or return no series; the gateway still answers 200
+              <p className="text-sm text-gray-500">No EC2 metrics available</p>
             )}
           </div>
         </div>
@@ -167,7 +185,7 @@ export default function CloudWatchPage() {
         <div className="bg-white rounded-lg shadow p-6">
           <h3 className="text-lg font-semibold mb-4">S3 Storage Usage</h3>
           <div className="h-[300px]">
-            {metrics?.s3_metrics && (
+            {metrics?.s3_metrics?.length ? (
               <ResponsiveContainer>
                 <AreaChart data={metrics.s3_metrics[0].Values.map((value, index) => ({
                   time: new Date(metrics.s3_metrics[0].Timestamps[index]).toLocaleTimeString(),
@@ -180,6 +198,8 @@ export default function CloudWatchPage() {
                   <Area type="monotone" dataKey="value" stroke="#10b981" fill="#10b981" fillOpacity={0.2} />
                 </AreaChart>
               </ResponsiveContainer>
+            ) : (
+              <p className="text-sm text-gray-500">No S3 metrics available</p>
             )}
           </div>
         </div>
@@ -221,6 +241,28 @@ export default function CloudWatchPage() {
         </div>
       )}
 
+      {/* Live Log Tail */}
+      <div className="mb-6">
+        <div className="mb-2 flex items-center gap-2">
+          <label htmlFor="log-group" className="text-sm text-gray-600">Log group</label>
+          <select
+            id="log-group"
+            value={logGroup}
+            onChange={(e) => setLogGroup(e.target.value)}
+            className="border rounded-lg px-2 py-1 text-sm"
+          >
+            {logGroups.map((name) => (
+              <option key={name} value={name}>{name}</option>
+            ))}
+          </select>
+        </div>
+        {logGroup ? (
+          <Logs group={logGroup} />
+        ) : (
+          <p className="text-sm text-gray-500">No log groups available</p>
+        )}
+      </div>
+
       {/* Active Alarms */}
       <div className="bg-white rounded-lg shadow p-6">
         <h3 className="text-lg font-semibold mb-4 flex items-center">
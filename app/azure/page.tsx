@@ -53,16 +53,16 @@ export default function AzurePage() {
         body: JSON.stringify({ text, voice }),
       })
 
-      const data = await response.json()
-      
-      if (data.success && data.audio) {
-        // Create audio from base64
-        const audio = `data:audio/wav;base64,${data.audio}`
+      if (response.ok) {
+        // The response body is the audio itself
+        const audio = URL.createObjectURL(await response.blob())
         if (audioRef.current) {
+          if (audioRef.current.src.startsWith('blob:')) URL.revokeObjectURL(audioRef.current.src)
           audioRef.current.src = audio
           audioRef.current.play()
         }
       } else {
+        const data = await response.json()
         console.error('Speech synthesis failed:', data.error)
       }
     } catch (error) {
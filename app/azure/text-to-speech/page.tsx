@@ -24,28 +24,14 @@ export default function TextToSpeech() {
 
     setIsLoading(true)
     try {
-      const response = await fetch('http://localhost:5001/tts/synthesize', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ text, voice }),
-      })
-
-      const data = await response.json()
-      
-      if (data.success && data.audio) {
-        // Create audio from base64
-        const audio = `data:audio/wav;base64,${data.audio}`
-        if (audioRef.current) {
-          audioRef.current.src = audio
-          audioRef.current.play()
-        }
-      } else {
-        console.error('Speech synthesis failed:', data.error)
+      // Stream MP3 straight into the player so playback starts while Azure is still synthesizing
+      const params = new URLSearchParams({ text, voice, format: 'mp3' })
+      if (audioRef.current) {
+        audioRef.current.src = `http://localhost:5001/tts/stream?${params}`
+        await audioRef.current.play()
       }
     } catch (error) {
-      console.error('Error:', error)
+      console.error('Speech synthesis failed:', error)
     } finally {
       setIsLoading(false)
     }
@@ -1,10 +1,17 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, send_file
 from flask_cors import CORS
-import azure.cognitiveservices.speech as speechsdk
 import os
-import tempfile
 import logging
 import base64
+import hashlib
+import io
+import time
+from azure_speech import SynthesizerPool, SynthesisError, OUTPUT_FORMATS, DEFAULT_VOICE
+from azure_speech_cache import SpeechCache, cache_key
+from azure_speech_longform import split_text, stream_wav, build_wav, is_ssml, MAX_CHUNK_CHARS, MAX_PARALLEL
+from azure_speech_batch import BatchManager, LocalOutput, BlobOutput, parse_items, BATCH_OUTPUT_DIR
+from azure_voices import VoiceCatalog, fetch_voices_rest
+from azure_provisioning import FleetManager, plan_fleet, MAX_PARALLEL_OPERATIONS, MAX_FLEET_SIZE
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -17,51 +24,77 @@ CORS(app)
 SUBSCRIPTION_KEY = os.getenv('AZURE_SUBSCRIPTION_KEY')
 REGION = "westus2"
 
+# Synthesizers are reused per (voice, format) instead of being rebuilt per request
+synthesizer_pool = SynthesizerPool(SUBSCRIPTION_KEY, REGION)
+# Repeated prompts are served from memory/disk instead of being re-synthesized
+speech_cache = SpeechCache()
+
+def _tts_params():
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    return data.get('text'), data.get('voice', DEFAULT_VOICE), data.get('format')
+
+def cached_synthesize(text, voice, audio_format, ssml=False):
+    """Return (audio bytes, cache tier or None) for a prompt."""
+    key = cache_key(text, voice, audio_format)
+    audio, tier = speech_cache.get(key)
+    if audio is not None:
+        return audio, tier
+    started = time.perf_counter()
+    audio = synthesizer_pool.synthesize(text, voice, audio_format, ssml=ssml)
+    speech_cache.record_synthesis((time.perf_counter() - started) * 1000)
+    speech_cache.put(key, audio)
+    return audio, None
+
+def _cache_on_completion(key, chunks):
+    # Pass chunks through and cache the clip only if the stream finished cleanly
+    started = time.perf_counter()
+    buffered = []
+    for chunk in chunks:
+        buffered.append(chunk)
+        yield chunk
+    speech_cache.record_synthesis((time.perf_counter() - started) * 1000)
+    speech_cache.put(key, b''.join(buffered))
+
+def _send_audio(audio, audio_format, key, tier):
+    # conditional=True gives Range/If-None-Match support so the player can seek
+    response = send_file(io.BytesIO(audio), mimetype=OUTPUT_FORMATS[audio_format][1],
+                         conditional=True, etag=key, max_age=86400)
+    response.headers['X-TTS-Cache'] = tier or 'miss'
+    return response
+
 @app.route('/tts/synthesize', methods=['POST'])
 def synthesize_speech():
+    """Synthesize a prompt and return the audio bytes with the format's Content-Type.
+
+    Body: {"text", "voice", "format", "encoding"}. Pass "encoding": "base64"
+    for the older JSON response carrying the audio as a base64 string.
+    """
     try:
-        data = request.get_json()
-        text = data.get('text')
-        voice = data.get('voice', 'en-IN-NeerjaNeural')  # Default to Indian voice
+        text, voice, audio_format = _tts_params()
+        audio_format = audio_format or 'wav'
 
         if not text:
             return jsonify({'error': 'No text provided'}), 400
+        if audio_format not in OUTPUT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {audio_format}'}), 400
 
-        # Create temporary file for audio output
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-        audio_file = temp_file.name
-
-        # Configure speech service
-        speech_config = speechsdk.SpeechConfig(subscription=SUBSCRIPTION_KEY, region=REGION)
-        speech_config.speech_synthesis_voice_name = voice
-        
-        # Configure audio output to file
-        audio_config = speechsdk.audio.AudioOutputConfig(filename=audio_file)
-        synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=audio_config)
-
-        # Synthesize speech
-        result = synthesizer.speak_text_async(text).get()
-
-        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-            # Read the audio file and convert to base64
-            with open(audio_file, 'rb') as audio:
-                audio_data = base64.b64encode(audio.read()).decode('utf-8')
-            
-            # Clean up the temporary file
-            os.unlink(audio_file)
-            
-            return jsonify({
-                'success': True,
-                'audio': audio_data,
-                'message': 'Speech synthesized successfully'
-            })
-        else:
-            error_details = result.cancellation_details.error_details if result.cancellation_details else "Unknown error"
-            return jsonify({
-                'success': False,
-                'error': f'Speech synthesis failed: {error_details}'
-            }), 500
+        # Synthesize straight to memory - no temporary WAV file
+        audio, tier = cached_synthesize(text, voice, audio_format)
+        if (request.get_json(silent=True) or {}).get('encoding') != 'base64':
+            return _send_audio(audio, audio_format, cache_key(text, voice, audio_format), tier)
+        return jsonify({
+            'success': True,
+            'audio': base64.b64encode(audio).decode('utf-8'),
+            'format': audio_format,
+            'cached': tier is not None,
+            'message': 'Speech synthesized successfully'
+        })
 
+    except SynthesisError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Speech synthesis failed: {e}'
+        }), 500
     except Exception as e:
         logger.error(f"Error in speech synthesis: {str(e)}")
         return jsonify({
@@ -69,17 +102,321 @@ def synthesize_speech():
             'error': str(e)
         }), 500
 
+@app.route('/tts/stream', methods=['GET', 'POST'])
+def stream_speech():
+    """Stream compressed audio over chunked HTTP as the service produces it.
+
+    GET takes text/voice/format as query parameters so the URL can be used
+    directly as an <audio> src and playback starts before synthesis ends.
+    """
+    text, voice, audio_format = _tts_params()
+    audio_format = audio_format or 'mp3'
+
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    if audio_format not in OUTPUT_FORMATS:
+        return jsonify({'error': f'Unsupported format: {audio_format}'}), 400
+
+    key = cache_key(text, voice, audio_format)
+    audio, tier = speech_cache.get(key)
+    if audio is not None:
+        return _send_audio(audio, audio_format, key, tier)
+
+    try:
+        # Players open with "bytes=0-", which the stream answers; a seek into a clip that is
+        # not cached yet is synthesized whole so the requested range can be served
+        if request.range and request.range.ranges != [(0, None)]:
+            audio, _ = cached_synthesize(text, voice, audio_format)
+            return _send_audio(audio, audio_format, key, 'miss')
+        chunks = _cache_on_completion(key, synthesizer_pool.stream(text, voice, audio_format))
+    except SynthesisError as e:
+        return jsonify({'success': False, 'error': f'Speech synthesis failed: {e}'}), 500
+    except Exception as e:
+        logger.error(f"Error starting speech stream: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return Response(stream_with_context(chunks), mimetype=OUTPUT_FORMATS[audio_format][1],
+                    headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no', 'X-TTS-Cache': 'miss'})
+
+@app.route('/tts/longform', methods=['POST'])
+def synthesize_longform():
+    """Synthesize a long document as WAV, chunked at sentence/SSML boundaries.
+
+    Chunks are synthesized in parallel (up to max_parallel) and streamed in
+    order as soon as each contiguous prefix is ready. If a chunk fails after
+    streaming has begun, the response ends without its terminating chunk
+    (see stream_wav), so clients must treat an incomplete transfer as a
+    failure. Pass "stream": false to get a single WAV with exact header
+    sizes, or a 500 on failure, instead.
+    """
+    data = request.get_json(silent=True) or {}
+    text = data.get('text')
+    voice = data.get('voice', DEFAULT_VOICE)
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+
+    try:
+        max_chars = int(data.get('max_chars', MAX_CHUNK_CHARS))
+        max_parallel = min(int(data.get('max_parallel', MAX_PARALLEL)), MAX_PARALLEL)
+        chunks = split_text(text, max_chars)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    ssml = is_ssml(text)
+    synthesize = lambda chunk: cached_synthesize(chunk, voice, 'pcm', ssml=ssml)[0]  # noqa: E731
+    logger.info(f"Long-form synthesis: {len(text)} chars in {len(chunks)} chunks")
+
+    if data.get('stream', True):
+        return Response(stream_with_context(stream_wav(chunks, synthesize, max_parallel)), mimetype='audio/wav',
+                        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no', 'X-TTS-Chunks': str(len(chunks))})
+    try:
+        return Response(build_wav(chunks, synthesize, max_parallel), mimetype='audio/wav')
+    except SynthesisError as e:
+        return jsonify({'success': False, 'error': f'Speech synthesis failed: {e}'}), 500
+
+# Bulk narration jobs run in the background on rate-limited workers. They synthesize directly
+# rather than through speech_cache so one-off batch text cannot push out the interactive prompts.
+batch_manager = BatchManager(lambda text, voice, audio_format: synthesizer_pool.synthesize(text, voice, audio_format))
+
+@app.route('/tts/batch', methods=['POST'])
+def submit_speech_batch():
+    """Queue a batch of (id, text, voice) items.
+
+    Accepts JSON {"items": [...], "voice", "format", "output": {...}} or a
+    multipart upload of a CSV/JSONL file in the "items" field. Output goes
+    to a local directory by default, or to a blob container when
+    output.account and output.container are given.
+    """
+    try:
+        if request.files.get('items'):
+            options = request.form
+            output_options = request.form
+            items = parse_items(upload=request.files['items'],
+                                default_voice=options.get('voice', DEFAULT_VOICE),
+                                default_format=options.get('format', 'mp3'))
+        else:
+            options = request.get_json(silent=True) or {}
+            output_options = options.get('output') or {}
+            items = parse_items(payload=options.get('items'),
+                                default_voice=options.get('voice', DEFAULT_VOICE),
+                                default_format=options.get('format', 'mp3'))
+
+        bad_formats = {item['format'] for item in items} - set(OUTPUT_FORMATS)
+        if bad_formats:
+            return jsonify({'error': f'Unsupported format: {", ".join(sorted(bad_formats))}'}), 400
+
+        if output_options.get('container'):
+            from azure_clients import get_blob_service_client
+            container_client = get_blob_service_client(output_options['account']).get_container_client(
+                output_options['container'])
+            prefix = output_options.get('prefix')
+            make_output = lambda job_id: BlobOutput(container_client, prefix or f'{job_id}/')  # noqa: E731
+        else:
+            make_output = lambda job_id: LocalOutput(os.path.join(BATCH_OUTPUT_DIR, job_id))  # noqa: E731
+
+        job = batch_manager.submit(items, make_output)
+        return jsonify(job.progress()), 202
+
+    except (ValueError, KeyError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to submit TTS batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/tts/batch', methods=['GET'])
+def list_speech_batches():
+    return jsonify([job.progress() for job in batch_manager.list_jobs()])
+
+@app.route('/tts/batch/<job_id>', methods=['GET'])
+def get_speech_batch(job_id):
+    job = batch_manager.jobs.get(job_id)
+    if not job:
+        return jsonify({'error': f'Unknown batch job: {job_id}'}), 404
+    return jsonify(job.progress())
+
+@app.route('/tts/batch/<job_id>/manifest', methods=['GET'])
+def get_speech_batch_manifest(job_id):
+    job = batch_manager.jobs.get(job_id)
+    if not job:
+        return jsonify({'error': f'Unknown batch job: {job_id}'}), 404
+    response = jsonify(job.manifest())
+    response.headers['Content-Disposition'] = f'attachment; filename=tts-batch-{job_id}.json'
+    return response
+
+@app.route('/tts/batch/<job_id>/cancel', methods=['POST'])
+def cancel_speech_batch(job_id):
+    if job_id not in batch_manager.jobs:
+        return jsonify({'error': f'Unknown batch job: {job_id}'}), 404
+    return jsonify(batch_manager.cancel(job_id).progress())
+
+@app.route('/tts/cache/stats', methods=['GET'])
+def get_speech_cache_stats():
+    return jsonify(speech_cache.stats())
+
+# Full Azure voice list, cached with background refresh and a bundled offline snapshot
+voice_catalog = VoiceCatalog(lambda: fetch_voices_rest(SUBSCRIPTION_KEY, REGION))
+
 @app.route('/tts/voices', methods=['GET'])
 def get_available_voices():
-    # List of commonly used voices
-    voices = [
-        {"name": "en-IN-NeerjaNeural", "language": "English (India)", "gender": "Female"},
-        {"name": "en-US-JennyNeural", "language": "English (US)", "gender": "Female"},
-        {"name": "en-GB-SoniaNeural", "language": "English (UK)", "gender": "Female"},
-        {"name": "en-AU-NatashaNeural", "language": "English (Australia)", "gender": "Female"},
-        {"name": "en-US-GuyNeural", "language": "English (US)", "gender": "Male"}
-    ]
-    return jsonify(voices)
+    """List voices, optionally filtered by locale, gender, style or q (name search)."""
+    voices, etag = voice_catalog.query(
+        locale=request.args.get('locale'),
+        gender=request.args.get('gender'),
+        style=request.args.get('style'),
+        search=request.args.get('q')
+    )
+    response = jsonify(voices)
+    # The ETag covers catalog version and filters, so unchanged lists come back as 304
+    response.set_etag(f"{etag}-{hashlib.md5(request.query_string).hexdigest()[:8]}")
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response.make_conditional(request)
+
+@app.route('/tts/voices/status', methods=['GET'])
+def get_voice_catalog_status():
+    return jsonify(voice_catalog.status())
+
+# ---------------------------- VM Fleets ---------------------------- #
+
+fleet_manager = FleetManager()
+DEFAULT_IMAGE = {"publisher": "Canonical", "offer": "UbuntuServer", "sku": "18.04-LTS"}
+
+@app.route('/vm/fleet', methods=['POST'])
+def create_vm_fleet():
+    """Provision a fleet of VMs sharing one VNet in a single call.
+
+    Body: {"names": [...]} or {"count": N, "prefix": "vm"}, plus optional
+    vm_size, image, vnet_name, subnet_name and max_parallel. Returns 202
+    with a fleet id to poll.
+    """
+    data = request.get_json(silent=True) or {}
+    names = data.get('names')
+    if names is None:
+        try:
+            count = int(data.get('count', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': '"count" must be an integer'}), 400
+        if count > MAX_FLEET_SIZE:
+            return jsonify({'error': f'A fleet can have at most {MAX_FLEET_SIZE} VMs'}), 400
+        names = [f"{data.get('prefix', 'vm')}{i + 1}" for i in range(max(count, 0))]
+    if not isinstance(names, list) or not all(isinstance(name, str) and name for name in names):
+        return jsonify({'error': '"names" must be a list of VM names'}), 400
+    if not names:
+        return jsonify({'error': 'Provide "names" or a positive "count"'}), 400
+    if len(set(names)) != len(names):
+        return jsonify({'error': 'VM names must be unique'}), 400
+    try:
+        max_parallel = int(data.get('max_parallel', MAX_PARALLEL_OPERATIONS))
+    except (TypeError, ValueError):
+        return jsonify({'error': '"max_parallel" must be an integer'}), 400
+    if max_parallel < 1:
+        return jsonify({'error': '"max_parallel" must be at least 1'}), 400
+
+    try:
+        import azure_blob_vm
+        plan = plan_fleet(
+            names,
+            image_reference=data.get('image', DEFAULT_IMAGE),
+            vm_size=data.get('vm_size', 'Standard_B1s'),
+            admin_username=azure_blob_vm.admin_username,
+            admin_password=azure_blob_vm.admin_password,
+            vnet_name=data.get('vnet_name', 'myVNet'),
+            subnet_name=data.get('subnet_name', 'mySubnet'),
+            max_parallel=min(max_parallel, MAX_PARALLEL_OPERATIONS)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Failed to plan VM fleet: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    fleet_id = fleet_manager.submit(plan)
+    return jsonify(fleet_manager.describe(fleet_id)), 202
+
+@app.route('/vm/status', methods=['GET'])
+def get_vm_fleet_status():
+    """Power and provisioning state of every VM, with optional filters."""
+    try:
+        import azure_blob_vm
+        return jsonify(azure_blob_vm.get_vm_statuses(
+            group=request.args.get('resource_group'),
+            power_state=request.args.get('power_state'),
+            location=request.args.get('location'),
+            name_contains=request.args.get('q'),
+            max_age=0 if request.args.get('refresh') else azure_blob_vm.VM_STATUS_TTL
+        ))
+    except Exception as e:
+        logger.error(f"Failed to get VM status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/vm/fleet/<fleet_id>', methods=['GET'])
+def get_vm_fleet(fleet_id):
+    fleet = fleet_manager.describe(fleet_id)
+    if fleet is None:
+        return jsonify({'error': f'Unknown fleet: {fleet_id}'}), 404
+    return jsonify(fleet)
+
+# ---------------------------- CDN ---------------------------- #
+
+def _cdn_paths(data):
+    paths = data.get('paths') or []
+    if isinstance(paths, str):
+        paths = [paths]
+    return paths
+
+@app.route('/cdn/endpoints', methods=['POST'])
+def create_or_update_cdn_endpoints():
+    """Create or update many endpoints in one call; returns 202 with operation ids.
+
+    Body: {"profile": ..., "endpoints": [{"name": ..., "origin_host": ..., ...}]}
+    """
+    data = request.get_json(silent=True) or {}
+    specs = data.get('endpoints') or []
+    if not data.get('profile') or not specs:
+        return jsonify({'error': 'Provide "profile" and a non-empty "endpoints" list'}), 400
+    if any('name' not in spec for spec in specs):
+        return jsonify({'error': 'Every endpoint needs a "name"'}), 400
+    try:
+        import azure_cdn
+        op_ids = azure_cdn.create_or_update_endpoints(data['profile'], specs)
+        return jsonify(azure_cdn.cdn_operations.summary(op_ids)), 202
+    except Exception as e:
+        logger.error(f"Failed to start CDN endpoint operations: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cdn/purge', methods=['POST'])
+@app.route('/cdn/load', methods=['POST'])
+def cdn_content_operation():
+    """Purge or pre-load a list of paths, batched to the API's per-call limits.
+
+    Body: {"profile": ..., "endpoint": ..., "paths": [...]}
+    """
+    data = request.get_json(silent=True) or {}
+    paths = _cdn_paths(data)
+    if not data.get('profile') or not data.get('endpoint') or not paths:
+        return jsonify({'error': 'Provide "profile", "endpoint" and "paths"'}), 400
+    try:
+        import azure_cdn
+        start = azure_cdn.purge_content if request.path.endswith('/purge') else azure_cdn.load_content
+        op_ids = start(data['profile'], data['endpoint'], paths)
+        return jsonify(azure_cdn.cdn_operations.summary(op_ids)), 202
+    except Exception as e:
+        logger.error(f"Failed to start CDN content operation: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cdn/operations', methods=['GET'])
+@app.route('/cdn/operations/<op_id>', methods=['GET'])
+def get_cdn_operations(op_id=None):
+    """Status of CDN operations by id (or ?ids=a,b,c); never waits on Azure."""
+    import azure_cdn
+    op_ids = [op_id] if op_id else [i for i in request.args.get('ids', '').split(',') if i]
+    # One read per id, so an operation evicted meanwhile is reported as unknown rather than failing
+    statuses = [azure_cdn.cdn_operations.status(i) for i in op_ids]
+    unknown = [i for i, status in zip(op_ids, statuses) if status is None]
+    if unknown or not op_ids:
+        return jsonify({'error': f'Unknown operation: {", ".join(unknown) or "none given"}'}), 404
+    if op_id:
+        return jsonify(statuses[0])
+    return jsonify({'done': all(s['done'] for s in statuses), 'operations': statuses})
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001) 
\ No newline at end of file
@@ -1,35 +1,43 @@
 import logging
 import os
-from azure.identity import AzureCliCredential
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.storage import StorageManagementClient
 from azure.mgmt.network import NetworkManagementClient
-from azure.storage.blob import BlobServiceClient
+from azure_clients import get_credential, get_blob_service_client, get_management_client
+from azure_transfer import upload_file, upload_directory, upload_glob, MAX_CONCURRENCY, BLOCK_SIZE
 from azure.core.exceptions import ResourceNotFoundError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger()
 
-# Use Azure CLI to authenticate
-credential = AzureCliCredential()
+# Use Azure CLI to authenticate (shared, token-caching credential)
+credential = get_credential()
 
 # Replace these with your actual Azure details
 subscription_id = os.getenv('AZURE_SUBSCRIPTION_ID')
-resource_group_name = 'Main_free'
+resource_group_name = os.getenv('AZURE_RESOURCE_GROUP', 'Main_free')
 location = 'West US 2'  # Use the region of your VM
 admin_username = os.getenv('AZURE_VM_USERNAME')
 admin_password = os.getenv('AZURE_VM_PASSWORD')
 
-# Initialize the Azure management clients
-resource_client = ResourceManagementClient(credential, subscription_id)
-compute_client = ComputeManagementClient(credential, subscription_id)
-storage_client = StorageManagementClient(credential, subscription_id)
-network_client = NetworkManagementClient(credential, subscription_id)
+# Fleet status is cached briefly so dashboards polling together share one fetch
+VM_STATUS_TTL = int(os.getenv('AZURE_VM_STATUS_TTL', '15'))
+# Cap on concurrent instance_view calls when the bulk status listing is unavailable
+VM_STATUS_MAX_WORKERS = int(os.getenv('AZURE_VM_STATUS_WORKERS', '16'))
+
+# Initialize the Azure management clients (pooled and shared across modules)
+resource_client = get_management_client(ResourceManagementClient, subscription_id)
+compute_client = get_management_client(ComputeManagementClient, subscription_id)
+storage_client = get_management_client(StorageManagementClient, subscription_id)
+network_client = get_management_client(NetworkManagementClient, subscription_id)
 
 # --- Azure Network Operations ---
-def create_vnet(resource_group_name, location, vnet_name, subnet_name):
+def create_vnet(resource_group_name, location, vnet_name, subnet_name, raise_errors=False):
     try:
         vnet_params = {
             'location': location,
@@ -52,9 +60,11 @@ def create_vnet(resource_group_name, location, vnet_name, subnet_name):
         return vnet
     except Exception as e:
         logger.error(f"Failed to create VNet: {e}")
+        if raise_errors:
+            raise
         return None
 
-def create_network_interface(resource_group_name, location, vnet_name, subnet_name, nic_name):
+def create_network_interface(resource_group_name, location, vnet_name, subnet_name, nic_name, raise_errors=False):
     try:
         subnet_info = network_client.subnets.get(resource_group_name, vnet_name, subnet_name)
         nic_params = {
@@ -71,10 +81,12 @@ def create_network_interface(resource_group_name, location, vnet_name, subnet_na
         return nic.id
     except Exception as e:
         logger.error(f"Failed to create NIC: {e}")
+        if raise_errors:
+            raise
         return None
 
 # --- Azure VM Operations ---
-def create_vm(vm_name, image_reference, vm_size, admin_username, admin_password, nic_id):
+def create_vm(vm_name, image_reference, vm_size, admin_username, admin_password, nic_id, raise_errors=False):
     try:
         vm_parameters = {
             "location": location,
@@ -109,6 +121,8 @@ def create_vm(vm_name, image_reference, vm_size, admin_username, admin_password,
         return vm.id
     except Exception as e:
         logger.error(f"Failed to create VM: {e}")
+        if raise_errors:
+            raise
         return None
 
 def list_vms():
@@ -121,6 +135,78 @@ def list_vms():
         logger.error(f"Failed to list VMs: {e}")
         return []
 
+_vm_status_cache = {}
+# Guards the cache and the per-group locks; each group's fetch runs under its own lock
+_vm_status_lock = threading.Lock()
+_vm_status_group_locks = {}
+
+def _power_state(statuses):
+    for status in statuses or []:
+        if status.code and status.code.startswith('PowerState/'):
+            return status.code.split('/', 1)[1]
+    return 'unknown'
+
+def _status_record(vm, instance_view=None):
+    instance_view = instance_view or vm.instance_view
+    return {
+        'name': vm.name,
+        'resource_group': vm.id.split('/')[4] if vm.id else resource_group_name,
+        'location': vm.location,
+        'vm_size': vm.hardware_profile.vm_size if vm.hardware_profile else None,
+        'power_state': _power_state(instance_view.statuses if instance_view else None),
+        'provisioning_state': vm.provisioning_state,
+    }
+
+def _fetch_vm_statuses(group):
+    try:
+        # One paged call returns every VM with its instance view - no N+1
+        vms = compute_client.virtual_machines.list_all(status_only='true')
+        return [_status_record(vm) for vm in vms
+                if vm.id and vm.id.split('/')[4].lower() == group.lower()]
+    except Exception as e:
+        logger.warning(f"Bulk VM status listing failed, falling back to instance views: {e}")
+
+    vms = list(compute_client.virtual_machines.list(group))
+
+    def fetch(vm):
+        try:
+            return _status_record(vm, compute_client.virtual_machines.instance_view(group, vm.name))
+        except Exception as e:
+            logger.error(f"Failed to get instance view for VM '{vm.name}': {e}")
+            return _status_record(vm)
+
+    with ThreadPoolExecutor(max_workers=VM_STATUS_MAX_WORKERS) as pool:
+        return list(pool.map(fetch, vms))
+
+def get_vm_statuses(group=None, power_state=None, location=None, name_contains=None, max_age=VM_STATUS_TTL):
+    """Compact power/provisioning status for every VM in a resource group.
+
+    Results are cached for max_age seconds; filters apply to the cached list.
+    """
+    group = group or resource_group_name
+    with _vm_status_lock:
+        cached = _vm_status_cache.get(group)
+        group_lock = _vm_status_group_locks.setdefault(group, threading.Lock())
+    if cached is None or time.time() - cached[0] > max_age:
+        # Callers for the same group share one fetch; other groups aren't held up
+        with group_lock:
+            with _vm_status_lock:
+                cached = _vm_status_cache.get(group)
+            if cached is None or time.time() - cached[0] > max_age:
+                cached = (time.time(), _fetch_vm_statuses(group))
+                with _vm_status_lock:
+                    _vm_status_cache[group] = cached
+    fetched_at, records = cached
+
+    if power_state:
+        records = [r for r in records if r['power_state'] == power_state]
+    if location:
+        wanted = location.replace(' ', '').lower()
+        records = [r for r in records if (r['location'] or '').replace(' ', '').lower() == wanted]
+    if name_contains:
+        records = [r for r in records if name_contains.lower() in r['name'].lower()]
+    return {'fetched_at': fetched_at, 'count': len(records), 'vms': records}
+
 def delete_vm(vm_name):
     try:
         async_vm_deletion = compute_client.virtual_machines.begin_delete(
@@ -135,7 +221,7 @@ def delete_vm(vm_name):
 # --- Azure Blob Storage Operations ---
 def create_container(storage_account_name, container_name):
     try:
-        blob_service_client = BlobServiceClient(account_url=f"https://{storage_account_name}.blob.core.windows.net", credential=credential)
+        blob_service_client = get_blob_service_client(storage_account_name)
         container_client = blob_service_client.get_container_client(container_name)
         container_client.create_container()
         logger.info(f"Blob container '{container_name}' created successfully.")
@@ -144,7 +230,7 @@ def create_container(storage_account_name, container_name):
 
 def list_containers(storage_account_name):
     try:
-        blob_service_client = BlobServiceClient(account_url=f"https://{storage_account_name}.blob.core.windows.net", credential=credential)
+        blob_service_client = get_blob_service_client(storage_account_name)
         containers = blob_service_client.list_containers()
         container_names = [container.name for container in containers]
         logger.info(f"Blob containers: {container_names}")
@@ -155,24 +241,31 @@ def list_containers(storage_account_name):
 
 def delete_container(storage_account_name, container_name):
     try:
-        blob_service_client = BlobServiceClient(account_url=f"https://{storage_account_name}.blob.core.windows.net", credential=credential)
+        blob_service_client = get_blob_service_client(storage_account_name)
         container_client = blob_service_client.get_container_client(container_name)
         container_client.delete_container()
         logger.info(f"Blob container '{container_name}' deleted successfully.")
     except Exception as e:
         logger.error(f"Failed to delete Blob container: {e}")
 
-def upload_file_to_blob(storage_account_name, container_name, file_name):
+def upload_file_to_blob(storage_account_name, container_name, file_name,
+                        max_concurrency=MAX_CONCURRENCY, block_size=BLOCK_SIZE, overwrite=True):
+    # file_name may also be a directory or a glob pattern such as 'site/**/*.html'.
+    # Returns {path: status}; failures are logged and raised, since callers act on the result
     try:
-        blob_service_client = BlobServiceClient(account_url=f"https://{storage_account_name}.blob.core.windows.net", credential=credential)
-        container_client = blob_service_client.get_container_client(container_name)
-        blob_client = container_client.get_blob_client(os.path.basename(file_name))
-
-        with open(file_name, "rb") as file:
-            blob_client.upload_blob(file)
-        logger.info(f"File '{file_name}' uploaded to Blob container '{container_name}' successfully.")
+        container_client = get_blob_service_client(storage_account_name).get_container_client(container_name)
+        options = dict(max_concurrency=max_concurrency, block_size=block_size, overwrite=overwrite)
+        if os.path.isdir(file_name):
+            results = upload_directory(container_client, file_name, **options)
+        elif any(char in file_name for char in '*?['):
+            results = upload_glob(container_client, file_name, **options)
+        else:
+            results = {file_name: upload_file(container_client, file_name, **options)}
+        logger.info(f"Uploaded '{file_name}' to Blob container '{container_name}': {results}")
+        return results
     except Exception as e:
         logger.error(f"Failed to upload file to Blob: {e}")
+        raise
 
 # --- Main Execution ---
 if __name__ == "__main__":
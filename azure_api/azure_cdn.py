@@ -1,39 +1,52 @@
 import logging
 import os
 import json
-from azure.identity import AzureCliCredential
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.storage import StorageManagementClient
 from azure.mgmt.network import NetworkManagementClient
-from azure.storage.blob import BlobServiceClient
+from azure_clients import get_credential, get_blob_service_client, get_management_client
+from azure_transfer import upload_file, MAX_CONCURRENCY, BLOCK_SIZE
 from azure.core.exceptions import ResourceNotFoundError
 from azure.mgmt.cdn import CdnManagementClient
-from azure.mgmt.cdn.models import Sku, Endpoint, Origin, Profile, EndpointUpdateParameters
+from azure.mgmt.cdn.models import Sku, Endpoint, Origin, Profile, EndpointUpdateParameters, PurgeParameters, LoadParameters
 
 # Configure logging to a file
 logging.basicConfig(filename='azure_operations.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-# Use Azure CLI to authenticate
-credential = AzureCliCredential()
+# Use Azure CLI to authenticate (shared, token-caching credential)
+credential = get_credential()
 
-# Replace these with your actual Azure details
-subscription_id = ""  # Set your Azure subscription ID
-resource_group_name = ''
+# Azure details come from the environment, like the other Azure modules
+subscription_id = os.getenv('AZURE_SUBSCRIPTION_ID')
+resource_group_name = os.getenv('AZURE_RESOURCE_GROUP', 'Main_free')
 location = 'global'  # Use the region of your VM
 
-# Initialize the Azure management clients
-resource_client = ResourceManagementClient(credential, subscription_id)
-compute_client = ComputeManagementClient(credential, subscription_id)
-storage_client = StorageManagementClient(credential, subscription_id)
-network_client = NetworkManagementClient(credential, subscription_id)
-cdn_client = CdnManagementClient(credential, subscription_id)
+# Initialize the Azure management clients (pooled and shared across modules)
+resource_client = get_management_client(ResourceManagementClient, subscription_id)
+compute_client = get_management_client(ComputeManagementClient, subscription_id)
+storage_client = get_management_client(StorageManagementClient, subscription_id)
+network_client = get_management_client(NetworkManagementClient, subscription_id)
+cdn_client = get_management_client(CdnManagementClient, subscription_id)
+
+# Content paths per purge/load request (service limits)
+PURGE_BATCH_SIZE = int(os.getenv('AZURE_CDN_PURGE_BATCH', '100'))
+LOAD_BATCH_SIZE = int(os.getenv('AZURE_CDN_LOAD_BATCH', '10'))
+# Endpoint operations started at once
+CDN_MAX_PARALLEL = int(os.getenv('AZURE_CDN_PARALLEL', '8'))
+# Finished operations are kept this long (seconds) for status checks, up to this many in total
+OPERATION_TTL = int(os.getenv('AZURE_CDN_OPERATION_TTL', '3600'))
+MAX_OPERATIONS = int(os.getenv('AZURE_CDN_MAX_OPERATIONS', '1000'))
 
 # --- Azure Blob Storage Operations ---
 def create_container(storage_account_name, container_name):
     try:
-        blob_service_client = BlobServiceClient(account_url=f"https://{storage_account_name}.blob.core.windows.net", credential=credential)
+        blob_service_client = get_blob_service_client(storage_account_name)
         container_client = blob_service_client.get_container_client(container_name)
         container_client.create_container()
         logger.info(f"Blob container '{container_name}' created successfully.")
@@ -42,14 +55,12 @@ def create_container(storage_account_name, container_name):
         logger.error(f"Failed to create Blob container: {e}")
         print(f"Failed to create Blob container: {e}")
 
-def upload_file_to_blob(storage_account_name, container_name, file_path):
+def upload_file_to_blob(storage_account_name, container_name, file_path,
+                        max_concurrency=MAX_CONCURRENCY, block_size=BLOCK_SIZE, overwrite=True):
     try:
-        blob_service_client = BlobServiceClient(account_url=f"https://{storage_account_name}.blob.core.windows.net", credential=credential)
-        container_client = blob_service_client.get_container_client(container_name)
-        blob_client = container_client.get_blob_client(os.path.basename(file_path))
-
-        with open(file_path, "rb") as file:
-            blob_client.upload_blob(file)
+        container_client = get_blob_service_client(storage_account_name).get_container_client(container_name)
+        upload_file(container_client, file_path, max_concurrency=max_concurrency,
+                    block_size=block_size, overwrite=overwrite)
         logger.info(f"File '{file_path}' uploaded to Blob container '{container_name}' successfully.")
         print(f"File '{file_path}' uploaded to Blob container '{container_name}' successfully.")
         return f"https://{storage_account_name}.blob.core.windows.net/{container_name}/{os.path.basename(file_path)}"
@@ -118,6 +129,236 @@ def update_cdn_endpoint(profile_name, endpoint_name):
         logger.error(f"Failed to update CDN endpoint: {e}")
         print(f"Failed to update CDN endpoint: {e}")
 
+# --- Azure CDN Bulk Operations ---
+class OperationTracker:
+    """Holds LRO pollers so callers can start work and check on it later.
+
+    Nothing here blocks: pollers run on the SDK's own threads and status()
+    only reads their current state.
+    """
+
+    def __init__(self, ttl=OPERATION_TTL, max_operations=MAX_OPERATIONS):
+        self._operations = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.max_operations = max_operations
+
+    def _evict(self):
+        """Drop finished records past the TTL, then the oldest finished ones over the cap (lock held)."""
+        cutoff = time.time() - self.ttl
+        for op_id in [i for i, r in self._operations.items() if r['finished'] and r['finished'] < cutoff]:
+            del self._operations[op_id]
+        excess = len(self._operations) - self.max_operations
+        if excess > 0:
+            finished = sorted((r['finished'], i) for i, r in self._operations.items() if r['finished'])
+            for _, op_id in finished[:excess]:
+                del self._operations[op_id]
+
+    def track(self, kind, target, poller):
+        op_id = uuid.uuid4().hex[:12]
+        record = {'id': op_id, 'kind': kind, 'target': target, 'poller': poller,
+                  'started': time.time(), 'finished': None, 'error': None}
+
+        def on_done(finished_poller):
+            record['finished'] = time.time()
+            logger.info(f"CDN {kind} on '{target}' finished with status {finished_poller.status()}")
+
+        poller.add_done_callback(on_done)
+        with self._lock:
+            self._operations[op_id] = record
+            self._evict()
+        return op_id
+
+    def track_error(self, kind, target, error):
+        op_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._operations[op_id] = {'id': op_id, 'kind': kind, 'target': target, 'poller': None,
+                                       'started': time.time(), 'finished': time.time(), 'error': str(error)}
+            self._evict()
+        return op_id
+
+    def __contains__(self, op_id):
+        with self._lock:
+            return op_id in self._operations
+
+    def poller(self, op_id):
+        """The operation's poller; None when it never started or is unknown."""
+        with self._lock:
+            record = self._operations.get(op_id)
+        return record and record['poller']
+
+    def status(self, op_id):
+        """Current state of an operation, or None once it is unknown or evicted."""
+        with self._lock:
+            record = self._operations.get(op_id)
+        if record is None:
+            return None
+        poller = record['poller']
+        if poller is None:
+            state, done = 'Failed', True
+        else:
+            state, done = poller.status(), poller.done()
+        return {key: record[key] for key in ('id', 'kind', 'target', 'started', 'finished', 'error')} | {
+            'status': state, 'done': done}
+
+    def summary(self, op_ids):
+        statuses = [self.status(op_id) or {'id': op_id, 'status': 'Expired', 'done': True} for op_id in op_ids]
+        return {'done': all(s['done'] for s in statuses), 'operations': statuses}
+
+cdn_operations = OperationTracker()
+
+class ChainedOperation:
+    """Poller-like handle for work that may only start once other pollers finish.
+
+    start() is called after every poller in after has succeeded and returns
+    the pollers it began; the chain is done when those are. OperationTracker
+    tracks it like any SDK poller.
+    """
+
+    def __init__(self, after, start):
+        self._status = 'NotStarted'
+        self._error = None
+        self._callbacks = []
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, args=(after, start), name='cdn-chain', daemon=True).start()
+
+    def _run(self, after, start):
+        try:
+            for poller in after:
+                if poller is None:
+                    raise RuntimeError('a preceding operation never started')
+                poller.result()
+            self._status = 'InProgress'
+            for poller in start():
+                poller.result()
+            self._status = 'Succeeded'
+        except Exception as e:
+            logger.error(f"Chained CDN operation failed: {e}")
+            self._error = e
+            self._status = 'Failed'
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def status(self):
+        return self._status
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        self._done.wait(timeout)
+        if self._error is not None:
+            raise self._error
+
+    def add_done_callback(self, func):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(func)
+                return
+        func(self)
+
+def _normalize_paths(paths):
+    seen, normalized = set(), []
+    for path in paths:
+        path = '/' + path.strip().lstrip('/')
+        if path not in seen:
+            seen.add(path)
+            normalized.append(path)
+    return normalized
+
+def _chunks(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _start_endpoint(profile_name, spec):
+    name = spec['name']
+    try:
+        try:
+            cdn_client.endpoints.get(resource_group_name, profile_name, name)
+            exists = True
+        except ResourceNotFoundError:
+            exists = False
+        if exists:
+            update = EndpointUpdateParameters(
+                is_http_allowed=spec.get('is_http_allowed', True),
+                is_https_allowed=spec.get('is_https_allowed', True),
+                is_compression_enabled=spec.get('is_compression_enabled', True),
+                content_types_to_compress=spec.get('content_types_to_compress')
+            )
+            poller = cdn_client.endpoints.begin_update(resource_group_name, profile_name, name, update)
+            return cdn_operations.track('update_endpoint', name, poller)
+        origin_host = spec['origin_host']
+        endpoint = Endpoint(
+            location=location,
+            origins=[Origin(name=origin_host.replace('.', '-'), host_name=origin_host)],
+            origin_host_header=spec.get('origin_host_header', origin_host),
+            is_http_allowed=spec.get('is_http_allowed', True),
+            is_https_allowed=spec.get('is_https_allowed', True),
+            is_compression_enabled=spec.get('is_compression_enabled', True),
+            content_types_to_compress=spec.get('content_types_to_compress')
+        )
+        poller = cdn_client.endpoints.begin_create(resource_group_name, profile_name, name, endpoint)
+        return cdn_operations.track('create_endpoint', name, poller)
+    except Exception as e:
+        logger.error(f"Failed to start CDN endpoint operation for '{name}': {e}")
+        return cdn_operations.track_error('create_or_update_endpoint', name, e)
+
+def create_or_update_endpoints(profile_name, endpoint_specs, max_parallel=CDN_MAX_PARALLEL):
+    """Start create/update for many endpoints at once; returns operation ids.
+
+    endpoint_specs: [{'name': ..., 'origin_host': ..., ...}]. Creation can take
+    minutes per endpoint - poll cdn_operations.status() instead of waiting.
+    """
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        return list(pool.map(lambda spec: _start_endpoint(profile_name, spec), endpoint_specs))
+
+def _start_content_operation(kind, profile_name, endpoint_name, paths, batch_size):
+    begin = cdn_client.endpoints.begin_purge_content if kind == 'purge' else cdn_client.endpoints.begin_load_content
+    parameters = PurgeParameters if kind == 'purge' else LoadParameters
+    op_ids = []
+    for batch in _chunks(_normalize_paths(paths), batch_size):
+        try:
+            poller = begin(resource_group_name, profile_name, endpoint_name, parameters(content_paths=batch))
+            op_ids.append(cdn_operations.track(kind, f'{endpoint_name}: {len(batch)} paths', poller))
+        except Exception as e:
+            logger.error(f"Failed to start CDN {kind} on '{endpoint_name}': {e}")
+            op_ids.append(cdn_operations.track_error(kind, endpoint_name, e))
+    return op_ids
+
+def purge_content(profile_name, endpoint_name, paths):
+    """Purge paths (wildcards like '/css/*' allowed) in API-sized batches."""
+    return _start_content_operation('purge', profile_name, endpoint_name, paths, PURGE_BATCH_SIZE)
+
+def load_content(profile_name, endpoint_name, paths):
+    """Pre-load paths into the CDN edge in API-sized batches."""
+    return _start_content_operation('load', profile_name, endpoint_name, paths, LOAD_BATCH_SIZE)
+
+def purge_after_upload(profile_name, endpoint_name, upload_results, root='', preload=False):
+    """Purge (and optionally preload) only the blobs an upload actually changed.
+
+    upload_results is the {path: status} dict from azure_transfer's
+    upload_directory/upload_glob; unchanged ('skipped') files are left cached.
+    The preload starts only once every purge batch has finished, otherwise
+    the edge could load the old content and the purge then drop it again.
+    """
+    changed = [os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, '/') if root else os.path.basename(path)
+               for path, status in upload_results.items() if status == 'uploaded']
+    if not changed:
+        return []
+    op_ids = purge_content(profile_name, endpoint_name, changed)
+    if preload:
+        def start_loads():
+            return [cdn_client.endpoints.begin_load_content(resource_group_name, profile_name, endpoint_name,
+                                                            LoadParameters(content_paths=batch))
+                    for batch in _chunks(_normalize_paths(changed), LOAD_BATCH_SIZE)]
+        purges = [cdn_operations.poller(op_id) for op_id in op_ids]
+        op_ids.append(cdn_operations.track('load', f'{endpoint_name}: {len(changed)} paths after purge',
+                                           ChainedOperation(purges, start_loads)))
+    return op_ids
+
 # --- Main Execution ---
 if __name__ == "__main__":
     # Azure Blob Storage operations
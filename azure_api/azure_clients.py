@@ -0,0 +1,181 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from azure.identity import AzureCliCredential
+from azure.storage.blob import BlobServiceClient
+
+logger = logging.getLogger()
+
+# Refresh tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = int(os.getenv('AZURE_TOKEN_REFRESH_MARGIN', '300'))
+# Connections kept open per host in the shared HTTP session
+POOL_MAXSIZE = int(os.getenv('AZURE_HTTP_POOL_MAXSIZE', '32'))
+
+_lock = threading.RLock()
+_credential = None
+_session = None
+_blob_clients = {}
+_mgmt_clients = {}
+
+
+# --- Credential ---
+class _Fetch:
+    """One get_token() call to the wrapped credential that concurrent callers share."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = None
+        self.error = None
+
+
+class CachedTokenCredential:
+    """Wraps a credential and caches its tokens per scope set and options.
+
+    AzureCliCredential shells out to `az` for every get_token() call. Here a
+    token is reused until it nears expiry; inside the refresh margin the
+    cached token is still returned while a background thread fetches the
+    next one, so callers only block when no valid token exists at all.
+    Tokens are keyed on the scopes plus options such as tenant_id, and
+    callers that need the same token at once share a single fetch.
+    """
+
+    def __init__(self, credential, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._tokens = {}
+        self._fetches = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(scopes, kwargs):
+        return scopes, tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+    def _fetch(self, key, scopes, kwargs, fetch):
+        try:
+            fetch.token = self._credential.get_token(*scopes, **kwargs)
+            with self._lock:
+                self._tokens[key] = fetch.token
+        except Exception as e:
+            fetch.error = e
+        finally:
+            with self._lock:
+                self._fetches.pop(key, None)
+            fetch.done.set()
+
+    def _background_refresh(self, key, scopes, kwargs, fetch):
+        self._fetch(key, scopes, kwargs, fetch)
+        if fetch.error is not None:
+            logger.warning(f"Background token refresh failed for {scopes}: {fetch.error}")
+
+    def get_token(self, *scopes, claims=None, **kwargs):
+        if claims:
+            # Claims challenges must always go to the real credential
+            return self._credential.get_token(*scopes, claims=claims, **kwargs)
+
+        key = self._key(scopes, kwargs)
+        now = time.time()
+        with self._lock:
+            token = self._tokens.get(key)
+            if token and token.expires_on - now > self._refresh_margin:
+                return token
+            fetch = self._fetches.get(key)
+            leader = fetch is None
+            if leader:
+                fetch = self._fetches[key] = _Fetch()
+            if token and token.expires_on > now + 30:
+                if leader:
+                    threading.Thread(target=self._background_refresh, args=(key, scopes, kwargs, fetch),
+                                     daemon=True).start()
+                return token
+        if leader:
+            self._fetch(key, scopes, kwargs, fetch)
+        else:
+            fetch.done.wait()
+        if fetch.error is not None:
+            raise fetch.error
+        return fetch.token
+
+    def close(self):
+        if hasattr(self._credential, 'close'):
+            self._credential.close()
+
+
+def get_credential():
+    """Return the process-wide cached Azure credential."""
+    global _credential
+    if _credential is None:
+        with _lock:
+            if _credential is None:
+                _credential = CachedTokenCredential(AzureCliCredential())
+    return _credential
+
+
+# --- Transport ---
+def get_session():
+    """Return the shared requests session used by every Azure client."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_MAXSIZE, pool_maxsize=POOL_MAXSIZE)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _transport():
+    # One transport per client, all borrowing the same pooled session
+    return RequestsTransport(session=get_session(), session_owner=False)
+
+
+# --- Client pools ---
+def account_url(storage_account_name):
+    if storage_account_name.startswith(('http://', 'https://')):
+        return storage_account_name.rstrip('/')
+    return f"https://{storage_account_name}.blob.core.windows.net"
+
+
+def get_blob_service_client(storage_account_name):
+    """Return a pooled BlobServiceClient for an account name or URL."""
+    url = account_url(storage_account_name)
+    client = _blob_clients.get(url)
+    if client is None:
+        with _lock:
+            client = _blob_clients.get(url)
+            if client is None:
+                client = BlobServiceClient(account_url=url, credential=get_credential(), transport=_transport())
+                _blob_clients[url] = client
+    return client
+
+
+def get_management_client(client_class, subscription_id):
+    """Return a pooled management client (Compute, Network, Cdn, ...)."""
+    key = (client_class, subscription_id)
+    client = _mgmt_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _mgmt_clients.get(key)
+            if client is None:
+                client = client_class(get_credential(), subscription_id, transport=_transport())
+                _mgmt_clients[key] = client
+    return client
+
+
+def reset_clients():
+    """Drop every pooled client and the cached credential (e.g. after re-login)."""
+    global _credential, _session
+    with _lock:
+        _blob_clients.clear()
+        _mgmt_clients.clear()
+        if _credential is not None:
+            _credential.close()
+        _credential = None
+        if _session is not None:
+            _session.close()
+        _session = None
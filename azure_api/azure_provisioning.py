@@ -0,0 +1,272 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger()
+
+# Long-running operations in flight at once for one plan
+MAX_PARALLEL_OPERATIONS = int(os.getenv('AZURE_PROVISION_PARALLEL', '8'))
+# Most VMs one fleet request may create
+MAX_FLEET_SIZE = int(os.getenv('AZURE_FLEET_MAX_VMS', '50'))
+# Finished fleets are forgotten after this many seconds, or sooner once more than AZURE_FLEET_MAX_KEPT are kept
+FLEET_TTL = int(os.getenv('AZURE_FLEET_TTL', str(24 * 3600)))
+FLEET_MAX_KEPT = int(os.getenv('AZURE_FLEET_MAX_KEPT', '100'))
+
+
+class ProvisioningError(Exception):
+    """Raised when a plan fails; completed steps have already been rolled back."""
+
+
+class Step:
+    """One resource in a provisioning plan.
+
+    action(results) performs the (blocking) create and returns a value that
+    dependants can read from results[step_id]; rollback(value) undoes it.
+    """
+
+    def __init__(self, id, action, depends_on=(), rollback=None):
+        self.id = id
+        self.action = action
+        self.depends_on = tuple(depends_on)
+        self.rollback = rollback
+        self.status = 'pending'
+        self.error = None
+        self.started = None
+        self.finished = None
+
+    def describe(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'depends_on': list(self.depends_on),
+            'error': self.error,
+            'duration_s': round(self.finished - self.started, 1) if self.started and self.finished else None,
+        }
+
+
+class Plan:
+    """A dependency DAG of steps executed with bounded parallelism.
+
+    Every step starts as soon as its dependencies have finished, so total
+    time follows the longest dependency chain rather than the step count.
+    On the first failure nothing new is started, in-flight steps are allowed
+    to finish, and every completed step is rolled back in reverse order.
+    """
+
+    def __init__(self, steps, max_parallel=MAX_PARALLEL_OPERATIONS):
+        if max_parallel < 1:
+            raise ValueError('max_parallel must be at least 1')
+        self.steps = {step.id: step for step in steps}
+        self.max_parallel = max_parallel
+        self.results = {}
+        self.status = 'pending'
+        self._completed_order = []
+        self._validate()
+
+    def _validate(self):
+        for step in self.steps.values():
+            for dep in step.depends_on:
+                if dep not in self.steps:
+                    raise ValueError(f"Step '{step.id}' depends on unknown step '{dep}'")
+        # Kahn's algorithm - anything left over is part of a cycle
+        remaining = {sid: set(s.depends_on) for sid, s in self.steps.items()}
+        while remaining:
+            ready = [sid for sid, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+            for sid in ready:
+                del remaining[sid]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def _run_step(self, step):
+        step.status = 'running'
+        step.started = time.time()
+        try:
+            result = step.action(self.results)
+            if result is None:
+                raise ProvisioningError(f"Step '{step.id}' returned no result")
+            return result
+        finally:
+            step.finished = time.time()
+
+    def execute(self):
+        """Run the plan; returns results by step id or raises ProvisioningError."""
+        self.status = 'running'
+        failure = None
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='provision') as pool:
+            in_flight = {}
+            while True:
+                if failure is None:
+                    for step in self.steps.values():
+                        if len(in_flight) >= self.max_parallel:
+                            break
+                        if step.status == 'pending' and all(
+                                self.steps[dep].status == 'succeeded' for dep in step.depends_on):
+                            step.status = 'queued'
+                            in_flight[pool.submit(self._run_step, step)] = step
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = in_flight.pop(future)
+                    try:
+                        self.results[step.id] = future.result()
+                        step.status = 'succeeded'
+                        self._completed_order.append(step)
+                        logger.info(f"Provisioned '{step.id}' in {step.finished - step.started:.1f}s")
+                    except Exception as e:
+                        step.status = 'failed'
+                        step.error = str(e)
+                        failure = failure or e
+                        logger.error(f"Provisioning step '{step.id}' failed: {e}")
+
+        if failure is not None:
+            for step in self.steps.values():
+                if step.status == 'pending':
+                    step.status = 'skipped'
+            self.rollback()
+            self.status = 'failed'
+            raise ProvisioningError(str(failure))
+        self.status = 'succeeded'
+        return self.results
+
+    def _depth(self, step_id, memo):
+        if step_id not in memo:
+            deps = self.steps[step_id].depends_on
+            memo[step_id] = 1 + max((self._depth(dep, memo) for dep in deps), default=-1)
+        return memo[step_id]
+
+    def _undo(self, step):
+        try:
+            step.rollback(self.results[step.id])
+            step.status = 'rolled_back'
+            logger.info(f"Rolled back '{step.id}'")
+        except Exception as e:
+            step.error = f'rollback failed: {e}'
+            logger.error(f"Rollback of '{step.id}' failed: {e}")
+
+    def rollback(self):
+        """Undo completed steps, deepest first; steps at the same depth in parallel."""
+        self.status = 'rolling_back'
+        memo = {}
+        levels = {}
+        for step in self._completed_order:
+            if step.rollback is not None:
+                levels.setdefault(self._depth(step.id, memo), []).append(step)
+        with ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix='rollback') as pool:
+            for depth in sorted(levels, reverse=True):
+                list(pool.map(self._undo, levels[depth]))
+
+    def describe(self):
+        return {'status': self.status, 'steps': [step.describe() for step in self.steps.values()]}
+
+
+# --- VM fleets ---
+def plan_fleet(vm_names, image_reference, vm_size, admin_username, admin_password,
+               vnet_name='myVNet', subnet_name='mySubnet', max_parallel=MAX_PARALLEL_OPERATIONS):
+    """Build a plan for N VMs sharing one VNet/subnet: vnet -> nic-i -> vm-i."""
+    import azure_blob_vm as azure
+
+    if len(vm_names) > MAX_FLEET_SIZE:
+        raise ValueError(f'A fleet can have at most {MAX_FLEET_SIZE} VMs')
+
+    group, location = azure.resource_group_name, azure.location
+
+    def create_vnet(results):
+        return azure.create_vnet(group, location, vnet_name, subnet_name, raise_errors=True)
+
+    def delete_nic(vm_name, nic_name):
+        # A VM whose create failed part-way is not rolled back but can still hold the NIC,
+        # and Azure refuses to delete a NIC that is attached (NicInUse)
+        nic = azure.network_client.network_interfaces.get(group, nic_name)
+        if nic.virtual_machine is not None:
+            attached = nic.virtual_machine.id.rsplit('/', 1)[-1]
+            if attached.lower() != vm_name.lower():
+                raise ProvisioningError(f"NIC '{nic_name}' is attached to VM '{attached}' outside this plan")
+            logger.info(f"Deleting VM '{attached}' to detach NIC '{nic_name}'")
+            azure.compute_client.virtual_machines.begin_delete(group, attached).result()
+        azure.network_client.network_interfaces.begin_delete(group, nic_name).result()
+
+    def nic_step(vm_name):
+        nic_name = f'{vm_name}-nic'
+        return Step(
+            f'nic:{vm_name}',
+            lambda results: azure.create_network_interface(group, location, vnet_name, subnet_name, nic_name,
+                                                           raise_errors=True),
+            depends_on=['vnet'],
+            rollback=lambda nic_id: delete_nic(vm_name, nic_name)
+        )
+
+    def vm_step(vm_name):
+        return Step(
+            f'vm:{vm_name}',
+            lambda results: azure.create_vm(vm_name, image_reference, vm_size, admin_username, admin_password,
+                                            results[f'nic:{vm_name}'], raise_errors=True),
+            depends_on=[f'nic:{vm_name}'],
+            rollback=lambda vm_id: azure.compute_client.virtual_machines.begin_delete(group, vm_name).result()
+        )
+
+    # The VNet is shared infrastructure and is left in place on rollback
+    steps = [Step('vnet', create_vnet)]
+    for vm_name in vm_names:
+        steps.append(nic_step(vm_name))
+        steps.append(vm_step(vm_name))
+    return Plan(steps, max_parallel=max_parallel)
+
+
+class FleetManager:
+    """Runs fleet plans in the background so HTTP requests return immediately."""
+
+    def __init__(self, ttl=FLEET_TTL, max_kept=FLEET_MAX_KEPT):
+        self.ttl = ttl
+        self.max_kept = max_kept
+        self.fleets = {}
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        """Forget finished fleets past the TTL, then the oldest finished ones over the cap (lock held)."""
+        cutoff = time.time() - self.ttl
+        for fleet_id in [i for i, r in self.fleets.items() if r['finished'] and r['finished'] < cutoff]:
+            del self.fleets[fleet_id]
+        excess = len(self.fleets) - self.max_kept
+        if excess > 0:
+            finished = sorted((r['finished'], i) for i, r in self.fleets.items() if r['finished'])
+            for _, fleet_id in finished[:excess]:
+                del self.fleets[fleet_id]
+
+    def submit(self, plan):
+        fleet_id = uuid.uuid4().hex[:12]
+        record = {'id': fleet_id, 'plan': plan, 'created': time.time(), 'finished': None, 'error': None}
+        with self._lock:
+            self.fleets[fleet_id] = record
+            self._evict()
+
+        def run():
+            try:
+                plan.execute()
+            except Exception as e:
+                record['error'] = str(e)
+            finally:
+                record['finished'] = time.time()
+
+        threading.Thread(target=run, name=f'fleet-{fleet_id}', daemon=True).start()
+        return fleet_id
+
+    def describe(self, fleet_id):
+        """Status of a fleet, or None once it is unknown or evicted."""
+        with self._lock:
+            self._evict()
+            record = self.fleets.get(fleet_id)
+        if record is None:
+            return None
+        return {
+            'fleet_id': fleet_id,
+            'created': record['created'],
+            'finished': record['finished'],
+            'error': record['error'],
+            **record['plan'].describe(),
+        }
@@ -0,0 +1,134 @@
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import azure.cognitiveservices.speech as speechsdk
+
+logger = logging.getLogger()
+
+# format name -> (SDK output format, MIME type)
+OUTPUT_FORMATS = {
+    'mp3': (speechsdk.SpeechSynthesisOutputFormat.Audio24Khz48KBitRateMonoMp3, 'audio/mpeg'),
+    'opus': (speechsdk.SpeechSynthesisOutputFormat.Ogg24Khz16BitMonoOpus, 'audio/ogg'),
+    'webm': (speechsdk.SpeechSynthesisOutputFormat.Webm24Khz16BitMonoOpus, 'audio/webm'),
+    'wav': (speechsdk.SpeechSynthesisOutputFormat.Riff24Khz16BitMonoPcm, 'audio/wav'),
+    'pcm': (speechsdk.SpeechSynthesisOutputFormat.Raw24Khz16BitMonoPcm, 'audio/L16;rate=24000'),
+}
+DEFAULT_VOICE = 'en-IN-NeerjaNeural'
+STREAM_CHUNK_SIZE = 8192
+
+
+class SynthesisError(Exception):
+    """Raised when the Speech service cancels a synthesis."""
+
+
+def _cancellation_message(details):
+    if details is None:
+        return 'Unknown error'
+    return details.error_details or str(details.reason)
+
+
+class SynthesizerPool:
+    """Reusable in-memory SpeechSynthesizers keyed by (voice, format).
+
+    Creating a SpeechConfig/SpeechSynthesizer costs a connection setup per
+    request; here idle synthesizers are handed back out, and one is only
+    built when every pooled instance for that key is busy.
+    """
+
+    def __init__(self, subscription_key, region, max_idle_per_key=4):
+        self.subscription_key = subscription_key
+        self.region = region
+        self.max_idle_per_key = max_idle_per_key
+        self._configs = {}
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _config(self, voice, fmt):
+        key = (voice, fmt)
+        if key not in self._configs:
+            config = speechsdk.SpeechConfig(subscription=self.subscription_key, region=self.region)
+            config.speech_synthesis_voice_name = voice
+            config.set_speech_synthesis_output_format(OUTPUT_FORMATS[fmt][0])
+            self._configs[key] = config
+        return self._configs[key]
+
+    def checkout(self, voice=DEFAULT_VOICE, fmt='wav'):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported audio format '{fmt}'")
+        key = (voice, fmt)
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if idle:
+                return idle.pop()
+            config = self._config(voice, fmt)
+        # audio_config=None keeps the audio in memory instead of a file/speaker
+        return speechsdk.SpeechSynthesizer(speech_config=config, audio_config=None)
+
+    def checkin(self, synthesizer, voice=DEFAULT_VOICE, fmt='wav'):
+        with self._lock:
+            idle = self._idle.setdefault((voice, fmt), deque())
+            if len(idle) < self.max_idle_per_key:
+                idle.append(synthesizer)
+
+    @contextmanager
+    def acquire(self, voice=DEFAULT_VOICE, fmt='wav'):
+        """Borrow a synthesizer; it is only returned to the pool on success."""
+        synthesizer = self.checkout(voice, fmt)
+        yield synthesizer
+        self.checkin(synthesizer, voice, fmt)
+
+    def synthesize(self, text, voice=DEFAULT_VOICE, fmt='wav', ssml=False):
+        """Synthesize text (or an SSML document) and return the complete audio as bytes."""
+        with self.acquire(voice, fmt) as synthesizer:
+            speak = synthesizer.speak_ssml_async if ssml else synthesizer.speak_text_async
+            result = speak(text).get()
+            if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+                raise SynthesisError(_cancellation_message(result.cancellation_details))
+            return result.audio_data
+
+    def stream(self, text, voice=DEFAULT_VOICE, fmt='mp3', chunk_size=STREAM_CHUNK_SIZE):
+        """Start synthesis and return an iterator of audio chunks.
+
+        The first chunk is read before returning so service errors surface as
+        SynthesisError while an HTTP status can still be sent; the rest are
+        yielded as the service produces them.
+        """
+        synthesizer = self.checkout(voice, fmt)
+        try:
+            result = synthesizer.start_speaking_text_async(text).get()
+            if result.reason == speechsdk.ResultReason.Canceled:
+                raise SynthesisError(_cancellation_message(result.cancellation_details))
+            audio_stream = speechsdk.AudioDataStream(result)
+            first = self._read(audio_stream, chunk_size)
+        except Exception:
+            synthesizer.stop_speaking_async().get()
+            raise
+        return self._iter_stream(synthesizer, voice, fmt, audio_stream, first, chunk_size)
+
+    @staticmethod
+    def _read(audio_stream, chunk_size):
+        buffer = bytes(chunk_size)
+        filled = audio_stream.read_data(buffer)
+        if filled == 0 and audio_stream.status == speechsdk.StreamStatus.Canceled:
+            raise SynthesisError(_cancellation_message(audio_stream.cancellation_details))
+        return buffer[:filled]
+
+    def _iter_stream(self, synthesizer, voice, fmt, audio_stream, chunk, chunk_size):
+        completed = False
+        try:
+            while chunk:
+                yield chunk
+                chunk = self._read(audio_stream, chunk_size)
+            completed = True
+        except SynthesisError as e:
+            # Re-raise so the truncated response is visible to the client and callers
+            logger.error(f"Speech stream interrupted: {e}")
+            raise
+        finally:
+            if completed:
+                self.checkin(synthesizer, voice, fmt)
+            else:
+                # Client went away or the service failed - stop billing for audio nobody hears
+                synthesizer.stop_speaking_async().get()
@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from werkzeug.utils import secure_filename
+
+logger = logging.getLogger()
+
+# Concurrent synthesis calls across all batch jobs
+BATCH_WORKERS = int(os.getenv('TTS_BATCH_WORKERS', '8'))
+# Requests per second allowed against the Speech resource (keep below its quota)
+BATCH_RATE_LIMIT = float(os.getenv('TTS_BATCH_RPS', '15'))
+BATCH_MAX_ATTEMPTS = int(os.getenv('TTS_BATCH_MAX_ATTEMPTS', '3'))
+BATCH_OUTPUT_DIR = os.getenv('TTS_BATCH_DIR', os.path.join(os.getcwd(), 'tts_batches'))
+MAX_BATCH_ITEMS = int(os.getenv('TTS_BATCH_MAX_ITEMS', '100000'))
+# Finished jobs are forgotten after this many seconds, or sooner once more than BATCH_MAX_JOBS are kept
+BATCH_JOB_TTL = int(os.getenv('TTS_BATCH_JOB_TTL', str(24 * 3600)))
+BATCH_MAX_JOBS = int(os.getenv('TTS_BATCH_MAX_JOBS', '200'))
+
+
+class RateLimiter:
+    """Token bucket shared by every batch worker."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def parse_items(payload=None, upload=None, default_voice=None, default_format='mp3'):
+    """Build batch items from a JSON list or an uploaded CSV/JSONL file.
+
+    Each item needs text; a missing id becomes the item's position, and
+    voice and format fall back to the request-level defaults.
+    """
+    rows = []
+    if upload is not None:
+        content = upload.read().decode('utf-8-sig')
+        if (upload.filename or '').lower().endswith('.csv'):
+            rows = list(csv.DictReader(io.StringIO(content)))
+        else:
+            rows = [json.loads(line) for line in content.splitlines() if line.strip()]
+    elif payload:
+        rows = payload
+
+    if not rows:
+        raise ValueError('No batch items provided')
+    if not isinstance(rows, list):
+        raise ValueError('Batch items must be a list')
+    if len(rows) > MAX_BATCH_ITEMS:
+        raise ValueError(f'Batch exceeds {MAX_BATCH_ITEMS} items')
+
+    items, seen = [], set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise ValueError(f'Item {index} must be an object')
+        item_id = row.get('id')
+        # CSV leaves an empty column as '', JSON as null; 0 is a real id
+        item_id = str(index if item_id is None or item_id == '' else item_id)
+        if not isinstance(row.get('text'), str) or not row['text'].strip():
+            raise ValueError(f"Item '{item_id}' has no text")
+        if item_id in seen:
+            raise ValueError(f"Duplicate item id '{item_id}'")
+        seen.add(item_id)
+        items.append({
+            'id': item_id,
+            'text': row['text'],
+            'voice': row.get('voice') or default_voice,
+            'format': row.get('format') or default_format,
+        })
+    return items
+
+
+class LocalOutput:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+
+class BlobOutput:
+    def __init__(self, container_client, prefix=''):
+        self.container_client = container_client
+        self.prefix = prefix
+
+    def write(self, name, data):
+        blob_client = self.container_client.get_blob_client(self.prefix + name)
+        blob_client.upload_blob(data, overwrite=True)
+        return blob_client.url
+
+
+class BatchJob:
+    def __init__(self, items):
+        self.id = uuid.uuid4().hex[:12]
+        self.items = items
+        self.output = None
+        self.created = time.time()
+        self.finished = None
+        self.cancelled = False
+        self.results = {}
+        self.manifest_location = None
+        self._lock = threading.Lock()
+        self._remaining = len(items)
+        # Index of the next item a worker will take (guarded by the manager's queue lock)
+        self.next_index = 0
+
+    def record(self, item_id, result):
+        with self._lock:
+            self.results[item_id] = result
+            self._remaining -= 1
+            return self._remaining == 0
+
+    @property
+    def status(self):
+        if self.finished:
+            return 'cancelled' if self.cancelled else 'completed'
+        return 'cancelling' if self.cancelled else 'running'
+
+    def progress(self):
+        with self._lock:
+            results = list(self.results.values())
+        succeeded = sum(1 for r in results if r['status'] == 'succeeded')
+        failed = sum(1 for r in results if r['status'] == 'failed')
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': len(self.items),
+            'succeeded': succeeded,
+            'failed': failed,
+            'skipped': len(results) - succeeded - failed,
+            'pending': len(self.items) - len(results),
+            'created': self.created,
+            'finished': self.finished,
+        }
+
+    def manifest(self):
+        return {
+            **self.progress(),
+            'items': [{'id': item['id'], **self.results.get(item['id'], {'status': 'pending'})} for item in self.items],
+        }
+
+
+class BatchManager:
+    """Runs batch TTS jobs on a shared, rate-limited set of workers.
+
+    synthesize(text, voice, fmt) returns audio bytes. Work happens on
+    background threads, so submit() returns immediately with the job.
+    Workers take one item at a time from each running job in turn, so a
+    large job cannot hold back one submitted after it, and only the items
+    being synthesized are in flight.
+    """
+
+    def __init__(self, synthesize, workers=BATCH_WORKERS, rate_limit=BATCH_RATE_LIMIT,
+                 max_attempts=BATCH_MAX_ATTEMPTS, job_ttl=BATCH_JOB_TTL, max_jobs=BATCH_MAX_JOBS):
+        self.synthesize = synthesize
+        self.max_attempts = max_attempts
+        self.limiter = RateLimiter(rate_limit)
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.workers = workers
+        self._lock = threading.Lock()
+        # Jobs with items not yet taken by a worker, in round-robin order
+        self._queue = deque()
+        self._ready = threading.Condition()
+        self._threads = []
+
+    def _evict(self):
+        """Forget finished jobs past the TTL, then the oldest finished ones over the cap (lock held)."""
+        cutoff = time.time() - self.job_ttl
+        for job_id in [i for i, job in self.jobs.items() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
+        excess = len(self.jobs) - self.max_jobs
+        if excess > 0:
+            finished = sorted((job.finished, i) for i, job in self.jobs.items() if job.finished)
+            for _, job_id in finished[:excess]:
+                del self.jobs[job_id]
+
+    def list_jobs(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def submit(self, items, make_output):
+        """Queue items; make_output(job_id) returns the LocalOutput/BlobOutput to write to."""
+        job = BatchJob(items)
+        job.output = make_output(job.id)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._evict()
+        with self._ready:
+            self._start_workers()
+            self._queue.append(job)
+            self._ready.notify_all()
+        logger.info(f"TTS batch {job.id} queued with {len(items)} items")
+        return job
+
+    def cancel(self, job_id):
+        """Skip the items no worker has taken yet; items in flight still finish."""
+        job = self.jobs[job_id]
+        with self._ready:
+            job.cancelled = True
+            if job in self._queue:
+                self._queue.remove(job)
+            skipped, job.next_index = job.items[job.next_index:], len(job.items)
+        finished = False
+        for item in skipped:
+            finished = job.record(item['id'], {'status': 'skipped', 'attempts': 0}) or finished
+        if finished:
+            self._finish(job)
+        return job
+
+    def _start_workers(self):
+        # Called with self._ready held
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'tts-batch-{len(self._threads)}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_item(self):
+        """Block until some job has an untaken item, then take it and move that job to the back."""
+        with self._ready:
+            while not self._queue:
+                self._ready.wait()
+            job = self._queue.popleft()
+            index = job.next_index
+            job.next_index += 1
+            if job.next_index < len(job.items):
+                self._queue.append(job)
+            return job, index
+
+    def _work(self):
+        while True:
+            job, index = self._next_item()
+            item = job.items[index]
+            if job.record(item['id'], self._synthesize_item(job, index, item)):
+                self._finish(job)
+
+    def _synthesize_item(self, job, index, item):
+        # Ids that sanitize to the same name ('a/b', 'a_b') would overwrite each other without the position
+        name = f"{index:06d}-{secure_filename(item['id']) or 'item'}.{item['format']}"
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.limiter.acquire()
+                audio = self.synthesize(item['text'], item['voice'], item['format'])
+                location = job.output.write(name, audio)
+                return {'status': 'succeeded', 'attempts': attempt, 'location': location, 'bytes': len(audio)}
+            except Exception as e:
+                last_error = str(e)
+                logger.warning(f"TTS batch {job.id} item '{item['id']}' attempt {attempt} failed: {e}")
+                if attempt < self.max_attempts:
+                    time.sleep(min(2 ** attempt, 30))
+        return {'status': 'failed', 'attempts': self.max_attempts, 'error': last_error}
+
+    def _finish(self, job):
+        job.finished = time.time()
+        try:
+            job.manifest_location = job.output.write('manifest.json', json.dumps(job.manifest(), indent=2).encode('utf-8'))
+        except Exception as e:
+            logger.error(f"Failed to write manifest for TTS batch {job.id}: {e}")
+        logger.info(f"TTS batch {job.id} {job.status}: {job.progress()}")
@@ -0,0 +1,211 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+# Hot phrases kept in process memory
+MEMORY_CACHE_BYTES = int(os.getenv('TTS_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+# Everything else spills to disk, evicted least-recently-used past this size, and
+# survives restarts; set TTS_CACHE_DIR to an empty string to keep only the memory tier
+DISK_CACHE_BYTES = int(os.getenv('TTS_CACHE_DISK_BYTES', str(1024 * 1024 * 1024)))
+DISK_CACHE_DIR = os.getenv('TTS_CACHE_DIR', os.path.join(os.getcwd(), 'tts_cache'))
+
+
+def normalize_text(text):
+    """Canonical form of a prompt: NFC, collapsed whitespace, trimmed."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def cache_key(text, voice, fmt):
+    digest = hashlib.sha256()
+    for part in (voice, fmt, normalize_text(text)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class MemoryTier:
+    """Byte-bounded LRU of audio clips."""
+
+    name = 'memory'
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskTier:
+    """Audio files under a directory, evicted least-recently-used once over max_bytes.
+
+    The recency order lives in memory, seeded once from file mtimes at
+    startup; reads still touch the mtime so the order survives a restart.
+    """
+
+    name = 'disk'
+
+    def __init__(self, directory, max_bytes=DISK_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.endswith('.tmp'):
+                    stat = os.stat(os.path.join(root, name))
+                    found.append((stat.st_mtime, name, stat.st_size))
+        # Oldest first, so eviction pops from the front
+        self._sizes = OrderedDict((name, size) for _, name, size in sorted(found))
+        self.size = sum(self._sizes.values())
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self._sizes.pop(key, 0)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if key in self._sizes:
+                self._sizes.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.size += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        while self._sizes and self.size > self.max_bytes * 0.9:
+            key, size = self._sizes.popitem(last=False)
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def __len__(self):
+        return len(self._sizes)
+
+
+class SpeechCache:
+    """Tiered cache of synthesized audio keyed by (normalized text, voice, format).
+
+    Lookups walk the tiers in order and promote hits into the faster ones.
+    Per-tier hit counts, bytes served and lookup latency are kept for stats().
+    """
+
+    def __init__(self, tiers=None):
+        if tiers is None:
+            tiers = [MemoryTier()]
+            if DISK_CACHE_DIR:
+                tiers.append(DiskTier(DISK_CACHE_DIR))
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self._stats = {tier.name: {'hits': 0, 'bytes': 0, 'latency_ms': 0.0} for tier in tiers}
+        self._misses = 0
+        self._synth = {'count': 0, 'latency_ms': 0.0}
+
+    def get(self, key):
+        """Return (audio, tier name) or (None, None)."""
+        for i, tier in enumerate(self.tiers):
+            started = time.perf_counter()
+            data = tier.get(key)
+            if data is None:
+                continue
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                stats = self._stats[tier.name]
+                stats['hits'] += 1
+                stats['bytes'] += len(data)
+                stats['latency_ms'] += elapsed
+            for faster in self.tiers[:i]:
+                faster.put(key, data)
+            return data, tier.name
+        with self._lock:
+            self._misses += 1
+        return None, None
+
+    def put(self, key, data):
+        for tier in self.tiers:
+            try:
+                tier.put(key, data)
+            except OSError as e:
+                logger.warning(f"TTS cache write to {tier.name} tier failed: {e}")
+
+    def record_synthesis(self, elapsed_ms):
+        with self._lock:
+            self._synth['count'] += 1
+            self._synth['latency_ms'] += elapsed_ms
+
+    def stats(self):
+        with self._lock:
+            hits = sum(s['hits'] for s in self._stats.values())
+            lookups = hits + self._misses
+            return {
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'hits': hits,
+                'misses': self._misses,
+                'bytes_saved': sum(s['bytes'] for s in self._stats.values()),
+                'tiers': {
+                    tier.name: {
+                        'entries': len(tier),
+                        'size_bytes': tier.size,
+                        'max_bytes': tier.max_bytes,
+                        'hits': self._stats[tier.name]['hits'],
+                        'avg_latency_ms': round(self._stats[tier.name]['latency_ms'] / self._stats[tier.name]['hits'], 3)
+                        if self._stats[tier.name]['hits'] else None,
+                    } for tier in self.tiers
+                },
+                'synthesis': {
+                    'count': self._synth['count'],
+                    'avg_latency_ms': round(self._synth['latency_ms'] / self._synth['count'], 1)
+                    if self._synth['count'] else None,
+                },
+            }
@@ -0,0 +1,200 @@
+import logging
+import os
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+# Characters per synthesis request; well under the service's per-request limits
+MAX_CHUNK_CHARS = int(os.getenv('TTS_LONGFORM_CHUNK_CHARS', '800'))
+# Chunks synthesized at once for a single document
+MAX_PARALLEL = int(os.getenv('TTS_LONGFORM_PARALLEL', '4'))
+
+# Raw PCM produced for the 'pcm' output format
+SAMPLE_RATE = 24000
+BITS_PER_SAMPLE = 16
+CHANNELS = 1
+
+_SENTENCE_END = re.compile(r'(?<=[.!?。！？])["\')\]]*\s+')
+_SSML_WRAPPER = re.compile(r'^\s*((?:<\?xml[^>]*>\s*)?<speak\b[^>]*>)(.*?)(</speak>\s*)$', re.S)
+_SSML_TOKEN = re.compile(r'<!--.*?-->|<[^>]*>|[^<]+', re.S)
+_TAG_NAME = re.compile(r'</?\s*([\w:.-]+)')
+# Elements a chunk may end right after
+_SSML_BOUNDARY_TAGS = ('p', 's', 'voice', 'break')
+
+
+def is_ssml(text):
+    return text.lstrip().startswith(('<speak', '<?xml'))
+
+
+def _split_sentences(text):
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _sentence_pieces(text):
+    # Like _split_sentences, but keeps the whitespace so the pieces join back into the text
+    pieces, start = [], 0
+    for match in _SENTENCE_END.finditer(text):
+        pieces.append(text[start:match.end()])
+        start = match.end()
+    pieces.append(text[start:])
+    return [piece for piece in pieces if piece]
+
+
+def _ssml_segments(body):
+    """Cut an SSML body after </p>, </s>, </voice>, <break/> and at sentence ends.
+
+    Returns (open_before, markup, has_text, open_after) per segment, where
+    the open lists hold (name, opening tag) of the elements open at each
+    end of the segment.
+    """
+    segments, stack = [], []
+    markup, open_before, has_text = '', [], False
+
+    def cut():
+        nonlocal markup, open_before, has_text
+        if markup:
+            segments.append((open_before, markup, has_text, list(stack)))
+        markup, open_before, has_text = '', list(stack), False
+
+    for token in _SSML_TOKEN.findall(body):
+        if not token.startswith('<'):
+            for piece in _sentence_pieces(token):
+                markup += piece
+                has_text = has_text or bool(piece.strip())
+                if _SENTENCE_END.search(piece):
+                    cut()
+            continue
+        markup += token
+        if token.startswith(('<!', '<?')):
+            continue
+        name = _TAG_NAME.match(token).group(1)
+        if token.startswith('</'):
+            while stack and stack.pop()[0] != name:
+                pass
+        elif not token.endswith('/>'):
+            stack.append((name, token))
+        if name in _SSML_BOUNDARY_TAGS and (token.startswith('</') or token.endswith('/>')):
+            cut()
+    cut()
+    return segments
+
+
+def _pack_ssml(segments, max_chars):
+    """Join segments into chunks of about max_chars, each closing and reopening the elements open at its cuts."""
+    chunks, current = [], []
+
+    def close():
+        if any(has_text for _, _, has_text, _ in current):
+            chunks.append(''.join(tag for _, tag in current[0][0]) + ''.join(m for _, m, _, _ in current) +
+                          ''.join(f'</{name}>' for name, _ in reversed(current[-1][3])))
+
+    for segment in segments:
+        size = sum(len(m) for _, m, _, _ in current)
+        # Segments without text (closing tags, breaks) stay with the chunk before them
+        if current and segment[2] and size + len(segment[1]) > max_chars and \
+                any(has_text for _, _, has_text, _ in current):
+            close()
+            current = []
+        current.append(segment)
+    if current:
+        close()
+    return chunks
+
+
+def _pack(pieces, max_chars, joiner):
+    chunks, current = [], ''
+    for piece in pieces:
+        piece = piece.strip()
+        candidate = f'{current}{joiner}{piece}' if current else piece
+        if current and len(candidate) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text, max_chars=MAX_CHUNK_CHARS):
+    """Split plain text or SSML into chunks of at most ~max_chars.
+
+    Plain text is cut at sentence ends. SSML is cut after </p>, </s>,
+    </voice> and <break/> and at sentence ends; each chunk is wrapped in
+    the document's <speak> element and closes and reopens the elements
+    (<voice>, <p>, <prosody>, ...) open at its cuts, so it is valid on its
+    own and keeps its own voice. A single sentence longer than max_chars
+    is kept whole.
+    """
+    if max_chars <= 0:
+        raise ValueError('max_chars must be a positive number of characters')
+    if is_ssml(text):
+        match = _SSML_WRAPPER.match(text)
+        if not match:
+            raise ValueError('Unsupported SSML document structure')
+        prefix, body, suffix = match.groups()
+        return [f'{prefix}{chunk}{suffix}' for chunk in _pack_ssml(_ssml_segments(body), max_chars)]
+    return _pack(_split_sentences(text.strip()), max_chars, ' ')
+
+
+def wav_header(data_size=None):
+    """RIFF/WAVE header for 24 kHz 16-bit mono PCM.
+
+    Pass the PCM byte count for an exact header; with None the sizes are
+    set to the 0xFFFFFFFF 'unknown length' convention used for streaming.
+    """
+    block_align = CHANNELS * BITS_PER_SAMPLE // 8
+    byte_rate = SAMPLE_RATE * block_align
+    riff_size = 0xFFFFFFFF if data_size is None else 36 + data_size
+    data_size = 0xFFFFFFFF if data_size is None else data_size
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', riff_size, b'WAVE', b'fmt ', 16, 1, CHANNELS,
+                       SAMPLE_RATE, byte_rate, block_align, BITS_PER_SAMPLE, b'data', data_size)
+
+
+def synthesize_ordered(chunks, synthesize, max_parallel=MAX_PARALLEL):
+    """Synthesize chunks concurrently and yield their PCM in document order.
+
+    synthesize(chunk) must return raw PCM bytes. Each segment is yielded as
+    soon as it and every segment before it are done, so the first audio is
+    available after the first chunk rather than after the whole document.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = [pool.submit(synthesize, chunk) for chunk in chunks]
+        try:
+            for index, future in enumerate(futures):
+                pcm = future.result()
+                logger.debug(f"Long-form segment {index + 1}/{len(futures)} ready ({len(pcm)} bytes)")
+                yield pcm
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def stream_wav(chunks, synthesize, max_parallel=MAX_PARALLEL):
+    """Yield a streaming WAV: an open-ended header, then PCM segments in order.
+
+    The header promises no length, so a failure part-way cannot be told
+    apart from the end of the audio by the bytes alone. The error is logged
+    and re-raised instead. A server using chunked transfer encoding
+    (gunicorn, waitress) then drops the connection before the final chunk,
+    which clients see as an incomplete transfer: fetch() rejects and curl
+    exits with code 18. The Flask development server closes the connection
+    either way, so there the failure only shows in the log.
+    """
+    yield wav_header()
+    sent = 0
+    try:
+        for pcm in synthesize_ordered(chunks, synthesize, max_parallel):
+            yield pcm
+            sent += 1
+    except Exception as e:
+        logger.error(f"Long-form stream aborted after {sent} of {len(chunks)} segments: {e}")
+        raise
+
+
+def build_wav(chunks, synthesize, max_parallel=MAX_PARALLEL):
+    """Return a complete WAV file with exact sizes in its header."""
+    pcm = b''.join(synthesize_ordered(chunks, synthesize, max_parallel))
+    return wav_header(len(pcm)) + pcm
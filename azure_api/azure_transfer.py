@@ -0,0 +1,219 @@
+import base64
+import glob
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobBlock, ContentSettings
+
+logger = logging.getLogger()
+
+# Parallel connections used for a single blob
+MAX_CONCURRENCY = int(os.getenv('AZURE_TRANSFER_CONCURRENCY', '8'))
+# Block size for staged uploads (Azure allows up to 4000 MiB per block)
+BLOCK_SIZE = int(os.getenv('AZURE_TRANSFER_BLOCK_SIZE', str(8 * 1024 * 1024)))
+# Files at or below this size go up in a single Put Blob request
+SINGLE_PUT_SIZE = int(os.getenv('AZURE_TRANSFER_SINGLE_PUT_SIZE', str(8 * 1024 * 1024)))
+# Files transferred at once by directory/glob/container operations
+MAX_FILES_IN_FLIGHT = int(os.getenv('AZURE_TRANSFER_FILES_IN_FLIGHT', '4'))
+
+_READ_CHUNK = 1024 * 1024
+
+
+# --- Helpers ---
+def file_md5(path):
+    """MD5 digest of a local file, read in chunks."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_READ_CHUNK), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def remote_md5(blob_client):
+    """Stored Content-MD5 of a blob, or None if it doesn't exist or has none."""
+    try:
+        properties = blob_client.get_blob_properties()
+    except ResourceNotFoundError:
+        return None
+    md5 = properties.content_settings.content_md5
+    return bytes(md5) if md5 else None
+
+
+def _block_id(md5, block_size, index):
+    # Block ids encode the file hash and block size so a changed file or a
+    # different block size never resumes into mismatched staged blocks
+    raw = f"{md5.hex()[:16]}-{block_size:010d}-{index:06d}"
+    return base64.b64encode(raw.encode('ascii')).decode('ascii')
+
+
+def _content_settings(path, md5, content_type=None):
+    if not content_type:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return ContentSettings(content_type=content_type, content_md5=bytearray(md5))
+
+
+# --- Upload ---
+def _staged_upload(blob_client, path, md5, size, block_size, max_concurrency, content_settings):
+    block_count = (size + block_size - 1) // block_size
+    block_ids = [_block_id(md5, block_size, i) for i in range(block_count)]
+
+    # Blocks already staged by an interrupted run can be reused as-is
+    try:
+        _, uncommitted = blob_client.get_block_list('uncommitted')
+        staged = {block.id: block.size for block in uncommitted}
+    except ResourceNotFoundError:
+        staged = {}
+
+    def expected_size(index):
+        return min(block_size, size - index * block_size)
+
+    pending = [i for i in range(block_count) if staged.get(block_ids[i]) != expected_size(i)]
+    if len(pending) < block_count:
+        logger.info(f"Resuming upload of '{path}': {block_count - len(pending)}/{block_count} blocks already staged")
+
+    def stage(index):
+        with open(path, 'rb') as f:
+            f.seek(index * block_size)
+            data = f.read(expected_size(index))
+        blob_client.stage_block(block_ids[index], data, length=len(data))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        for future in as_completed([pool.submit(stage, i) for i in pending]):
+            future.result()
+
+    blob_client.commit_block_list([BlobBlock(block_id=b) for b in block_ids], content_settings=content_settings)
+    return len(pending)
+
+
+def upload_file(container_client, file_path, blob_name=None, max_concurrency=MAX_CONCURRENCY,
+                block_size=BLOCK_SIZE, overwrite=True, skip_unchanged=True, content_type=None):
+    """Upload one file; returns 'skipped' or 'uploaded'.
+
+    Small files use a single Put Blob. Larger ones are staged in block_size
+    blocks over max_concurrency threads and committed at the end, so a
+    re-run after a failure only sends the blocks that are missing.
+    """
+    blob_name = blob_name or os.path.basename(file_path)
+    blob_client = container_client.get_blob_client(blob_name)
+    md5 = file_md5(file_path)
+
+    existing = remote_md5(blob_client) if (skip_unchanged or not overwrite) else None
+    if existing is not None:
+        if skip_unchanged and existing == md5:
+            logger.info(f"Skipping '{file_path}': unchanged")
+            return 'skipped'
+        if not overwrite:
+            raise FileExistsError(f"Blob '{blob_name}' already exists")
+
+    size = os.path.getsize(file_path)
+    content_settings = _content_settings(file_path, md5, content_type)
+    if size <= SINGLE_PUT_SIZE:
+        with open(file_path, 'rb') as f:
+            blob_client.upload_blob(f, length=size, overwrite=True, content_settings=content_settings,
+                                    max_concurrency=max_concurrency)
+    else:
+        _staged_upload(blob_client, file_path, md5, size, block_size, max_concurrency, content_settings)
+    return 'uploaded'
+
+
+def _run_bounded(jobs, max_files):
+    """Run (key, callable) jobs through a bounded pool; returns {key: result or error}."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_files) as pool:
+        futures = {pool.submit(fn): key for key, fn in jobs}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logger.error(f"Transfer failed for '{key}': {e}")
+                results[key] = f'error: {e}'
+    return results
+
+
+def upload_glob(container_client, pattern, root=None, prefix='', max_files=MAX_FILES_IN_FLIGHT, **kwargs):
+    """Upload every file matching a glob pattern; blob names are relative to root."""
+    paths = [p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p)]
+    root = root or os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths] or ['.'])
+
+    def job(path):
+        relative = os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/')
+        return lambda: upload_file(container_client, path, blob_name=prefix + relative, **kwargs)
+
+    return _run_bounded([(path, job(path)) for path in paths], max_files)
+
+
+def upload_directory(container_client, directory, prefix='', max_files=MAX_FILES_IN_FLIGHT, **kwargs):
+    """Upload a directory tree, preserving relative paths as blob names."""
+    directory = os.path.abspath(directory)
+    return upload_glob(container_client, os.path.join(directory, '**', '*'), root=directory,
+                       prefix=prefix, max_files=max_files, **kwargs)
+
+
+# --- Download ---
+def download_file(container_client, blob_name, file_path, max_concurrency=MAX_CONCURRENCY, skip_unchanged=True):
+    """Download one blob to a local path; returns 'skipped' or 'downloaded'."""
+    blob_client = container_client.get_blob_client(blob_name)
+    if skip_unchanged and os.path.exists(file_path):
+        existing = remote_md5(blob_client)
+        if existing is not None and existing == file_md5(file_path):
+            logger.info(f"Skipping '{blob_name}': local copy unchanged")
+            return 'skipped'
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    partial = file_path + '.partial'
+    try:
+        with open(partial, 'wb') as f:
+            container_client.download_blob(blob_name, max_concurrency=max_concurrency).readinto(f)
+        os.replace(partial, file_path)
+    except BaseException:
+        # Leave no half-written file behind; the next attempt starts over
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return 'downloaded'
+
+
+def download_prefix(container_client, directory, prefix='', max_files=MAX_FILES_IN_FLIGHT, **kwargs):
+    """Download every blob under prefix into directory."""
+    def job(name):
+        target = os.path.join(directory, *name[len(prefix):].lstrip('/').split('/'))
+        return lambda: download_file(container_client, name, target, **kwargs)
+
+    names = [blob.name for blob in container_client.list_blobs(name_starts_with=prefix or None)]
+    return _run_bounded([(name, job(name)) for name in names], max_files)
+
+
+# --- Copy ---
+def copy_blob(source_blob_client, dest_blob_client, poll_interval=1.0, timeout=600):
+    """Server-side copy; the source must be readable by the service (same account or SAS URL)."""
+    dest_blob_client.start_copy_from_url(source_blob_client.url)
+    deadline = time.monotonic() + timeout
+    while True:
+        copy = dest_blob_client.get_blob_properties().copy
+        if copy.status != 'pending':
+            break
+        if time.monotonic() > deadline:
+            dest_blob_client.abort_copy(copy.id)
+            raise TimeoutError(f"Copy to '{dest_blob_client.blob_name}' timed out")
+        time.sleep(poll_interval)
+    if copy.status != 'success':
+        raise RuntimeError(f"Copy to '{dest_blob_client.blob_name}' {copy.status}: {copy.status_description}")
+    return 'copied'
+
+
+def copy_prefix(source_container_client, dest_container_client, prefix='', dest_prefix='',
+                max_files=MAX_FILES_IN_FLIGHT, **kwargs):
+    """Copy every blob under prefix to another container."""
+    def job(name):
+        dest_name = dest_prefix + name[len(prefix):]
+        return lambda: copy_blob(source_container_client.get_blob_client(name),
+                                 dest_container_client.get_blob_client(dest_name), **kwargs)
+
+    names = [blob.name for blob in source_container_client.list_blobs(name_starts_with=prefix or None)]
+    return _run_bounded([(name, job(name)) for name in names], max_files)
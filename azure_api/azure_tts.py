@@ -1,7 +1,7 @@
 import logging
 import os
 import json
-from azure.identity import AzureCliCredential
+from azure_clients import get_credential, get_management_client
 from azure.mgmt.compute import ComputeManagementClient
 from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.storage import StorageManagementClient
@@ -12,19 +12,19 @@ import azure.cognitiveservices.speech as speechsdk
 logging.basicConfig(filename='azure_operations.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-# Use Azure CLI to authenticate
-credential = AzureCliCredential()
+# Use Azure CLI to authenticate (shared, token-caching credential)
+credential = get_credential()
 
 # Replace these with your actual Azure details
 subscription_id = ""  # Set your Azure subscription ID
 resource_group_name = ''
 location = 'West US 2'  # Use the region of your VM
 
-# Initialize the Azure management clients
-resource_client = ResourceManagementClient(credential, subscription_id)
-compute_client = ComputeManagementClient(credential, subscription_id)
-storage_client = StorageManagementClient(credential, subscription_id)
-network_client = NetworkManagementClient(credential, subscription_id)
+# Initialize the Azure management clients (pooled and shared across modules)
+resource_client = get_management_client(ResourceManagementClient, subscription_id)
+compute_client = get_management_client(ComputeManagementClient, subscription_id)
+storage_client = get_management_client(StorageManagementClient, subscription_id)
+network_client = get_management_client(NetworkManagementClient, subscription_id)
 
 # --- Azure Text-to-Speech Operation ---
 def text_to_speech(text, subscription_key, region):
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger()
+
+# The voice list changes a few times a year; refresh daily in the background
+VOICE_CATALOG_TTL = int(os.getenv('TTS_VOICES_TTL', str(24 * 3600)))
+VOICE_LIST_TIMEOUT = float(os.getenv('TTS_VOICES_TIMEOUT', '10'))
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'voices_snapshot.json')
+
+
+def normalize_voice(raw):
+    """Project a REST voices/list entry onto the fields the UI uses."""
+    return {
+        'name': raw['ShortName'],
+        'display_name': raw.get('LocalName') or raw.get('DisplayName', ''),
+        'locale': raw['Locale'],
+        'language': raw.get('LocaleName', raw['Locale']),
+        'gender': raw.get('Gender', ''),
+        'voice_type': raw.get('VoiceType', ''),
+        'styles': raw.get('StyleList', []),
+    }
+
+
+def fetch_voices_rest(subscription_key, region, session=None):
+    """Fetch the full voice list from the Speech REST endpoint."""
+    url = f"https://{region}.tts.speech.microsoft.com/cognitiveservices/voices/list"
+    response = (session or requests).get(url, headers={'Ocp-Apim-Subscription-Key': subscription_key},
+                                         timeout=VOICE_LIST_TIMEOUT)
+    response.raise_for_status()
+    return [normalize_voice(raw) for raw in response.json()]
+
+
+class VoiceCatalog:
+    """Cached, indexed Azure voice list.
+
+    Served from memory; once older than ttl a background refresh is started
+    and the current list keeps being served until it lands. Starts from the
+    bundled snapshot so the catalog is usable offline or before the first
+    fetch succeeds.
+    """
+
+    def __init__(self, fetch, ttl=VOICE_CATALOG_TTL, snapshot_path=SNAPSHOT_PATH):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.source = 'empty'
+        self.loaded_at = 0
+        self.last_error = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._set([])
+        self._load_snapshot()
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                self._set(json.load(f))
+            self.source = 'snapshot'
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load voice snapshot {self.snapshot_path}: {e}")
+
+    def _set(self, voices):
+        voices = sorted(voices, key=lambda v: (v['locale'], v['name']))
+        by_locale, by_language, by_gender, by_style = {}, {}, {}, {}
+        for i, voice in enumerate(voices):
+            by_locale.setdefault(voice['locale'].lower(), set()).add(i)
+            by_language.setdefault(voice['locale'].split('-')[0].lower(), set()).add(i)
+            by_gender.setdefault(voice['gender'].lower(), set()).add(i)
+            for style in voice.get('styles') or []:
+                by_style.setdefault(style.lower(), set()).add(i)
+        body = json.dumps(voices, sort_keys=True).encode('utf-8')
+        state = {
+            'voices': voices,
+            'locale': by_locale,
+            'language': by_language,
+            'gender': by_gender,
+            'style': by_style,
+            'etag': hashlib.sha1(body).hexdigest(),
+        }
+        # Swap everything at once so readers never see a half-built index
+        with self._lock:
+            self._state = state
+
+    def _snapshot(self):
+        with self._lock:
+            return self._state
+
+    def refresh(self):
+        """Fetch the live list now; keeps the current list if the fetch fails."""
+        try:
+            voices = self.fetch()
+            if not voices:
+                raise ValueError('Voice list was empty')
+            self._set(voices)
+            self.source = 'live'
+            self.loaded_at = time.time()
+            self.last_error = None
+            logger.info(f"Voice catalog refreshed: {len(voices)} voices")
+        except Exception as e:
+            self.last_error = str(e)
+            # Back off for a tenth of the TTL rather than retrying on every request
+            self.loaded_at = time.time() - self.ttl * 0.9
+            logger.error(f"Voice catalog refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _maybe_refresh(self):
+        if time.time() - self.loaded_at < self.ttl:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name='voice-catalog-refresh', daemon=True).start()
+
+    @property
+    def etag(self):
+        return self._snapshot()['etag']
+
+    def query(self, locale=None, gender=None, style=None, search=None):
+        """Filter voices by locale (e.g. 'en' or 'en-US'), gender, style and name substring.
+
+        Returns (voices, etag), both taken from the same catalog version so a
+        refresh landing mid-request can't pair one list with another's ETag.
+        """
+        self._maybe_refresh()
+        state = self._snapshot()
+        matched = None
+        if locale:
+            locale = locale.lower()
+            index = state['locale'] if '-' in locale else state['language']
+            matched = set(index.get(locale, ()))
+        for field, value in (('gender', gender), ('style', style)):
+            if value:
+                ids = state[field].get(value.lower(), set())
+                matched = set(ids) if matched is None else matched & ids
+        voices = state['voices'] if matched is None else [state['voices'][i] for i in sorted(matched)]
+        if search:
+            needle = search.lower()
+            voices = [v for v in voices if needle in v['name'].lower() or needle in v['display_name'].lower()]
+        return voices, state['etag']
+
+    def status(self):
+        state = self._snapshot()
+        return {
+            'voices': len(state['voices']),
+            'source': self.source,
+            'loaded_at': self.loaded_at or None,
+            'etag': state['etag'],
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,56 @@
+import base64
+
+import pytest
+
+import app as tts
+from azure_speech_cache import MemoryTier, SpeechCache
+
+
+class StubPool:
+    def __init__(self):
+        self.calls = 0
+
+    def synthesize(self, text, voice=None, fmt='wav', ssml=False):
+        self.calls += 1
+        return f'{fmt}:{text}'.encode()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    pool = StubPool()
+    monkeypatch.setattr(tts, 'synthesizer_pool', pool)
+    monkeypatch.setattr(tts, 'speech_cache', SpeechCache([MemoryTier()]))
+    return tts.app.test_client(), pool
+
+
+def test_synthesize_returns_audio_bytes(client):
+    client, pool = client
+    response = client.post('/tts/synthesize', json={'text': 'Hello', 'format': 'mp3'})
+    assert response.status_code == 200
+    assert response.mimetype == 'audio/mpeg'
+    assert response.data == b'mp3:Hello'
+    assert response.headers['X-TTS-Cache'] == 'miss'
+
+    again = client.post('/tts/synthesize', json={'text': 'Hello', 'format': 'mp3'})
+    assert again.data == b'mp3:Hello' and again.headers['X-TTS-Cache'] == 'memory'
+    assert pool.calls == 1
+
+
+def test_synthesize_base64_only_on_request(client):
+    client, _ = client
+    response = client.post('/tts/synthesize', json={'text': 'Hello', 'encoding': 'base64'})
+    data = response.get_json()
+    assert data['success'] and data['format'] == 'wav'
+    assert base64.b64decode(data['audio']) == b'wav:Hello'
+
+
+def test_synthesize_rejects_unknown_formats(client):
+    client, _ = client
+    assert client.post('/tts/synthesize', json={'text': 'Hello', 'format': 'ogg-7'}).status_code == 400
+
+
+@pytest.mark.parametrize('max_parallel', [0, -3, 'many'])
+def test_fleet_rejects_bad_max_parallel(max_parallel):
+    response = tts.app.test_client().post('/vm/fleet', json={'count': 2, 'max_parallel': max_parallel})
+    assert response.status_code == 400
+    assert 'max_parallel' in response.get_json()['error']
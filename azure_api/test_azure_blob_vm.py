@@ -0,0 +1,33 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('AZURE_SUBSCRIPTION_ID', '00000000-0000-0000-0000-000000000000')
+
+import azure_blob_vm  # noqa: E402
+
+
+def test_slow_group_does_not_block_other_groups_and_shares_one_fetch(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch(group):
+        calls.append(group)
+        if group == 'slow':
+            started.set()
+            release.wait(5)
+        return [{'name': f'{group}-vm', 'power_state': 'running', 'location': 'eastus'}]
+    monkeypatch.setattr(azure_blob_vm, '_fetch_vm_statuses', fetch)
+    monkeypatch.setattr(azure_blob_vm, '_vm_status_cache', {})
+    monkeypatch.setattr(azure_blob_vm, '_vm_status_group_locks', {})
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        slow = [pool.submit(azure_blob_vm.get_vm_statuses, 'slow') for _ in range(2)]
+        assert started.wait(5)
+        began = time.monotonic()
+        fast = azure_blob_vm.get_vm_statuses('fast')
+        assert time.monotonic() - began < 1 and fast['vms'][0]['name'] == 'fast-vm'
+        release.set()
+        assert all(f.result()['count'] == 1 for f in slow)
+    assert sorted(calls) == ['fast', 'slow']
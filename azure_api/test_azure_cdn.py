@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault('AZURE_SUBSCRIPTION_ID', '00000000-0000-0000-0000-000000000000')
+
+import azure_cdn  # noqa: E402
+from azure_cdn import ChainedOperation, OperationTracker  # noqa: E402
+
+
+class FakePoller:
+    """SDK LRO poller stand-in that finishes when the test calls finish()."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._callbacks = []
+        self._status = 'InProgress'
+
+    def finish(self, status='Succeeded'):
+        self._status = status
+        self._done.set()
+        for callback in self._callbacks:
+            callback(self)
+
+    def status(self):
+        return self._status
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        self._done.wait(timeout or 5)
+        if self._status == 'Failed':
+            raise RuntimeError('operation failed')
+
+    def add_done_callback(self, func):
+        self._callbacks.append(func)
+
+
+class FakeEndpoints:
+    def __init__(self):
+        self.calls = []
+        self.pollers = []
+
+    def _begin(self, kind, parameters):
+        self.calls.append((kind, list(parameters.content_paths)))
+        self.pollers.append(FakePoller())
+        return self.pollers[-1]
+
+    def begin_purge_content(self, group, profile, endpoint, parameters):
+        return self._begin('purge', parameters)
+
+    def begin_load_content(self, group, profile, endpoint, parameters):
+        return self._begin('load', parameters)
+
+
+def _until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_preload_waits_for_the_purge(monkeypatch):
+    endpoints = FakeEndpoints()
+    monkeypatch.setattr(azure_cdn, 'cdn_client', SimpleNamespace(endpoints=endpoints))
+    op_ids = azure_cdn.purge_after_upload('profile', 'endpoint', {'site/a.html': 'uploaded', 'site/b.css': 'skipped'},
+                                          root='site', preload=True)
+    assert len(op_ids) == 2
+    time.sleep(0.05)
+    assert endpoints.calls == [('purge', ['/a.html'])]
+    assert azure_cdn.cdn_operations.status(op_ids[1])['status'] == 'NotStarted'
+
+    endpoints.pollers[0].finish()
+    _until(lambda: len(endpoints.calls) == 2)
+    assert endpoints.calls[1] == ('load', ['/a.html'])
+    endpoints.pollers[1].finish()
+    _until(lambda: azure_cdn.cdn_operations.summary(op_ids)['done'])
+    assert azure_cdn.cdn_operations.status(op_ids[1])['status'] == 'Succeeded'
+
+
+def test_failed_purge_skips_the_preload():
+    purge = FakePoller()
+    started = []
+    chain = ChainedOperation([purge], lambda: started.append(True) or [])
+    purge.finish('Failed')
+    _until(chain.done)
+    assert chain.status() == 'Failed' and not started
+
+
+def test_tracker_forgets_finished_operations_without_failing_readers():
+    tracker = OperationTracker(max_operations=2)
+    first = tracker.track_error('purge', 'endpoint', RuntimeError('quota'))
+    assert tracker.status(first)['status'] == 'Failed'
+    for _ in range(2):
+        tracker.track_error('purge', 'endpoint', RuntimeError('quota'))
+    assert first not in tracker
+    assert tracker.status(first) is None
+    assert tracker.summary([first])['operations'][0]['status'] == 'Expired'
+
+
+def test_tracker_records_when_a_poller_finishes():
+    tracker = OperationTracker()
+    poller = FakePoller()
+    op_id = tracker.track('load', 'endpoint', poller)
+    assert tracker.status(op_id)['done'] is False
+    poller.finish()
+    status = tracker.status(op_id)
+    assert status['done'] and status['finished'] is not None
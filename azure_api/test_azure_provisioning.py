@@ -0,0 +1,102 @@
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from azure_provisioning import FleetManager, Plan, ProvisioningError, Step, plan_fleet
+
+
+def _recording_step(log, id, depends_on=(), fail=False, delay=0.0):
+    def action(results):
+        log.append(('start', id))
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError(f'{id} quota exceeded')
+        log.append(('done', id))
+        return f'{id}-result'
+    return Step(id, action, depends_on=depends_on, rollback=lambda value: log.append(('undo', id)))
+
+
+def test_steps_run_after_their_dependencies():
+    log = []
+    plan = Plan([_recording_step(log, 'vm', ['nic']), _recording_step(log, 'nic', ['vnet']),
+                 _recording_step(log, 'vnet'), _recording_step(log, 'disk')], max_parallel=4)
+    results = plan.execute()
+    done = [id for event, id in log if event == 'done']
+    assert done.index('vnet') < done.index('nic') < done.index('vm')
+    assert results['vm'] == 'vm-result' and plan.status == 'succeeded'
+
+
+def test_parallelism_is_bounded():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def action(results):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return True
+    Plan([Step(f's{n}', action) for n in range(6)], max_parallel=2).execute()
+    assert peak[0] == 2
+
+
+def test_failure_skips_dependants_and_rolls_back_deepest_first():
+    log = []
+    plan = Plan([_recording_step(log, 'vnet'), _recording_step(log, 'nic', ['vnet']),
+                 _recording_step(log, 'vm', ['nic'], fail=True), _recording_step(log, 'app', ['vm'])])
+    with pytest.raises(ProvisioningError, match='vm quota exceeded'):
+        plan.execute()
+    statuses = {step['id']: step['status'] for step in plan.describe()['steps']}
+    assert statuses == {'vnet': 'rolled_back', 'nic': 'rolled_back', 'vm': 'failed', 'app': 'skipped'}
+    assert [id for event, id in log if event == 'undo'] == ['nic', 'vnet']
+    assert plan.status == 'failed'
+
+
+@pytest.mark.parametrize('steps, max_parallel', [
+    ([Step('a', bool, ['b']), Step('b', bool, ['a'])], 1),
+    ([Step('a', bool, ['missing'])], 1),
+    ([Step('a', bool)], 0),
+])
+def test_invalid_plans_are_rejected(steps, max_parallel):
+    with pytest.raises(ValueError):
+        Plan(steps, max_parallel=max_parallel)
+
+
+def test_plan_fleet_shares_one_vnet(monkeypatch):
+    calls = []
+    azure = SimpleNamespace(
+        resource_group_name='rg', location='westus',
+        create_vnet=lambda *args, **kwargs: calls.append('vnet') or 'vnet-id',
+        create_network_interface=lambda group, location, vnet, subnet, nic, **kwargs: calls.append(nic) or f'{nic}-id',
+        create_vm=lambda name, image, size, user, password, nic_id, **kwargs: calls.append(name) or f'{name}-id')
+    monkeypatch.setitem(sys.modules, 'azure_blob_vm', azure)
+    plan = plan_fleet(['web1', 'web2'], {}, 'Standard_B1s', 'admin', 'secret', max_parallel=3)
+    assert {step.id: step.depends_on for step in plan.steps.values()} == {
+        'vnet': (), 'nic:web1': ('vnet',), 'vm:web1': ('nic:web1',), 'nic:web2': ('vnet',), 'vm:web2': ('nic:web2',)}
+    assert plan.execute()['vm:web2'] == 'web2-id'
+    assert calls.count('vnet') == 1 and sorted(calls) == ['vnet', 'web1', 'web1-nic', 'web2', 'web2-nic']
+
+
+def _wait(manager, fleet_id):
+    deadline = time.monotonic() + 5
+    while not manager.describe(fleet_id)['finished']:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_fleet_manager_reports_failures_and_evicts_finished_fleets():
+    manager = FleetManager(max_kept=2)
+    failed = manager.submit(Plan([_recording_step([], 'vm', fail=True)]))
+    _wait(manager, failed)
+    assert manager.describe(failed)['error'] == 'vm quota exceeded'
+    later = []
+    for _ in range(2):
+        later.append(manager.submit(Plan([_recording_step([], 'vm')])))
+        _wait(manager, later[-1])
+    manager.submit(Plan([_recording_step([], 'vm', delay=0.1)]))
+    assert manager.describe(failed) is None
+    assert all(manager.describe(fleet_id) for fleet_id in later[1:])
@@ -0,0 +1,87 @@
+import threading
+import time
+
+from azure_speech_batch import BatchManager, LocalOutput
+
+
+def _items(prefix, count):
+    return [{'id': f'{prefix}-{n}', 'text': f'{prefix} {n}', 'voice': None, 'format': 'mp3'} for n in range(count)]
+
+
+def _wait(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished
+
+
+class GatedSynthesize:
+    """Records the order of calls; each call waits until the test opens the gate."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, text, voice, fmt):
+        self.calls.append(text)
+        self.gate.wait(5)
+        if text.startswith('bad'):
+            raise RuntimeError('quota exceeded')
+        return text.encode()
+
+
+def _manager(synthesize, workers=1):
+    return BatchManager(synthesize, workers=workers, rate_limit=1000, max_attempts=2)
+
+
+def test_job_runs_to_completion_and_writes_a_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr('azure_speech_batch.time.sleep', lambda seconds: None)
+    manager = _manager(GatedSynthesize(), workers=2)
+    job = manager.submit(_items('ok', 3) + _items('bad', 1), lambda job_id: LocalOutput(str(tmp_path / job_id)))
+    _wait(job)
+    progress = job.progress()
+    assert (progress['status'], progress['succeeded'], progress['failed'], progress['pending']) == ('completed', 3, 1, 0)
+    assert job.results['bad-0'] == {'status': 'failed', 'attempts': 2, 'error': 'quota exceeded'}
+    assert (tmp_path / job.id / 'manifest.json').exists()
+    assert (tmp_path / job.id / '000000-ok-0.mp3').read_bytes() == b'ok 0'
+
+
+def test_jobs_take_turns_on_the_workers(tmp_path):
+    synthesize = GatedSynthesize()
+    synthesize.gate.clear()
+    manager = _manager(synthesize)
+    first = manager.submit(_items('first', 4), lambda job_id: LocalOutput(str(tmp_path / job_id)))
+    while not synthesize.calls:
+        time.sleep(0.01)
+    second = manager.submit(_items('second', 2), lambda job_id: LocalOutput(str(tmp_path / job_id)))
+    synthesize.gate.set()
+    _wait(first)
+    _wait(second)
+    assert synthesize.calls == ['first 0', 'first 1', 'second 0', 'first 2', 'second 1', 'first 3']
+
+
+def test_cancel_skips_items_not_yet_taken(tmp_path):
+    synthesize = GatedSynthesize()
+    synthesize.gate.clear()
+    manager = _manager(synthesize)
+    job = manager.submit(_items('item', 5), lambda job_id: LocalOutput(str(tmp_path / job_id)))
+    while not synthesize.calls:
+        time.sleep(0.01)
+    manager.cancel(job.id)
+    assert job.status == 'cancelling'
+    synthesize.gate.set()
+    _wait(job)
+    progress = job.progress()
+    assert (progress['status'], progress['succeeded'], progress['skipped']) == ('cancelled', 1, 4)
+    assert synthesize.calls == ['item 0']
+
+
+def test_finished_jobs_are_evicted_over_the_cap(tmp_path):
+    manager = BatchManager(GatedSynthesize(), workers=1, rate_limit=1000, max_jobs=2)
+    jobs = []
+    for n in range(3):
+        jobs.append(manager.submit(_items(f'job{n}', 1), lambda job_id: LocalOutput(str(tmp_path / job_id))))
+        _wait(jobs[-1])
+    manager.submit(_items('last', 1), lambda job_id: LocalOutput(str(tmp_path / job_id)))
+    assert jobs[0].id not in manager.jobs and jobs[2].id in manager.jobs
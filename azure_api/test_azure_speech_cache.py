@@ -0,0 +1,39 @@
+import os
+
+from azure_speech_cache import DiskTier
+
+
+def test_disk_tier_evicts_least_recently_read(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=30)
+    for key in ('aa1', 'bb2', 'cc3'):
+        tier.put(key, b'x' * 10)
+    assert tier.get('aa1') == b'x' * 10
+    tier.put('dd4', b'x' * 10)
+    assert tier.get('bb2') is None and tier.get('aa1') is not None
+    assert tier.size == 20 and len(tier) == 2
+    assert not os.path.exists(tier.path('bb2'))
+
+
+def test_disk_tier_eviction_does_not_read_mtimes(tmp_path, monkeypatch):
+    tier = DiskTier(str(tmp_path), max_bytes=100)
+    for n in range(10):
+        tier.put(f'k{n:02d}', b'x' * 10)
+
+    def getmtime(path):
+        raise AssertionError('eviction should use the in-memory order')
+    monkeypatch.setattr(os.path, 'getmtime', getmtime)
+    tier.put('k10', b'x' * 10)
+    assert tier.get('k00') is None and tier.get('k10') is not None
+
+
+def test_disk_tier_restores_recency_from_mtimes(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=1000)
+    for key in ('old', 'new', 'mid'):
+        tier.put(key, b'x' * 10)
+        os.utime(tier.path(key), (0, {'old': 1, 'mid': 2, 'new': 3}[key]))
+
+    reopened = DiskTier(str(tmp_path), max_bytes=25)
+    assert reopened.size == 30
+    reopened.put('fresh', b'y' * 5)
+    assert reopened.get('old') is None and reopened.get('mid') is None
+    assert reopened.get('new') == b'x' * 10 and len(reopened) == 2
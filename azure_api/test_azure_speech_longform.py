@@ -0,0 +1,70 @@
+import re
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from azure_speech_longform import split_text, stream_wav, wav_header
+
+SPEAK = ('<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" '
+         'xmlns:mstts="https://www.w3.org/2001/mstts" xml:lang="en-US">')
+NS = '{http://www.w3.org/2001/10/synthesis}'
+
+
+def _document():
+    paragraph = '<p>' + ''.join(f'<s>Sentence number {i} of this paragraph.</s>' for i in range(6)) + '</p>'
+    return (SPEAK +
+            '<voice name="en-US-JennyNeural">' + paragraph + paragraph +
+            '<prosody rate="+10%">Loose text. More loose text here. <break time="300ms"/>And after.</prosody>'
+            '</voice>'
+            '<voice name="en-US-GuyNeural"><mstts:express-as style="cheerful">' + paragraph +
+            '</mstts:express-as></voice></speak>')
+
+
+def _text(element):
+    return re.sub(r'\s+', '', ''.join(element.itertext()))
+
+
+def test_every_ssml_chunk_is_well_formed_xml():
+    document = _document()
+    chunks = split_text(document, max_chars=120)
+    assert len(chunks) > 3
+    for chunk in chunks:
+        root = ET.fromstring(chunk)
+        assert root.tag == f'{NS}speak'
+        # Text never sits outside a voice, so every chunk keeps its own
+        assert all(child.tag == f'{NS}voice' for child in root)
+
+
+def test_ssml_chunks_keep_text_and_voices_in_order():
+    document = _document()
+    chunks = split_text(document, max_chars=120)
+    assert ''.join(_text(ET.fromstring(chunk)) for chunk in chunks) == _text(ET.fromstring(document))
+    voices = [voice.get('name') for chunk in chunks for voice in ET.fromstring(chunk)]
+    assert voices == sorted(voices, key=lambda name: name != 'en-US-JennyNeural')
+    assert {'en-US-JennyNeural', 'en-US-GuyNeural'} <= set(voices)
+
+
+def test_plain_text_is_cut_at_sentence_ends():
+    text = ' '.join(f'This is sentence {i}.' for i in range(50))
+    chunks = split_text(text, max_chars=100)
+    assert all(len(chunk) <= 100 and chunk.endswith('.') for chunk in chunks)
+    assert ' '.join(chunks) == text
+
+
+def test_split_text_rejects_non_positive_sizes():
+    for max_chars in (0, -5):
+        with pytest.raises(ValueError):
+            split_text('One sentence. Two sentences.', max_chars=max_chars)
+
+
+def test_stream_wav_logs_and_aborts_on_a_failed_segment(caplog):
+    def synthesize(chunk):
+        if chunk == 'bad':
+            raise RuntimeError('Synthesis canceled')
+        return b'\0\0' * 10
+    stream = stream_wav(['good', 'bad', 'never'], synthesize, max_parallel=1)
+    assert next(stream) == wav_header()
+    assert next(stream) == b'\0\0' * 10
+    with pytest.raises(RuntimeError, match='Synthesis canceled'):
+        next(stream)
+    assert 'aborted after 1 of 3 segments' in caplog.text
@@ -0,0 +1,44 @@
+import pytest
+
+from azure_transfer import download_file
+
+
+class StubDownload:
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+
+    def readinto(self, f):
+        if self.fail_after is not None:
+            f.write(self.data[:self.fail_after])
+            raise ConnectionError('connection reset')
+        f.write(self.data)
+        return len(self.data)
+
+
+class StubContainer:
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+
+    def get_blob_client(self, name):
+        return None
+
+    def download_blob(self, name, max_concurrency=None):
+        return StubDownload(self.data, self.fail_after)
+
+
+def test_download_writes_the_blob(tmp_path):
+    target = tmp_path / 'nested' / 'report.csv'
+    assert download_file(StubContainer(b'a,b\n'), 'report.csv', str(target)) == 'downloaded'
+    assert target.read_bytes() == b'a,b\n'
+    assert not (tmp_path / 'nested' / 'report.csv.partial').exists()
+
+
+def test_failed_download_leaves_no_partial_file_and_keeps_the_old_copy(tmp_path):
+    target = tmp_path / 'report.csv'
+    target.write_bytes(b'old')
+    with pytest.raises(ConnectionError):
+        download_file(StubContainer(b'new contents', fail_after=3), 'report.csv', str(target), skip_unchanged=False)
+    assert target.read_bytes() == b'old'
+    assert [p.name for p in tmp_path.iterdir()] == ['report.csv']
@@ -0,0 +1,32 @@
+import app as tts
+from azure_voices import VoiceCatalog
+
+
+def _voice(name, locale='en-US', gender='Female'):
+    return {'name': name, 'display_name': name, 'locale': locale, 'language': locale,
+            'gender': gender, 'voice_type': 'Neural', 'styles': []}
+
+
+def test_query_returns_the_etag_of_the_list_it_served(tmp_path):
+    lists = [[_voice('en-US-Ava')], [_voice('en-US-Ava'), _voice('en-US-Brian', gender='Male')]]
+    catalog = VoiceCatalog(lambda: lists.pop(0), snapshot_path=str(tmp_path / 'none.json'))
+    catalog.refresh()
+    voices, etag = catalog.query(locale='en')
+    catalog.refresh()
+    newer, newer_etag = catalog.query(locale='en')
+    assert [v['name'] for v in voices] == ['en-US-Ava'] and len(newer) == 2
+    assert etag != newer_etag and catalog.etag == newer_etag == catalog.status()['etag']
+
+
+def test_conditional_get_sees_a_refreshed_catalog(tmp_path, monkeypatch):
+    lists = [[_voice('en-US-Ava')], [_voice('en-US-Brian')]]
+    catalog = VoiceCatalog(lambda: lists.pop(0), snapshot_path=str(tmp_path / 'none.json'))
+    catalog.refresh()
+    monkeypatch.setattr(tts, 'voice_catalog', catalog)
+    client = tts.app.test_client()
+
+    first = client.get('/tts/voices?locale=en-US')
+    assert client.get('/tts/voices?locale=en-US', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    catalog.refresh()
+    changed = client.get('/tts/voices?locale=en-US', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.get_json()[0]['name'] == 'en-US-Brian'
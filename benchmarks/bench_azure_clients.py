@@ -0,0 +1,92 @@
+"""Per-operation latency of Azure blob helpers: per-call clients vs the shared pool.
+
+"before" builds a fresh credential and BlobServiceClient for every operation,
+as the blob helpers used to; "after" goes through azure_clients. Without
+--account the token source is a stub that sleeps --token-latency seconds
+(roughly what `az account get-access-token` costs) and no request leaves the
+process. With --account the real AzureCliCredential and list_containers()
+are used.
+
+    python benchmarks/bench_azure_clients.py [--ops 20] [--token-latency 0.8]
+    python benchmarks/bench_azure_clients.py --account mystorageacct
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'azure_api'))
+
+from azure.core.credentials import AccessToken  # noqa: E402
+from azure.storage.blob import BlobServiceClient  # noqa: E402
+
+import azure_clients  # noqa: E402
+
+
+class StubCliCredential:
+    """Mimics AzureCliCredential: every get_token() pays a subprocess cost."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def get_token(self, *scopes, **kwargs):
+        time.sleep(self.latency)
+        return AccessToken('stub-token', int(time.time()) + 3600)
+
+
+def stub_operation(client, credential):
+    # Stand-in for one blob call: build the request and authenticate it
+    client.get_container_client('bench').url
+    credential.get_token('https://storage.azure.com/.default')
+
+
+def live_operation(client, credential):
+    list(client.list_containers(results_per_page=1).by_page().next())
+
+
+def measure(label, ops, make_client, operation):
+    samples = []
+    for _ in range(ops):
+        start = time.perf_counter()
+        client, credential = make_client()
+        operation(client, credential)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {label:<8}{statistics.mean(samples):>10.1f}{statistics.median(samples):>10.1f}{p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=20)
+    parser.add_argument('--token-latency', type=float, default=0.8)
+    parser.add_argument('--account', help='storage account to benchmark against for real')
+    args = parser.parse_args()
+
+    if args.account:
+        from azure.identity import AzureCliCredential
+        url = azure_clients.account_url(args.account)
+        new_credential = AzureCliCredential
+        operation = live_operation
+    else:
+        url = azure_clients.account_url('benchaccount')
+        new_credential = lambda: StubCliCredential(args.token_latency)  # noqa: E731
+        operation = stub_operation
+        azure_clients._credential = azure_clients.CachedTokenCredential(new_credential())
+
+    def before():
+        credential = new_credential()
+        return BlobServiceClient(account_url=url, credential=credential), credential
+
+    def after():
+        return azure_clients.get_blob_service_client(url), azure_clients.get_credential()
+
+    print(f"{args.ops} operations against {url} (ms)")
+    print(f"  {'':<8}{'mean':>10}{'p50':>10}{'p95':>10}")
+    measure('before', args.ops, before, operation)
+    measure('after', args.ops, after, operation)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Blob transfer throughput against Azurite, the local storage emulator.
+
+Compares the old single-call upload_blob() with azure_transfer.upload_file()
+at several concurrency levels, plus a directory upload and a second
+(skip-if-unchanged) pass. Start Azurite first, e.g.:
+
+    npx azurite-blob --silent --location /tmp/azurite &
+    python benchmarks/bench_blob_transfer.py [--size-mb 256] [--files 64]
+
+Set AZURITE_CONNECTION_STRING to point at a non-default emulator.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'azure_api'))
+
+from azure.storage.blob import BlobServiceClient  # noqa: E402
+
+import azure_transfer  # noqa: E402
+
+AZURITE = (
+    'DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;'
+    'AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;'
+    'BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;'
+)
+
+
+def report(label, seconds, total_bytes):
+    print(f"  {label:<34}{seconds:>8.2f}s{total_bytes / seconds / 1024 / 1024:>10.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=256, help='size of the single large file')
+    parser.add_argument('--files', type=int, default=64, help='files in the directory upload')
+    parser.add_argument('--file-kb', type=int, default=512, help='size of each directory file')
+    parser.add_argument('--block-mb', type=int, default=8)
+    args = parser.parse_args()
+
+    service = BlobServiceClient.from_connection_string(os.getenv('AZURITE_CONNECTION_STRING', AZURITE))
+    container = service.create_container(f'bench-{uuid.uuid4().hex[:8]}')
+    block_size = args.block_mb * 1024 * 1024
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            big = os.path.join(workdir, 'big.bin')
+            with open(big, 'wb') as f:
+                for _ in range(args.size_mb):
+                    f.write(os.urandom(1024 * 1024))
+            size = os.path.getsize(big)
+
+            print(f"Single {args.size_mb} MiB file")
+            start = time.perf_counter()
+            with open(big, 'rb') as f:
+                container.get_blob_client('baseline.bin').upload_blob(f)
+            report('upload_blob() defaults', time.perf_counter() - start, size)
+
+            for concurrency in (1, 4, 8, 16):
+                start = time.perf_counter()
+                azure_transfer.upload_file(container, big, blob_name=f'engine-{concurrency}.bin',
+                                           max_concurrency=concurrency, block_size=block_size)
+                report(f'upload_file(max_concurrency={concurrency})', time.perf_counter() - start, size)
+
+            start = time.perf_counter()
+            azure_transfer.upload_file(container, big, blob_name='engine-16.bin')
+            report('upload_file() unchanged (skip)', time.perf_counter() - start, size)
+
+            start = time.perf_counter()
+            azure_transfer.download_file(container, 'engine-16.bin', os.path.join(workdir, 'down.bin'),
+                                         max_concurrency=8)
+            report('download_file(max_concurrency=8)', time.perf_counter() - start, size)
+
+            site = os.path.join(workdir, 'site')
+            for i in range(args.files):
+                path = os.path.join(site, f'dir{i % 8}', f'file{i}.bin')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(os.urandom(args.file_kb * 1024))
+            dir_bytes = args.files * args.file_kb * 1024
+
+            print(f"\nDirectory of {args.files} x {args.file_kb} KiB files")
+            start = time.perf_counter()
+            for root, _, files in os.walk(site):
+                for name in files:
+                    path = os.path.join(root, name)
+                    with open(path, 'rb') as f:
+                        container.get_blob_client('serial/' + os.path.relpath(path, site)).upload_blob(f)
+            report('serial upload_blob()', time.perf_counter() - start, dir_bytes)
+
+            for max_files in (4, 16):
+                start = time.perf_counter()
+                azure_transfer.upload_directory(container, site, prefix=f'pool{max_files}/', max_files=max_files)
+                report(f'upload_directory(max_files={max_files})', time.perf_counter() - start, dir_bytes)
+    finally:
+        container.delete_container()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Gateway vs presigned direct-to-S3 uploads against a local S3 stand-in.
+
+Uploads the same file through POST /s3/upload (every byte through Flask)
+and through /s3/presign_upload + parallel part PUTs + /s3/complete_multipart,
+then checks the stored object's bytes. Start any S3-compatible server first:
+
+    moto_server -p 5005 &        # or: minio server /tmp/minio --address :5005
+    AWS_S3_ENDPOINT_URL=http://127.0.0.1:5005 AWS_ACCESS_KEY_ID=test AWS_SECRET_ACCESS_KEY=test \\
+        python benchmarks/bench_presigned_upload.py [--size-mb 256] [--parallel 8]
+"""
+import argparse
+import hashlib
+import io
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+import app as gateway  # noqa: E402
+
+
+def report(label, seconds, total_bytes):
+    print(f"  {label:<34}{seconds:>8.2f}s{total_bytes / seconds / 1024 / 1024:>10.1f} MiB/s")
+
+
+def stored_md5(s3, bucket, key):
+    digest = hashlib.md5()
+    for chunk in s3.get_object(Bucket=bucket, Key=key)['Body'].iter_chunks(1024 * 1024):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_presigned(client, bucket, key, data, parallel):
+    plan = client.post('/s3/presign_upload', json={'bucket_name': bucket, 'key': key, 'size': len(data)}).get_json()
+    if plan['method'] == 'single':
+        requests.put(plan['url'], data=data).raise_for_status()
+        return plan
+
+    def put_part(part):
+        response = requests.put(part['url'], data=data[part['start']:part['end'] + 1])
+        response.raise_for_status()
+        return {'PartNumber': part['part_number'], 'ETag': response.headers['ETag']}
+
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        parts = list(pool.map(put_part, plan['parts']))
+    done = client.post('/s3/complete_multipart', json={'bucket_name': bucket, 'key': key,
+                                                       'upload_id': plan['upload_id'], 'parts': parts})
+    assert done.status_code == 200, done.get_json()
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--parallel', type=int, default=8, help='part uploads in flight')
+    args = parser.parse_args()
+    if not os.getenv('AWS_S3_ENDPOINT_URL'):
+        sys.exit('Set AWS_S3_ENDPOINT_URL to the local S3 stand-in')
+
+    s3 = gateway.get_aws_client('s3')
+    bucket = f'bench-{uuid.uuid4().hex[:8]}'
+    s3.create_bucket(Bucket=bucket)
+    client = gateway.app.test_client()
+    data = os.urandom(args.size_mb * 1024 * 1024)
+    expected = hashlib.md5(data).hexdigest()
+
+    print(f"{args.size_mb} MiB object")
+    start = time.perf_counter()
+    response = client.post('/s3/upload', data={'bucket_name': bucket, 'file': (io.BytesIO(data), 'gateway.bin')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200, response.get_json()
+    report('through gateway (/s3/upload)', time.perf_counter() - start, len(data))
+    assert stored_md5(s3, bucket, 'gateway.bin') == expected
+
+    for parallel in sorted({1, args.parallel}):
+        key = f'direct-{parallel}.bin'
+        start = time.perf_counter()
+        plan = upload_presigned(client, bucket, key, data, parallel)
+        report(f"presigned {plan['method']}, {parallel} in flight", time.perf_counter() - start, len(data))
+        assert stored_md5(s3, bucket, key) == expected, f'{key} content mismatch'
+    print("  stored objects verified")
+
+
+if __name__ == '__main__':
+    main()
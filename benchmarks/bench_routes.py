@@ -0,0 +1,279 @@
+"""Offline benchmark of every gateway route against stubbed clouds.
+
+Runs the AWS gateway (api/app.py) and the TTS service (azure_api/app.py)
+in-process with the Flask test client. AWS calls go to benchmarks/stubs.py
+(or to moto server with --aws-endpoint) and Speech calls to a stub pool,
+each with injected latency. Per route it reports p50/p95/p99 latency,
+throughput, upstream calls per request and peak traced memory, writes the
+results as JSON and compares them with a stored baseline:
+
+    python benchmarks/bench_routes.py --latency-ms 40 --jitter-ms 20
+    python benchmarks/bench_routes.py --save-baseline          # record benchmarks/baseline.json
+    python benchmarks/bench_routes.py --baseline benchmarks/baseline.json --routes 's3.*,ec2.*'
+
+Exits with status 1 when any route regresses past --tolerance.
+"""
+import argparse
+import fnmatch
+import importlib.util
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'api'))
+sys.path.insert(0, os.path.join(ROOT, 'azure_api'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stubs import AwsStub, Latency, StubSynthesizerPool  # noqa: E402
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+AWS_SERVICES = ('s3', 'ec2', 'cloudfront', 'cloudwatch', 'rekognition')
+
+
+def load_module(name, path):
+    """Import an app module under a unique name (both services call theirs app.py)."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_gateways(speech_latency):
+    """Import both apps with the Azure connectors and Speech SDK stubbed out."""
+    os.environ.pop('AZURE_SUBSCRIPTION_ID', None)
+    gateway = load_module('gateway_app', os.path.join(ROOT, 'api', 'app.py'))
+    tts = load_module('tts_app', os.path.join(ROOT, 'azure_api', 'app.py'))
+    tts.synthesizer_pool = StubSynthesizerPool(speech_latency)
+    # Keep the catalog on its bundled snapshot instead of calling the voices REST API
+    tts.voice_catalog.fetch = lambda: tts.voice_catalog.query()
+    tts.voice_catalog.loaded_at = time.time()
+    return gateway, tts
+
+
+def _png():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _website_zip(files=20):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr('index.html', '<html></html>')
+        for i in range(files - 1):
+            archive.writestr(f'assets/app-{i}.js', 'console.log(1);' * 100)
+    return buffer.getvalue()
+
+
+LONG_TEXT = ' '.join(f'This is sentence number {i} of a long narrated document.' for i in range(60))
+
+
+def routes(png, site):
+    """(name, service, method, path, kwargs(i)) for every benchmarked route."""
+    return [
+        ('s3.list_buckets', 'gateway', 'GET', '/s3/list_buckets', lambda i: {}),
+        ('s3.bucket_info', 'gateway', 'GET', '/s3/bucket_info?bucket_name=bench', lambda i: {}),
+        ('s3.list_objects', 'gateway', 'GET', '/s3/list_objects?bucket_name=bench', lambda i: {}),
+        ('s3.create_bucket', 'gateway', 'POST', '/s3/create_bucket',
+         lambda i: {'json': {'bucket_name': f'bench-{i}'}}),
+        ('s3.upload', 'gateway', 'POST', '/s3/upload',
+         lambda i: {'data': {'bucket_name': 'bench', 'file': (io.BytesIO(b'\0' * 256 * 1024), f'f{i}.bin')},
+                    'content_type': 'multipart/form-data'}),
+        ('s3.presign_upload', 'gateway', 'POST', '/s3/presign_upload',
+         lambda i: {'json': {'bucket_name': 'bench', 'filename': f'f{i}.bin', 'size': 256 * 1024 * 1024}}),
+        ('s3.download', 'gateway', 'GET', '/s3/download?bucket_name=bench&key=obj.bin', lambda i: {}),
+        ('s3.upload_website', 'gateway', 'POST', '/s3/upload_website',
+         lambda i: {'data': {'bucket_name': 'bench', 'distribution_id': 'EBENCH',
+                             'website': (io.BytesIO(site), 'site.zip')},
+                    'content_type': 'multipart/form-data'}),
+        ('ec2.describe_instances', 'gateway', 'GET', '/describe_instances', lambda i: {}),
+        ('ec2.start_instance', 'gateway', 'POST', '/start_instance', lambda i: {'json': {'InstanceId': 'i-0'}}),
+        ('rekognition.analyze', 'gateway', 'POST', '/analyze',
+         lambda i: {'data': {'image': (io.BytesIO(png), 'image.png')}, 'content_type': 'multipart/form-data'}),
+        ('cloudfront.list_distributions', 'gateway', 'GET', '/cloudfront/list_distributions', lambda i: {}),
+        ('cloudfront.create_distribution', 'gateway', 'POST', '/cloudfront/distributions',
+         lambda i: {'json': {'origins': [{'id': 'o', 'domain': 'example.com'}], 'preset': 'api'}}),
+        ('cloudfront.invalidate', 'gateway', 'POST', '/cloudfront/invalidate',
+         lambda i: {'json': {'distribution_id': 'EBENCH', 'paths': [f'/p/{i}.js']}}),
+        ('cloudwatch.get_metrics', 'gateway', 'GET', '/cloudwatch/get_metrics', lambda i: {}),
+        ('cloudwatch.get_alarms', 'gateway', 'GET', '/cloudwatch/get_alarms', lambda i: {}),
+        ('cloudwatch.get_service_health', 'gateway', 'GET', '/cloudwatch/get_service_health', lambda i: {}),
+        ('cloudwatch.get_insights', 'gateway', 'GET', '/cloudwatch/get_insights', lambda i: {}),
+        ('inventory.query', 'gateway', 'GET', '/inventory?page_size=50', lambda i: {}),
+        ('tts.synthesize', 'tts', 'POST', '/tts/synthesize',
+         lambda i: {'json': {'text': f'Benchmark prompt {uuid.uuid4().hex}', 'format': 'mp3'}}),
+        ('tts.synthesize_cached', 'tts', 'POST', '/tts/synthesize',
+         lambda i: {'json': {'text': 'The same cached prompt every time.', 'format': 'mp3'}}),
+        ('tts.stream', 'tts', 'GET', None,
+         lambda i: {'path': f'/tts/stream?text=Streamed+prompt+{uuid.uuid4().hex}&format=mp3'}),
+        ('tts.longform', 'tts', 'POST', '/tts/longform',
+         lambda i: {'json': {'text': f'{LONG_TEXT} {uuid.uuid4().hex}.', 'stream': False}}),
+        ('tts.voices', 'tts', 'GET', '/tts/voices?locale=en', lambda i: {}),
+    ]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _call(client, method, path, kwargs):
+    kwargs = dict(kwargs)
+    path = kwargs.pop('path', path)
+    started = time.perf_counter()
+    response = client.open(path, method=method, **kwargs)
+    response.get_data()
+    elapsed = time.perf_counter() - started
+    status = response.status_code
+    response.close()
+    return elapsed, status
+
+
+def run_route(client, method, path, make_kwargs, requests, concurrency, warmup):
+    for i in range(warmup):
+        _call(client, method, path, make_kwargs(-1 - i))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(lambda i: _call(client, method, path, make_kwargs(i)), range(requests)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def measure_memory(client, method, path, make_kwargs, requests, concurrency):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        run_route(client, method, path, make_kwargs, requests, concurrency, warmup=0)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Return [(route, metric, baseline, current)] for every regression."""
+    regressions = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if previous.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append((name, metric, previous[metric], current[metric]))
+        if previous.get('throughput_rps') and current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append((name, 'throughput_rps', previous['throughput_rps'], current['throughput_rps']))
+        if previous.get('peak_memory_kb') and current['peak_memory_kb'] is not None and \
+                current['peak_memory_kb'] > previous['peak_memory_kb'] * (1 + memory_tolerance):
+            regressions.append((name, 'peak_memory_kb', previous['peak_memory_kb'], current['peak_memory_kb']))
+        if current['errors'] > previous.get('errors', 0):
+            regressions.append((name, 'errors', previous.get('errors', 0), current['errors']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--memory-requests', type=int, default=20, help='requests traced for peak memory (0 = skip)')
+    parser.add_argument('--latency-ms', type=float, default=20, help='injected delay per upstream call')
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--speech-latency-ms', type=float, default=150)
+    parser.add_argument('--scale', type=int, default=100, help='instances/buckets/alarms returned by list calls')
+    parser.add_argument('--routes', default='*', help='comma-separated glob patterns of route names')
+    parser.add_argument('--aws-endpoint', help='use moto server (or LocalStack) at this URL instead of the stub')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--baseline', help='baseline file to compare against')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, help='write results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed latency/throughput change')
+    parser.add_argument('--memory-tolerance', type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.aws_endpoint:
+        for service in AWS_SERVICES:
+            os.environ[f'AWS_{service.upper()}_ENDPOINT_URL'] = args.aws_endpoint
+    # Presigning signs locally, so it needs some credentials even against the stub
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    aws = AwsStub(Latency(args.latency_ms, args.jitter_ms), scale=args.scale)
+    if not args.aws_endpoint:
+        aws.__enter__()
+    gateway, tts = load_gateways(Latency(args.speech_latency_ms, args.jitter_ms))
+    clients = {'gateway': gateway.app.test_client(), 'tts': tts.app.test_client()}
+    patterns = args.routes.split(',')
+    selected = [r for r in routes(_png(), _website_zip()) if any(fnmatch.fnmatch(r[0], p) for p in patterns)]
+
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'backend': args.aws_endpoint or 'stub',
+            **{key: getattr(args, key) for key in ('requests', 'concurrency', 'latency_ms', 'jitter_ms',
+                                                   'speech_latency_ms', 'scale')},
+        },
+        'routes': {},
+    }
+    print(f"{'route':<34}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}{'calls/req':>10}{'peak KB':>10}{'errors':>7}")
+    for name, service, method, path, make_kwargs in selected:
+        client = clients[service]
+        aws.reset()
+        timings, elapsed = run_route(client, method, path, make_kwargs, args.requests, args.concurrency, args.warmup)
+        upstream = aws.total_calls()
+        peak = measure_memory(client, method, path, make_kwargs, args.memory_requests, args.concurrency) \
+            if args.memory_requests else None
+        latencies = sorted(t * 1000 for t, _ in timings)
+        row = {
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(sum(latencies) / len(latencies), 2),
+            'throughput_rps': round(len(timings) / elapsed, 1),
+            'upstream_calls_per_request': round(upstream / len(timings), 2) if not args.aws_endpoint else None,
+            'peak_memory_kb': round(peak, 1) if peak is not None else None,
+            'errors': sum(1 for _, status in timings if status >= 500),
+        }
+        results['routes'][name] = row
+        print(f"{name:<34}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+              f"{row['throughput_rps']:>9.1f}{row['upstream_calls_per_request'] or 0:>10.2f}"
+              f"{row['peak_memory_kb'] or 0:>10.0f}{row['errors']:>7}")
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"{datetime.utcnow():%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before} -> {after}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
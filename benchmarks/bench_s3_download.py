@@ -0,0 +1,129 @@
+"""Throughput and peak RSS of /s3/download on multi-GB objects.
+
+Runs the gateway in-process against a stub S3 client that generates object
+bytes on the fly (optionally throttled per connection to mimic S3's
+per-stream bandwidth), so no real bucket or disk space is needed. Each mode
+runs in its own process so peak RSS is measured independently:
+
+    buffered  - read the whole object, then respond (the naive relay)
+    stream    - /s3/download?parallel=0, chunked relay of one get_object
+    parallel  - /s3/download with concurrent ranged fetches
+
+    python benchmarks/bench_s3_download.py [--size-gb 2] [--stream-mbps 400]
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+
+class GeneratedStream(io.RawIOBase):
+    """Readable stream of size bytes, optionally capped at mbps."""
+
+    def __init__(self, size, mbps):
+        self.remaining = size
+        self.seconds_per_byte = 1 / (mbps * 1024 * 1024) if mbps else 0
+
+    def readable(self):
+        return True
+
+    def read(self, amount=-1):
+        amount = self.remaining if amount is None or amount < 0 else min(amount, self.remaining)
+        self.remaining -= amount
+        if self.seconds_per_byte:
+            time.sleep(amount * self.seconds_per_byte)
+        return b'\0' * amount
+
+
+class StubS3:
+    def __init__(self, size, mbps):
+        self.size = size
+        self.mbps = mbps
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return {'ContentLength': self.size, 'ETag': '"stub"', 'ContentType': 'application/octet-stream',
+                'LastModified': datetime.datetime(2024, 1, 1)}
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        from botocore.response import StreamingBody
+        first, last = 0, self.size - 1
+        response = {'ETag': '"stub"', 'ContentType': 'application/octet-stream'}
+        if Range:
+            first, last = (int(v) for v in Range[len('bytes='):].split('-'))
+            response['ContentRange'] = f'bytes {first}-{last}/{self.size}'
+        length = last - first + 1
+        response['ContentLength'] = length
+        response['Body'] = StreamingBody(GeneratedStream(length, self.mbps), length)
+        return response
+
+
+def run_mode(mode, size, mbps):
+    import app as gateway
+    from flask import Response
+
+    stub = StubS3(size, mbps)
+
+    @gateway.app.route('/bench/buffered')
+    def buffered():
+        body = stub.get_object(Bucket='b', Key='k')['Body'].read()
+        return Response(body, mimetype='application/octet-stream')
+
+    url = {
+        'buffered': '/bench/buffered',
+        'stream': '/s3/download?bucket_name=b&key=big.bin&parallel=0',
+        'parallel': '/s3/download?bucket_name=b&key=big.bin',
+    }[mode]
+
+    with mock.patch.object(gateway, 'get_aws_client', lambda service: stub):
+        client = gateway.app.test_client()
+        start = time.perf_counter()
+        response = client.get(url, buffered=False)
+        received = 0
+        for chunk in response.response:
+            received += len(chunk)
+        response.close()
+        elapsed = time.perf_counter() - start
+
+    assert received == size, f'{mode}: got {received} of {size} bytes'
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-gb', type=float, default=2)
+    parser.add_argument('--stream-mbps', type=float, default=400,
+                        help='per-connection bandwidth of the stub (0 = unthrottled)')
+    parser.add_argument('--modes', default='buffered,stream,parallel')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    size = int(args.size_gb * 1024 ** 3)
+
+    if args.run:
+        run_mode(args.run, size, args.stream_mbps)
+        return
+
+    print(f"{args.size_gb:g} GiB object, stub bandwidth "
+          f"{'unthrottled' if not args.stream_mbps else f'{args.stream_mbps:g} MiB/s per stream'}")
+    print(f"  {'mode':<12}{'time':>10}{'MiB/s':>10}{'peak RSS':>12}")
+    for mode in args.modes.split(','):
+        output = subprocess.run(
+            [sys.executable, __file__, '--run', mode, '--size-gb', str(args.size_gb),
+             '--stream-mbps', str(args.stream_mbps)],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        rate = size / result['seconds'] / 1024 / 1024
+        print(f"  {mode:<12}{result['seconds']:>9.2f}s{rate:>10.1f}{result['peak_rss_mb']:>10.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
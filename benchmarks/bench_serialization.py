@@ -0,0 +1,91 @@
+"""Serialization and compression benchmark for the gateway response layer.
+
+Builds payloads shaped like /cloudwatch/get_alarms and /analyze responses and
+reports encode time and bytes on the wire for stdlib json vs the fast
+serializer, and for each available compression codec.
+
+    python benchmarks/bench_serialization.py [--alarms 2000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+import responses  # noqa: E402
+
+
+def make_alarms(count):
+    now = datetime.utcnow()
+    return {'alarms': [{
+        'AlarmName': f'cpu-high-{i}',
+        'AlarmArn': f'arn:aws:cloudwatch:us-east-1:123456789012:alarm:cpu-high-{i}',
+        'AlarmDescription': 'CPU above threshold for 3 datapoints',
+        'StateValue': 'OK' if i % 3 else 'ALARM',
+        'StateReason': 'Threshold Crossed: 1 datapoint [12.5 (01/01/24 00:00:00)] was not greater than the threshold (80.0).',
+        'StateUpdatedTimestamp': now - timedelta(minutes=i),
+        'AlarmConfigurationUpdatedTimestamp': now - timedelta(days=i % 30),
+        'MetricName': 'CPUUtilization',
+        'Namespace': 'AWS/EC2',
+        'Statistic': 'Average',
+        'Dimensions': [{'Name': 'InstanceId', 'Value': f'i-{i:017x}'}],
+        'Period': 300,
+        'EvaluationPeriods': 3,
+        'Threshold': 80.0,
+        'ComparisonOperator': 'GreaterThanThreshold',
+    } for i in range(count)]}
+
+
+def make_analysis(labels):
+    box = {'Width': 0.31, 'Height': 0.42, 'Left': 0.12, 'Top': 0.08}
+    return {'message': 'Image analyzed successfully', 'results': {
+        'labels': [{'Name': f'Label{i}', 'Confidence': 97.123456,
+                    'Instances': [{'BoundingBox': box, 'Confidence': 95.5}] * 4,
+                    'Parents': [{'Name': 'Parent'}]} for i in range(labels)],
+        'faces': [{'BoundingBox': box, 'Landmarks': [{'Type': f'l{j}', 'X': 0.3, 'Y': 0.4} for j in range(30)],
+                   'Emotions': [{'Type': 'CALM', 'Confidence': 88.1}] * 8} for _ in range(labels // 4)],
+    }}
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(name, payload, repeat):
+    stdlib_time, stdlib_bytes = timed(
+        lambda: json.dumps(payload, default=str).encode('utf-8'), repeat)
+    fast_time, fast_bytes = timed(lambda: responses.dumps(payload), repeat)
+    backend = 'orjson' if responses.orjson is not None else 'json'
+
+    print(f"\n{name}")
+    print(f"  {'encoder':<16}{'ms':>10}{'bytes':>12}")
+    print(f"  {'stdlib json':<16}{stdlib_time * 1000:>10.2f}{len(stdlib_bytes):>12}")
+    print(f"  {'dumps (' + backend + ')':<16}{fast_time * 1000:>10.2f}{len(fast_bytes):>12}")
+    for encoding in responses._ENCODINGS:
+        if not responses._available(encoding):
+            continue
+        comp_time, body = timed(lambda: responses.compress(fast_bytes, encoding), repeat)
+        print(f"  {'+ ' + encoding:<16}{comp_time * 1000:>10.2f}{len(body):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--alarms', type=int, default=2000)
+    parser.add_argument('--labels', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    run(f'get_alarms ({args.alarms} alarms)', make_alarms(args.alarms), args.repeat)
+    run(f'analyze ({args.labels} labels)', make_analysis(args.labels), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+"""Replay dashboard polling and interactive bursts from N simulated users.
+
+Each simulated user has a few browser tabs open on the Next.js pages and
+follows their timers: the EC2 details page polls /describe_instances every
+5 s, the AWS overview every 10 s, the CloudWatch page fetches its four
+panels every 5 min, and the home page loads the distribution list once.
+On top of that every user makes Poisson-timed bursts (an upload, an image
+analysis or a TTS request). Like a browser, each user has at most six
+connections in flight; setInterval does not wait for the previous tick,
+so slow responses pile up exactly as they do in the UI.
+
+By default both services run in-process behind real HTTP servers with the
+clouds stubbed (benchmarks/stubs.py), so upstream calls can be counted.
+Users are stepped up until the gateway saturates: p95 over --slo-ms,
+completed throughput below offered, or errors over 1%:
+
+    python benchmarks/load_dashboard.py --users 10,25,50,100 --step-seconds 60
+    python benchmarks/load_dashboard.py --time-scale 10 --users 20,40,80,160   # timers 10x faster
+    python benchmarks/load_dashboard.py --server-threads 8                     # fixed worker pool
+    python benchmarks/load_dashboard.py --gateway-url http://127.0.0.1:5000 --tts-url http://127.0.0.1:5001
+
+--time-scale divides every timer, so one simulated user stands in for
+time-scale real ones; the report shows both counts. Against external URLs
+upstream calls and server-side queueing are not visible and show as '-'.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import _png, load_gateways, percentile  # noqa: E402
+from stubs import AwsStub, Latency  # noqa: E402
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+# Chrome's limit of concurrent HTTP/1.1 connections per origin
+BROWSER_CONNECTIONS = 6
+SERVICE_TIME_HEADER = 'X-Service-Time-Ms'
+
+CLOUDWATCH_PANELS = [('gateway', 'GET', f'/cloudwatch/{panel}', None)
+                     for panel in ('get_metrics', 'get_alarms', 'get_service_health', 'get_insights')]
+DESCRIBE_INSTANCES = ('gateway', 'GET', '/describe_instances', None)
+
+# Requests made when each page mounts, then its setInterval period and what every tick fetches
+PAGES = {
+    'overview': {'mount': [('gateway', 'GET', '/s3/list_buckets', None), DESCRIBE_INSTANCES],
+                 'every': 10, 'tick': [DESCRIBE_INSTANCES]},
+    'ec2_details': {'mount': [DESCRIBE_INSTANCES], 'every': 5, 'tick': [DESCRIBE_INSTANCES]},
+    'cloudwatch': {'mount': CLOUDWATCH_PANELS, 'every': 300, 'tick': CLOUDWATCH_PANELS},
+    'home': {'mount': [('gateway', 'GET', '/cloudfront/list_distributions', None)], 'every': None, 'tick': []},
+}
+
+TTS_PROMPTS = [f'Your deployment number {i} has finished successfully.' for i in range(20)]
+
+
+def _multipart(field, filename, content, content_type='application/octet-stream'):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="bucket_name"\r\n\r\nload\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def bursts(png):
+    """Interactive requests as (service, method, path, body factory)."""
+    return {
+        'upload': ('gateway', 'POST', '/s3/upload',
+                   lambda: _multipart('file', f'{uuid.uuid4().hex}.bin', os.urandom(256 * 1024))),
+        'analyze': ('gateway', 'POST', '/analyze', lambda: _multipart('image', 'image.png', png, 'image/png')),
+        'tts': ('tts', 'POST', '/tts/synthesize',
+                lambda: (json.dumps({'text': random.choice(TTS_PROMPTS), 'format': 'mp3'}).encode(),
+                         'application/json')),
+    }
+
+
+def parse_weights(spec, known):
+    weights = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        if name not in known:
+            raise SystemExit(f"unknown name {name!r}, expected one of {', '.join(known)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+# ---------------------------- HTTP ---------------------------- #
+
+async def http_request(host, port, method, path, body=b'', content_type=None):
+    """One request on a fresh connection; returns (status, headers, body bytes)."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: close',
+                'Accept-Encoding: identity']
+        if body:
+            head += [f'Content-Type: {content_type}', f'Content-Length: {len(body)}']
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        size = 0
+        while True:
+            chunk = await reader.read(64 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+        return status, headers, size
+    finally:
+        writer.close()
+
+
+def service_timed(wsgi_app):
+    """Middleware that reports time spent in the app, so queueing can be separated from work."""
+    def app(environ, start_response):
+        started = time.perf_counter()
+
+        def timed_start_response(status, headers, exc_info=None):
+            headers.append((SERVICE_TIME_HEADER, f'{(time.perf_counter() - started) * 1000:.3f}'))
+            return start_response(status, headers, exc_info)
+        return wsgi_app(environ, timed_start_response)
+    return app
+
+
+def serve(flask_app, threads):
+    """Run flask_app on an ephemeral port in a background thread; returns (server, port).
+
+    threads=0 is Werkzeug's thread-per-request server (what app.run uses);
+    otherwise requests wait for one of a fixed pool of workers, like
+    gunicorn --threads.
+    """
+    from werkzeug.serving import BaseWSGIServer, ThreadedWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    class QueuedThreadedWSGIServer(ThreadedWSGIServer):
+        request_queue_size = 1024
+
+    server_class = PooledWSGIServer if threads else QueuedThreadedWSGIServer
+    server = server_class('127.0.0.1', 0, service_timed(flask_app.wsgi_app))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+# ---------------------------- Users ---------------------------- #
+
+class Step:
+    """Samples and counters for one user count."""
+
+    def __init__(self):
+        self.samples = []
+        self.scheduled = 0
+        self.in_flight = set()
+
+    def record(self, name, status, wait, latency, service):
+        self.samples.append({'route': name, 'status': status, 'wait': wait, 'latency': latency,
+                             'service': service})
+
+
+class LoadGenerator:
+    def __init__(self, targets, args, png):
+        self.targets = targets
+        self.args = args
+        self.bursts = bursts(png)
+        self.page_weights = parse_weights(args.pages, PAGES)
+        self.burst_weights = parse_weights(args.burst_mix, self.bursts)
+        self.scale = args.time_scale
+
+    def fire(self, step, connections, request, stop_at):
+        """Start a request without waiting for it, as setInterval and event handlers do."""
+        if time.perf_counter() >= stop_at:
+            return
+        step.scheduled += 1
+        task = asyncio.ensure_future(self.send(step, connections, request))
+        step.in_flight.add(task)
+        task.add_done_callback(step.in_flight.discard)
+
+    async def send(self, step, connections, request):
+        service, method, path, make_body = request
+        host, port = self.targets[service]
+        body, content_type = make_body() if make_body else (b'', None)
+        queued = time.perf_counter()
+        async with connections:
+            started = time.perf_counter()
+            try:
+                status, headers, _ = await asyncio.wait_for(
+                    http_request(host, port, method, path, body, content_type), self.args.timeout)
+                service_ms = headers.get(SERVICE_TIME_HEADER.lower())
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status, service_ms = 0, None
+            finished = time.perf_counter()
+        step.record(f"{service}:{method} {path.split('?')[0]}", status, started - queued, finished - started,
+                    float(service_ms) / 1000 if service_ms else None)
+
+    async def tab(self, step, connections, page, stop_at):
+        spec = PAGES[page]
+        # Tabs are opened at random moments rather than all at once
+        await asyncio.sleep(random.uniform(0, self.args.ramp_seconds))
+        mounted = time.perf_counter()
+        for request in spec['mount']:
+            self.fire(step, connections, request, stop_at)
+        if not spec['every']:
+            return
+        interval = spec['every'] / self.scale
+        tick = 1
+        while True:
+            next_at = mounted + tick * interval
+            if next_at >= stop_at:
+                return
+            await asyncio.sleep(next_at - time.perf_counter())
+            for request in spec['tick']:
+                self.fire(step, connections, request, stop_at)
+            tick += 1
+
+    async def interactions(self, step, connections, stop_at):
+        rate = self.args.bursts_per_minute * self.scale / 60
+        if rate <= 0:
+            return
+        names, weights = zip(*self.burst_weights.items())
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            if time.perf_counter() >= stop_at:
+                return
+            self.fire(step, connections, self.bursts[random.choices(names, weights)[0]], stop_at)
+
+    async def user(self, step, stop_at):
+        connections = asyncio.Semaphore(BROWSER_CONNECTIONS)
+        names, weights = zip(*self.page_weights.items())
+        pages = random.choices(names, weights, k=self.args.tabs_per_user)
+        await asyncio.gather(*(self.tab(step, connections, page, stop_at) for page in pages),
+                             self.interactions(step, connections, stop_at))
+
+    async def run_step(self, users):
+        step = Step()
+        stop_at = time.perf_counter() + self.args.step_seconds
+        await asyncio.gather(*(self.user(step, stop_at) for _ in range(users)))
+        # Let requests already sent finish so late responses count against this step
+        if step.in_flight:
+            await asyncio.wait(set(step.in_flight), timeout=self.args.timeout)
+        for task in list(step.in_flight):
+            task.cancel()
+        return step
+
+
+# ---------------------------- Report ---------------------------- #
+
+def _ms(values, pct):
+    value = percentile(sorted(values), pct)
+    return round(value * 1000, 1) if value is not None else None
+
+
+def summarize(step, users, args, upstream, speech_calls):
+    samples = step.samples
+    duration = args.step_seconds
+    ok = [s for s in samples if 0 < s['status'] < 500]
+    errors = len(samples) - len(ok)
+    latencies = [s['latency'] for s in samples]
+    queueing = [s['latency'] - s['service'] for s in samples if s['service'] is not None]
+    # One wall-clock minute at time_scale covers time_scale simulated minutes per user
+    user_minutes = users * duration * args.time_scale / 60
+    row = {
+        'users': users,
+        'equivalent_users': users * args.time_scale,
+        'offered_rps': round(step.scheduled / duration, 1),
+        'completed_rps': round(len(ok) / duration, 1),
+        'p50_ms': _ms(latencies, 50),
+        'p95_ms': _ms(latencies, 95),
+        'p99_ms': _ms(latencies, 99),
+        'queueing_p50_ms': _ms(queueing, 50),
+        'queueing_p95_ms': _ms(queueing, 95),
+        'browser_wait_p95_ms': _ms([s['wait'] for s in samples], 95),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'upstream_calls': upstream,
+        'upstream_per_request': round(sum(upstream.values()) / len(samples), 2)
+        if upstream is not None and samples else None,
+        'upstream_per_user_minute': round(sum(upstream.values()) / user_minutes, 2)
+        if upstream is not None else None,
+        'user_minutes': round(user_minutes, 2),
+        'speech_calls_per_user_minute': round(speech_calls / user_minutes, 3) if speech_calls is not None else None,
+        'routes': {},
+    }
+    for route in sorted({s['route'] for s in samples}):
+        subset = [s for s in samples if s['route'] == route]
+        row['routes'][route] = {
+            'requests': len(subset),
+            'p95_ms': _ms([s['latency'] for s in subset], 95),
+            'queueing_p95_ms': _ms([s['latency'] - s['service'] for s in subset if s['service'] is not None], 95),
+            'errors': sum(1 for s in subset if not 0 < s['status'] < 500),
+        }
+    reasons = []
+    if row['p95_ms'] is not None and row['p95_ms'] > args.slo_ms:
+        reasons.append(f"p95 {row['p95_ms']}ms > {args.slo_ms:g}ms")
+    if step.scheduled and len(ok) < step.scheduled * 0.95:
+        reasons.append(f"completed {len(ok)} of {step.scheduled} offered")
+    if row['error_rate'] > 0.01:
+        reasons.append(f"error rate {row['error_rate']:.1%}")
+    row['saturated'] = reasons
+    return row
+
+
+def _fmt(value, width=9):
+    return f'{value:>{width}.1f}' if value is not None else f"{'-':>{width}}"
+
+
+def print_row(row):
+    print(f"{row['users']:>6}{row['equivalent_users']:>8}{row['offered_rps']:>9.1f}{row['completed_rps']:>9.1f}"
+          f"{_fmt(row['p50_ms'])}{_fmt(row['p95_ms'])}{_fmt(row['p99_ms'])}{_fmt(row['queueing_p95_ms'])}"
+          f"{_fmt(row['browser_wait_p95_ms'])}{_fmt(row['upstream_per_user_minute'], 11)}"
+          f"{row['error_rate']:>8.1%}  {'; '.join(row['saturated']) or 'ok'}")
+
+
+def print_routes(row):
+    print(f"\nPer route at {row['users']} users:")
+    print(f"  {'route':<44}{'requests':>9}{'p95':>9}{'queue p95':>11}{'errors':>8}")
+    for route, stats in row['routes'].items():
+        print(f"  {route:<44}{stats['requests']:>9}{_fmt(stats['p95_ms'])}"
+              f"{_fmt(stats['queueing_p95_ms'], 11)}{stats['errors']:>8}")
+    if row['upstream_calls']:
+        per_user = sorted(((count / row['user_minutes'], op) for op, count in row['upstream_calls'].items()),
+                          reverse=True)
+        print('  upstream calls per user-minute: ' + ', '.join(f'{op} {rate:.2f}' for rate, op in per_user))
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', default='10,25,50,100,200', help='comma-separated user counts to step through')
+    parser.add_argument('--step-seconds', type=float, default=60)
+    parser.add_argument('--ramp-seconds', type=float, default=5, help='tabs open at random within this window')
+    parser.add_argument('--time-scale', type=float, default=1, help='divide every timer by this factor')
+    parser.add_argument('--tabs-per-user', type=int, default=2)
+    parser.add_argument('--pages', default='overview=2,ec2_details=2,cloudwatch=1,home=1',
+                        help='relative weights of the pages users keep open')
+    parser.add_argument('--bursts-per-minute', type=float, default=1, help='interactive requests per user')
+    parser.add_argument('--burst-mix', default='upload=1,analyze=1,tts=2')
+    parser.add_argument('--slo-ms', type=float, default=1000, help='p95 above this counts as saturated')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--stop-at-saturation', action='store_true')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--gateway-url', help='drive a running gateway instead of an in-process one')
+    parser.add_argument('--tts-url', help='drive a running TTS service instead of an in-process one')
+    parser.add_argument('--server-threads', type=int, default=0,
+                        help='in-process worker pool size (0 = thread per request, like app.run)')
+    parser.add_argument('--latency-ms', type=float, default=40, help='injected delay per stubbed AWS call')
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--speech-latency-ms', type=float, default=300)
+    parser.add_argument('--scale', type=int, default=50, help='instances/buckets/alarms returned by list calls')
+    parser.add_argument('--output', help='results file (default benchmarks/results/load-<timestamp>.json)')
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    raise_fd_limit()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'test')
+
+    aws = tts = None
+    targets = {}
+    servers = []
+    if not (args.gateway_url and args.tts_url):
+        aws = AwsStub(Latency(args.latency_ms, args.jitter_ms), scale=args.scale).__enter__()
+        gateway, tts = load_gateways(Latency(args.speech_latency_ms, args.jitter_ms))
+        for service, flask_app in (('gateway', gateway.app), ('tts', tts.app)):
+            server, port = serve(flask_app, args.server_threads)
+            servers.append(server)
+            targets[service] = ('127.0.0.1', port)
+    for service, url in (('gateway', args.gateway_url), ('tts', args.tts_url)):
+        if url:
+            parts = urlsplit(url)
+            targets[service] = (parts.hostname, parts.port or 80)
+    # Upstream counts are only meaningful when the gateway runs against the stub
+    count_upstream = aws is not None and not args.gateway_url
+
+    generator = LoadGenerator(targets, args, _png())
+    results = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'targets': {service: f'{host}:{port}' for service, (host, port) in targets.items()},
+            **{key: getattr(args, key) for key in ('step_seconds', 'time_scale', 'tabs_per_user', 'pages',
+                                                   'bursts_per_minute', 'burst_mix', 'slo_ms', 'server_threads',
+                                                   'latency_ms', 'jitter_ms', 'speech_latency_ms', 'scale')},
+        },
+        'steps': [],
+        'saturation': None,
+    }
+    print(f"{'users':>6}{'equiv':>8}{'offered':>9}{'done/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queue95':>9}"
+          f"{'wait95':>9}{'up/usr-min':>11}{'errors':>8}  status")
+    loop = asyncio.new_event_loop()
+    try:
+        for users in (int(u) for u in args.users.split(',')):
+            if aws is not None:
+                aws.reset()
+            speech_before = tts.synthesizer_pool.calls if tts is not None and not args.tts_url else None
+            step = loop.run_until_complete(generator.run_step(users))
+            row = summarize(step, users, args, dict(aws.calls) if count_upstream else None,
+                            tts.synthesizer_pool.calls - speech_before if speech_before is not None else None)
+            print_row(row)
+            results['steps'].append(row)
+            if row['saturated'] and results['saturation'] is None:
+                results['saturation'] = {'users': users, 'equivalent_users': row['equivalent_users'],
+                                         'reasons': row['saturated']}
+                if args.stop_at_saturation:
+                    break
+    finally:
+        loop.close()
+        for server in servers:
+            server.shutdown()
+
+    if results['steps']:
+        # Break down the first saturated step, where the bottleneck shows
+        saturated = [r for r in results['steps'] if r['saturated']]
+        print_routes(saturated[0] if saturated else results['steps'][-1])
+    healthy = [r for r in results['steps'] if not r['saturated']]
+    if results['saturation']:
+        sat = results['saturation']
+        print(f"\nSaturated at {sat['users']} users ({sat['equivalent_users']:g} real-time): "
+              f"{'; '.join(sat['reasons'])}")
+    if healthy:
+        print(f"Last healthy step: {healthy[-1]['users']} users ({healthy[-1]['equivalent_users']:g} real-time), "
+              f"{healthy[-1]['completed_rps']} req/s")
+
+    output = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"load-{datetime.utcnow():%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,508 @@
+"""Offline stand-ins for the clouds behind both gateways.
+
+AwsStub replaces botocore's API call with canned, correctly shaped
+responses after an injected delay, so every boto3 route runs without a
+network. Point the gateway at moto server instead by passing the stub's
+operations through (see bench_routes.py --aws-endpoint). LocalS3 is a
+small S3-compatible HTTP server for flows that leave boto3, such as
+browsers PUTting to presigned URLs. StubSynthesizerPool
+stands in for the Azure Speech SDK with the same interface as
+azure_speech.SynthesizerPool.
+"""
+import hashlib
+import io
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+
+class Latency:
+    """Injected delay: base milliseconds plus uniform jitter, per call."""
+
+    def __init__(self, base_ms=0.0, jitter_ms=0.0, per_operation=None):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self.per_operation = per_operation or {}
+
+    def sleep(self, operation=None):
+        base = self.per_operation.get(operation, self.base_ms)
+        delay = base + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+_PATTERN = bytes(range(251))
+
+
+def object_bytes(first, last):
+    """Bytes first..last of every stub object: byte i is i % 251, so misplaced ranges show up."""
+    offset = first % len(_PATTERN)
+    length = last - first + 1
+    return (_PATTERN * ((offset + length) // len(_PATTERN) + 1))[offset:offset + length]
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _instances(count):
+    return {'Reservations': [{'Instances': [{
+        'InstanceId': f'i-{i:017x}',
+        'InstanceType': 't3.micro',
+        'State': {'Name': 'running' if i % 4 else 'stopped', 'Code': 16 if i % 4 else 80},
+        'PublicIpAddress': f'54.0.{i // 256}.{i % 256}',
+        'PrivateIpAddress': f'10.0.{i // 256}.{i % 256}',
+        'LaunchTime': _now() - timedelta(days=i),
+        'Placement': {'AvailabilityZone': 'us-east-1a'},
+        'VpcId': 'vpc-0123456789',
+        'SubnetId': 'subnet-0123456789',
+        'SecurityGroups': [{'GroupName': 'default', 'GroupId': 'sg-0123456789'}],
+        'Tags': [{'Key': 'Name', 'Value': f'web-{i}'}],
+    }]} for i in range(count)]}
+
+
+def _metric_results(params, points):
+    """Random series for every returned query; SORT(..., N) expressions yield N series."""
+    now = _now()
+
+    def result(query_id, label):
+        return {
+            'Id': query_id,
+            'Label': label,
+            'Timestamps': [now - timedelta(minutes=5 * i) for i in range(points)],
+            'Values': [random.random() * 100 for _ in range(points)],
+            'StatusCode': 'Complete',
+        }
+
+    queries = params.get('MetricDataQueries', [])
+    results = []
+    for query in queries:
+        if query.get('ReturnData') is False:
+            continue
+        expression = query.get('Expression', '')
+        if expression.startswith('SORT('):
+            limit = int(expression.rstrip(')').rsplit(',', 1)[1])
+            sources = [q for q in queries if 'MetricStat' in q][:limit]
+            results.extend(result(query['Id'], source.get('Label', source['Id'])) for source in sources)
+        else:
+            results.append(result(query['Id'], query.get('Label', query['Id'])))
+    return {'MetricDataResults': results}
+
+
+# (dimension, fixed dimensions) each namespace's chartable metric is published with
+_METRIC_DIMENSIONS = {
+    'AWS/EC2': ('InstanceId', {}),
+    'AWS/S3': ('BucketName', {'StorageType': 'StandardStorage'}),
+    'AWS/CloudFront': ('DistributionId', {'Region': 'Global'}),
+}
+
+
+def _distribution(i):
+    return {
+        'Id': f'E{i:013d}', 'ARN': f'arn:aws:cloudfront::123456789012:distribution/E{i:013d}',
+        'Status': 'Deployed', 'LastModifiedTime': datetime(2024, 1, 1, tzinfo=timezone.utc),
+        'DomainName': f'd{i}.cloudfront.net', 'Comment': f'site {i}', 'Enabled': True,
+        'PriceClass': 'PriceClass_All', 'HttpVersion': 'http2', 'Aliases': {'Quantity': 0},
+        'Origins': {'Quantity': 1, 'Items': [{'Id': 'S3Origin', 'DomainName': f'bucket-{i}.s3.amazonaws.com'}]},
+    }
+
+
+class AwsStub:
+    """Patch botocore so every AWS call returns canned data after a delay.
+
+    scale sets list sizes (instances, buckets, objects, distributions,
+    datapoints). calls counts upstream requests per operation, which is
+    how the load tools measure amplification.
+    """
+
+    LOG_EVENT_INTERVAL_MS = 100
+
+    list_page_size = 1000
+
+    def __init__(self, latency=None, scale=100, object_size=1024 * 1024):
+        self.latency = latency or Latency()
+        self.scale = scale
+        self.object_size = object_size
+        self.calls = {}
+        self.queries = {}
+        self._lock = threading.Lock()
+        self._patch = mock.patch('botocore.client.BaseClient._make_api_call', self._make_api_call)
+
+    def __enter__(self):
+        self._patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._patch.stop()
+
+    def reset(self):
+        with self._lock:
+            self.calls = {}
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def _make_api_call(self, operation, params):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        self.latency.sleep(operation)
+        handler = getattr(self, f'op_{operation}', None)
+        return handler(params) if handler else {}
+
+    # --- S3 ---
+    def op_ListBuckets(self, params):
+        return {'Buckets': [{'Name': f'bucket-{i}', 'CreationDate': _now()} for i in range(self.scale)],
+                'Owner': {'ID': 'owner'}}
+
+    def op_ListObjectsV2(self, params):
+        # Paged like S3: at most MaxKeys (or list_page_size) keys, continuing from the token's offset
+        first = int(params.get('ContinuationToken') or 0)
+        last = min(first + params.get('MaxKeys', self.list_page_size), self.scale)
+        response = {'Contents': [{'Key': f'obj-{i}', 'Size': self.object_size, 'LastModified': _now(),
+                                  'ETag': '"stub"'} for i in range(first, last)],
+                    'KeyCount': last - first, 'IsTruncated': last < self.scale}
+        if last < self.scale:
+            response['NextContinuationToken'] = str(last)
+        return response
+
+    def op_HeadObject(self, params):
+        if params.get('Key', '').startswith('missing'):
+            from botocore.exceptions import ClientError
+            raise ClientError({'Error': {'Code': '404'}, 'ResponseMetadata': {'HTTPStatusCode': 404}}, 'HeadObject')
+        return {'ContentLength': self.object_size, 'ETag': '"stub"', 'ContentType': 'application/octet-stream',
+                'LastModified': _now()}
+
+    def op_GetObject(self, params):
+        first, last = 0, self.object_size - 1
+        response = {'ETag': '"stub"', 'ContentType': 'application/octet-stream', 'LastModified': _now()}
+        if params.get('Range'):
+            first, last = (int(v) for v in params['Range'][len('bytes='):].split('-'))
+            response['ContentRange'] = f'bytes {first}-{last}/{self.object_size}'
+        length = last - first + 1
+        response['ContentLength'] = length
+        response['Body'] = StreamingBody(io.BytesIO(object_bytes(first, last)), length)
+        return response
+
+    def op_PutObject(self, params):
+        return {'ETag': '"stub"'}
+
+    def op_CreateMultipartUpload(self, params):
+        return {'UploadId': 'stub-upload'}
+
+    def op_UploadPart(self, params):
+        return {'ETag': '"stub-part"'}
+
+    def op_CompleteMultipartUpload(self, params):
+        return {'ETag': '"stub-2"'}
+
+    def op_GetBucketLocation(self, params):
+        return {'LocationConstraint': None}
+
+    # --- EC2 ---
+    def op_DescribeInstances(self, params):
+        return _instances(len(params.get('InstanceIds') or []) or self.scale)
+
+    def op_StartInstances(self, params):
+        return {'StartingInstances': [{'InstanceId': i, 'CurrentState': {'Name': 'pending'}}
+                                      for i in params['InstanceIds']]}
+
+    def op_StopInstances(self, params):
+        return {'StoppingInstances': [{'InstanceId': i, 'CurrentState': {'Name': 'stopping'}}
+                                      for i in params['InstanceIds']]}
+
+    def op_DescribeRegions(self, params):
+        return {'Regions': [{'RegionName': r} for r in ('us-east-1', 'us-west-2', 'eu-west-1', 'ap-south-1')]}
+
+    # --- Rekognition ---
+    def op_DetectLabels(self, params):
+        return {'Labels': [{'Name': f'label-{i}', 'Confidence': 90.0, 'Instances': [], 'Parents': []}
+                           for i in range(20)]}
+
+    def op_DetectFaces(self, params):
+        return {'FaceDetails': [{'Confidence': 99.0, 'Quality': {'Brightness': 80.0, 'Sharpness': 90.0}}]}
+
+    def op_RecognizeCelebrities(self, params):
+        return {'CelebrityFaces': [], 'UnrecognizedFaces': []}
+
+    def op_DetectText(self, params):
+        return {'TextDetections': [{'DetectedText': 'STUB', 'Type': 'LINE', 'Confidence': 99.0}]}
+
+    def op_DetectProtectiveEquipment(self, params):
+        return {'Persons': []}
+
+    # --- CloudFront ---
+    def op_ListDistributions(self, params):
+        return {'DistributionList': {'Quantity': self.scale, 'IsTruncated': False,
+                                     'Items': [_distribution(i) for i in range(self.scale)]}}
+
+    def op_CreateDistribution(self, params):
+        return {'Distribution': {'Id': 'ESTUB', 'DomainName': 'dstub.cloudfront.net', 'Status': 'InProgress'}}
+
+    def op_CreateInvalidation(self, params):
+        return {'Invalidation': {'Id': f'I{random.randrange(10 ** 8)}', 'Status': 'InProgress'}}
+
+    def op_GetInvalidation(self, params):
+        return {'Invalidation': {'Id': params['Id'], 'Status': 'Completed'}}
+
+    def op_CreateCloudFrontOriginAccessIdentity(self, params):
+        return {'CloudFrontOriginAccessIdentity': {'Id': 'OAISTUB', 'S3CanonicalUserId': 'canonical'}}
+
+    # --- CloudWatch ---
+    def op_GetMetricData(self, params):
+        return _metric_results(params, points=min(self.scale * 3, 288))
+
+    def op_DescribeAlarms(self, params):
+        return {'MetricAlarms': [{'AlarmName': f'alarm-{i}', 'StateValue': 'OK' if i % 5 else 'ALARM',
+                                  'MetricName': 'CPUUtilization', 'Namespace': 'AWS/EC2',
+                                  'StateUpdatedTimestamp': _now()} for i in range(self.scale)]}
+
+    def op_ListMetrics(self, params):
+        namespace = params.get('Namespace', 'AWS/EC2')
+        dimension, fixed = _METRIC_DIMENSIONS.get(namespace, ('InstanceId', {}))
+        values = {'InstanceId': lambda i: f'i-{i:017x}', 'BucketName': lambda i: f'bucket-{i}',
+                  'DistributionId': lambda i: f'E{i:013d}'}[dimension]
+        return {'Metrics': [{
+            'Namespace': namespace, 'MetricName': params.get('MetricName', 'CPUUtilization'),
+            'Dimensions': [{'Name': dimension, 'Value': values(i)}] +
+                          [{'Name': name, 'Value': value} for name, value in fixed.items()],
+        } for i in range(self.scale)]}
+
+    # --- CloudWatch Logs ---
+    def op_DescribeLogGroups(self, params):
+        prefix = params.get('logGroupNamePrefix', '')
+        names = [name for name in (f'/aws/lambda/fn-{i}' for i in range(self.scale)) if name.startswith(prefix)]
+        start = int(params.get('nextToken', 0))
+        end = start + params.get('limit', 50)
+        return {'logGroups': [{'logGroupName': name, 'storedBytes': 1024 * i, 'retentionInDays': 30}
+                              for i, name in enumerate(names[start:end], start)],
+                **({'nextToken': str(end)} if end < len(names) else {})}
+
+    def op_FilterLogEvents(self, params):
+        """A live log: two streams each write one line every LOG_EVENT_INTERVAL_MS up to now."""
+        if params['logGroupName'].startswith('/missing'):
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException',
+                                         'Message': 'The specified log group does not exist.'}}, 'FilterLogEvents')
+        step = self.LOG_EVENT_INTERVAL_MS
+        now = int(time.time() * 1000)
+        start = max(int(params.get('nextToken') or params.get('startTime', now - 3600 * 1000)),
+                    params.get('startTime', 0))
+        end = min(params.get('endTime', now), now)
+        limit = min(params.get('limit', 10000), 1000)
+        pattern = params.get('filterPattern', '')
+        events, timestamp = [], -(-start // step) * step
+        while timestamp <= end and len(events) < limit:
+            for stream in ('web-1', 'web-2'):
+                message = f"{'ERROR' if timestamp % 7000 == 0 else 'INFO'} {stream} served request {timestamp}"
+                if pattern and pattern not in message:
+                    continue
+                events.append({'logStreamName': stream, 'timestamp': timestamp, 'message': message,
+                               'ingestionTime': timestamp + 50, 'eventId': f'{timestamp}-{stream}'})
+            timestamp += step
+        return {'events': events, **({'nextToken': str(timestamp)} if timestamp <= end else {})}
+
+    def op_StartQuery(self, params):
+        query_id = f'q-{random.randrange(16 ** 12):012x}'
+        with self._lock:
+            self.queries[query_id] = {'limit': params.get('limit', 1000), 'polls': 0, 'status': 'Running'}
+        return {'queryId': query_id}
+
+    def op_GetQueryResults(self, params):
+        """Results grow on every poll and are complete on the third."""
+        with self._lock:
+            query = self.queries[params['queryId']]
+            if query['status'] == 'Running':
+                query['polls'] += 1
+                if query['polls'] >= 3:
+                    query['status'] = 'Complete'
+        rows = query['limit'] * min(query['polls'], 3) // 3
+        return {'status': query['status'], 'results': [[
+            {'field': '@timestamp', 'value': f'2024-01-01 00:00:{i % 60:02d}.000'},
+            {'field': '@message', 'value': f'INFO served request {i}'},
+            {'field': '@ptr', 'value': f'ptr-{i}'},
+        ] for i in range(rows)], 'statistics': {'recordsMatched': float(rows), 'recordsScanned': float(rows * 10),
+                                                'bytesScanned': float(rows * 1000)}}
+
+    def op_StopQuery(self, params):
+        with self._lock:
+            query = self.queries[params['queryId']]
+            if query['status'] != 'Running':
+                raise ClientError({'Error': {'Code': 'InvalidParameterException',
+                                             'Message': 'Query is not running'}}, 'StopQuery')
+            query['status'] = 'Cancelled'
+        return {'success': True}
+
+    # --- STS ---
+    def op_AssumeRole(self, params):
+        return {'Credentials': {
+            'AccessKeyId': f'ASIA{random.randrange(16 ** 12):012X}',
+            'SecretAccessKey': 'stub-secret',
+            'SessionToken': 'stub-token',
+            'Expiration': _now() + timedelta(seconds=params.get('DurationSeconds', 3600)),
+        }, 'AssumedRoleUser': {'Arn': f"{params['RoleArn']}/{params['RoleSessionName']}",
+                               'AssumedRoleId': 'AROASTUB:stub'}}
+
+    def op_GetCallerIdentity(self, params):
+        return {'Account': '123456789012', 'Arn': 'arn:aws:iam::123456789012:user/stub', 'UserId': 'AIDASTUB'}
+
+
+class LocalS3:
+    """In-memory, path-style S3 over HTTP on 127.0.0.1 (signatures are not checked).
+
+    Serves buckets, objects, multipart uploads and bucket CORS, which is
+    enough for presign -> part PUT -> complete/abort round trips. Point the
+    gateway at it with AWS_S3_ENDPOINT_URL=<endpoint>.
+    """
+
+    def __init__(self):
+        self.objects = {}   # (bucket, key) -> bytes
+        self.uploads = {}   # upload id -> {'bucket', 'key', 'parts': {number: bytes}}
+        self.cors = {}      # bucket -> CORSConfiguration XML
+        self.buckets = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self.endpoint = f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        s3 = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_PUT(self):
+                s3._dispatch(self, 'PUT')
+
+            def do_POST(self):
+                s3._dispatch(self, 'POST')
+
+            def do_GET(self):
+                s3._dispatch(self, 'GET')
+
+            def do_HEAD(self):
+                s3._dispatch(self, 'HEAD')
+
+            def do_DELETE(self):
+                s3._dispatch(self, 'DELETE')
+        return Handler
+
+    def _dispatch(self, request, method):
+        url = urlsplit(request.path)
+        query = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        body = request.rfile.read(int(request.headers.get('Content-Length') or 0))
+        with self._lock:
+            status, headers, payload = self._handle(method, bucket, key, query, body)
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header('Content-Length', str(len(payload)))
+        request.end_headers()
+        if method != 'HEAD':
+            request.wfile.write(payload)
+
+    @staticmethod
+    def _xml(tag, inner):
+        return 200, {'Content-Type': 'application/xml'}, f'<{tag}>{inner}</{tag}>'.encode()
+
+    @staticmethod
+    def _error(status, code):
+        return status, {'Content-Type': 'application/xml'}, f'<Error><Code>{code}</Code></Error>'.encode()
+
+    def _handle(self, method, bucket, key, query, body):
+        if bucket not in self.buckets and not (method == 'PUT' and not key):
+            return self._error(404, 'NoSuchBucket')
+        if not key:
+            if 'cors' in query:
+                if method == 'PUT':
+                    self.cors[bucket] = body.decode()
+                    return 200, {}, b''
+                if bucket not in self.cors:
+                    return self._error(404, 'NoSuchCORSConfiguration')
+                return 200, {'Content-Type': 'application/xml'}, self.cors[bucket].encode()
+            if method == 'PUT':
+                self.buckets.add(bucket)
+                return 200, {}, b''
+            return self._error(400, 'NotImplemented')
+
+        upload = self.uploads.get(query.get('uploadId'))
+        if 'uploadId' in query and upload is None:
+            return self._error(404, 'NoSuchUpload')
+        if method == 'POST' and 'uploads' in query:
+            upload_id = uuid.uuid4().hex
+            self.uploads[upload_id] = {'bucket': bucket, 'key': key, 'parts': {}}
+            return self._xml('InitiateMultipartUploadResult',
+                             f'<Bucket>{bucket}</Bucket><Key>{key}</Key><UploadId>{upload_id}</UploadId>')
+        if method == 'PUT' and upload:
+            upload['parts'][int(query['partNumber'])] = body
+            return 200, {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}, b''
+        if method == 'GET' and upload:
+            parts = ''.join(f'<Part><PartNumber>{n}</PartNumber><ETag>"{hashlib.md5(data).hexdigest()}"</ETag>'
+                            f'<Size>{len(data)}</Size></Part>' for n, data in sorted(upload['parts'].items()))
+            return self._xml('ListPartsResult', f'<IsTruncated>false</IsTruncated>{parts}')
+        if method == 'POST' and upload:
+            numbers = [int(n) for n in re.findall(r'<PartNumber>(\d+)</PartNumber>', body.decode())]
+            if not numbers or any(n not in upload['parts'] for n in numbers):
+                return self._error(400, 'InvalidPart')
+            del self.uploads[query['uploadId']]
+            self.objects[(bucket, key)] = b''.join(upload['parts'][n] for n in numbers)
+            return self._xml('CompleteMultipartUploadResult',
+                             f'<Bucket>{bucket}</Bucket><Key>{key}</Key><ETag>"{len(numbers)}"</ETag>')
+        if method == 'DELETE' and upload:
+            del self.uploads[query['uploadId']]
+            return 204, {}, b''
+        if method == 'PUT':
+            self.objects[(bucket, key)] = body
+            return 200, {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}, b''
+        if method in ('GET', 'HEAD'):
+            if (bucket, key) not in self.objects:
+                return self._error(404, 'NoSuchKey')
+            return 200, {'Content-Type': 'application/octet-stream'}, self.objects[(bucket, key)]
+        return self._error(400, 'NotImplemented')
+
+
+class StubSynthesizerPool:
+    """Drop-in for azure_speech.SynthesizerPool that returns silence after a delay.
+
+    Audio size follows text length (bytes_per_char) so cache and streaming
+    costs scale like the real service.
+    """
+
+    def __init__(self, latency=None, bytes_per_char=400, chunk_size=16 * 1024):
+        self.latency = latency or Latency()
+        self.bytes_per_char = bytes_per_char
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _audio(self, text):
+        with self._lock:
+            self.calls += 1
+        self.latency.sleep('synthesize')
+        return b'\0' * (len(text) * self.bytes_per_char)
+
+    def synthesize(self, text, voice=None, fmt='wav', ssml=False):
+        return self._audio(text)
+
+    def stream(self, text, voice=None, fmt='mp3', chunk_size=None):
+        audio = self._audio(text)
+        size = chunk_size or self.chunk_size
+        return iter([audio[i:i + size] for i in range(0, len(audio), size)] or [b''])
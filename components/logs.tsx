@@ -1,40 +1,55 @@
+'use client'
+
+import { useEffect, useState } from "react"
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
+import { tailLogGroup } from "@/lib/api"
+
+// Rows kept on screen; older ones drop off as new events arrive
+const MAX_ROWS = 500
+
+type LogEvent = {
+  id: string
+  timestamp: number
+  stream: string
+  message: string
+}
+
+export function Logs({ group, filter }: { group: string; filter?: string }) {
+  const [logs, setLogs] = useState<LogEvent[]>([])
+  const [error, setError] = useState<string | null>(null)
 
-const logs = [
-  {
-    id: 1,
-    timestamp: "2023-06-07T13:00:00Z",
-    connector: "AWS",
-    message: "Successfully synced data from S3 bucket",
-  },
-  {
-    id: 2,
-    timestamp: "2023-06-07T13:15:00Z",
-    connector: "Azure",
-    message: "Updated VM configurations",
-  },
-  {
-    id: 3,
-    timestamp: "2023-06-07T13:30:00Z",
-    connector: "Google Cloud",
-    message: "Deployed new Cloud Function",
-  },
-]
+  useEffect(() => {
+    setLogs([])
+    setError(null)
+    const source = tailLogGroup(group, { filter })
+    source.addEventListener("events", (event) => {
+      const { events } = JSON.parse((event as MessageEvent).data) as { events: LogEvent[] }
+      setLogs((current) => [...events.reverse(), ...current].slice(0, MAX_ROWS))
+    })
+    source.addEventListener("error", (event) => {
+      // Server-side failures arrive as an "error" event with a body; connection drops have none and reconnect
+      const data = (event as MessageEvent).data
+      if (data) {
+        setError(JSON.parse(data).error)
+        source.close()
+      }
+    })
+    return () => source.close()
+  }, [group, filter])
 
-export function Logs() {
   return (
     <Card>
       <CardHeader>
         <CardTitle>Logs</CardTitle>
-        <CardDescription>Recent activity logs from your connectors</CardDescription>
+        <CardDescription>{error ?? `Live tail of ${group}`}</CardDescription>
       </CardHeader>
       <CardContent>
         <Table>
           <TableHeader>
             <TableRow>
               <TableHead>Timestamp</TableHead>
-              <TableHead>Connector</TableHead>
+              <TableHead>Stream</TableHead>
               <TableHead>Message</TableHead>
             </TableRow>
           </TableHeader>
@@ -42,7 +57,7 @@ export function Logs() {
             {logs.map((log) => (
               <TableRow key={log.id}>
                 <TableCell>{new Date(log.timestamp).toLocaleString()}</TableCell>
-                <TableCell>{log.connector}</TableCell>
+                <TableCell>{log.stream}</TableCell>
                 <TableCell>{log.message}</TableCell>
               </TableRow>
             ))}
@@ -52,4 +67,3 @@ export function Logs() {
     </Card>
   )
 }
-
@@ -52,24 +52,109 @@ export async function deleteS3Bucket(bucketName: string) {
   return response.json();
 }
 
-export async function uploadFileToS3(bucketName: string, file: File) {
+// Parts sent to S3 at once for multipart uploads
+const UPLOAD_CONCURRENCY = 4;
+
+async function postJson(path: string, body: unknown) {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(body),
+  });
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || `Request to ${path} failed`);
+  }
+  return data;
+}
+
+async function putToS3(url: string, body: Blob, headers: Record<string, string> = {}) {
+  const response = await fetch(url, { method: 'PUT', body, headers });
+  if (!response.ok) {
+    throw new Error(`S3 upload failed with status ${response.status}`);
+  }
+  return response;
+}
+
+// Fallback: the gateway receives the file and uploads it to S3 itself
+async function proxyUploadToS3(bucketName: string, file: File) {
   const formData = new FormData();
   formData.append('file', file);
   formData.append('bucket_name', bucketName);
 
+  const response = await fetch(`${API_BASE_URL}/s3/upload`, {
+    method: 'POST',
+    body: formData,
+  });
+  const data = await response.json();
+  if (!response.ok) {
+    throw new Error(data.error || 'Failed to upload file');
+  }
+  return data;
+}
+
+// Sends the file to the presigned URLs; returns false when S3 refused or the
+// browser blocked the requests (e.g. missing bucket CORS rules)
+async function putPlanToS3(bucketName: string, file: File, plan: any) {
+  if (plan.method === 'single') {
+    try {
+      await putToS3(plan.url, file, plan.headers);
+      return true;
+    } catch (error) {
+      console.warn('Direct upload failed, retrying through the gateway:', error);
+      return false;
+    }
+  }
+
+  const queue = [...plan.parts];
+  const worker = async () => {
+    for (let part = queue.shift(); part; part = queue.shift()) {
+      await putToS3(part.url, file.slice(part.start, part.end + 1));
+    }
+  };
+  try {
+    await Promise.all(Array.from({ length: UPLOAD_CONCURRENCY }, worker));
+    return true;
+  } catch (error) {
+    console.warn('Direct upload failed, retrying through the gateway:', error);
+    await postJson('/s3/abort_multipart', { bucket_name: bucketName, key: plan.key, upload_id: plan.upload_id })
+      .catch(() => undefined);
+    return false;
+  }
+}
+
+// Uploads go straight from the browser to S3 through presigned URLs; the
+// gateway only signs the URLs and completes multipart uploads. When the
+// bucket cannot accept browser uploads, the file goes through /s3/upload.
+export async function uploadFileToS3(bucketName: string, file: File) {
   try {
-    const response = await fetch(`${API_BASE_URL}/s3/upload`, {
-      method: 'POST',
-      body: formData,
+    const plan = await postJson('/s3/presign_upload', {
+      bucket_name: bucketName,
+      filename: file.name,
+      size: file.size,
+      content_type: file.type || undefined,
     });
 
-    const data = await response.json();
-    
-    if (!response.ok) {
-      throw new Error(data.error || 'Failed to upload file');
+    if (plan.method === 'proxy' || !(await putPlanToS3(bucketName, file, plan))) {
+      return await proxyUploadToS3(bucketName, file);
+    }
+
+    if (plan.method === 'single') {
+      return {
+        message: 'File uploaded successfully',
+        url: `https://${bucketName}.s3.amazonaws.com/${plan.key}`,
+        filename: plan.key,
+      };
     }
 
-    return data;
+    // Parts are looked up server-side, so the bucket's CORS rules need not expose ETag
+    return await postJson('/s3/complete_multipart', {
+      bucket_name: bucketName,
+      key: plan.key,
+      upload_id: plan.upload_id,
+    });
   } catch (error) {
     console.error('Upload error:', error);
     throw error;
@@ -237,3 +322,21 @@ export async function createCloudFrontDistribution(bucketName: string) {
   return response.json();
 }
 
+export async function listLogGroups(prefix?: string) {
+  const params = new URLSearchParams(prefix ? { prefix } : {});
+  const response = await fetch(`${API_BASE_URL}/cloudwatch/logs/groups?${params}`);
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.error || 'Failed to list log groups');
+  }
+  return response.json() as Promise<{ groups: { name: string; storedBytes: number; retentionInDays?: number }[]; nextToken?: string }>;
+}
+
+export function tailLogGroup(group: string, options: { filter?: string; cursor?: string; since?: number } = {}) {
+  const params = new URLSearchParams({ group });
+  if (options.filter) params.set('filter', options.filter);
+  if (options.cursor) params.set('cursor', options.cursor);
+  if (options.since !== undefined) params.set('since', String(options.since));
+  // EventSource reconnects on its own and resumes from the cursor via Last-Event-ID
+  return new EventSource(`${API_BASE_URL}/cloudwatch/logs/tail?${params}`);
+}